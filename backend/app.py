@@ -1,34 +1,28 @@
-import logging
-import sys
+import time
 from pathlib import Path
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from backend.config import Config
 from backend.routes import register_routes
+from backend.utils.file_serving import precompress_static, send_static_asset
+from backend.utils.logging_utils import create_console_handler, setup_async_logging
+from backend.utils.tracing import TraceContextFilter, configure_tracing
 
 
 def setup_logging():
-    """Setup logging system"""
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-
-    root_logger.handlers.clear()
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
-    console_format = logging.Formatter(
-        '\n%(asctime)s | %(levelname)-8s | %(name)s\n'
-        '  -> %(message)s',
-        datefmt='%H:%M:%S'
+    """Setup logging system (records are formatted and written by a background thread)"""
+    console_handler = create_console_handler(
+        '\n%(asctime)s | %(levelname)-8s | %(name)s | trace=%(trace_id)s\n'
+        '  -> %(message)s'
     )
-    console_handler.setFormatter(console_format)
-    root_logger.addHandler(console_handler)
 
-    logging.getLogger('backend').setLevel(logging.DEBUG)
-    logging.getLogger('werkzeug').setLevel(logging.INFO)
-    logging.getLogger('urllib3').setLevel(logging.WARNING)
-
-    return root_logger
+    return setup_async_logging(
+        [console_handler],
+        level=Config.LOG_LEVEL,
+        module_levels=Config.LOG_MODULE_LEVELS,
+        sampling=Config.LOG_SAMPLING,
+        context_filters=[TraceContextFilter()]
+    )
 
 
 def create_app():
@@ -48,12 +42,13 @@ def create_app():
         app = Flask(__name__)
 
     app.config.from_object(Config)
+    configure_tracing(Config.TRACE_EXPORT_FILE)
 
     CORS(app, resources={
         r"/api/*": {
             "origins": Config.CORS_ORIGINS,
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type"],
+            "allow_headers": ["Content-Type", "X-Trace-Id"],
         }
     })
 
@@ -61,14 +56,19 @@ def create_app():
 
     _validate_config_on_startup(logger)
 
+    if Config.STARTUP_WARMUP:
+        _warm_up_in_background(logger)
+
     if frontend_dist.exists():
+        _setup_static_serving(app, logger)
+
         @app.route('/')
         def serve_index():
-            return send_from_directory(app.static_folder, 'index.html')
+            return send_static_asset(app.static_folder, 'index.html')
 
         @app.errorhandler(404)
         def fallback(e):
-            return send_from_directory(app.static_folder, 'index.html')
+            return send_static_asset(app.static_folder, 'index.html')
     else:
         @app.route('/')
         def index():
@@ -86,52 +86,76 @@ def create_app():
     return app
 
 
-def _validate_config_on_startup(logger):
-    """Validate config on startup"""
-    from pathlib import Path
-    import yaml
+def _setup_static_serving(app, logger):
+    """Serve frontend/dist with precompressed variants, cache headers and optional offload"""
+    if Config.STATIC_PRECOMPRESS:
+        try:
+            created = precompress_static(app.static_folder)
+            logger.info("[OK] Precompressed %s static files", created)
+        except OSError as e:
+            logger.warning("[WARN] Failed to precompress static files: %s", e)
 
-    logger.info("Checking config files...")
+    if Config.STATIC_OFFLOAD:
+        logger.info("[OK] File transfers offloaded to the web server (%s)", Config.STATIC_OFFLOAD)
+
+    app.view_functions['static'] = lambda filename: send_static_asset(app.static_folder, filename)
+
+
+def _warm_up_in_background(logger):
+    """Preload the active providers' modules in a background thread (startup itself stays lazy)"""
+    import threading
 
-    text_config_path = Path(__file__).parent.parent / 'text_providers.yaml'
-    if text_config_path.exists():
+    def warm_up():
+        from backend.generators.factory import ImageGeneratorFactory
+        from backend.utils.config_store import CONFIG_STORE
+
+        start = time.perf_counter()
         try:
-            with open(text_config_path, 'r', encoding='utf-8') as f:
-                text_config = yaml.safe_load(f) or {}
-            active = text_config.get('active_provider', 'not set')
-            providers = list(text_config.get('providers', {}).keys())
-            logger.info(f"[OK] Text config: active={active}, providers={providers}")
-
-            if active in text_config.get('providers', {}):
-                provider = text_config['providers'][active]
-                if not provider.get('api_key'):
-                    logger.warning(f"[WARN] Text provider [{active}] API Key not set")
-                else:
-                    logger.info(f"[OK] Text provider [{active}] API Key configured")
+            image_config = CONFIG_STORE.get('image_providers')
+            active = image_config.get('active_provider', '')
+            provider_type = image_config.get('providers', {}).get(active, {}).get('type', active)
+            if provider_type in ImageGeneratorFactory.GENERATORS:
+                ImageGeneratorFactory.get_generator_class(provider_type)
+
+            text_config = CONFIG_STORE.get('text_providers')
+            active = text_config.get('active_provider', '')
+            if text_config.get('providers', {}).get(active, {}).get('type', active) == 'google_gemini':
+                import backend.utils.genai_client  # noqa: F401
         except Exception as e:
-            logger.error(f"[ERROR] Failed to read text_providers.yaml: {e}")
-    else:
-        logger.warning("[WARN] text_providers.yaml not found, using defaults")
+            logger.debug("Provider warm-up failed: %s", e)
+            return
+        logger.debug("Provider modules warmed up in %.2fs", time.perf_counter() - start)
+
+    threading.Thread(target=warm_up, name="startup-warmup", daemon=True).start()
 
-    image_config_path = Path(__file__).parent.parent / 'image_providers.yaml'
-    if image_config_path.exists():
+
+def _validate_config_on_startup(logger):
+    """Validate config on startup (parses each file once into the config store)"""
+    from backend.utils.config_store import CONFIG_STORE
+
+    logger.info("Checking config files...")
+
+    for name, label in (('text_providers', 'Text'), ('image_providers', 'Image')):
+        filename = CONFIG_STORE.path(name).name
         try:
-            with open(image_config_path, 'r', encoding='utf-8') as f:
-                image_config = yaml.safe_load(f) or {}
-            active = image_config.get('active_provider', 'not set')
-            providers = list(image_config.get('providers', {}).keys())
-            logger.info(f"[OK] Image config: active={active}, providers={providers}")
-
-            if active in image_config.get('providers', {}):
-                provider = image_config['providers'][active]
-                if not provider.get('api_key'):
-                    logger.warning(f"[WARN] Image provider [{active}] API Key not set")
-                else:
-                    logger.info(f"[OK] Image provider [{active}] API Key configured")
+            snapshot = CONFIG_STORE.get(name)
         except Exception as e:
-            logger.error(f"[ERROR] Failed to read image_providers.yaml: {e}")
-    else:
-        logger.warning("[WARN] image_providers.yaml not found, using defaults")
+            logger.error("[ERROR] Failed to read %s: %s", filename, e)
+            continue
+
+        if not snapshot.exists:
+            logger.warning("[WARN] %s not found, using defaults", filename)
+            continue
+
+        active = snapshot.get('active_provider', 'not set')
+        providers = snapshot.get('providers', {})
+        logger.info("[OK] %s config: active=%s, providers=%s", label, active, list(providers.keys()))
+
+        if active in providers:
+            if not providers[active].get('api_key'):
+                logger.warning("[WARN] %s provider [%s] API Key not set", label, active)
+            else:
+                logger.info("[OK] %s provider [%s] API Key configured", label, active)
 
     logger.info("[OK] Config check completed")
 
@@ -1,6 +1,6 @@
 import logging
-import yaml
-from pathlib import Path
+import os
+from backend.utils.config_store import CONFIG_STORE, thaw
 
 logger = logging.getLogger(__name__)
 
@@ -29,82 +29,76 @@ class Config:
     PORT = 8099
     CORS_ORIGINS = ['http://localhost:5173', 'http://localhost:3000']
     OUTPUT_DIR = 'output'
-
-    _image_providers_config = None
-    _text_providers_config = None
+    # 日誌級別（可用環境變數 LOG_LEVEL 覆蓋，開發環境可設為 DEBUG）
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+    # 個別模組的日誌級別
+    LOG_MODULE_LEVELS = {
+        'werkzeug': 'INFO',
+        'urllib3': 'WARNING',
+    }
+    # 按模組採樣 DEBUG/INFO 日誌（模組名前綴 -> 保留比例），WARNING 以上不採樣
+    LOG_SAMPLING = {}
+    # 追蹤 span 匯出檔案（JSONL），None 表示只保留在記憶體
+    TRACE_EXPORT_FILE = None
+    # 生成圖片後額外產生的 WebP 寬度（像素，原圖保留），預設不產生；
+    # 可用環境變數 IMAGE_RENDITION_WIDTHS 開啟，例如 480,960,1600
+    IMAGE_RENDITION_WIDTHS = [
+        int(width) for width in os.environ.get('IMAGE_RENDITION_WIDTHS', '').split(',') if width.strip()
+    ]
+    IMAGE_RENDITION_QUALITY = 80
+    # 檔案傳輸交給前端 Web 伺服器：None（由 Flask 傳送）、'x-accel'（nginx）、'x-sendfile'（Apache / lighttpd）
+    STATIC_OFFLOAD = os.environ.get('STATIC_OFFLOAD') or None
+    # X-Accel-Redirect 使用的 internal location 前綴（需與 nginx 設定對應）
+    STATIC_OFFLOAD_LOCATIONS = {
+        'history': '/_internal/history/',
+        'frontend': '/_internal/dist/',
+    }
+    # 啟動時為 frontend/dist 的文字資源產生 .gz（有安裝 brotli 時另產生 .br）
+    STATIC_PRECOMPRESS = os.environ.get('STATIC_PRECOMPRESS', '').lower() in ('1', 'true', 'yes')
+    # 啟動後在背景預先載入目前服務商的模組（例如 google.genai），不延後啟動完成時間
+    # 預設關閉：會在背景讀取服務商設定並建立客戶端，需要時再設為 1 開啟
+    STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', '').lower() in ('1', 'true', 'yes')
+    # 圖床上傳：每個圖床的最大並行數、每秒請求數、失敗重試次數
+    IMAGE_HOST_MAX_WORKERS = 6
+    IMAGE_HOST_RATE_LIMITS = {
+        'urusai.cc': 4.0,
+        'imgbb.com': 2.0,
+    }
+    IMAGE_HOST_RETRIES = 3
+    # Blogger 發布佇列：並行數、每個部落格每秒發文數、失敗（429 / 5xx / 網路錯誤）重試次數
+    BLOGGER_PUBLISH_WORKERS = 4
+    BLOGGER_PUBLISH_RATE = 0.2
+    BLOGGER_PUBLISH_RETRIES = 5
+    # 使用者部落格清單快取秒數（0 表示不快取）
+    BLOGGER_BLOGS_CACHE_TTL = 300
+    # Unsplash：搜尋結果快取（秒數、最多筆數）、下載圖片大小上限（位元組）
+    UNSPLASH_SEARCH_CACHE_TTL = 600
+    UNSPLASH_SEARCH_CACHE_SIZE = 256
+    UNSPLASH_DOWNLOAD_MAX_BYTES = 25 * 1024 * 1024
+    # 圖片提示詞壓縮：文章簡介（取代完整大綱）與使用者需求的最大字數
+    PROMPT_BRIEF_MAX_CHARS = int(os.environ.get('PROMPT_BRIEF_MAX_CHARS', 600))
+    # 各頁圖片提示詞（一次文字模型呼叫產生）快取的大綱數
+    IMAGE_PROMPT_CACHE_SIZE = 128
+    # 參考圖片：上傳大小上限（位元組）、記憶體中快取的壓縮圖數量、未使用多久後刪除（秒）
+    REFERENCE_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+    REFERENCE_IMAGE_CACHE_SIZE = 64
+    REFERENCE_IMAGE_TTL = 7 * 24 * 3600
 
     @classmethod
     def load_image_providers_config(cls):
-        if cls._image_providers_config is not None:
-            return cls._image_providers_config
-
-        config_path = Path(__file__).parent.parent / 'image_providers.yaml'
-        logger.debug(f"載入圖片服務商配置: {config_path}")
-
-        if not config_path.exists():
-            logger.warning(f"圖片配置檔案不存在: {config_path}，使用預設配置")
-            cls._image_providers_config = {
-                'active_provider': 'google_genai',
-                'providers': {}
-            }
-            return cls._image_providers_config
-
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                cls._image_providers_config = yaml.safe_load(f) or {}
-            logger.debug(f"圖片配置載入成功: {list(cls._image_providers_config.get('providers', {}).keys())}")
-        except yaml.YAMLError as e:
-            logger.error(f"圖片配置檔案 YAML 格式錯誤: {e}")
-            raise ValueError(
-                f"配置檔案格式錯誤: image_providers.yaml\n"
-                f"YAML 解析錯誤: {e}\n"
-                "解決方案：\n"
-                "1. 檢查 YAML 縮排是否正確（使用空格，不要用 Tab）\n"
-                "2. 檢查引號是否配對\n"
-                "3. 使用線上 YAML 驗證器檢查格式"
-            )
-
-        return cls._image_providers_config
+        """載入圖片服務商配置（唯讀快照內容，檔案變更時自動重新載入）"""
+        return CONFIG_STORE.get('image_providers').data
 
     @classmethod
     def load_text_providers_config(cls):
-        """載入文字生成服務商配置"""
-        if cls._text_providers_config is not None:
-            return cls._text_providers_config
-
-        config_path = Path(__file__).parent.parent / 'text_providers.yaml'
-        logger.debug(f"載入文字服務商配置: {config_path}")
-
-        if not config_path.exists():
-            logger.warning(f"文字配置檔案不存在: {config_path}，使用預設配置")
-            cls._text_providers_config = {
-                'active_provider': 'google_gemini',
-                'providers': {}
-            }
-            return cls._text_providers_config
-
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                cls._text_providers_config = yaml.safe_load(f) or {}
-            logger.debug(f"文字配置載入成功: {list(cls._text_providers_config.get('providers', {}).keys())}")
-        except yaml.YAMLError as e:
-            logger.error(f"文字配置檔案 YAML 格式錯誤: {e}")
-            raise ValueError(
-                f"配置檔案格式錯誤: text_providers.yaml\n"
-                f"YAML 解析錯誤: {e}\n"
-                "解決方案：\n"
-                "1. 檢查 YAML 縮排是否正確（使用空格，不要用 Tab）\n"
-                "2. 檢查引號是否配對\n"
-                "3. 使用線上 YAML 驗證器檢查格式"
-            )
-
-        return cls._text_providers_config
+        """載入文字生成服務商配置（唯讀快照內容，檔案變更時自動重新載入）"""
+        return CONFIG_STORE.get('text_providers').data
 
     @classmethod
     def get_active_image_provider(cls):
         config = cls.load_image_providers_config()
         active = config.get('active_provider', 'google_genai')
-        logger.debug(f"目前啟用的圖片服務商: {active}")
+        logger.debug("目前啟用的圖片服務商: %s", active)
         return active
 
     @classmethod
@@ -114,7 +108,7 @@ class Config:
         if provider_name is None:
             provider_name = cls.get_active_image_provider()
 
-        logger.info(f"取得圖片服務商配置: {provider_name}")
+        logger.info("取得圖片服務商配置: %s", provider_name)
 
         providers = config.get('providers', {})
         if not providers:
@@ -128,7 +122,7 @@ class Config:
 
         if provider_name not in providers:
             available = ', '.join(providers.keys()) if providers else '無'
-            logger.error(f"圖片服務商 [{provider_name}] 不存在，可用服務商: {available}")
+            logger.error("圖片服務商 [%s] 不存在，可用服務商: %s", provider_name, available)
             raise ValueError(
                 f"未找到圖片生成服務商配置: {provider_name}\n"
                 f"可用的服務商: {available}\n"
@@ -138,12 +132,12 @@ class Config:
                 "3. 檢查 image_providers.yaml 檔案"
             )
 
-        provider_config = providers[provider_name].copy()
+        provider_config = thaw(providers[provider_name])
 
         # 驗證必要欄位
         api_key = provider_config.get('api_key', '')
         if not _is_valid_api_key(api_key):
-            logger.error(f"圖片服務商 [{provider_name}] 未配置有效的 API Key")
+            logger.error("圖片服務商 [%s] 未配置有效的 API Key", provider_name)
             raise ValueError(
                 f"服務商 {provider_name} 未配置有效的 API Key\n"
                 "解決方案：\n"
@@ -154,19 +148,18 @@ class Config:
         provider_type = provider_config.get('type', provider_name)
         if provider_type in ['openai', 'openai_compatible', 'image_api']:
             if not provider_config.get('base_url'):
-                logger.error(f"服務商 [{provider_name}] 類型為 {provider_type}，但未配置 base_url")
+                logger.error("服務商 [%s] 類型為 %s，但未配置 base_url", provider_name, provider_type)
                 raise ValueError(
                     f"服務商 {provider_name} 未配置 Base URL\n"
                     f"服務商類型 {provider_type} 需要配置 base_url\n"
                     "解決方案：在系統設定頁面編輯該服務商，填寫 Base URL"
                 )
 
-        logger.info(f"圖片服務商配置驗證通過: {provider_name} (type={provider_type})")
+        logger.info("圖片服務商配置驗證通過: %s (type=%s)", provider_name, provider_type)
         return provider_config
 
     @classmethod
     def reload_config(cls):
-        """重新載入配置（清除快取）"""
+        """重新載入所有配置（發布新的快照）"""
         logger.info("重新載入所有配置...")
-        cls._image_providers_config = None
-        cls._text_providers_config = None
+        CONFIG_STORE.reload()
@@ -1,6 +1,6 @@
 """图片生成器抽象基类"""
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 
 class ImageGeneratorBase(ABC):
@@ -16,6 +16,10 @@ class ImageGeneratorBase(ABC):
         self.config = config
         self.api_key = config.get('api_key')
         self.base_url = config.get('base_url')
+        # 服务商名称（用于指标标签，由 ImageService 设置为配置中的服务商名）
+        self.provider_name = config.get('type', '')
+        # 服务商侧文件缓存（支持文件上传的生成器在配置 file_upload 时设置，见 file_cache.py）
+        self.file_cache = None
 
     @abstractmethod
     def generate_image(
@@ -31,10 +35,67 @@ class ImageGeneratorBase(ABC):
             **kwargs: 其他参数（如分辨率、宽高比等）
 
         Returns:
-            图片二进制数据
+            图片二进制数据，或已流式写入临时文件的 StreamedImage（见 utils/streaming.py）
         """
         pass
 
+    def supports_batch(self) -> bool:
+        """
+        是否支持批量生成（一次请求生成多张图片）
+
+        Returns:
+            是否支持批量生成
+        """
+        return False
+
+    def generate_images_batch(
+        self,
+        batch_requests: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        批量生成图片
+
+        默认逐张调用 generate_image，所有生成器都可以调用；supports_batch() 为 True 的
+        生成器覆盖此方法，改用服务商的批量接口。
+
+        Args:
+            batch_requests: 请求列表，每项包含 custom_id、prompt 及生成参数（传给 generate_image）
+            progress_callback: 进度回调，参数包含 status、completed、failed、total
+            **kwargs: 其他参数
+
+        Returns:
+            custom_id -> 图片（bytes 或 StreamedImage）或异常对象
+        """
+        results: Dict[str, Any] = {}
+        failed = 0
+        for item in batch_requests:
+            params = {key: value for key, value in item.items() if key != 'custom_id' and value is not None}
+            try:
+                results[str(item['custom_id'])] = self.generate_image(**params)
+            except Exception as e:
+                results[str(item['custom_id'])] = e
+                failed += 1
+            if progress_callback is not None:
+                progress_callback({
+                    "status": "in_progress" if len(results) < len(batch_requests) else "completed",
+                    "completed": len(results) - failed,
+                    "failed": failed,
+                    "total": len(batch_requests),
+                })
+        return results
+
+    def release_files(self, scope: str):
+        """
+        释放任务在服务商侧缓存的文件（未启用文件缓存时不做任何事）
+
+        Args:
+            scope: 任务 ID
+        """
+        if self.file_cache is not None:
+            self.file_cache.release(scope)
+
     @abstractmethod
     def validate_config(self) -> bool:
         """
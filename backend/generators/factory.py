@@ -1,22 +1,58 @@
 """图片生成器工厂"""
-from typing import Dict, Any
+import importlib
+import logging
+import threading
+from typing import Dict, Any, Type, Union
 from .base import ImageGeneratorBase
-from .google_genai import GoogleGenAIGenerator
-from .openai_compatible import OpenAICompatibleGenerator
-from .image_api import ImageApiGenerator
+
+logger = logging.getLogger(__name__)
 
 
 class ImageGeneratorFactory:
-    """图片生成器工厂类"""
-
-    # 注册的生成器类型
-    GENERATORS = {
-        'google_genai': GoogleGenAIGenerator,
-        'openai': OpenAICompatibleGenerator,
-        'openai_compatible': OpenAICompatibleGenerator,
-        'image_api': ImageApiGenerator,
+    """
+    图片生成器工厂类
+
+    内置生成器以 "模块:类名" 登记，第一次使用时才导入（google_genai 会带入整个
+    google.genai 依赖树，只配置了其他服务商时不应该在启动时加载）。
+    """
+
+    # 注册的生成器类型（类，或 "相对模块:类名"）
+    GENERATORS: Dict[str, Union[Type[ImageGeneratorBase], str]] = {
+        'google_genai': '.google_genai:GoogleGenAIGenerator',
+        'openai': '.openai_compatible:OpenAICompatibleGenerator',
+        'openai_compatible': '.openai_compatible:OpenAICompatibleGenerator',
+        'image_api': '.image_api:ImageApiGenerator',
     }
 
+    _load_lock = threading.Lock()
+
+    @classmethod
+    def get_generator_class(cls, provider: str) -> Type[ImageGeneratorBase]:
+        """
+        取得生成器类（按需导入并缓存）
+
+        Args:
+            provider: 服务商类型
+
+        Returns:
+            生成器类
+        """
+        entry = cls.GENERATORS[provider]
+        if isinstance(entry, str):
+            with cls._load_lock:
+                entry = cls.GENERATORS[provider]
+                if isinstance(entry, str):
+                    path = entry
+                    module_name, class_name = path.split(':')
+                    module = importlib.import_module(module_name, package=__package__)
+                    entry = getattr(module, class_name)
+                    # 登记为同一个类的其他类型也一并替换
+                    for name, other in cls.GENERATORS.items():
+                        if other == path:
+                            cls.GENERATORS[name] = entry
+                    logger.debug("已加载图片生成器: %s -> %s", provider, class_name)
+        return entry
+
     @classmethod
     def create(cls, provider: str, config: Dict[str, Any]) -> ImageGeneratorBase:
         """
@@ -43,7 +79,7 @@ class ImageGeneratorFactory:
                 "3. 或使用环境变量 IMAGE_PROVIDER 指定服务商"
             )
 
-        generator_class = cls.GENERATORS[provider]
+        generator_class = cls.get_generator_class(provider)
         return generator_class(config)
 
     @classmethod
@@ -0,0 +1,110 @@
+"""
+服务商侧文件缓存
+
+同一任务的每一页都会带上相同的参考图（封面、用户上传的图片）。服务商支持文件上传时，
+每张图片在每个任务中只上传一次，之后的请求只传文件引用（file uri / file id）：
+- 按 (任务, 内容哈希) 缓存，不同任务互不影响
+- 条目到期后重新上传（过期时间应短于服务商保留文件的时间），过期或释放的文件尽量从服务商删除
+- 同一张图片被多个页面同时请求时只上传一次
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def image_mime_type(data: bytes) -> str:
+    """根据文件头判断图片类型（压缩后的参考图可能是 JPEG 或原始格式）"""
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return 'image/png'
+
+
+class ProviderFileCache:
+    """
+    服务商侧文件缓存（按任务隔离，带过期时间）
+
+    Args:
+        ttl: 条目有效秒数
+        delete_func: 删除服务商文件的函数，参数为上传函数返回的引用（可选，失败只记录日志）
+    """
+
+    def __init__(self, ttl: float, delete_func: Optional[Callable[[Any], None]] = None):
+        self.ttl = ttl
+        self.delete_func = delete_func
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}  # (任务, 哈希) -> (到期时间, 引用)
+        self._uploading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_or_upload(self, scope: str, data: bytes, upload_func: Callable[[bytes], Any]) -> Any:
+        """
+        取得图片在服务商侧的引用（没有或已过期时上传）
+
+        Args:
+            scope: 任务 ID
+            data: 图片数据
+            upload_func: 上传函数，参数为图片数据，返回引用；失败时抛出异常
+
+        Returns:
+            上传函数返回的引用
+        """
+        key = (scope, hashlib.sha256(data).hexdigest())
+        ref = self._get(key)
+        if ref is not None:
+            return ref
+
+        with self._lock:
+            upload_lock = self._uploading.setdefault(key, threading.Lock())
+
+        with upload_lock:
+            # 等待期间可能已由其他页面上传
+            ref = self._get(key)
+            if ref is not None:
+                return ref
+            try:
+                ref = upload_func(data)
+            except Exception:
+                with self._lock:
+                    self._uploading.pop(key, None)
+                raise
+            # 先写入条目再移除上传锁，之后到达的请求一定能取到引用
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, ref)
+                self._uploading.pop(key, None)
+            logger.debug("参考图已上传到服务商: scope=%s, %s bytes", scope, len(data))
+            return ref
+
+    def _get(self, key: Tuple[str, str]) -> Optional[Any]:
+        """有效条目的引用（顺便清理过期条目）"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]
+            refs = [self._entries.pop(k)[1] for k in expired]
+            entry = self._entries.get(key)
+        self._delete(refs)
+        return entry[1] if entry else None
+
+    def release(self, scope: str):
+        """释放任务的所有文件（任务结束后调用）"""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == scope]
+            refs = [self._entries.pop(k)[1] for k in keys]
+        self._delete(refs)
+
+    def _delete(self, refs):
+        if not self.delete_func:
+            return
+        for ref in refs:
+            try:
+                self.delete_func(ref)
+            except Exception as e:
+                logger.debug("删除服务商文件失败（忽略）: %s", e)
@@ -3,12 +3,15 @@ import logging
 import time
 import random
 import base64
+import io
 from functools import wraps
 from typing import Dict, Any, Optional
 from google import genai
 from google.genai import types
 from .base import ImageGeneratorBase
+from .file_cache import ProviderFileCache, image_mime_type
 from ..utils.image_compressor import compress_image
+from ..utils.metrics import record_failure, record_retry
 
 logger = logging.getLogger(__name__)
 
@@ -291,6 +294,9 @@ def retry_on_error(max_retries=5, base_delay=3):
                 except Exception as e:
                     last_error = e
                     error_str = str(e).lower()
+                    generator = args[0] if args else None
+                    labels = {"provider": getattr(generator, 'provider_name', ''), "model": kwargs.get('model', '')}
+                    record_failure('generator', e, **labels)
 
                     # 不可重试的错误类型
                     non_retryable = [
@@ -313,12 +319,13 @@ def retry_on_error(max_retries=5, base_delay=3):
 
                     # 可重试的错误
                     if attempt < max_retries - 1:
+                        record_retry('generator', e, **labels)
                         if "429" in error_str or "resource_exhausted" in error_str:
                             wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            logger.warning(f"⏳ 遇到速率限制，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
+                            logger.warning("⏳ 遇到速率限制，%.1f秒后重试 (尝试 %s/%s)", wait_time, attempt + 2, max_retries)
                         else:
                             wait_time = min(2 ** attempt, 10) + random.uniform(0, 1)
-                            logger.warning(f"⚠️ 请求失败，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
+                            logger.warning("⚠️ 请求失败，%.1f秒后重试 (尝试 %s/%s)", wait_time, attempt + 2, max_retries)
                         time.sleep(wait_time)
                         continue
 
@@ -358,7 +365,7 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
 
         # 如果有 base_url，则配置 http_options
         if self.config.get('base_url'):
-            logger.debug(f"  使用自定义 base_url: {self.config['base_url']}")
+            logger.debug("  使用自定义 base_url: %s", self.config['base_url'])
             http_options = types.HttpOptions(
                 base_url=self.config['base_url'],
                 api_version="v1beta",
@@ -379,12 +386,40 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
             types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
             types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
         ]
+
+        # 参考图通过 Files API 上传，每个任务只上传一次（文件在服务端保留 48 小时）
+        if self.config.get('file_upload', False):
+            self.file_cache = ProviderFileCache(
+                ttl=float(self.config.get('file_cache_ttl', 3600)),
+                delete_func=lambda file: self.client.files.delete(name=file.name)
+            )
         logger.info("GoogleGenAIGenerator 初始化完成")
 
     def validate_config(self) -> bool:
         """验证配置"""
         return bool(self.api_key)
 
+    def _upload_file(self, data: bytes) -> types.File:
+        """通过 Files API 上传图片"""
+        return self.client.files.upload(
+            file=io.BytesIO(data),
+            config=types.UploadFileConfig(mime_type=image_mime_type(data))
+        )
+
+    def _image_part(self, data: bytes, cache_scope: Optional[str]) -> types.Part:
+        """
+        参考图片的 Part：启用文件缓存时引用已上传的文件，否则内联
+
+        上传失败时退回内联，不影响生成。
+        """
+        if self.file_cache is not None and cache_scope:
+            try:
+                file = self.file_cache.get_or_upload(cache_scope, data, self._upload_file)
+                return types.Part(file_data=types.FileData(file_uri=file.uri, mime_type=file.mime_type))
+            except Exception as e:
+                logger.warning("参考图上传到 Files API 失败，改为内联: %s", str(e)[:200])
+        return types.Part(inline_data=types.Blob(mime_type=image_mime_type(data), data=data))
+
     @retry_on_error(max_retries=5, base_delay=3)
     def generate_image(
         self,
@@ -393,6 +428,7 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
         temperature: float = 1.0,
         model: str = "gemini-3-pro-image-preview",
         reference_image: Optional[bytes] = None,
+        cache_scope: Optional[str] = None,
         **kwargs
     ) -> bytes:
         """
@@ -404,30 +440,26 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
             temperature: 温度
             model: 模型名称
             reference_image: 参考图片二进制数据（用于保持风格一致）
+            cache_scope: 文件缓存的任务 ID（启用 file_upload 时参考图每个任务只上传一次）
             **kwargs: 其他参数
 
         Returns:
             图片二进制数据
         """
-        logger.info(f"Google GenAI 生成图片: model={model}, aspect_ratio={aspect_ratio}")
-        logger.debug(f"  prompt 长度: {len(prompt)} 字符, 有参考图: {reference_image is not None}")
+        logger.info("Google GenAI 生成图片: model=%s, aspect_ratio=%s", model, aspect_ratio)
+        logger.debug("  prompt 长度: %s 字符, 有参考图: %s", len(prompt), reference_image is not None)
 
         # 构建 parts 列表
         parts = []
 
         # 如果有参考图，先添加参考图和说明
         if reference_image:
-            logger.debug(f"  添加参考图片 ({len(reference_image)} bytes)")
+            logger.debug("  添加参考图片 (%s bytes)", len(reference_image))
             # 压缩参考图到 200KB 以内
             compressed_ref = compress_image(reference_image, max_size_kb=200)
-            logger.debug(f"  参考图压缩后: {len(compressed_ref)} bytes")
-            # 添加参考图
-            parts.append(types.Part(
-                inline_data=types.Blob(
-                    mime_type="image/png",
-                    data=compressed_ref
-                )
-            ))
+            logger.debug("  参考图压缩后: %s bytes", len(compressed_ref))
+            # 添加参考图（已上传的文件引用或内联数据）
+            parts.append(self._image_part(compressed_ref, cache_scope))
             # 添加带参考说明的提示词
             enhanced_prompt = f"""请参考上面这张图片的视觉风格（包括配色、排版风格、字体风格、装饰元素风格），生成一张风格一致的新图片。
 
@@ -476,7 +508,7 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
 
         generate_content_config = types.GenerateContentConfig(**config_params)
 
-        logger.debug(f"  开始调用 API: model={model}, 启用 thinking_config")
+        logger.debug("  开始调用 API: model=%s, 启用 thinking_config", model)
 
         # 使用非流式调用，方便提取最后一张图片
         response = self.client.models.generate_content(
@@ -491,9 +523,9 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
             for i, part in enumerate(response.parts):
                 if hasattr(part, 'inline_data') and part.inline_data:
                     last_image_data = part.inline_data.data
-                    logger.debug(f"  Part {i}: 找到图片数据 ({len(last_image_data)} bytes)")
+                    logger.debug("  Part %s: 找到图片数据 (%s bytes)", i, len(last_image_data))
                 elif hasattr(part, 'text') and part.text:
-                    logger.debug(f"  Part {i}: 文本 - {part.text[:100] if len(part.text) > 100 else part.text}")
+                    logger.debug("  Part %s: 文本 - %s", i, part.text[:100] if len(part.text) > 100 else part.text)
 
         image_data = last_image_data
 
@@ -514,7 +546,7 @@ class GoogleGenAIGenerator(ImageGeneratorBase):
                 "3. 检查网络连接后重试"
             )
 
-        logger.info(f"✅ Google GenAI 图片生成成功: {len(image_data)} bytes")
+        logger.info("✅ Google GenAI 图片生成成功: %s bytes", len(image_data))
         return image_data
 
     def get_supported_aspect_ratios(self) -> list:
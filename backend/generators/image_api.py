@@ -6,7 +6,11 @@ import base64
 import requests
 from typing import Dict, Any, Optional, List, Union
 from .base import ImageGeneratorBase
+from .file_cache import ProviderFileCache, image_mime_type
 from ..utils.image_compressor import compress_image
+from ..utils.metrics import observe_stage, record_failure, record_retry
+from ..utils.logging_utils import LazyPayload, summarize_payload
+from ..utils.streaming import StreamedImage, read_image_response, download_to_file
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +25,16 @@ def retry_on_error(max_retries: int = 3, base_delay: float = 2):
                     return func(*args, **kwargs)
                 except Exception as e:
                     last_error = e
+                    generator = args[0] if args else None
+                    labels = {
+                        "provider": getattr(generator, 'provider_name', ''),
+                        "model": kwargs.get('model') or getattr(generator, 'model', '')
+                    }
+                    record_failure('generator', e, **labels)
                     if attempt < max_retries - 1:
+                        record_retry('generator', e, **labels)
                         delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        logger.warning(f"请求失败，{delay:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries}): {str(e)[:100]}")
+                        logger.warning("请求失败，%.1f秒后重试 (尝试 %s/%s): %s", delay, attempt + 2, max_retries, str(e)[:100])
                         time.sleep(delay)
             raise last_error
         return wrapper
@@ -36,7 +47,10 @@ class ImageApiGenerator(ImageGeneratorBase):
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         logger.debug("初始化 ImageApiGenerator...")
-        self.base_url = config.get('base_url', 'https://api.example.com').rstrip('/').rstrip('/v1')
+        # 去掉结尾的 /v1（按后缀去除，不能用 rstrip：端口可能以 1 结尾）
+        self.base_url = config.get('base_url', 'https://api.example.com').rstrip('/')
+        if self.base_url.endswith('/v1'):
+            self.base_url = self.base_url[:-len('/v1')]
         self.model = config.get('model', 'default-model')
         self.default_aspect_ratio = config.get('default_aspect_ratio', '3:4')
         self.image_size = config.get('image_size', '4K')
@@ -53,7 +67,24 @@ class ImageApiGenerator(ImageGeneratorBase):
             endpoint_type = '/' + endpoint_type
         self.endpoint_type = endpoint_type
 
-        logger.info(f"ImageApiGenerator 初始化完成: base_url={self.base_url}, model={self.model}, endpoint={self.endpoint_type}")
+        # 参考图通过文件接口上传，每个任务只上传一次，之后以 file id 引用。
+        # 只有 chat 端点的 "file" 内容块能引用 file id，且服务商需明确支持（file_reference: true）；
+        # images 端点的 image 数组只接受图片数据，参考图一律内联
+        self.file_endpoint = '/' + config.get('file_endpoint', '/v1/files').lstrip('/')
+        self.file_purpose = config.get('file_purpose', 'vision')
+        if config.get('file_upload', False):
+            uses_chat = 'chat' in self.endpoint_type or 'completions' in self.endpoint_type
+            if uses_chat and config.get('file_reference', False):
+                self.file_cache = ProviderFileCache(
+                    ttl=float(config.get('file_cache_ttl', 3600)),
+                    delete_func=self._delete_file
+                )
+            else:
+                logger.warning(
+                    "file_upload 需要 chat 端点且服务商支持文件引用（file_reference: true），参考图改为内联"
+                )
+
+        logger.info("ImageApiGenerator 初始化完成: base_url=%s, model=%s, endpoint=%s", self.base_url, self.model, self.endpoint_type)
 
     def validate_config(self) -> bool:
         """验证配置是否有效"""
@@ -73,6 +104,54 @@ class ImageApiGenerator(ImageGeneratorBase):
         """获取支持的宽高比"""
         return ["1:1", "2:3", "3:2", "3:4", "4:3", "4:5", "5:4", "9:16", "16:9", "21:9"]
 
+    def _upload_file(self, data: bytes) -> str:
+        """上传参考图到文件接口，返回 file id"""
+        api_url = f"{self.base_url}{self.file_endpoint}"
+        mime_type = image_mime_type(data)
+        response = requests.post(
+            api_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            data={"purpose": self.file_purpose},
+            files={"file": (f"reference.{mime_type.split('/')[1]}", data, mime_type)},
+            timeout=60
+        )
+        if response.status_code in (404, 405, 501):
+            # 服务端没有文件接口，之后不再尝试
+            self.file_cache = None
+            raise Exception(f"服务端不支持文件上传 (状态码: {response.status_code})，改为内联参考图")
+        if response.status_code not in (200, 201):
+            raise Exception(f"文件上传失败 (状态码: {response.status_code}): {response.text[:200]}")
+        file_id = response.json().get('id')
+        if not file_id:
+            raise Exception("文件上传响应中没有 id")
+        return file_id
+
+    def _delete_file(self, file_id: str):
+        """删除已上传的文件"""
+        requests.delete(
+            f"{self.base_url}{self.file_endpoint}/{file_id}",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=30
+        )
+
+    def _reference_file_id(self, data: bytes, cache_scope: Optional[str]) -> Optional[str]:
+        """
+        参考图在服务端的 file id（未启用文件缓存或上传失败时返回 None，改为内联）
+        """
+        file_cache = self.file_cache
+        if file_cache is None or not cache_scope:
+            return None
+        try:
+            return file_cache.get_or_upload(cache_scope, data, self._upload_file)
+        except Exception as e:
+            logger.warning("参考图上传失败，改为内联: %s", str(e)[:200])
+            return None
+
+    @staticmethod
+    def _data_uri(data: bytes) -> str:
+        """内联参考图的 data URI"""
+        return f"data:{image_mime_type(data)};base64,{base64.b64encode(data).decode('utf-8')}"
+
     @retry_on_error(max_retries=3, base_delay=2)
     def generate_image(
         self,
@@ -82,8 +161,9 @@ class ImageApiGenerator(ImageGeneratorBase):
         model: str = None,
         reference_image: Optional[bytes] = None,
         reference_images: Optional[List[bytes]] = None,
+        cache_scope: Optional[str] = None,
         **kwargs
-    ) -> bytes:
+    ) -> StreamedImage:
         """
         生成图片
 
@@ -94,9 +174,10 @@ class ImageApiGenerator(ImageGeneratorBase):
             model: 模型名称
             reference_image: 单张参考图片数据（向后兼容）
             reference_images: 多张参考图片数据列表
+            cache_scope: 文件缓存的任务 ID（chat 端点启用 file_upload 与 file_reference 时参考图每个任务只上传一次）
 
         Returns:
-            生成的图片二进制数据
+            生成的图片（已流式写入临时文件的 StreamedImage）
         """
         self.validate_config()
 
@@ -106,11 +187,11 @@ class ImageApiGenerator(ImageGeneratorBase):
         if model is None:
             model = self.model
 
-        logger.info(f"Image API 生成图片: model={model}, aspect_ratio={aspect_ratio}, endpoint={self.endpoint_type}")
+        logger.info("Image API 生成图片: model=%s, aspect_ratio=%s, endpoint=%s", model, aspect_ratio, self.endpoint_type)
 
         # 根据端点类型选择不同的生成方式
         if 'chat' in self.endpoint_type or 'completions' in self.endpoint_type:
-            return self._generate_via_chat_api(prompt, aspect_ratio, model, reference_image, reference_images)
+            return self._generate_via_chat_api(prompt, aspect_ratio, model, reference_image, reference_images, cache_scope)
         else:
             return self._generate_via_images_api(prompt, aspect_ratio, model, reference_image, reference_images)
 
@@ -121,8 +202,8 @@ class ImageApiGenerator(ImageGeneratorBase):
         model: str,
         reference_image: Optional[bytes] = None,
         reference_images: Optional[List[bytes]] = None
-    ) -> bytes:
-        """通过 /v1/images/generations 端点生成图片"""
+    ) -> StreamedImage:
+        """通过 /v1/images/generations 端点生成图片（参考图以 data URI 内联）"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -160,14 +241,12 @@ class ImageApiGenerator(ImageGeneratorBase):
 
         # 如果有参考图片且不是 DALL-E 模型，添加到 image 数组
         if all_reference_images and not is_dalle:
-            logger.debug(f"  添加 {len(all_reference_images)} 张参考图片")
+            logger.debug("  添加 %s 张参考图片", len(all_reference_images))
             image_uris = []
             for idx, img_data in enumerate(all_reference_images):
                 compressed_img = compress_image(img_data, max_size_kb=200)
-                logger.debug(f"  参考图 {idx}: {len(img_data)} -> {len(compressed_img)} bytes")
-                base64_image = base64.b64encode(compressed_img).decode('utf-8')
-                data_uri = f"data:image/png;base64,{base64_image}"
-                image_uris.append(data_uri)
+                logger.debug("  参考图 %s: %s -> %s bytes", idx, len(img_data), len(compressed_img))
+                image_uris.append(self._data_uri(compressed_img))
 
             payload["image"] = image_uris
 
@@ -186,12 +265,12 @@ class ImageApiGenerator(ImageGeneratorBase):
             logger.warning("DALL-E 模型不支援參考圖片功能，將忽略參考圖片")
 
         api_url = f"{self.base_url}{self.endpoint_type}"
-        logger.debug(f"  发送请求到: {api_url}")
-        response = requests.post(api_url, headers=headers, json=payload, timeout=300)
+        logger.debug("  发送请求到: %s", api_url)
+        response = requests.post(api_url, headers=headers, json=payload, timeout=300, stream=True)
 
         if response.status_code != 200:
             error_detail = response.text[:500]
-            logger.error(f"Image API 请求失败: status={response.status_code}, error={error_detail}")
+            logger.error("Image API 请求失败: status=%s, error=%s", response.status_code, error_detail)
             raise Exception(
                 f"Image API 请求失败 (状态码: {response.status_code})\n"
                 f"错误详情: {error_detail}\n"
@@ -204,26 +283,21 @@ class ImageApiGenerator(ImageGeneratorBase):
                 "建议：检查API密钥和base_url配置"
             )
 
-        result = response.json()
-        logger.debug(f"  API 响应: data 长度={len(result.get('data', []))}")
+        # 流式读取：b64_json 直接分块解码到临时文件
+        with observe_stage('decode', provider=self.provider_name, model=model):
+            images, result = read_image_response(response)
+        logger.debug("  API 响应: data 长度=%s", len(result.get('data', [])))
 
-        if "data" in result and len(result["data"]) > 0:
-            item = result["data"][0]
+        if images:
+            for extra in images[1:]:
+                extra.discard()
+            logger.info("✅ Image API 图片生成成功: %s bytes", len(images[0]))
+            return images[0]
 
-            if "b64_json" in item:
-                b64_data_uri = item["b64_json"]
-                if b64_data_uri.startswith('data:'):
-                    b64_string = b64_data_uri.split(',', 1)[1]
-                else:
-                    b64_string = b64_data_uri
-                image_data = base64.b64decode(b64_string)
-                logger.info(f"✅ Image API 图片生成成功: {len(image_data)} bytes")
-                return image_data
-
-        logger.error(f"无法从响应中提取图片数据: {str(result)[:200]}")
+        logger.error("无法从响应中提取图片数据: %s", LazyPayload(result))
         raise Exception(
             f"图片数据提取失败：未找到 b64_json 数据。\n"
-            f"API响应片段: {str(result)[:500]}\n"
+            f"API响应片段: {str(summarize_payload(result))[:500]}\n"
             "可能原因：\n"
             "1. API返回格式与预期不符\n"
             "2. response_format 参数未生效\n"
@@ -237,8 +311,9 @@ class ImageApiGenerator(ImageGeneratorBase):
         aspect_ratio: str,
         model: str,
         reference_image: Optional[bytes] = None,
-        reference_images: Optional[List[bytes]] = None
-    ) -> bytes:
+        reference_images: Optional[List[bytes]] = None,
+        cache_scope: Optional[str] = None
+    ) -> StreamedImage:
         """通过 /v1/chat/completions 端点生成图片（如即梦 API）"""
         import re
 
@@ -259,17 +334,20 @@ class ImageApiGenerator(ImageGeneratorBase):
 
         # 如果有参考图片，构建多模态消息
         if all_reference_images:
-            logger.debug(f"  添加 {len(all_reference_images)} 张参考图片到 chat 消息")
+            logger.debug("  添加 %s 张参考图片到 chat 消息", len(all_reference_images))
             content_parts = [{"type": "text", "text": prompt}]
 
             for idx, img_data in enumerate(all_reference_images):
                 compressed_img = compress_image(img_data, max_size_kb=200)
-                logger.debug(f"  参考图 {idx}: {len(img_data)} -> {len(compressed_img)} bytes")
-                base64_image = base64.b64encode(compressed_img).decode('utf-8')
-                content_parts.append({
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{base64_image}"}
-                })
+                logger.debug("  参考图 %s: %s -> %s bytes", idx, len(img_data), len(compressed_img))
+                file_id = self._reference_file_id(compressed_img, cache_scope)
+                if file_id:
+                    content_parts.append({"type": "file", "file": {"file_id": file_id}})
+                else:
+                    content_parts.append({
+                        "type": "image_url",
+                        "image_url": {"url": self._data_uri(compressed_img)}
+                    })
 
             user_content = content_parts
 
@@ -281,9 +359,9 @@ class ImageApiGenerator(ImageGeneratorBase):
         }
 
         api_url = f"{self.base_url}{self.endpoint_type}"
-        logger.info(f"Chat API 生成图片: {api_url}, model={model}")
+        logger.info("Chat API 生成图片: %s, model=%s", api_url, model)
 
-        response = requests.post(api_url, headers=headers, json=payload, timeout=300)
+        response = requests.post(api_url, headers=headers, json=payload, timeout=300, stream=True)
 
         if response.status_code != 200:
             error_detail = response.text[:500]
@@ -313,8 +391,16 @@ class ImageApiGenerator(ImageGeneratorBase):
                     f"【模型】{model}"
                 )
 
-        result = response.json()
-        logger.debug(f"Chat API 响应: {str(result)[:500]}")
+        # 流式读取：data URI（纯 data URL 或 Markdown 内嵌）直接分块解码到临时文件
+        with observe_stage('decode', provider=self.provider_name, model=model):
+            images, result = read_image_response(response)
+        logger.debug("Chat API 响应: %s", LazyPayload(result))
+
+        if images:
+            for extra in images[1:]:
+                extra.discard()
+            logger.info("从响应中提取到 Base64 图片数据")
+            return images[0]
 
         # 解析响应
         if "choices" in result and len(result["choices"]) > 0:
@@ -327,23 +413,9 @@ class ImageApiGenerator(ImageGeneratorBase):
                     pattern = r'!\[.*?\]\((https?://[^\s\)]+)\)'
                     urls = re.findall(pattern, content)
                     if urls:
-                        logger.info(f"从 Markdown 提取到 {len(urls)} 张图片，下载第一张...")
+                        logger.info("从 Markdown 提取到 %s 张图片，下载第一张...", len(urls))
                         return self._download_image(urls[0])
 
-                    # Markdown 图片 Base64: ![xxx](data:image/...)
-                    base64_pattern = r'!\[.*?\]\((data:image\/[^;]+;base64,[^\s\)]+)\)'
-                    base64_urls = re.findall(base64_pattern, content)
-                    if base64_urls:
-                        logger.info("从 Markdown 提取到 Base64 图片数据")
-                        base64_data = base64_urls[0].split(",")[1]
-                        return base64.b64decode(base64_data)
-
-                    # 纯 Base64 data URL
-                    if content.startswith("data:image"):
-                        logger.info("检测到 Base64 图片数据")
-                        base64_data = content.split(",")[1]
-                        return base64.b64decode(base64_data)
-
                     # 纯 URL
                     if content.startswith("http://") or content.startswith("https://"):
                         logger.info("检测到图片 URL")
@@ -351,7 +423,7 @@ class ImageApiGenerator(ImageGeneratorBase):
 
         raise Exception(
             "❌ 无法从 Chat API 响应中提取图片数据\n\n"
-            f"【响应内容】\n{str(result)[:500]}\n\n"
+            f"【响应内容】\n{str(summarize_payload(result))[:500]}\n\n"
             "【可能原因】\n"
             "1. 该模型不支持图片生成\n"
             "2. 响应格式与预期不符\n"
@@ -361,15 +433,17 @@ class ImageApiGenerator(ImageGeneratorBase):
             "2. 修改提示词后重试"
         )
 
-    def _download_image(self, url: str) -> bytes:
-        """下载图片并返回二进制数据"""
-        logger.info(f"下载图片: {url[:100]}...")
+    def _download_image(self, url: str) -> StreamedImage:
+        """下载图片（分块写入临时文件）"""
+        logger.info("下载图片: %s...", url[:100])
         try:
-            response = requests.get(url, timeout=60)
+            response = requests.get(url, timeout=60, stream=True)
             if response.status_code == 200:
-                logger.info(f"✅ 图片下载成功: {len(response.content)} bytes")
-                return response.content
+                image = download_to_file(response)
+                logger.info("✅ 图片下载成功: %s bytes", len(image))
+                return image
             else:
+                response.close()
                 raise Exception(f"下载图片失败: HTTP {response.status_code}")
         except requests.exceptions.Timeout:
             raise Exception("❌ 下载图片超时，请重试")
@@ -3,10 +3,17 @@ import logging
 import time
 import random
 import base64
+import json
 from functools import wraps
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Union
 import requests
 from .base import ImageGeneratorBase
+from ..utils.metrics import observe_stage, record_failure, record_retry
+from ..utils.logging_utils import LazyPayload, summarize_payload
+from ..utils.streaming import (
+    CHUNK_SIZE, PLACEHOLDER, StreamedImage, read_image_response, download_to_file, discard_image,
+    scan_image_chunks
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,21 +28,29 @@ def retry_on_error(max_retries=5, base_delay=3):
                     return func(*args, **kwargs)
                 except Exception as e:
                     error_str = str(e)
+                    generator = args[0] if args else None
+                    labels = {
+                        "provider": getattr(generator, 'provider_name', ''),
+                        "model": kwargs.get('model') or getattr(generator, 'default_model', '')
+                    }
+                    record_failure('generator', e, **labels)
+                    if attempt < max_retries - 1:
+                        record_retry('generator', e, **labels)
                     # Check if rate limit error
                     if "429" in error_str or "rate" in error_str.lower():
                         if attempt < max_retries - 1:
                             wait_time = (base_delay ** attempt) + random.uniform(0, 1)
-                            logger.warning(f"Rate limit hit, retrying in {wait_time:.1f}s (attempt {attempt + 2}/{max_retries})")
+                            logger.warning("Rate limit hit, retrying in %.1fs (attempt %s/%s)", wait_time, attempt + 2, max_retries)
                             time.sleep(wait_time)
                             continue
                     # Other errors or retries exhausted
                     if attempt < max_retries - 1:
                         wait_time = 2 ** attempt
-                        logger.warning(f"Request failed: {error_str[:100]}, retrying in {wait_time}s")
+                        logger.warning("Request failed: %s, retrying in %ss", error_str[:100], wait_time)
                         time.sleep(wait_time)
                         continue
                     raise
-            logger.error(f"Image generation failed after {max_retries} retries")
+            logger.error("Image generation failed after %s retries", max_retries)
             raise Exception(
                 f"Image generation failed after {max_retries} retries.\n"
                 "Possible causes:\n"
@@ -69,8 +84,10 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                 "Solution: Edit this provider in system settings and fill in the Base URL"
             )
 
-        # Normalize base_url: remove trailing /v1
-        self.base_url = self.base_url.rstrip('/').rstrip('/v1')
+        # Normalize base_url: remove trailing /v1 (a suffix, not a character set: ports may end in 1)
+        self.base_url = self.base_url.rstrip('/')
+        if self.base_url.endswith('/v1'):
+            self.base_url = self.base_url[:-len('/v1')]
 
         # Default model
         self.default_model = config.get('model', 'dall-e-3')
@@ -84,7 +101,17 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
             endpoint_type = '/v1/chat/completions'
         self.endpoint_type = endpoint_type
 
-        logger.info(f"OpenAICompatibleGenerator initialized: base_url={self.base_url}, model={self.default_model}, endpoint={self.endpoint_type}")
+        # Batch mode: 'none' (one request per image) or 'jsonl' (submit one batch file to the
+        # provider's offline batch API). n > 1 only returns variants of a single prompt, and every
+        # page has its own prompt, so there is no grouped mode.
+        self.batch_mode = config.get('batch_mode', 'none')
+        if self.batch_mode not in ('none', 'jsonl'):
+            logger.warning("Unsupported batch_mode %r, using single requests", self.batch_mode)
+            self.batch_mode = 'none'
+        self.batch_poll_interval = float(config.get('batch_poll_interval', 5))
+        self.batch_timeout = float(config.get('batch_timeout', 1800))
+
+        logger.info("OpenAICompatibleGenerator initialized: base_url=%s, model=%s, endpoint=%s", self.base_url, self.default_model, self.endpoint_type)
 
     def validate_config(self) -> bool:
         """Validate config"""
@@ -98,7 +125,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         model: str = None,
         quality: str = "standard",
         **kwargs
-    ) -> bytes:
+    ) -> Union[bytes, StreamedImage]:
         """
         Generate image
 
@@ -110,12 +137,12 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
             **kwargs: Other parameters
 
         Returns:
-            Image binary data
+            Image bytes, or a StreamedImage already decoded into a temp file
         """
         if model is None:
             model = self.default_model
 
-        logger.info(f"OpenAI Compatible API generating image: model={model}, size={size}, endpoint={self.endpoint_type}")
+        logger.info("OpenAI Compatible API generating image: model=%s, size=%s, endpoint=%s", model, size, self.endpoint_type)
 
         # Decide which API method based on endpoint path
         if 'chat' in self.endpoint_type or 'completions' in self.endpoint_type:
@@ -124,24 +151,14 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
             # Default to images API
             return self._generate_via_images_api(prompt, size, model, quality)
 
-    def _generate_via_images_api(
+    def _build_images_payload(
         self,
         prompt: str,
         size: str,
         model: str,
         quality: str
-    ) -> bytes:
-        """Generate via images API endpoint"""
-        # Ensure endpoint starts with /
-        endpoint = self.endpoint_type if self.endpoint_type.startswith('/') else '/' + self.endpoint_type
-        url = f"{self.base_url}{endpoint}"
-        logger.debug(f"  Sending request to: {url}")
-
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
+    ) -> Dict[str, Any]:
+        """Build images API request body"""
         payload = {
             "model": model,
             "prompt": prompt,
@@ -154,11 +171,48 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         if quality and model.startswith('dall-e'):
             payload["quality"] = quality
 
-        response = requests.post(url, headers=headers, json=payload, timeout=180)
+        return payload
+
+    def _images_endpoint(self) -> str:
+        """Images API endpoint path (always starts with /)"""
+        return self.endpoint_type if self.endpoint_type.startswith('/') else '/' + self.endpoint_type
+
+    def _generate_via_images_api(
+        self,
+        prompt: str,
+        size: str,
+        model: str,
+        quality: str
+    ) -> Union[bytes, StreamedImage]:
+        """Generate via images API endpoint"""
+        images = self._request_images(prompt, size, model, quality)
+        for extra in images[1:]:
+            discard_image(extra)
+        return images[0]
+
+    def _request_images(
+        self,
+        prompt: str,
+        size: str,
+        model: str,
+        quality: str
+    ) -> List[Union[bytes, StreamedImage]]:
+        """Send one images API request and return all images in the response"""
+        url = f"{self.base_url}{self._images_endpoint()}"
+        logger.debug("  Sending request to: %s", url)
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        payload = self._build_images_payload(prompt, size, model, quality)
+
+        response = requests.post(url, headers=headers, json=payload, timeout=180, stream=True)
 
         if response.status_code != 200:
             error_detail = response.text[:500]
-            logger.error(f"OpenAI Images API request failed: status={response.status_code}, error={error_detail}")
+            logger.error("OpenAI Images API request failed: status=%s, error=%s", response.status_code, error_detail)
             raise Exception(
                 f"OpenAI Images API request failed (status: {response.status_code})\n"
                 f"Error details: {error_detail}\n"
@@ -173,14 +227,20 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                 "Suggestion: Check API key, base_url and model name configuration"
             )
 
-        result = response.json()
-        logger.debug(f"  API response: data length={len(result.get('data', []))}")
+        # Stream the body: b64_json payloads are decoded chunk by chunk into temp files
+        with observe_stage('decode', provider=self.provider_name, model=model):
+            images, result = read_image_response(response)
+        logger.debug("  API response: data length=%s", len(result.get('data', [])))
+
+        if images:
+            logger.info("[OK] OpenAI Images API generated %s image(s): %s bytes", len(images), sum(map(len, images)))
+            return images
 
         if "data" not in result or len(result["data"]) == 0:
-            logger.error(f"API returned no image data: {str(result)[:200]}")
+            logger.error("API returned no image data: %s", LazyPayload(result))
             raise ValueError(
                 "OpenAI API returned no image data.\n"
-                f"Response: {str(result)[:500]}\n"
+                f"Response: {str(summarize_payload(result))[:500]}\n"
                 "Possible causes:\n"
                 "1. Prompt blocked by safety filter\n"
                 "2. Model does not support image generation\n"
@@ -188,42 +248,222 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                 "Suggestion: Modify prompt or check model configuration"
             )
 
-        image_data = result["data"][0]
+        return [self._extract_image_bytes(image_data) for image_data in result["data"]]
 
+    def _extract_image_bytes(self, image_data: Dict[str, Any]) -> Union[bytes, StreamedImage]:
+        """Extract image bytes from one images API data item"""
         # Handle base64 format
         if "b64_json" in image_data:
-            img_bytes = base64.b64decode(image_data["b64_json"])
-            logger.info(f"[OK] OpenAI Images API image generated: {len(img_bytes)} bytes")
+            with observe_stage('decode', provider=self.provider_name, model=self.default_model):
+                img_bytes = base64.b64decode(image_data["b64_json"])
+            logger.info("[OK] OpenAI Images API image generated: %s bytes", len(img_bytes))
             return img_bytes
 
         # Handle URL format
         elif "url" in image_data:
-            logger.debug(f"  Downloading image from URL...")
-            img_response = requests.get(image_data["url"], timeout=60)
-            if img_response.status_code == 200:
-                logger.info(f"[OK] OpenAI Images API image generated: {len(img_response.content)} bytes")
-                return img_response.content
-            else:
-                logger.error(f"Download image failed: {img_response.status_code}")
-                raise Exception(f"Download image failed: {img_response.status_code}")
+            logger.debug("  Downloading image from URL...")
+            return self._download_image(image_data["url"])
 
         else:
-            logger.error(f"Cannot extract image data from response: {str(image_data)[:200]}")
+            logger.error("Cannot extract image data from response: %s", LazyPayload(image_data))
             raise ValueError(
                 "Cannot extract image data from API response.\n"
-                f"Response data: {str(image_data)[:500]}\n"
+                f"Response data: {str(summarize_payload(image_data))[:500]}\n"
                 "Possible causes:\n"
                 "1. Response format does not contain b64_json or url field\n"
                 "2. response_format parameter not effective\n"
                 "Suggestion: Check API documentation for image return format"
             )
 
+    def supports_batch(self) -> bool:
+        """Batching uses the offline batch API, which only covers the images endpoint"""
+        if self.batch_mode != 'jsonl':
+            return False
+        return not ('chat' in self.endpoint_type or 'completions' in self.endpoint_type)
+
+    def generate_images_batch(
+        self,
+        batch_requests: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Generate many images through the provider's offline batch API
+
+        Args:
+            batch_requests: Request list, each item has custom_id, prompt and optional size/model/quality
+            progress_callback: Called with the batch job status after submitting and on every poll
+            **kwargs: Other parameters
+
+        Returns:
+            Dict mapping custom_id to image bytes, or to the Exception for that item
+        """
+        if not self.supports_batch():
+            return super().generate_images_batch(batch_requests, progress_callback, **kwargs)
+        if not batch_requests:
+            return {}
+
+        logger.info("OpenAI Compatible batch generating %s images via batch API", len(batch_requests))
+        return self._generate_via_batch_file(batch_requests, progress_callback)
+
+    def _normalize_batch_request(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill default generation parameters of one batch item"""
+        return {
+            "custom_id": str(item["custom_id"]),
+            "prompt": item["prompt"],
+            "size": item.get("size") or "1024x1024",
+            "model": item.get("model") or self.default_model,
+            "quality": item.get("quality") or "standard",
+        }
+
+    def _generate_via_batch_file(
+        self,
+        batch_requests: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Submit all requests as one JSONL file to an OpenAI-style offline batch API
+
+        Flow: upload file (/v1/files) -> create batch (/v1/batches) -> poll batch ->
+        stream the output file and map each line back by custom_id. Images in the output
+        are decoded into temp files while downloading, never held in memory as a whole.
+        """
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        endpoint = self._images_endpoint()
+
+        lines = []
+        for item in map(self._normalize_batch_request, batch_requests):
+            lines.append(json.dumps({
+                "custom_id": item["custom_id"],
+                "method": "POST",
+                "url": endpoint,
+                "body": self._build_images_payload(
+                    item["prompt"], item["size"], item["model"], item["quality"]
+                )
+            }, ensure_ascii=False))
+        batch_file = ("\n".join(lines) + "\n").encode("utf-8")
+
+        # 1. Upload batch input file
+        response = requests.post(
+            f"{self.base_url}/v1/files",
+            headers=headers,
+            data={"purpose": "batch"},
+            files={"file": ("batch_images.jsonl", batch_file, "application/jsonl")},
+            timeout=120
+        )
+        input_file_id = self._check_batch_response(response, "upload batch file")["id"]
+
+        # 2. Create batch job
+        response = requests.post(
+            f"{self.base_url}/v1/batches",
+            headers=headers,
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": endpoint,
+                "completion_window": "24h"
+            },
+            timeout=60
+        )
+        batch = self._check_batch_response(response, "create batch")
+        batch_id = batch["id"]
+        logger.info("Batch job submitted: id=%s, requests=%s", batch_id, len(lines))
+
+        def report(batch_state: Dict[str, Any]):
+            if progress_callback is None:
+                return
+            counts = batch_state.get("request_counts") or {}
+            progress_callback({
+                "batch_id": batch_id,
+                "status": batch_state.get("status"),
+                "completed": counts.get("completed", 0),
+                "failed": counts.get("failed", 0),
+                "total": counts.get("total") or len(lines),
+            })
+
+        # 3. Poll until finished
+        report(batch)
+        deadline = time.time() + self.batch_timeout
+        while batch.get("status") not in ("completed", "failed", "expired", "cancelled"):
+            if time.time() > deadline:
+                raise TimeoutError(
+                    f"Batch job {batch_id} not finished after {self.batch_timeout:.0f}s "
+                    f"(status: {batch.get('status')})"
+                )
+            time.sleep(self.batch_poll_interval)
+            response = requests.get(f"{self.base_url}/v1/batches/{batch_id}", headers=headers, timeout=30)
+            batch = self._check_batch_response(response, "poll batch")
+            report(batch)
+
+        if batch["status"] != "completed" or not batch.get("output_file_id"):
+            raise Exception(
+                f"Batch job {batch_id} ended with status: {batch['status']}\n"
+                f"Errors: {str(batch.get('errors'))[:300]}"
+            )
+
+        # 4. Stream output, decoding images into temp files, and split per request
+        response = requests.get(
+            f"{self.base_url}/v1/files/{batch['output_file_id']}/content",
+            headers=headers,
+            timeout=300,
+            stream=True
+        )
+        if response.status_code != 200:
+            response.close()
+            raise Exception(f"Download batch output failed: HTTP {response.status_code}")
+        with observe_stage('decode', provider=self.provider_name, model=self.default_model):
+            try:
+                images, text = scan_image_chunks(response.iter_content(CHUNK_SIZE))
+            finally:
+                response.close()
+
+        placeholders = {PLACEHOLDER.format(position): image for position, image in enumerate(images)}
+        results: Dict[str, Any] = {}
+        try:
+            for line in text.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                custom_id = str(entry.get("custom_id"))
+                body = (entry.get("response") or {}).get("body") or {}
+                status_code = (entry.get("response") or {}).get("status_code", 200)
+                try:
+                    if entry.get("error") or status_code != 200 or not body.get("data"):
+                        raise Exception(
+                            f"Batch item failed (status: {status_code}): "
+                            f"{str(entry.get('error') or body)[:300]}"
+                        )
+                    image_data = body["data"][0]
+                    streamed = placeholders.pop(image_data.get("b64_json"), None)
+                    results[custom_id] = streamed if streamed is not None else self._extract_image_bytes(image_data)
+                except Exception as e:
+                    results[custom_id] = e
+        finally:
+            # Images not assigned to any request (extra data items, unparsable lines)
+            for image in placeholders.values():
+                discard_image(image)
+
+        for item in batch_requests:
+            results.setdefault(str(item["custom_id"]), ValueError("Missing from batch output"))
+
+        return results
+
+    def _check_batch_response(self, response, action: str) -> Dict[str, Any]:
+        """Raise a readable error for failed batch API calls"""
+        if response.status_code not in (200, 201):
+            raise Exception(
+                f"OpenAI batch API failed to {action} (status: {response.status_code})\n"
+                f"Error details: {response.text[:300]}\n"
+                "Suggestion: Check that this provider supports /v1/files and /v1/batches, "
+                "or set batch_mode to 'none'"
+            )
+        return response.json()
+
     def _generate_via_chat_api(
         self,
         prompt: str,
         size: str,
         model: str
-    ) -> bytes:
+    ) -> StreamedImage:
         """
         Generate image via chat/completions endpoint
 
@@ -235,7 +475,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         # Ensure endpoint starts with /
         endpoint = self.endpoint_type if self.endpoint_type.startswith('/') else '/' + self.endpoint_type
         url = f"{self.base_url}{endpoint}"
-        logger.info(f"Chat API generating image: {url}, model={model}")
+        logger.info("Chat API generating image: %s, model=%s", url, model)
 
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -254,7 +494,7 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
             "temperature": 1.0
         }
 
-        response = requests.post(url, headers=headers, json=payload, timeout=180)
+        response = requests.post(url, headers=headers, json=payload, timeout=180, stream=True)
 
         if response.status_code != 200:
             error_detail = response.text[:500]
@@ -285,8 +525,16 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                     f"[Model] {model}"
                 )
 
-        result = response.json()
-        logger.debug(f"Chat API response: {str(result)[:500]}")
+        # Stream the body: data URI payloads are decoded chunk by chunk into temp files
+        with observe_stage('decode', provider=self.provider_name, model=model):
+            images, result = read_image_response(response)
+        logger.debug("Chat API response: %s", LazyPayload(result))
+
+        if images:
+            for extra in images[1:]:
+                extra.discard()
+            logger.info("Detected Base64 image data")
+            return images[0]
 
         # Parse response
         if "choices" in result and len(result["choices"]) > 0:
@@ -299,23 +547,17 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
                     image_urls = self._extract_markdown_image_urls(content)
                     if image_urls:
                         # Download first image
-                        logger.info(f"Extracted {len(image_urls)} images from Markdown, downloading first one...")
+                        logger.info("Extracted %s images from Markdown, downloading first one...", len(image_urls))
                         return self._download_image(image_urls[0])
 
-                    # 2. Try to parse Base64 data URL
-                    if content.startswith("data:image"):
-                        logger.info("Detected Base64 image data")
-                        base64_data = content.split(",")[1]
-                        return base64.b64decode(base64_data)
-
-                    # 3. Try as plain URL
+                    # 2. Try as plain URL (Base64 data URLs were already decoded while streaming)
                     if content.startswith("http://") or content.startswith("https://"):
                         logger.info("Detected image URL")
                         return self._download_image(content.strip())
 
         raise ValueError(
             "[FAIL] Cannot extract image data from Chat API response\n\n"
-            f"[Response]\n{str(result)[:500]}\n\n"
+            f"[Response]\n{str(summarize_payload(result))[:500]}\n\n"
             "[Possible causes]\n"
             "1. This model does not support image generation\n"
             "2. Response format does not match expected\n"
@@ -335,18 +577,20 @@ class OpenAICompatibleGenerator(ImageGeneratorBase):
         # Match ![any text](url) format
         pattern = r'!\[.*?\]\((https?://[^\s\)]+)\)'
         urls = re.findall(pattern, content)
-        logger.debug(f"Extracted {len(urls)} image URLs from Markdown")
+        logger.debug("Extracted %s image URLs from Markdown", len(urls))
         return urls
 
-    def _download_image(self, url: str) -> bytes:
-        """Download image and return binary data"""
-        logger.info(f"Downloading image: {url[:100]}...")
+    def _download_image(self, url: str) -> StreamedImage:
+        """Download image chunk by chunk into a temp file"""
+        logger.info("Downloading image: %s...", url[:100])
         try:
-            response = requests.get(url, timeout=60)
+            response = requests.get(url, timeout=60, stream=True)
             if response.status_code == 200:
-                logger.info(f"[OK] Image downloaded: {len(response.content)} bytes")
-                return response.content
+                image = download_to_file(response)
+                logger.info("[OK] Image downloaded: %s bytes", len(image))
+                return image
             else:
+                response.close()
                 raise Exception(f"Download image failed: HTTP {response.status_code}")
         except requests.exceptions.Timeout:
             raise Exception("[FAIL] Download image timeout, please retry")
@@ -0,0 +1,79 @@
+"""
+图片生成器注册表
+
+按 (服务商名称, 配置哈希) 缓存生成器实例：
+- 配置没变的服务商一直复用同一个实例（客户端、连接池保持温热）
+- 某个服务商的配置变化时只重建它，旧实例从注册表移除，仍在使用它的任务可以继续用完
+"""
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Tuple
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
+from .base import ImageGeneratorBase
+from .factory import ImageGeneratorFactory
+
+logger = logging.getLogger(__name__)
+
+
+def config_hash(provider_config: Dict[str, Any]) -> str:
+    """服务商配置的哈希（键顺序无关）"""
+    payload = json.dumps(provider_config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class GeneratorRegistry:
+    """生成器实例注册表（每个服务商只保留当前配置对应的实例）"""
+
+    def __init__(self):
+        self._generators: Dict[str, Tuple[str, ImageGeneratorBase]] = {}  # 服务商 -> (配置哈希, 实例)
+        self._lock = threading.Lock()
+
+    def get(self, provider_name: str, provider_config: Dict[str, Any]) -> ImageGeneratorBase:
+        """
+        取得服务商的生成器（配置变化时重建）
+
+        Args:
+            provider_name: 服务商名称
+            provider_config: 服务商配置
+
+        Returns:
+            图片生成器实例
+        """
+        digest = config_hash(provider_config)
+        with self._lock:
+            entry = self._generators.get(provider_name)
+        if entry is not None and entry[0] == digest:
+            CACHE_HITS.inc(cache='image_generator')
+            return entry[1]
+        CACHE_MISSES.inc(cache='image_generator')
+
+        # 创建实例可能较慢（客户端初始化、读取凭据），不持有锁，其他服务商的请求不受影响
+        provider_type = provider_config.get('type', provider_name)
+        generator = ImageGeneratorFactory.create(provider_type, provider_config)
+        generator.provider_name = provider_name
+
+        with self._lock:
+            current = self._generators.get(provider_name)
+            if current is not None and current[0] == digest:
+                # 其他线程已用同样的配置创建好了，丢弃这次创建的实例
+                return current[1]
+            self._generators[provider_name] = (digest, generator)
+
+        if entry is None:
+            logger.info("创建图片生成器: %s (type=%s)", provider_name, provider_type)
+        else:
+            logger.info("服务商配置已变更，重建图片生成器: %s (type=%s)", provider_name, provider_type)
+        return generator
+
+    def prune(self, provider_names: Iterable[str]):
+        """移除已不在配置中的服务商"""
+        keep = set(provider_names)
+        with self._lock:
+            for name in [name for name in self._generators if name not in keep]:
+                del self._generators[name]
+                logger.info("移除图片生成器: %s", name)
+
+
+GENERATOR_REGISTRY = GeneratorRegistry()
@@ -9,6 +9,9 @@ API 路由模組
 - blogger_routes: Blogger 發布 API
 - upload_routes: 圖片上傳 API
 - unsplash_routes: Unsplash 備用圖庫 API
+- batch_routes: 批量生成 API
+- metrics_routes: 指標 API
+- trace_routes: 任務追蹤 API
 
 所有路由都註冊到 /api 前綴下
 """
@@ -26,6 +29,9 @@ def create_api_blueprint():
     from .blogger_routes import create_blogger_blueprint
     from .upload_routes import create_upload_blueprint
     from .unsplash_routes import create_unsplash_blueprint
+    from .batch_routes import create_batch_blueprint
+    from .metrics_routes import create_metrics_blueprint
+    from .trace_routes import create_trace_blueprint
 
     api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -37,6 +43,9 @@ def create_api_blueprint():
     api_bp.register_blueprint(create_blogger_blueprint())
     api_bp.register_blueprint(create_upload_blueprint(), url_prefix='/upload')
     api_bp.register_blueprint(create_unsplash_blueprint(), url_prefix='/unsplash')
+    api_bp.register_blueprint(create_batch_blueprint())
+    api_bp.register_blueprint(create_metrics_blueprint())
+    api_bp.register_blueprint(create_trace_blueprint())
 
     return api_bp
 
@@ -0,0 +1,135 @@
+"""
+批量生成相关 API 路由
+
+包含功能：
+- 提交批量生成任务（多个主题一次提交）
+- 查询批量任务进度
+- 列出批量任务
+"""
+
+import logging
+from flask import Blueprint, request, jsonify
+from backend.services.batch import get_batch_service, BatchService
+from .utils import log_request, log_error
+
+logger = logging.getLogger(__name__)
+
+
+def create_batch_blueprint():
+    """创建批量生成路由蓝图（工厂函数，支持多次调用）"""
+    batch_bp = Blueprint('batch', __name__)
+
+    @batch_bp.route('/batch', methods=['POST'])
+    def submit_batch():
+        """
+        提交批量生成任务
+
+        请求体：
+        - items: 主题列表（必填），每项为字符串或对象：
+          - topic: 主题文本
+          - text_style: 文字風格（可选）
+          - image_style: 图片風格（可选）
+        - text_style: 默认文字風格（可选，默认 professional）
+        - image_style: 默认图片風格（可选，默认 flat）
+
+        返回：
+        - success: 是否成功
+        - batch_id: 批量任务 ID
+        """
+        try:
+            data = request.get_json() or {}
+            raw_items = data.get('items') or []
+            text_style = data.get('text_style', 'professional')
+            image_style = data.get('image_style', 'flat')
+
+            if not isinstance(raw_items, list):
+                return jsonify({
+                    "success": False,
+                    "error": "参数错误：items 必须是列表。"
+                }), 400
+
+            items = []
+            for raw in raw_items:
+                item = {'topic': raw} if isinstance(raw, str) else raw
+                if not isinstance(item, dict) or not isinstance(item.get('topic', ''), str):
+                    return jsonify({
+                        "success": False,
+                        "error": "参数错误：每个主题必须是字符串，或包含字符串 topic 的对象。"
+                    }), 400
+                if item.get('topic', '').strip():
+                    items.append(dict(item))
+
+            log_request('/batch', {
+                'items_count': len(items),
+                'text_style': text_style,
+                'image_style': image_style
+            })
+
+            if not items:
+                return jsonify({
+                    "success": False,
+                    "error": "参数错误：items 不能为空。\n请提供至少一个主题。"
+                }), 400
+
+            if len(items) > BatchService.MAX_ITEMS_PER_BATCH:
+                return jsonify({
+                    "success": False,
+                    "error": f"参数错误：单次最多提交 {BatchService.MAX_ITEMS_PER_BATCH} 个主题。"
+                }), 400
+
+            batch_id = get_batch_service().submit_batch(items, text_style, image_style)
+            logger.info("📦 批量任务已提交: %s, 共 %s 个主题", batch_id, len(items))
+
+            return jsonify({
+                "success": True,
+                "batch_id": batch_id,
+                "total": len(items)
+            }), 202
+
+        except Exception as e:
+            log_error('/batch', e)
+            return jsonify({
+                "success": False,
+                "error": f"提交批量任务失败。\n错误详情: {str(e)}"
+            }), 500
+
+    @batch_bp.route('/batch', methods=['GET'])
+    def list_batches():
+        """
+        列出所有批量任务（仅汇总进度）
+
+        返回：
+        - success: 是否成功
+        - batches: 批量任务列表
+        """
+        return jsonify({
+            "success": True,
+            "batches": get_batch_service().list_batches()
+        }), 200
+
+    @batch_bp.route('/batch/<batch_id>', methods=['GET'])
+    def get_batch(batch_id):
+        """
+        查询批量任务进度
+
+        路径参数：
+        - batch_id: 批量任务 ID
+
+        返回：
+        - success: 是否成功
+        - batch: 任务状态，包含 progress 汇总和每个主题的状态
+        """
+        batch = get_batch_service().get_batch(batch_id)
+
+        if batch is None:
+            return jsonify({
+                "success": False,
+                "error": f"批量任务不存在：{batch_id}\n可能原因：任务ID错误或服务已重启"
+            }), 404
+
+        return jsonify({
+            "success": True,
+            "batch": batch
+        }), 200
+
+    return batch_bp
@@ -3,22 +3,74 @@ Google Blogger 發布相關 API 路由
 """
 
 import logging
+import os
 import re
 import requests
+from datetime import datetime
 from pathlib import Path
 from flask import Blueprint, request, jsonify
+from werkzeug.security import safe_join
 from backend.services.blogger import BloggerService, generate_blog_html
+from backend.services.blogger_queue import get_publish_queue
+from backend.services.image_hosting import get_uploader
 from backend.config import Config
+from backend.utils.logging_utils import LazyPayload
+from backend.utils.tracing import start_span, new_trace_id
 
 logger = logging.getLogger(__name__)
 
 # urusai.cc API 端點
 URUSAI_API_URL = "https://api.urusai.cc/v1/upload"
+URUSAI_HOST = "urusai.cc"
+
+HISTORY_ROOT = str(Path(__file__).parent.parent.parent / "history")
+
+
+def _upload_to_urusai(image_path: str) -> str:
+    """
+    上傳單一圖片到 urusai.cc（失敗時拋出例外，由上傳器重試）
+
+    Args:
+        image_path: 圖片檔案路徑
+
+    Returns:
+        urusai.cc 圖片 URL
+    """
+    filename = os.path.basename(image_path)
+    with start_span("publish.upload_image", filename=filename), open(image_path, 'rb') as f:
+        # 使用 multipart/form-data 上傳
+        files = {
+            'file': (filename, f, 'image/png')
+        }
+
+        response = requests.post(
+            URUSAI_API_URL,
+            files=files,
+            timeout=60
+        )
+
+    if response.status_code != 200:
+        raise Exception(f"urusai.cc 上傳失敗: {response.status_code} - {response.text[:200]}")
+
+    result = response.json()
+    logger.debug("urusai.cc 回應: %s", LazyPayload(result))
+    # urusai.cc 返回格式: {"status":"success","data":{"url_direct":"..."}}
+    data = result.get('data', {})
+    direct_url = data.get('url_direct', '') or data.get('url_preview', '') or result.get('direct', '') or result.get('url', '')
+    if not direct_url:
+        raise Exception(f"urusai.cc 回應中沒有 URL: {LazyPayload(result)}")
+
+    logger.info("成功上傳圖片到 urusai.cc: %s", direct_url)
+    return direct_url
+
+
+def _get_urusai_uploader():
+    return get_uploader(URUSAI_HOST)
 
 
 def upload_image_to_urusai(image_path: Path) -> str:
     """
-    上傳圖片到 urusai.cc 並返回公開 URL
+    上傳圖片到 urusai.cc 並返回公開 URL（內容相同的圖片使用快取的 URL）
 
     Args:
         image_path: 圖片檔案路徑
@@ -27,86 +79,116 @@ def upload_image_to_urusai(image_path: Path) -> str:
         urusai.cc 圖片 URL，失敗返回空字串
     """
     try:
-        with open(image_path, 'rb') as f:
-            # 使用 multipart/form-data 上傳
-            files = {
-                'file': (image_path.name, f, 'image/png')
-            }
-
-            response = requests.post(
-                URUSAI_API_URL,
-                files=files,
-                timeout=60
-            )
-
-        if response.status_code == 200:
-            result = response.json()
-            logger.info(f"urusai.cc 回應: {result}")
-            # urusai.cc 返回格式: {"status":"success","data":{"url_direct":"..."}}
-            data = result.get('data', {})
-            direct_url = data.get('url_direct', '') or data.get('url_preview', '') or result.get('direct', '') or result.get('url', '')
-            if direct_url:
-                logger.info(f"成功上傳圖片到 urusai.cc: {direct_url}")
-                return direct_url
-            else:
-                logger.error(f"urusai.cc 回應中沒有 URL: {result}")
-                return ''
-        else:
-            logger.error(f"urusai.cc 上傳失敗: {response.status_code} - {response.text}")
-            return ''
-
+        return _get_urusai_uploader().upload_one(str(image_path), _upload_to_urusai)
     except Exception as e:
-        logger.error(f"上傳圖片到 urusai.cc 失敗: {e}")
+        logger.error("上傳圖片到 urusai.cc 失敗: %s", e)
         return ''
 
 
 def convert_images_to_public_urls(images: list) -> list:
     """
-    將本地圖片上傳到 urusai.cc 並返回公開 URL
+    將本地圖片並行上傳到 urusai.cc 並返回公開 URL
+
+    內容沒變的圖片直接使用快取的 URL，不會重新上傳。
 
     Args:
         images: 圖片 URL 列表
 
     Returns:
-        公開 URL 列表
+        公開 URL 列表（與 images 順序相同，失敗的位置為空字串）
     """
-    public_urls = []
+    public_urls = [''] * len(images)
+    local_paths = [None] * len(images)
 
-    for img_url in images:
+    for i, img_url in enumerate(images):
         if not img_url:
-            public_urls.append('')
             continue
 
-        try:
-            # 解析 URL 取得檔案路徑
-            # URL 格式: /api/images/task_id/filename?thumbnail=false
-            match = re.search(r'/api/images/([^/]+)/([^?]+)', img_url)
-            if match:
-                task_id = match.group(1)
-                filename = match.group(2)
-
-                # 構建實際檔案路徑（圖片存在 history 目錄）
-                file_path = Path(__file__).parent.parent.parent / "history" / task_id / filename
-                logger.info(f"圖片檔案路徑: {file_path}, 存在: {file_path.exists()}")
-
-                if file_path.exists():
-                    # 上傳到 urusai.cc
-                    public_url = upload_image_to_urusai(file_path)
-                    public_urls.append(public_url)
-                else:
-                    logger.warning(f"圖片檔案不存在: {file_path}")
-                    public_urls.append('')
-            else:
-                # 如果不是本地 URL，直接使用原 URL
-                public_urls.append(img_url)
+        # 解析 URL 取得檔案路徑
+        # URL 格式: /api/images/task_id/filename?thumbnail=false
+        match = re.search(r'/api/images/([^/]+)/([^?]+)', img_url)
+        if not match:
+            # 如果不是本地 URL，直接使用原 URL
+            public_urls[i] = img_url
+            continue
 
-        except Exception as e:
-            logger.error(f"處理圖片失敗: {e}")
-            public_urls.append('')
+        # 構建實際檔案路徑（圖片存在 history 目錄）
+        file_path = safe_join(HISTORY_ROOT, match.group(1), match.group(2))
+        if file_path and os.path.isfile(file_path):
+            local_paths[i] = file_path
+        else:
+            logger.warning("圖片檔案不存在: %s/%s", match.group(1), match.group(2))
+
+    uploaded = _get_urusai_uploader().upload_many(local_paths, _upload_to_urusai)
+    for i, path in enumerate(local_paths):
+        if path:
+            public_urls[i] = uploaded[i]
 
     return public_urls
 
 
+def _resolve_trace_id(data: dict, images: list) -> str:
+    """
+    決定發布流程的追蹤 ID：優先使用 task_id，其次從本地圖片 URL 取出 task_id
+
+    Args:
+        data: 請求內容
+        images: 圖片 URL 列表
+
+    Returns:
+        追蹤 ID
+    """
+    if data.get('task_id'):
+        return data['task_id']
+
+    for img_url in images:
+        match = re.search(r'/api/images/([^/]+)/', img_url or '')
+        if match:
+            return match.group(1)
+
+    return new_trace_id()
+
+
+def _status_code_for_error(error_msg: str) -> int:
+    """根據錯誤訊息決定 HTTP 狀態碼"""
+    if "過期" in error_msg or "無效" in error_msg:
+        return 401
+    if "權限不足" in error_msg:
+        return 403
+    return 500
+
+
+def _build_renderer(outline: str, images: list, title: str, trace_id: str):
+    """
+    建立在背景產生文章 HTML 的函式（上傳圖片到圖床後轉換大綱）
+
+    Args:
+        outline: 大綱內容
+        images: 圖片 URL 列表
+        title: 文章標題
+        trace_id: 追蹤 ID
+
+    Returns:
+        無參數、返回 HTML 的函式
+    """
+    def render() -> str:
+        with start_span("publish.upload_images", trace_id=trace_id, images=len(images)):
+            public_urls = convert_images_to_public_urls(images)
+        with start_span("publish.render_html", trace_id=trace_id):
+            return generate_blog_html(outline, public_urls, title)
+    return render
+
+
+def _parse_publish_at(value):
+    """解析發布時間（ISO 8601，沒有時區時視為伺服器本地時間），未提供時返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"publish_at 格式錯誤: {value}（請使用 ISO 8601，例如 2025-01-01T09:00:00+08:00）")
+
+
 def create_blogger_blueprint():
     """建立 Blogger 路由藍圖"""
     blogger_bp = Blueprint('blogger', __name__)
@@ -118,6 +200,7 @@ def create_blogger_blueprint():
 
         請求內容：
         - access_token: Google OAuth2 access token
+        - refresh: 是否略過快取重新查詢（可選，預設 false）
 
         回傳：
         - success: 是否成功
@@ -126,6 +209,7 @@ def create_blogger_blueprint():
         try:
             data = request.get_json()
             access_token = data.get('access_token')
+            refresh = bool(data.get('refresh', False))
 
             if not access_token:
                 return jsonify({
@@ -134,7 +218,7 @@ def create_blogger_blueprint():
                 }), 400
 
             service = BloggerService(access_token)
-            result = service.get_user_blogs()
+            result = service.get_user_blogs(use_cache=not refresh)
 
             blogs = []
             for blog in result.get('items', []):
@@ -151,20 +235,12 @@ def create_blogger_blueprint():
 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"取得部落格清單失敗: {error_msg}")
-
-            # 根據錯誤類型決定 HTTP 狀態碼
-            if "過期" in error_msg or "無效" in error_msg:
-                status_code = 401
-            elif "權限不足" in error_msg:
-                status_code = 403
-            else:
-                status_code = 500
+            logger.error("取得部落格清單失敗: %s", error_msg)
 
             return jsonify({
                 "success": False,
                 "error": error_msg
-            }), status_code
+            }), _status_code_for_error(error_msg)
 
     @blogger_bp.route('/blogger/publish', methods=['POST'])
     def publish_post():
@@ -179,6 +255,7 @@ def create_blogger_blueprint():
         - images: 圖片 URL 列表
         - labels: 標籤列表（可選）
         - is_draft: 是否為草稿（可選，預設 false）
+        - task_id: 任務 ID（可選，用於追蹤；未提供時從圖片 URL 取得）
 
         回傳：
         - success: 是否成功
@@ -207,19 +284,23 @@ def create_blogger_blueprint():
                     "error": "缺少 blog_id"
                 }), 400
 
+            trace_id = _resolve_trace_id(data, images)
+
             # 將本地圖片上傳到 urusai.cc 圖床
-            logger.info(f"正在上傳 {len(images)} 張圖片到 urusai.cc...")
-            logger.info(f"原始圖片 URL: {images}")
-            public_urls = convert_images_to_public_urls(images)
-            logger.info(f"轉換後公開 URL: {public_urls}")
+            logger.info("正在上傳 %s 張圖片到 urusai.cc...", len(images))
+            logger.info("原始圖片 URL: %s", images)
+            with start_span("publish.upload_images", trace_id=trace_id, images=len(images)):
+                public_urls = convert_images_to_public_urls(images)
+            logger.info("轉換後公開 URL: %s", public_urls)
 
             # 將大綱轉換為 HTML（使用公開 URL）
-            html_content = generate_blog_html(outline, public_urls, title)
-            logger.info(f"生成的 HTML 內容前 500 字元: {html_content[:500]}")
+            with start_span("publish.render_html", trace_id=trace_id):
+                html_content = generate_blog_html(outline, public_urls, title)
+            logger.debug("生成的 HTML 內容: %s", LazyPayload(html_content))
 
             # 寫入 debug 檔案到專案根目錄
             debug_path = Path(Config.OUTPUT_DIR).parent / "blogger_debug.txt"
-            logger.info(f"Debug 檔案路徑: {debug_path}")
+            logger.info("Debug 檔案路徑: %s", debug_path)
             try:
                 with open(debug_path, 'w', encoding='utf-8') as f:
                     f.write(f"=== 發布 Debug 資訊 ===\n")
@@ -232,42 +313,196 @@ def create_blogger_blueprint():
                         f.write(f"  [{i}] {url}\n")
                     f.write(f"\n大綱內容:\n{outline}\n")
                     f.write(f"\n生成的 HTML:\n{html_content}\n")
-                logger.info(f"Debug 檔案已寫入")
+                logger.info("Debug 檔案已寫入")
             except Exception as write_err:
-                logger.error(f"寫入 debug 檔案失敗: {write_err}")
+                logger.error("寫入 debug 檔案失敗: %s", write_err)
 
             # 發布到 Blogger
             service = BloggerService(access_token)
-            result = service.create_post(
-                blog_id=blog_id,
-                title=title,
-                content=html_content,
-                labels=labels,
-                is_draft=is_draft
-            )
+            with start_span("publish.create_post", trace_id=trace_id, is_draft=is_draft):
+                result = service.create_post(
+                    blog_id=blog_id,
+                    title=title,
+                    content=html_content,
+                    labels=labels,
+                    is_draft=is_draft
+                )
 
             return jsonify({
                 "success": True,
                 "post_url": result.get('url', ''),
                 "post_id": result.get('id', ''),
+                "trace_id": trace_id,
                 "message": "草稿已儲存" if is_draft else "文章已發布"
             })
 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"發布文章失敗: {error_msg}")
-
-            # 根據錯誤類型決定 HTTP 狀態碼
-            if "過期" in error_msg or "無效" in error_msg:
-                status_code = 401
-            elif "權限不足" in error_msg:
-                status_code = 403
-            else:
-                status_code = 500
+            logger.error("發布文章失敗: %s", error_msg)
 
             return jsonify({
                 "success": False,
                 "error": error_msg
-            }), status_code
+            }), _status_code_for_error(error_msg)
+
+    @blogger_bp.route('/blogger/queue', methods=['POST'])
+    def queue_posts():
+        """
+        將文章排入背景發布佇列（立即返回，用 GET /blogger/queue/<job_id> 查詢進度）
+
+        請求內容：
+        - access_token: Google OAuth2 access token
+        - blog_id: 預設部落格 ID（posts 中未指定時使用）
+        - posts: 文章列表，每篇包含 title、outline、images、labels、is_draft、
+                 publish_at（ISO 8601，可選）、blog_id（可選）、task_id（可選）
+          （未提供 posts 時，以請求本身作為單篇文章）
+
+        回傳：
+        - success: 是否成功
+        - jobs: 每篇文章的 job_id 與發布時間
+        """
+        try:
+            data = request.get_json() or {}
+            access_token = data.get('access_token')
+            posts = data.get('posts') or [data]
+
+            if not access_token:
+                return jsonify({
+                    "success": False,
+                    "error": "缺少 access_token"
+                }), 400
+
+            # 先驗證全部文章，避免只排入一部分
+            prepared = []
+            for position, post in enumerate(posts):
+                blog_id = post.get('blog_id') or data.get('blog_id')
+                if not blog_id:
+                    return jsonify({
+                        "success": False,
+                        "error": f"第 {position + 1} 篇文章缺少 blog_id"
+                    }), 400
+                try:
+                    publish_at = _parse_publish_at(post.get('publish_at'))
+                except ValueError as e:
+                    return jsonify({
+                        "success": False,
+                        "error": str(e)
+                    }), 400
+                prepared.append((post, blog_id, publish_at))
+
+            queue = get_publish_queue()
+            jobs = []
+            for post, blog_id, publish_at in prepared:
+                title = post.get('title', '未命名文章')
+                images = post.get('images', [])
+                trace_id = _resolve_trace_id(post, images)
+                job_id = queue.submit(
+                    access_token=access_token,
+                    blog_id=blog_id,
+                    title=title,
+                    render=_build_renderer(post.get('outline', ''), images, title, trace_id),
+                    labels=post.get('labels', []),
+                    is_draft=post.get('is_draft', False),
+                    publish_at=publish_at,
+                    trace_id=trace_id
+                )
+                job = queue.get_job(job_id)
+                jobs.append({
+                    "job_id": job_id,
+                    "title": title,
+                    "status": job["status"],
+                    "publish_at": job["publish_at"],
+                    "trace_id": trace_id
+                })
+
+            return jsonify({
+                "success": True,
+                "jobs": jobs
+            }), 202
+
+        except Exception as e:
+            logger.error("排入發布佇列失敗: %s", e)
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 500
+
+    @blogger_bp.route('/blogger/queue', methods=['GET'])
+    def list_queue():
+        """
+        列出發布佇列中的工作
+
+        查詢參數：
+        - status: 只列出此狀態（scheduled / queued / running / retrying / published / failed / cancelled）
+        - blog_id: 只列出此部落格
+
+        回傳：
+        - success: 是否成功
+        - jobs: 工作列表（新的在前）
+        - by_status: 各狀態數量
+        """
+        try:
+            result = get_publish_queue().list_jobs(
+                status=request.args.get('status') or None,
+                blog_id=request.args.get('blog_id') or None
+            )
+            return jsonify({
+                "success": True,
+                **result
+            })
+
+        except Exception as e:
+            logger.error("列出發布佇列失敗: %s", e)
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 500
+
+    @blogger_bp.route('/blogger/queue/<job_id>', methods=['GET'])
+    def get_queue_job(job_id):
+        """
+        查詢發布工作狀態
+
+        回傳：
+        - success: 是否成功
+        - job: 工作狀態（status、attempts、next_attempt_at、post_url、error 等）
+        """
+        job = get_publish_queue().get_job(job_id)
+        if job is None:
+            return jsonify({
+                "success": False,
+                "error": f"發布工作不存在: {job_id}"
+            }), 404
+
+        return jsonify({
+            "success": True,
+            "job": job
+        })
+
+    @blogger_bp.route('/blogger/queue/<job_id>', methods=['DELETE'])
+    def cancel_queue_job(job_id):
+        """
+        取消尚未開始的發布工作
+
+        回傳：
+        - success: 是否成功
+        """
+        queue = get_publish_queue()
+        job = queue.get_job(job_id)
+        if job is None:
+            return jsonify({
+                "success": False,
+                "error": f"發布工作不存在: {job_id}"
+            }), 404
+
+        if not queue.cancel(job_id):
+            return jsonify({
+                "success": False,
+                "error": f"工作狀態為 {job['status']}，無法取消"
+            }), 409
+
+        return jsonify({
+            "success": True
+        })
 
     return blogger_bp
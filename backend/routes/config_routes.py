@@ -8,17 +8,15 @@
 """
 
 import logging
-from pathlib import Path
-import yaml
 from flask import Blueprint, request, jsonify
+from backend.utils.config_store import CONFIG_STORE
 from .utils import prepare_providers_for_response
 
 logger = logging.getLogger(__name__)
 
-# 設定檔路徑
-CONFIG_DIR = Path(__file__).parent.parent.parent
-IMAGE_CONFIG_PATH = CONFIG_DIR / 'image_providers.yaml'
-TEXT_CONFIG_PATH = CONFIG_DIR / 'text_providers.yaml'
+# 設定名稱（見 backend/utils/config_store.py）
+IMAGE_CONFIG = 'image_providers'
+TEXT_CONFIG = 'text_providers'
 
 
 def create_config_blueprint():
@@ -40,16 +38,10 @@ def create_config_blueprint():
         """
         try:
             # 讀取圖片生成設定
-            image_config = _read_config(IMAGE_CONFIG_PATH, {
-                'active_provider': 'google_genai',
-                'providers': {}
-            })
+            image_config = _read_config(IMAGE_CONFIG)
 
             # 讀取文字生成設定
-            text_config = _read_config(TEXT_CONFIG_PATH, {
-                'active_provider': 'google_gemini',
-                'providers': {}
-            })
+            text_config = _read_config(TEXT_CONFIG)
 
             return jsonify({
                 "success": True,
@@ -94,19 +86,18 @@ def create_config_blueprint():
             # 更新圖片生成設定
             if 'image_generation' in data:
                 _update_provider_config(
-                    IMAGE_CONFIG_PATH,
+                    IMAGE_CONFIG,
                     data['image_generation']
                 )
 
             # 更新文字生成設定
             if 'text_generation' in data:
                 _update_provider_config(
-                    TEXT_CONFIG_PATH,
+                    TEXT_CONFIG,
                     data['text_generation']
                 )
 
-            # 清除設定快取，確保下次使用時讀取新設定
-            _clear_config_cache()
+            # 寫入時已發布新版本的設定；服務在下次取得時依版本重建
 
             return jsonify({
                 "success": True,
@@ -171,30 +162,27 @@ def create_config_blueprint():
 
 # ==================== 輔助函數 ====================
 
-def _read_config(path: Path, default: dict) -> dict:
-    """讀取設定檔"""
-    if path.exists():
-        with open(path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f) or default
-    return default
+def _read_config(name: str) -> dict:
+    """讀取設定（目前快照的可修改副本）"""
+    return CONFIG_STORE.get(name).to_dict()
 
 
-def _write_config(path: Path, config: dict):
-    """寫入設定檔"""
-    with open(path, 'w', encoding='utf-8') as f:
-        yaml.dump(config, f, allow_unicode=True, default_flow_style=False)
+def _write_config(name: str, config: dict):
+    """寫入設定檔並發布新版本"""
+    CONFIG_STORE.write(name, config)
 
 
-def _update_provider_config(config_path: Path, new_data: dict):
+def _update_provider_config(config_name: str, new_data: dict):
     """
     更新服務商設定
 
     Args:
-        config_path: 設定檔路徑
+        config_name: 設定名稱
         new_data: 新的設定資料
     """
     # 讀取現有設定
-    existing_config = _read_config(config_path, {'providers': {}})
+    existing_config = _read_config(config_name)
+    existing_config.setdefault('providers', {})
 
     # 更新 active_provider
     if 'active_provider' in new_data:
@@ -220,22 +208,7 @@ def _update_provider_config(config_path: Path, new_data: dict):
         existing_config['providers'] = new_providers
 
     # 儲存設定
-    _write_config(config_path, existing_config)
-
-
-def _clear_config_cache():
-    """清除設定快取"""
-    try:
-        from backend.config import Config
-        Config._image_providers_config = None
-    except Exception:
-        pass
-
-    try:
-        from backend.services.image import reset_image_service
-        reset_image_service()
-    except Exception:
-        pass
+    _write_config(config_name, existing_config)
 
 
 def _load_provider_config(provider_type: str, provider_name: str, config: dict) -> dict:
@@ -250,25 +223,22 @@ def _load_provider_config(provider_type: str, provider_name: str, config: dict)
     Returns:
         dict: 合併後的設定
     """
-    # 確定設定檔路徑
+    # 確定設定名稱
     if provider_type in ['openai_compatible', 'google_gemini']:
-        config_path = TEXT_CONFIG_PATH
+        config_name = TEXT_CONFIG
     else:
-        config_path = IMAGE_CONFIG_PATH
+        config_name = IMAGE_CONFIG
 
-    if config_path.exists():
-        with open(config_path, 'r', encoding='utf-8') as f:
-            yaml_config = yaml.safe_load(f) or {}
-            providers = yaml_config.get('providers', {})
+    providers = CONFIG_STORE.get(config_name).get('providers', {})
 
-            if provider_name in providers:
-                saved = providers[provider_name]
-                config['api_key'] = saved.get('api_key')
+    if provider_name in providers:
+        saved = providers[provider_name]
+        config['api_key'] = saved.get('api_key')
 
-                if not config['base_url']:
-                    config['base_url'] = saved.get('base_url')
-                if not config['model']:
-                    config['model'] = saved.get('model')
+        if not config['base_url']:
+            config['base_url'] = saved.get('base_url')
+        if not config['model']:
+            config['model'] = saved.get('model')
 
     return config
 
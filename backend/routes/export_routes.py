@@ -1,11 +1,20 @@
 """匯出相關路由"""
 import logging
-from flask import Blueprint, request, jsonify, Response
+import os
+from flask import Blueprint, request, jsonify, Response, send_file
 from backend.services.export import get_export_service
+from backend.utils.file_serving import offload_enabled, offload_file
+from backend.utils.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
 
+def _bulk_export_service():
+    """批次匯出服務（第一次使用時才載入，thread pool 相關模組不影響啟動）"""
+    from backend.services.bulk_export import get_bulk_export_service
+    return get_bulk_export_service()
+
+
 def create_export_blueprint():
     """創建匯出路由藍圖"""
     export_bp = Blueprint('export', __name__)
@@ -41,12 +50,13 @@ def create_export_blueprint():
                 return jsonify({"error": "缺少 pages"}), 400
 
             service = get_export_service()
-            markdown_content = service.export_to_markdown(
-                task_id=task_id,
-                pages=pages,
-                include_images=include_images,
-                image_base_url=image_base_url
-            )
+            with start_span("export.markdown", trace_id=task_id, pages=len(pages)):
+                markdown_content = service.export_to_markdown(
+                    task_id=task_id,
+                    pages=pages,
+                    include_images=include_images,
+                    image_base_url=image_base_url
+                )
 
             return jsonify({
                 "success": True,
@@ -55,7 +65,7 @@ def create_export_blueprint():
             })
 
         except Exception as e:
-            logger.error(f"匯出 Markdown 失敗: {str(e)}")
+            logger.error("匯出 Markdown 失敗: %s", e)
             return jsonify({"error": f"匯出失敗: {str(e)}"}), 500
 
     @export_bp.route('/export/html', methods=['POST'])
@@ -91,13 +101,14 @@ def create_export_blueprint():
                 return jsonify({"error": "缺少 pages"}), 400
 
             service = get_export_service()
-            html_content = service.export_to_html(
-                task_id=task_id,
-                pages=pages,
-                include_images=include_images,
-                image_base_url=image_base_url,
-                include_style=include_style
-            )
+            with start_span("export.html", trace_id=task_id, pages=len(pages)):
+                html_content = service.export_to_html(
+                    task_id=task_id,
+                    pages=pages,
+                    include_images=include_images,
+                    image_base_url=image_base_url,
+                    include_style=include_style
+                )
 
             return jsonify({
                 "success": True,
@@ -106,7 +117,7 @@ def create_export_blueprint():
             })
 
         except Exception as e:
-            logger.error(f"匯出 HTML 失敗: {str(e)}")
+            logger.error("匯出 HTML 失敗: %s", e)
             return jsonify({"error": f"匯出失敗: {str(e)}"}), 500
 
     @export_bp.route('/export/download/markdown', methods=['POST'])
@@ -129,12 +140,13 @@ def create_export_blueprint():
                 return jsonify({"error": "缺少 task_id"}), 400
 
             service = get_export_service()
-            markdown_content = service.export_to_markdown(
-                task_id=task_id,
-                pages=pages,
-                include_images=include_images,
-                image_base_url=image_base_url
-            )
+            with start_span("export.markdown", trace_id=task_id, pages=len(pages)):
+                markdown_content = service.export_to_markdown(
+                    task_id=task_id,
+                    pages=pages,
+                    include_images=include_images,
+                    image_base_url=image_base_url
+                )
 
             return Response(
                 markdown_content,
@@ -145,7 +157,7 @@ def create_export_blueprint():
             )
 
         except Exception as e:
-            logger.error(f"下載 Markdown 失敗: {str(e)}")
+            logger.error("下載 Markdown 失敗: %s", e)
             return jsonify({"error": f"下載失敗: {str(e)}"}), 500
 
     @export_bp.route('/export/download/html', methods=['POST'])
@@ -169,26 +181,17 @@ def create_export_blueprint():
                 return jsonify({"error": "缺少 task_id"}), 400
 
             service = get_export_service()
-            html_content = service.export_to_html(
-                task_id=task_id,
-                pages=pages,
-                include_images=include_images,
-                image_base_url=image_base_url,
-                include_style=include_style
-            )
+            with start_span("export.html", trace_id=task_id, pages=len(pages)):
+                html_content = service.export_to_html(
+                    task_id=task_id,
+                    pages=pages,
+                    include_images=include_images,
+                    image_base_url=image_base_url,
+                    include_style=include_style
+                )
 
             # 包裝成完整的 HTML 文件
-            full_html = f"""<!DOCTYPE html>
-<html lang="zh-TW">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>部落格文章</title>
-</head>
-<body>
-{html_content}
-</body>
-</html>"""
+            full_html = service.build_html_document(html_content)
 
             return Response(
                 full_html,
@@ -199,7 +202,96 @@ def create_export_blueprint():
             )
 
         except Exception as e:
-            logger.error(f"下載 HTML 失敗: {str(e)}")
+            logger.error("下載 HTML 失敗: %s", e)
             return jsonify({"error": f"下載失敗: {str(e)}"}), 500
 
+    @export_bp.route('/export/bulk', methods=['POST'])
+    def submit_bulk_export():
+        """
+        提交批次匯出任務（多篇歷史記錄匯出為靜態網站目錄 / ZIP）
+
+        Request body:
+        {
+            "record_ids": ["記錄ID", ...],  # 可選，預設全部記錄
+            "status": "completed",  # 可選，只匯出該狀態的記錄
+            "formats": ["markdown", "html"],  # 可選，預設兩種
+            "image_mode": "copy",  # 可選，copy / link（硬連結）/ none
+            "output": "zip"  # 可選，directory / zip
+        }
+
+        回傳：
+        - success: 是否成功
+        - job_id: 匯出任務 ID（用 GET /export/bulk/<job_id> 查詢進度）
+        """
+        try:
+            data = request.get_json() or {}
+
+            job_id = _bulk_export_service().submit_export(
+                record_ids=data.get('record_ids'),
+                status=data.get('status'),
+                formats=data.get('formats'),
+                image_mode=data.get('image_mode', 'copy'),
+                output=data.get('output', 'zip')
+            )
+            job = _bulk_export_service().get_job(job_id)
+
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "total": job["total"]
+            }), 202
+
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        except Exception as e:
+            logger.error("提交批次匯出失敗: %s", e)
+            return jsonify({"success": False, "error": f"提交批次匯出失敗: {str(e)}"}), 500
+
+    @export_bp.route('/export/bulk', methods=['GET'])
+    def list_bulk_exports():
+        """列出批次匯出任務"""
+        return jsonify({
+            "success": True,
+            "jobs": _bulk_export_service().list_jobs()
+        }), 200
+
+    @export_bp.route('/export/bulk/<job_id>', methods=['GET'])
+    def get_bulk_export(job_id):
+        """
+        查詢批次匯出進度
+
+        回傳：
+        - success: 是否成功
+        - job: 任務狀態（total / done / failed / progress / errors / archive）
+        """
+        job = _bulk_export_service().get_job(job_id)
+        if job is None:
+            return jsonify({
+                "success": False,
+                "error": f"匯出任務不存在：{job_id}\n可能原因：任務ID錯誤或服務已重啟"
+            }), 404
+
+        return jsonify({"success": True, "job": job}), 200
+
+    @export_bp.route('/export/bulk/<job_id>/download', methods=['GET'])
+    def download_bulk_export(job_id):
+        """下載批次匯出的 ZIP"""
+        job = _bulk_export_service().get_job(job_id)
+        if job is None or job["status"] != "completed" or not job.get("archive"):
+            return jsonify({
+                "success": False,
+                "error": f"匯出任務尚未完成或未產生 ZIP：{job_id}"
+            }), 404
+
+        from backend.services.bulk_export import EXPORT_ROOT
+
+        archive = job["archive"]
+        download_name = f"{job_id}.zip"
+        if offload_enabled():
+            return offload_file(
+                archive, os.path.dirname(EXPORT_ROOT), 'history', 'application/zip',
+                download_name=download_name
+            )
+        return send_file(archive, mimetype='application/zip', as_attachment=True, download_name=download_name)
+
     return export_bp
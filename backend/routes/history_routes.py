@@ -10,11 +10,13 @@
 """
 
 import os
-import io
+import hashlib
+import threading
 import zipfile
 import logging
 from flask import Blueprint, request, jsonify, send_file
 from backend.services.history import get_history_service
+from backend.utils.file_serving import offload_enabled, offload_file
 
 logger = logging.getLogger(__name__)
 
@@ -379,16 +381,22 @@ def create_history_blueprint():
                     "error": f"任务目录不存在：{task_id}"
                 }), 404
 
-            # 创建内存中的 ZIP 文件
-            zip_buffer = _create_images_zip(task_dir)
+            # 取得（或建立）磁盘上的 ZIP 文件
+            zip_path = _create_images_zip(task_dir, history_service.history_dir)
 
             # 生成安全的下载文件名
             title = record.get('title', 'images')
             safe_title = _sanitize_filename(title)
             filename = f"{safe_title}.zip"
 
+            if offload_enabled():
+                return offload_file(
+                    zip_path, history_service.history_dir, 'history', 'application/zip',
+                    download_name=filename
+                )
+
             return send_file(
-                zip_buffer,
+                zip_path,
                 mimetype='application/zip',
                 as_attachment=True,
                 download_name=filename
@@ -404,40 +412,63 @@ def create_history_blueprint():
     return history_bp
 
 
-def _create_images_zip(task_dir: str) -> io.BytesIO:
+def _create_images_zip(task_dir: str, history_dir: str) -> str:
     """
     创建包含所有图片的 ZIP 文件
 
+    ZIP 保存在 history/.cache/zips 下，文件名带图片列表（名称、大小、修改时间）的签名；
+    图片未变时直接复用，图片重新生成后会建立新文件并删除旧的。
+
     Args:
         task_dir: 任务目录路径
+        history_dir: history 根目录
 
     Returns:
-        io.BytesIO: 内存中的 ZIP 文件
+        ZIP 文件路径
     """
-    memory_file = io.BytesIO()
-
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        # 遍历任务目录中的所有图片（排除缩略图）
-        for filename in os.listdir(task_dir):
-            # 跳过缩略图文件
-            if filename.startswith('thumb_'):
-                continue
-
-            if filename.endswith(('.png', '.jpg', '.jpeg')):
-                file_path = os.path.join(task_dir, filename)
-
-                # 生成归档文件名（page_N.png 格式）
-                try:
-                    index = int(filename.split('.')[0])
-                    archive_name = f"page_{index + 1}.png"
-                except ValueError:
-                    archive_name = filename
-
-                zf.write(file_path, archive_name)
-
-    # 将指针移到开始位置
-    memory_file.seek(0)
-    return memory_file
+    # 遍历任务目录中的所有图片（排除缩略图）
+    entries = []
+    for filename in sorted(os.listdir(task_dir)):
+        # 跳过缩略图文件
+        if filename.startswith('thumb_'):
+            continue
+
+        if filename.endswith(('.png', '.jpg', '.jpeg')):
+            st = os.stat(os.path.join(task_dir, filename))
+            entries.append((filename, st.st_size, st.st_mtime_ns))
+
+    task_id = os.path.basename(os.path.normpath(task_dir))
+    signature = hashlib.sha1(repr(entries).encode('utf-8')).hexdigest()[:16]
+    cache_dir = os.path.join(history_dir, '.cache', 'zips')
+    zip_path = os.path.join(cache_dir, f"{task_id}-{signature}.zip")
+    if os.path.exists(zip_path):
+        return zip_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{zip_path}.{os.getpid()}.{threading.get_ident()}.part"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for filename, _, _ in entries:
+            file_path = os.path.join(task_dir, filename)
+
+            # 生成归档文件名（page_N.png 格式）
+            try:
+                index = int(filename.split('.')[0])
+                archive_name = f"page_{index + 1}.png"
+            except ValueError:
+                archive_name = filename
+
+            zf.write(file_path, archive_name)
+    os.replace(tmp_path, zip_path)
+
+    # 删除同一任务的旧 ZIP
+    for name in os.listdir(cache_dir):
+        if name.startswith(f"{task_id}-") and name.endswith('.zip') and name != os.path.basename(zip_path):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+    return zip_path
 
 
 def _sanitize_filename(title: str) -> str:
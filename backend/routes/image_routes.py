@@ -3,6 +3,7 @@
 
 包含功能：
 - 批量生成图片（SSE 流式返回）
+- 上传参考图片（上传一次，之后用内容哈希引用）
 - 获取图片
 - 重试/重新生成单张图片
 - 批量重试失败图片
@@ -14,7 +15,14 @@ import json
 import base64
 import logging
 from flask import Blueprint, request, jsonify, Response, send_file
+from werkzeug.security import safe_join
+from backend.config import Config
 from backend.services.image import get_image_service
+from backend.services.reference_images import REFERENCE_STORE, ReferenceImageNotFound, ReferenceImageTooLarge
+from backend.utils.file_serving import file_mimetype, finalize_offload, offload_enabled, offload_file
+from backend.utils.image_serving import FILE_INFO_CACHE, THUMBNAIL_CACHE
+from backend.utils.metrics import observe_stage
+from backend.utils.renditions import select_rendition
 from .utils import log_request, log_error
 
 logger = logging.getLogger(__name__)
@@ -37,6 +45,7 @@ def create_image_blueprint():
         - full_outline: 完整大纲文本
         - user_topic: 用户原始输入主题
         - user_images: base64 编码的用户参考图片列表
+        - reference_images: 已上传参考图片的 handle 列表（见 POST /references，优先使用）
 
         返回：
         SSE 事件流，包含以下事件类型：
@@ -52,8 +61,9 @@ def create_image_blueprint():
             user_topic = data.get('user_topic', '')
             image_style = data.get('image_style', 'flat')
 
-            # 解析 base64 格式的用户参考图片
+            # 解析 base64 格式的用户参考图片，以及已上传参考图片的 handle
             user_images = _parse_base64_images(data.get('user_images', []))
+            user_images += REFERENCE_STORE.resolve(data.get('reference_images', []))
 
             log_request('/generate', {
                 'pages_count': len(pages) if pages else 0,
@@ -70,7 +80,7 @@ def create_image_blueprint():
                     "error": "参数错误：pages 不能为空。\n请提供要生成的页面列表数据。"
                 }), 400
 
-            logger.info(f"🖼️  开始图片生成任务: {task_id}, 共 {len(pages)} 页, 風格: {image_style}")
+            logger.info("🖼️  开始图片生成任务: %s, 共 %s 页, 風格: %s", task_id, len(pages), image_style)
             image_service = get_image_service()
 
             def generate():
@@ -84,9 +94,10 @@ def create_image_blueprint():
                     event_type = event["event"]
                     event_data = event["data"]
 
-                    # 格式化为 SSE 格式
-                    yield f"event: {event_type}\n"
-                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+                    # 格式化为 SSE 格式（计时包含写回客户端）
+                    with observe_stage('sse_emit', provider=image_service.provider_name):
+                        yield f"event: {event_type}\n"
+                        yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
 
             return Response(
                 generate(),
@@ -97,6 +108,9 @@ def create_image_blueprint():
                 }
             )
 
+        except ReferenceImageNotFound as e:
+            return _reference_not_found(e)
+
         except Exception as e:
             log_error('/generate', e)
             error_msg = str(e)
@@ -105,6 +119,76 @@ def create_image_blueprint():
                 "error": f"图片生成异常。\n错误详情: {error_msg}\n建议：检查图片生成服务配置和后端日志"
             }), 500
 
+    # ==================== 参考图片 ====================
+
+    @image_bp.route('/references', methods=['POST'])
+    def upload_reference_images():
+        """
+        上传用户参考图片（上传一次，之后在请求中用 handle 引用）
+
+        请求体（multipart/form-data）：
+        - images: 图片文件（可多个）
+
+        返回：
+        - success: 是否成功
+        - references: 每张图片的 handle（内容 SHA-256）、size、stored_size、existing
+        """
+        try:
+            files = [f for f in request.files.getlist('images') if f and f.filename]
+            if not files:
+                return jsonify({
+                    "success": False,
+                    "error": "参数错误：请以 multipart/form-data 的 images 字段上传图片文件。"
+                }), 400
+
+            references = [REFERENCE_STORE.save(f.stream) for f in files]
+            logger.info("📎 参考图片已上传: %s 张", len(references))
+            return jsonify({
+                "success": True,
+                "references": references
+            }), 200
+
+        except ReferenceImageTooLarge as e:
+            return jsonify({
+                "success": False,
+                "error": f"参考图片过大。\n错误详情: {e}"
+            }), 413
+
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": f"参考图片上传失败。\n错误详情: {e}"
+            }), 400
+
+        except Exception as e:
+            log_error('/references', e)
+            return jsonify({
+                "success": False,
+                "error": f"参考图片上传失败。\n错误详情: {str(e)}"
+            }), 500
+
+    @image_bp.route('/references/<handle>', methods=['GET'])
+    def check_reference_image(handle):
+        """
+        检查参考图片是否已存在（上传前先检查，已存在就不必再上传）
+
+        路径参数：
+        - handle: 图片内容的 SHA-256（十六进制）
+
+        返回：
+        - success: 是否存在
+        - handle: 图片 handle
+        """
+        if not REFERENCE_STORE.exists(handle):
+            return jsonify({
+                "success": False,
+                "error": "参考图片不存在或已过期，请重新上传。"
+            }), 404
+        return jsonify({
+            "success": True,
+            "handle": handle
+        }), 200
+
     # ==================== 图片获取 ====================
 
     @image_bp.route('/images/<task_id>/<filename>', methods=['GET'])
@@ -118,41 +202,56 @@ def create_image_blueprint():
 
         查询参数：
         - thumbnail: 是否返回缩略图（默认 true）
+        - w: 需要的宽度（像素），返回不小于此宽度的最小 WebP 版本；
+             没有合适版本时返回原图（带 w 时忽略 thumbnail）
+        - v / t: 版本参数（带上时视为内容不变的 URL，返回 Cache-Control: immutable）
+
+        缓存：
+        - ETag 为内容哈希，支持 If-None-Match（304）
+        - 支持 Range 请求（206）
+        - 未带版本参数时返回 no-cache（同一 URL 重新生成后内容会变，需要每次验证 ETag）
 
         返回：
         - 成功：图片文件
         - 失败：JSON 错误信息
         """
         try:
-            logger.debug(f"获取图片: {task_id}/{filename}")
+            logger.debug("获取图片: %s/%s", task_id, filename)
 
             # 检查是否请求缩略图
             thumbnail = request.args.get('thumbnail', 'true').lower() == 'true'
+            versioned = bool(request.args.get('v') or request.args.get('t'))
+
+            history_root = _history_root()
+
+            # 按宽度选择 WebP 版本
+            requested_width = request.args.get('w', type=int)
+            if requested_width and requested_width > 0:
+                thumbnail = False
+                source_path = safe_join(history_root, task_id, filename)
+                if source_path is not None:
+                    selected = select_rendition(
+                        *os.path.split(source_path), requested_width, Config.IMAGE_RENDITION_WIDTHS
+                    )
+                    if selected is not None:
+                        return _send_image(*selected, False, versioned)
+
+            # 缩略图优先，不存在时返回原图
+            candidates = [f"thumb_{filename}", filename] if thumbnail else [filename]
+            for candidate in candidates:
+                filepath = safe_join(history_root, task_id, candidate)
+                if filepath is None:
+                    break
+                try:
+                    st = os.stat(filepath)
+                except FileNotFoundError:
+                    continue
+                return _send_image(filepath, st, candidate != filename, versioned)
 
-            # 构建 history 目录路径
-            history_root = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-                "history"
-            )
-
-            if thumbnail:
-                # 尝试返回缩略图
-                thumb_filename = f"thumb_{filename}"
-                thumb_filepath = os.path.join(history_root, task_id, thumb_filename)
-
-                if os.path.exists(thumb_filepath):
-                    return send_file(thumb_filepath, mimetype='image/png')
-
-            # 返回原图
-            filepath = os.path.join(history_root, task_id, filename)
-
-            if not os.path.exists(filepath):
-                return jsonify({
-                    "success": False,
-                    "error": f"图片不存在：{task_id}/{filename}"
-                }), 404
-
-            return send_file(filepath, mimetype='image/png')
+            return jsonify({
+                "success": False,
+                "error": f"图片不存在：{task_id}/{filename}"
+            }), 404
 
         except Exception as e:
             log_error('/images', e)
@@ -173,6 +272,7 @@ def create_image_blueprint():
         - task_id: 任务 ID（必填）
         - page: 页面信息（必填）
         - use_reference: 是否使用参考图（默认 true）
+        - reference_images: 用户参考图片的 handle 列表（任务状态已不存在时使用）
 
         返回：
         - success: 是否成功
@@ -183,6 +283,7 @@ def create_image_blueprint():
             task_id = data.get('task_id')
             page = data.get('page')
             use_reference = data.get('use_reference', True)
+            user_images = REFERENCE_STORE.resolve(data.get('reference_images', []))
 
             log_request('/retry', {
                 'task_id': task_id,
@@ -196,17 +297,23 @@ def create_image_blueprint():
                     "error": "参数错误：task_id 和 page 不能为空。\n请提供任务ID和页面信息。"
                 }), 400
 
-            logger.info(f"🔄 重试生成图片: task={task_id}, page={page.get('index')}")
+            logger.info("🔄 重试生成图片: task=%s, page=%s", task_id, page.get('index'))
             image_service = get_image_service()
-            result = image_service.retry_single_image(task_id, page, use_reference)
+            result = image_service.retry_single_image(
+                task_id, page, use_reference,
+                user_images=user_images or None
+            )
 
             if result["success"]:
-                logger.info(f"✅ 图片重试成功: {result.get('image_url')}")
+                logger.info("✅ 图片重试成功: %s", result.get('image_url'))
             else:
-                logger.error(f"❌ 图片重试失败: {result.get('error')}")
+                logger.error("❌ 图片重试失败: %s", result.get('error'))
 
             return jsonify(result), 200 if result["success"] else 500
 
+        except ReferenceImageNotFound as e:
+            return _reference_not_found(e)
+
         except Exception as e:
             log_error('/retry', e)
             error_msg = str(e)
@@ -244,7 +351,7 @@ def create_image_blueprint():
                     "error": "参数错误：task_id 和 pages 不能为空。\n请提供任务ID和要重试的页面列表。"
                 }), 400
 
-            logger.info(f"🔄 批量重试失败图片: task={task_id}, 共 {len(pages)} 页")
+            logger.info("🔄 批量重试失败图片: task=%s, 共 %s 页", task_id, len(pages))
             image_service = get_image_service()
 
             def generate():
@@ -253,8 +360,9 @@ def create_image_blueprint():
                     event_type = event["event"]
                     event_data = event["data"]
 
-                    yield f"event: {event_type}\n"
-                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
+                    with observe_stage('sse_emit', provider=image_service.provider_name):
+                        yield f"event: {event_type}\n"
+                        yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
 
             return Response(
                 generate(),
@@ -284,6 +392,7 @@ def create_image_blueprint():
         - use_reference: 是否使用参考图（默认 true）
         - full_outline: 完整大纲文本（用于上下文）
         - user_topic: 用户原始输入主题
+        - reference_images: 用户参考图片的 handle 列表（任务状态已不存在时使用）
 
         返回：
         - success: 是否成功
@@ -296,6 +405,7 @@ def create_image_blueprint():
             use_reference = data.get('use_reference', True)
             full_outline = data.get('full_outline', '')
             user_topic = data.get('user_topic', '')
+            user_images = REFERENCE_STORE.resolve(data.get('reference_images', []))
 
             log_request('/regenerate', {
                 'task_id': task_id,
@@ -309,21 +419,25 @@ def create_image_blueprint():
                     "error": "参数错误：task_id 和 page 不能为空。\n请提供任务ID和页面信息。"
                 }), 400
 
-            logger.info(f"🔄 重新生成图片: task={task_id}, page={page.get('index')}")
+            logger.info("🔄 重新生成图片: task=%s, page=%s", task_id, page.get('index'))
             image_service = get_image_service()
             result = image_service.regenerate_image(
                 task_id, page, use_reference,
                 full_outline=full_outline,
-                user_topic=user_topic
+                user_topic=user_topic,
+                user_images=user_images or None
             )
 
             if result["success"]:
-                logger.info(f"✅ 图片重新生成成功: {result.get('image_url')}")
+                logger.info("✅ 图片重新生成成功: %s", result.get('image_url'))
             else:
-                logger.error(f"❌ 图片重新生成失败: {result.get('error')}")
+                logger.error("❌ 图片重新生成失败: %s", result.get('error'))
 
             return jsonify(result), 200 if result["success"] else 500
 
+        except ReferenceImageNotFound as e:
+            return _reference_not_found(e)
+
         except Exception as e:
             log_error('/regenerate', e)
             error_msg = str(e)
@@ -348,6 +462,7 @@ def create_image_blueprint():
           - generated: 已生成的图片
           - failed: 失败的图片
           - has_cover: 是否有封面图
+          - prompt_stats: 提示词大小统计（发送 / 压缩节省的字符数）
         """
         try:
             image_service = get_image_service()
@@ -363,7 +478,8 @@ def create_image_blueprint():
             safe_state = {
                 "generated": state.get("generated", {}),
                 "failed": state.get("failed", {}),
-                "has_cover": state.get("cover_image") is not None
+                "has_cover": state.get("cover_image") is not None,
+                "prompt_stats": state.get("prompt_stats")
             }
 
             return jsonify({
@@ -420,3 +536,63 @@ def _parse_base64_images(images_base64: list) -> list:
         images.append(base64.b64decode(img_b64))
 
     return images
+
+
+def _reference_not_found(error: ReferenceImageNotFound):
+    """参考图片 handle 不存在或已过期的错误响应"""
+    logger.warning("参考图片不可用: %s", error)
+    return jsonify({
+        "success": False,
+        "error": f"参考图片不存在或已过期，请重新上传。\n错误详情: {error}",
+        "missing_reference": True
+    }), 404
+
+
+def _history_root() -> str:
+    """history 目录路径"""
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "history")
+
+
+def _send_image(filepath: str, st, is_thumbnail: bool, versioned: bool) -> Response:
+    """
+    输出图片（ETag + 条件请求 + Range）
+
+    启用 STATIC_OFFLOAD 时只返回传输头，由 Web 服务器发送文件并处理 Range / 条件请求
+    （不计算内容哈希，也不读入缩略图快取）。
+
+    Args:
+        filepath: 文件路径
+        st: os.stat 结果
+        is_thumbnail: 是否为缩略图（缩略图走内存快取）
+        versioned: URL 是否带版本参数
+    """
+    cached = None
+    if is_thumbnail and not offload_enabled():
+        cached = THUMBNAIL_CACHE.get(filepath, st) or THUMBNAIL_CACHE.load(filepath, st)
+
+    if offload_enabled():
+        response = offload_file(filepath, _history_root(), 'history', file_mimetype(filepath))
+        response = finalize_offload(response.make_conditional(request))
+    elif cached is not None:
+        response = Response(cached.data, mimetype=cached.mimetype)
+        response.set_etag(cached.etag)
+        response.last_modified = st.st_mtime
+        response = response.make_conditional(request, accept_ranges=True, complete_length=len(cached.data))
+    else:
+        info = FILE_INFO_CACHE.get(filepath, st)
+        response = send_file(
+            filepath,
+            mimetype=info.mimetype,
+            etag=info.etag,
+            last_modified=st.st_mtime,
+            conditional=True
+        )
+
+    if versioned:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,32 @@
+"""
+指标相关 API 路由
+
+包含功能：
+- 以 Prometheus 文本格式输出各阶段耗时、重试、限流与快取命中指标
+"""
+
+import logging
+from flask import Blueprint, Response
+from backend.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+def create_metrics_blueprint():
+    """创建指标路由蓝图（工厂函数，支持多次调用）"""
+    metrics_bp = Blueprint('metrics', __name__)
+
+    @metrics_bp.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """
+        取得指标（Prometheus 文本格式）
+
+        返回：
+        - text/plain; version=0.0.4 格式的指标文本
+        """
+        return Response(
+            REGISTRY.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+    return metrics_bp
@@ -10,6 +10,8 @@ import base64
 import logging
 from flask import Blueprint, request, jsonify
 from backend.services.outline import get_outline_service
+from backend.services.reference_images import REFERENCE_STORE, ReferenceImageNotFound
+from backend.utils.tracing import start_span, new_trace_id
 from .utils import log_request, log_error
 
 logger = logging.getLogger(__name__)
@@ -28,15 +30,20 @@ def create_outline_blueprint():
         1. multipart/form-data（带图片文件）
            - topic: 主题文本
            - images: 图片文件列表
+           - reference_images: 已上传参考图片的 handle（可多个）
 
         2. application/json（无图片或 base64 图片）
            - topic: 主题文本
            - images: base64 编码的图片数组（可选）
+           - reference_images: 已上传参考图片的 handle 列表（可选，见 POST /references）
+
+        可选请求头 X-Trace-Id：指定追踪 ID（不提供时自动生成）
 
         返回：
         - success: 是否成功
         - outline: 原始大纲文本
         - pages: 解析后的页面列表
+        - trace_id: 追踪 ID（可用 /api/tasks/<trace_id>/trace 查看各阶段耗时）
         """
         start_time = time.time()
 
@@ -55,19 +62,32 @@ def create_outline_blueprint():
                 }), 400
 
             # 调用大纲生成服务
-            logger.info(f"🔄 开始生成大纲，主题: {topic[:50]}...，風格: {text_style}")
+            logger.info("🔄 开始生成大纲，主题: %s...，風格: %s", topic[:50], text_style)
             outline_service = get_outline_service()
-            result = outline_service.generate_outline(topic, images if images else None, text_style)
+            trace_id = request.headers.get('X-Trace-Id') or new_trace_id()
+            with start_span("outline.generate", trace_id=trace_id, text_style=text_style) as span:
+                result = outline_service.generate_outline(topic, images if images else None, text_style)
+                if not result["success"]:
+                    span.set_error(result.get('error', '未知错误'))
+            result["trace_id"] = trace_id
 
             # 记录结果
             elapsed = time.time() - start_time
             if result["success"]:
-                logger.info(f"✅ 大纲生成成功，耗时 {elapsed:.2f}s，共 {len(result.get('pages', []))} 页")
+                logger.info("✅ 大纲生成成功，耗时 %.2fs，共 %s 页", elapsed, len(result.get('pages', [])))
                 return jsonify(result), 200
             else:
-                logger.error(f"❌ 大纲生成失败: {result.get('error', '未知错误')}")
+                logger.error("❌ 大纲生成失败: %s", result.get('error', '未知错误'))
                 return jsonify(result), 500
 
+        except ReferenceImageNotFound as e:
+            logger.warning("参考图片不可用: %s", e)
+            return jsonify({
+                "success": False,
+                "error": f"参考图片不存在或已过期，请重新上传。\n错误详情: {e}",
+                "missing_reference": True
+            }), 404
+
         except Exception as e:
             log_error('/outline', e)
             error_msg = str(e)
@@ -104,6 +124,7 @@ def _parse_outline_request():
                     image_data = file.read()
                     images.append(image_data)
 
+        images += REFERENCE_STORE.resolve(request.form.getlist('reference_images'))
         return topic, images, text_style
 
     # JSON 请求（无图片或 base64 图片）
@@ -121,4 +142,7 @@ def _parse_outline_request():
                 img_b64 = img_b64.split(',')[1]
             images.append(base64.b64decode(img_b64))
 
+    # 已上传的参考图片（只传 handle）
+    images += REFERENCE_STORE.resolve(data.get('reference_images', []))
+
     return topic, images, text_style
@@ -0,0 +1,48 @@
+"""
+追踪相关 API 路由
+
+包含功能：
+- 查看单个任务的追踪（大纲 → 图片 → 导出 → 发布各阶段 span）
+"""
+
+import logging
+from flask import Blueprint, jsonify
+from backend.utils.tracing import get_tracer, build_span_tree, summarize_spans
+
+logger = logging.getLogger(__name__)
+
+
+def create_trace_blueprint():
+    """创建追踪路由蓝图（工厂函数，支持多次调用）"""
+    trace_bp = Blueprint('trace', __name__)
+
+    @trace_bp.route('/tasks/<task_id>/trace', methods=['GET'])
+    def get_task_trace(task_id):
+        """
+        取得任务的追踪记录
+
+        路径参数：
+        - task_id: 任务 ID（或大纲请求返回的 trace_id）
+
+        返回：
+        - success: 是否成功
+        - trace_id: 追踪 ID
+        - summary: 按 span 名称汇总的耗时（次数、总耗时、最大耗时、错误数）
+        - spans: span 树（按开始时间排序，children 为子 span）
+        """
+        spans = get_tracer().get_spans(task_id)
+
+        if not spans:
+            return jsonify({
+                "success": False,
+                "error": f"追踪记录不存在：{task_id}\n可能原因：任务ID错误，或服务已重启且未设定 TRACE_EXPORT_FILE"
+            }), 404
+
+        return jsonify({
+            "success": True,
+            "trace_id": task_id,
+            "summary": summarize_spans(spans),
+            "spans": build_span_tree(spans)
+        }), 200
+
+    return trace_bp
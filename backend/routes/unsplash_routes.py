@@ -2,40 +2,129 @@
 Unsplash 圖庫搜尋 API 路由
 
 當 AI 圖片生成失敗時，提供 Unsplash 免費圖庫作為備用選項
+
+- 搜尋結果依 (關鍵字, 方向, 每頁數量) 快取（TTL + LRU），重複搜尋不再呼叫 API
+- 下載圖片串流寫入磁碟（有大小上限），縮圖與 WebP 版本在背景產生
 """
 
+import contextvars
 import logging
+import os
+import threading
+import time
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 from flask import Blueprint, request, jsonify
-import yaml
+from werkzeug.security import safe_join
+from backend.config import Config
+from backend.utils.config_store import CONFIG_STORE
+from backend.utils.image_compressor import compress_image_file
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
+from backend.utils.renditions import generate_renditions, list_renditions
+from backend.utils.streaming import download_to_file, write_bytes_atomic
 
 logger = logging.getLogger(__name__)
 
-# 設定檔路徑
-CONFIG_PATH = Path(__file__).parent.parent.parent / 'upload_config.yaml'
+HISTORY_ROOT = str(Path(__file__).parent.parent.parent / 'history')
+
+# 縮圖與下載計數在背景執行，不佔用 HTTP 請求
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="unsplash")
+
+
+class _SearchCache:
+    """搜尋結果快取（過期時間 + LRU 淘汰）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc(cache='unsplash_search')
+                return entry[1]
+            self._entries.pop(key, None)
+        CACHE_MISSES.inc(cache='unsplash_search')
+        return None
+
+    def set(self, key: Tuple, value: Dict[str, Any]):
+        if Config.UNSPLASH_SEARCH_CACHE_TTL <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + Config.UNSPLASH_SEARCH_CACHE_TTL, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > Config.UNSPLASH_SEARCH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+
+_search_cache = _SearchCache()
+
+
+def _search_cache_key(query: str, orientation: str, per_page) -> Tuple:
+    """快取鍵：關鍵字忽略大小寫與多餘空白"""
+    return (' '.join(query.lower().split()), orientation, int(per_page))
+
+
+def _trigger_download(photo_id: str, api_key: str):
+    """觸發 Unsplash 下載計數（遵守 API 規範，失敗不影響主流程）"""
+    try:
+        requests.get(
+            f'https://api.unsplash.com/photos/{photo_id}/download',
+            headers={'Authorization': f'Client-ID {api_key}'},
+            timeout=5
+        )
+    except Exception as e:
+        logger.debug("觸發 Unsplash 下載計數失敗: %s", e)
+
+
+def _generate_derivatives(filepath: str):
+    """產生縮圖與 WebP 版本（背景執行）"""
+    task_dir, filename = os.path.split(filepath)
+    try:
+        thumbnail_data = compress_image_file(filepath, max_size_kb=50)
+        write_bytes_atomic(thumbnail_data, os.path.join(task_dir, f'thumb_{filename}'))
+    except Exception as e:
+        logger.warning("產生縮圖失敗: %s: %s", filename, e)
+
+    if Config.IMAGE_RENDITION_WIDTHS:
+        try:
+            generate_renditions(filepath, Config.IMAGE_RENDITION_WIDTHS, Config.IMAGE_RENDITION_QUALITY)
+        except Exception as e:
+            logger.warning("產生 WebP 版本失敗: %s: %s", filename, e)
+
+
+def _remove_derivatives(task_dir: str, filename: str):
+    """替換圖片前移除舊的縮圖與 WebP 版本（新的產生前改用原圖）"""
+    names = [f'thumb_{filename}']
+    names += [name for _, name in list_renditions(task_dir, filename, Config.IMAGE_RENDITION_WIDTHS)]
+    for name in names:
+        try:
+            os.remove(os.path.join(task_dir, name))
+        except FileNotFoundError:
+            pass
 
 
 def _load_config() -> dict:
-    """載入設定"""
-    if not CONFIG_PATH.exists():
-        return {}
+    """載入設定（目前快照的可修改副本）"""
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f) or {}
+        return CONFIG_STORE.get('upload').to_dict()
     except Exception as e:
-        logger.error(f"載入設定失敗: {e}")
+        logger.error("載入設定失敗: %s", e)
         return {}
 
 
 def _save_config(config: dict) -> bool:
     """儲存設定"""
     try:
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            yaml.dump(config, f, allow_unicode=True)
+        CONFIG_STORE.write('upload', config)
         return True
     except Exception as e:
-        logger.error(f"儲存設定失敗: {e}")
+        logger.error("儲存設定失敗: %s", e)
         return False
 
 
@@ -103,6 +192,7 @@ def create_unsplash_blueprint():
         回傳：
         - success: 是否成功
         - photos: 圖片列表
+        - cached: 是否為快取的結果
         """
         config = _load_config()
         api_key = config.get('unsplash', {}).get('api_key', '')
@@ -124,6 +214,11 @@ def create_unsplash_blueprint():
                 'error': '請提供搜尋關鍵字'
             }), 400
 
+        cache_key = _search_cache_key(query, orientation, per_page)
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(dict(cached, success=True, cached=True))
+
         try:
             response = requests.get(
                 'https://api.unsplash.com/search/photos',
@@ -165,10 +260,13 @@ def create_unsplash_blueprint():
                     'photographer_url': photo['user']['links']['html']
                 })
 
+            _search_cache.set(cache_key, {'photos': photos, 'total': result.get('total', 0)})
+
             return jsonify({
                 'success': True,
                 'photos': photos,
-                'total': result.get('total', 0)
+                'total': result.get('total', 0),
+                'cached': False
             })
 
         except requests.exceptions.Timeout:
@@ -177,7 +275,7 @@ def create_unsplash_blueprint():
                 'error': '搜尋超時，請重試'
             }), 504
         except Exception as e:
-            logger.error(f"Unsplash 搜尋錯誤: {e}")
+            logger.error("Unsplash 搜尋錯誤: %s", e)
             return jsonify({
                 'success': False,
                 'error': f'搜尋失敗: {str(e)}'
@@ -213,47 +311,44 @@ def create_unsplash_blueprint():
                 'error': '缺少必要參數'
             }), 400
 
+        filename = f'{index}.png'
+        filepath = safe_join(HISTORY_ROOT, task_id, filename)
+        if filepath is None:
+            return jsonify({
+                'success': False,
+                'error': '任務 ID 或圖片索引不合法'
+            }), 400
+        task_dir = os.path.dirname(filepath)
+
         try:
-            # 觸發 Unsplash 下載計數（遵守 API 規範）
+            # 觸發 Unsplash 下載計數（遵守 API 規範，背景執行）
             if photo_id and api_key:
-                try:
-                    requests.get(
-                        f'https://api.unsplash.com/photos/{photo_id}/download',
-                        headers={'Authorization': f'Client-ID {api_key}'},
-                        timeout=5
-                    )
-                except:
-                    pass  # 失敗不影響主流程
-
-            # 下載圖片
-            response = requests.get(photo_url, timeout=30)
+                _background.submit(_trigger_download, photo_id, api_key)
+
+            # 串流下載到暫存檔，不把整張圖片讀進記憶體
+            response = requests.get(photo_url, timeout=30, stream=True)
             if response.status_code != 200:
+                response.close()
                 return jsonify({
                     'success': False,
                     'error': f'下載圖片失敗: HTTP {response.status_code}'
                 }), 500
 
-            # 儲存到任務目錄
-            history_root = Path(__file__).parent.parent.parent / 'history'
-            task_dir = history_root / task_id
-            task_dir.mkdir(parents=True, exist_ok=True)
-
-            filename = f'{index}.png'
-            filepath = task_dir / filename
+            try:
+                image = download_to_file(response, max_bytes=Config.UNSPLASH_DOWNLOAD_MAX_BYTES)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'下載圖片失敗: {e}'
+                }), 413
 
-            # 儲存原圖
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+            # 儲存到任務目錄（原子改名）
+            os.makedirs(task_dir, exist_ok=True)
+            _remove_derivatives(task_dir, filename)
+            image.save_to(filepath)
 
-            # 產生縮圖
-            try:
-                from backend.utils.image_compressor import compress_image
-                thumbnail_data = compress_image(response.content, max_size_kb=50)
-                thumbnail_path = task_dir / f'thumb_{filename}'
-                with open(thumbnail_path, 'wb') as f:
-                    f.write(thumbnail_data)
-            except Exception as e:
-                logger.warning(f"產生縮圖失敗: {e}")
+            # 縮圖與 WebP 版本在背景產生（產生前圖片介面會返回原圖）
+            _background.submit(contextvars.copy_context().run, _generate_derivatives, filepath)
 
             return jsonify({
                 'success': True,
@@ -266,7 +361,7 @@ def create_unsplash_blueprint():
                 'error': '下載超時，請重試'
             }), 504
         except Exception as e:
-            logger.error(f"下載 Unsplash 圖片錯誤: {e}")
+            logger.error("下載 Unsplash 圖片錯誤: %s", e)
             return jsonify({
                 'success': False,
                 'error': f'下載失敗: {str(e)}'
@@ -3,46 +3,99 @@
 
 包含功能：
 - 上傳圖片到 ImgBB
+- 批量並行上傳到 ImgBB（可用 SSE 逐張返回結果）
 - 取得 ImgBB 配置狀態
 """
 
 import os
-import base64
+import json
 import logging
 import requests
 from pathlib import Path
-from flask import Blueprint, request, jsonify
-import yaml
+from flask import Blueprint, request, jsonify, Response
+from werkzeug.security import safe_join
+from backend.services.image_hosting import StreamingMultipartBody, get_uploader
+from backend.utils.config_store import CONFIG_STORE
+from backend.utils.file_serving import file_mimetype
+from backend.utils.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
+IMGBB_API_URL = 'https://api.imgbb.com/1/upload'
+IMGBB_HOST = 'imgbb.com'
+
+HISTORY_ROOT = str(Path(__file__).parent.parent.parent / 'history')
+
+
+def _imgbb_upload_file(api_key: str, image_path: str) -> dict:
+    """
+    從磁碟串流上傳單一圖片到 ImgBB（失敗時拋出例外，由上傳器重試）
+
+    Args:
+        api_key: ImgBB API Key
+        image_path: 圖片檔案路徑
+
+    Returns:
+        包含 url、display_url、delete_url、thumb_url 的 dict
+    """
+    body = StreamingMultipartBody({'key': api_key}, 'image', image_path, file_mimetype(image_path))
+    try:
+        with start_span("publish.imgbb_upload", filename=os.path.basename(image_path)):
+            response = requests.post(
+                IMGBB_API_URL,
+                data=body,
+                headers={'Content-Type': body.content_type},
+                timeout=60
+            )
+    finally:
+        body.close()
+
+    try:
+        result = response.json()
+    except ValueError:
+        raise Exception(f"ImgBB 回應格式錯誤 ({response.status_code}): {response.text[:200]}")
+
+    if not (response.ok and result.get('success')):
+        error = result.get('error')
+        error_msg = error.get('message', '上傳失敗') if isinstance(error, dict) else (error or '上傳失敗')
+        raise Exception(f"ImgBB 上傳失敗 ({response.status_code}): {error_msg}")
+
+    img_data = result.get('data', {})
+    return {
+        'url': img_data.get('url'),
+        'display_url': img_data.get('display_url'),
+        'delete_url': img_data.get('delete_url'),
+        'thumb_url': img_data.get('thumb', {}).get('url')
+    }
+
 
 def create_upload_blueprint():
     """創建上傳路由藍圖"""
     upload_bp = Blueprint('upload', __name__)
 
-    # 配置檔案路徑
-    config_path = Path(__file__).parent.parent.parent / 'upload_config.yaml'
-
     def _load_config():
-        """載入上傳配置"""
-        if not config_path.exists():
-            return {'imgbb': {'api_key': ''}}
+        """載入上傳配置（目前快照的可修改副本）"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f) or {'imgbb': {'api_key': ''}}
+            return CONFIG_STORE.get('upload').to_dict()
         except Exception as e:
-            logger.error(f"載入上傳配置失敗: {e}")
+            logger.error("載入上傳配置失敗: %s", e)
             return {'imgbb': {'api_key': ''}}
 
+    def _get_imgbb_uploader():
+        """ImgBB 共用上傳器"""
+        return get_uploader(IMGBB_HOST)
+
+    def _upload_to_imgbb(path):
+        """上傳單一檔案到 ImgBB（每次上傳時讀取目前的 API Key）"""
+        return _imgbb_upload_file(_load_config().get('imgbb', {}).get('api_key', ''), path)
+
     def _save_config(config):
         """儲存上傳配置"""
         try:
-            with open(config_path, 'w', encoding='utf-8') as f:
-                yaml.dump(config, f, allow_unicode=True)
+            CONFIG_STORE.write('upload', config)
             return True
         except Exception as e:
-            logger.error(f"儲存上傳配置失敗: {e}")
+            logger.error("儲存上傳配置失敗: %s", e)
             return False
 
     @upload_bp.route('/config', methods=['GET'])
@@ -119,19 +172,33 @@ def create_upload_blueprint():
         task_id = data.get('task_id')
         filename = data.get('filename')
 
-        # 如果提供了 task_id 和 filename，從本地讀取圖片
+        # 如果提供了 task_id 和 filename，從本地串流上傳（相同內容使用快取的 URL）
         if task_id and filename:
-            history_root = Path(__file__).parent.parent.parent / 'history'
-            image_path = history_root / task_id / filename
+            image_path = safe_join(HISTORY_ROOT, task_id, filename)
 
-            if not image_path.exists():
+            if not image_path or not os.path.isfile(image_path):
                 return jsonify({
                     'success': False,
                     'error': f'圖片不存在: {task_id}/{filename}'
                 }), 404
 
-            with open(image_path, 'rb') as f:
-                image_data = base64.b64encode(f.read()).decode('utf-8')
+            try:
+                result = _get_imgbb_uploader().upload_file(image_path, _upload_to_imgbb)
+            except Exception as e:
+                logger.error("上傳到 ImgBB 時發生錯誤: %s", e)
+                return jsonify({
+                    'success': False,
+                    'error': f'上傳失敗: {str(e)}'
+                }), 500
+
+            return jsonify({
+                'success': True,
+                'url': result.get('url'),
+                'display_url': result.get('display_url'),
+                'delete_url': result.get('delete_url'),
+                'thumb_url': result.get('thumb_url'),
+                'cached': result.get('cached', False)
+            })
 
         if not image_data:
             return jsonify({
@@ -145,14 +212,15 @@ def create_upload_blueprint():
 
         try:
             # 呼叫 ImgBB API
-            response = requests.post(
-                'https://api.imgbb.com/1/upload',
-                data={
-                    'key': api_key,
-                    'image': image_data
-                },
-                timeout=30
-            )
+            with start_span("publish.imgbb_upload", trace_id=task_id, filename=filename):
+                response = requests.post(
+                    IMGBB_API_URL,
+                    data={
+                        'key': api_key,
+                        'image': image_data
+                    },
+                    timeout=30
+                )
 
             result = response.json()
 
@@ -167,7 +235,7 @@ def create_upload_blueprint():
                 })
             else:
                 error_msg = result.get('error', {}).get('message', '上傳失敗')
-                logger.error(f"ImgBB 上傳失敗: {error_msg}")
+                logger.error("ImgBB 上傳失敗: %s", error_msg)
                 return jsonify({
                     'success': False,
                     'error': f'ImgBB 上傳失敗: {error_msg}'
@@ -179,7 +247,7 @@ def create_upload_blueprint():
                 'error': '上傳超時，請重試'
             }), 504
         except Exception as e:
-            logger.error(f"上傳到 ImgBB 時發生錯誤: {e}")
+            logger.error("上傳到 ImgBB 時發生錯誤: %s", e)
             return jsonify({
                 'success': False,
                 'error': f'上傳失敗: {str(e)}'
@@ -190,12 +258,20 @@ def create_upload_blueprint():
         """
         批量上傳圖片到 ImgBB
 
+        並行上傳（有上限並限速），檔案從磁碟串流送出；內容相同的圖片只上傳一次，
+        已上傳過的直接返回快取的 URL。中斷後以相同列表重新呼叫即可續傳。
+
         請求體：
         - images: 圖片列表，每個包含 task_id, filename, index
+        - stream: 是否以 SSE 逐張返回結果（也可用 Accept: text/event-stream）
 
         返回：
-        - success: 是否成功
-        - results: 每張圖片的上傳結果
+        - 一般模式：
+          - success: 是否成功
+          - results: 每張圖片的上傳結果（與 images 順序相同，cached 表示使用快取）
+        - SSE 模式：
+          - image: 單張圖片上傳結果（依完成順序）
+          - complete: 全部完成（total / uploaded / failed / cached）
         """
         config = _load_config()
         api_key = config.get('imgbb', {}).get('api_key', '')
@@ -208,6 +284,7 @@ def create_upload_blueprint():
 
         data = request.get_json()
         images = data.get('images', [])
+        stream = bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
 
         if not images:
             return jsonify({
@@ -215,72 +292,67 @@ def create_upload_blueprint():
                 'error': '未提供圖片列表'
             }), 400
 
-        results = []
-        history_root = Path(__file__).parent.parent.parent / 'history'
-
-        for img_info in images:
-            task_id = img_info.get('task_id')
-            filename = img_info.get('filename')
-            index = img_info.get('index')
-
-            # 讀取本地圖片
-            image_path = history_root / task_id / filename
-
-            if not image_path.exists():
-                results.append({
-                    'index': index,
-                    'success': False,
-                    'error': f'圖片不存在'
-                })
-                continue
-
-            try:
-                with open(image_path, 'rb') as f:
-                    image_data = base64.b64encode(f.read()).decode('utf-8')
-
-                # 呼叫 ImgBB API
-                response = requests.post(
-                    'https://api.imgbb.com/1/upload',
-                    data={
-                        'key': api_key,
-                        'image': image_data
-                    },
-                    timeout=30
-                )
-
-                result = response.json()
-
-                if response.ok and result.get('success'):
-                    img_data = result.get('data', {})
-                    results.append({
-                        'index': index,
-                        'success': True,
-                        'url': img_data.get('url'),
-                        'display_url': img_data.get('display_url')
-                    })
-                else:
-                    error_msg = result.get('error', {}).get('message', '上傳失敗')
-                    results.append({
-                        'index': index,
-                        'success': False,
-                        'error': error_msg
-                    })
-
-            except Exception as e:
-                results.append({
-                    'index': index,
-                    'success': False,
-                    'error': str(e)
-                })
-
-        success_count = sum(1 for r in results if r.get('success'))
+        # 解析本地圖片路徑
+        paths = []
+        missing = []
+        for position, img_info in enumerate(images):
+            image_path = safe_join(HISTORY_ROOT, img_info.get('task_id') or '', img_info.get('filename') or '')
+            if image_path and os.path.isfile(image_path):
+                paths.append(image_path)
+            else:
+                paths.append(None)
+                missing.append(position)
+
+        def _result(position, outcome):
+            index = images[position].get('index')
+            if isinstance(outcome, Exception):
+                return {'index': index, 'success': False, 'error': str(outcome)}
+            return {
+                'index': index,
+                'success': True,
+                'url': outcome.get('url'),
+                'display_url': outcome.get('display_url'),
+                'cached': outcome.get('cached', False)
+            }
+
+        def _iter_results():
+            """依完成順序產生 (位置, 結果)"""
+            for position in missing:
+                yield position, _result(position, FileNotFoundError('圖片不存在'))
+            for position, outcome in _get_imgbb_uploader().iter_upload(paths, _upload_to_imgbb):
+                yield position, _result(position, outcome)
+
+        def _summary(results):
+            success_count = sum(1 for r in results if r.get('success'))
+            return {
+                'success': success_count > 0,
+                'total': len(images),
+                'uploaded': success_count,
+                'failed': len(images) - success_count,
+                'cached': sum(1 for r in results if r.get('cached'))
+            }
+
+        if stream:
+            def generate():
+                """SSE 事件生成器"""
+                results = []
+                for _, result in _iter_results():
+                    results.append(result)
+                    yield "event: image\n"
+                    yield f"data: {json.dumps(result, ensure_ascii=False)}\n\n"
+                yield "event: complete\n"
+                yield f"data: {json.dumps(_summary(results), ensure_ascii=False)}\n\n"
+
+            return Response(
+                generate(),
+                mimetype='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no',
+                }
+            )
 
-        return jsonify({
-            'success': success_count > 0,
-            'total': len(images),
-            'uploaded': success_count,
-            'failed': len(images) - success_count,
-            'results': results
-        })
+        results = [result for _, result in sorted(_iter_results(), key=lambda item: item[0])]
+        return jsonify(dict(_summary(results), results=results))
 
     return upload_bp
@@ -5,7 +5,7 @@ API 路由工具函数
 """
 
 import logging
-import traceback
+from backend.utils.logging_utils import LazyPayload
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +18,7 @@ def log_request(endpoint: str, data: dict = None):
         endpoint: API 端点路径
         data: 请求数据（会过滤敏感信息）
     """
-    logger.info(f"📥 收到请求: {endpoint}")
+    logger.info("📥 收到请求: %s", endpoint)
 
     if data:
         # 过滤敏感信息和大数据（图片二进制）
@@ -33,7 +33,7 @@ def log_request(endpoint: str, data: dict = None):
         if 'user_images' in data:
             safe_data['user_images'] = f"[{len(data['user_images'])} 张图片]"
 
-        logger.debug(f"  请求数据: {safe_data}")
+        logger.debug("  请求数据: %s", LazyPayload(safe_data))
 
 
 def log_error(endpoint: str, error: Exception):
@@ -44,10 +44,10 @@ def log_error(endpoint: str, error: Exception):
         endpoint: API 端点路径
         error: 异常对象
     """
-    logger.error(f"❌ 请求失败: {endpoint}")
-    logger.error(f"  错误类型: {type(error).__name__}")
-    logger.error(f"  错误信息: {str(error)}")
-    logger.debug(f"  堆栈跟踪:\n{traceback.format_exc()}")
+    logger.error("❌ 请求失败: %s", endpoint)
+    logger.error("  错误类型: %s", type(error).__name__)
+    logger.error("  错误信息: %s", error)
+    logger.debug("  堆栈跟踪:", exc_info=True)
 
 
 def mask_api_key(key: str) -> str:
@@ -0,0 +1,281 @@
+"""Batch Generation Service"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from backend.services.history import get_history_service
+from backend.services.image import get_image_service
+from backend.services.outline import get_outline_service
+from backend.utils.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+class BatchService:
+    """
+    Batch Generation Service Class
+
+    Runs outline + image generation for many topics through one shared
+    scheduler. Limits are global (across all batches), not per request.
+    """
+
+    # Scheduler Config
+    MAX_CONCURRENT_POSTS = 4  # Max posts in flight (outline + images)
+    MAX_CONCURRENT_IMAGE_TASKS = 2  # Max posts generating images at the same time
+    MAX_ITEMS_PER_BATCH = 100  # Max topics per batch request
+    BATCH_RETENTION = 24 * 3600  # Seconds a finished batch stays queryable (and its pages retryable)
+    MAX_BATCHES = 200  # Max batches kept; the oldest finished ones are evicted first
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.MAX_CONCURRENT_POSTS,
+            thread_name_prefix="batch"
+        )
+        self._image_slots = threading.BoundedSemaphore(self.MAX_CONCURRENT_IMAGE_TASKS)
+        self._lock = threading.Lock()
+
+        # Store batch states
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    def submit_batch(
+        self,
+        items: List[Dict[str, Any]],
+        text_style: str = "professional",
+        image_style: str = "flat"
+    ) -> str:
+        """
+        Submit a batch of topics
+
+        Args:
+            items: Topic list, each item has topic and optional text_style / image_style
+            text_style: Default text style for items without one
+            image_style: Default image style for items without one
+
+        Returns:
+            Batch ID
+        """
+        self._evict_batches()
+        batch_id = f"batch_{uuid.uuid4().hex[:8]}"
+        now = datetime.now().isoformat()
+
+        batch_items = []
+        for position, item in enumerate(items):
+            batch_items.append({
+                "position": position,
+                "topic": item["topic"],
+                "text_style": item.get("text_style") or text_style,
+                "image_style": item.get("image_style") or image_style,
+                "status": "pending",  # pending/outline/generating/completed/partial/failed
+                "record_id": None,
+                "task_id": None,
+                "pages_total": 0,
+                "pages_done": 0,
+                "pages_failed": 0,
+                "error": None,
+                "elapsed": None
+            })
+
+        with self._lock:
+            self._batches[batch_id] = {
+                "id": batch_id,
+                "created_at": now,
+                "updated_at": now,
+                "status": "running",  # running/completed
+                "finished_at": None,  # monotonic time the last item finished
+                "items": batch_items
+            }
+
+        logger.info("Batch submitted: batch_id=%s, items=%s", batch_id, len(batch_items))
+
+        for item in batch_items:
+            self._executor.submit(self._run_item, batch_id, item)
+
+        return batch_id
+
+    def _run_item(self, batch_id: str, item: Dict[str, Any]):
+        """Run outline and image generation for one batch item"""
+        start_time = time.time()
+        topic = item["topic"]
+        # Task ID is known up front so the outline span lands in the same trace as the images
+        task_id = f"task_{uuid.uuid4().hex[:8]}"
+
+        try:
+            # ==================== Phase 1: Outline ====================
+            self._update_item(batch_id, item, status="outline", task_id=task_id)
+            with start_span("outline.generate", trace_id=task_id, batch_id=batch_id):
+                outline_result = get_outline_service().generate_outline(
+                    topic, None, item["text_style"]
+                )
+                if not outline_result.get("success"):
+                    raise RuntimeError(outline_result.get("error", "Outline generation failed"))
+
+            pages = outline_result["pages"]
+            outline_text = outline_result["outline"]
+
+            history_service = get_history_service()
+            record_id = history_service.create_record(
+                topic, {"raw": outline_text, "pages": pages}, task_id
+            )
+            self._update_item(
+                batch_id, item,
+                record_id=record_id, pages_total=len(pages)
+            )
+
+            # ==================== Phase 2: Images ====================
+            with self._image_slots:
+                self._update_item(batch_id, item, status="generating")
+                history_service.update_record(record_id, status="generating")
+
+                # Shared service: each task carries its own context, so items can overlap
+                image_service = get_image_service()
+                finish = {}
+                for event in image_service.generate_images(
+                    pages, task_id, outline_text,
+                    user_topic=topic,
+                    image_style=item["image_style"]
+                ):
+                    if event["event"] == "complete":
+                        self._update_item(batch_id, item, pages_done=item["pages_done"] + 1)
+                    elif event["event"] == "error":
+                        self._update_item(batch_id, item, pages_failed=item["pages_failed"] + 1)
+                    elif event["event"] == "finish":
+                        finish = event["data"]
+                # Task context is kept until the batch is evicted so failed pages can be retried
+
+            generated = sorted(finish.get("images", []), key=lambda f: int(f.split('.')[0]))
+            if not generated:
+                status = "failed"
+            elif finish.get("failed"):
+                status = "partial"
+            else:
+                status = "completed"
+
+            history_service.update_record(
+                record_id,
+                images={"task_id": task_id, "generated": generated},
+                status="draft" if status == "failed" else status,
+                thumbnail=generated[0] if generated else None
+            )
+            self._update_item(
+                batch_id, item,
+                status=status,
+                error="All images failed" if status == "failed" else None,
+                elapsed=round(time.time() - start_time, 2)
+            )
+            logger.info("[OK] Batch item done: batch_id=%s, topic=%s, status=%s", batch_id, topic[:30], status)
+
+        except Exception as e:
+            logger.error("[FAIL] Batch item failed: batch_id=%s, topic=%s: %s", batch_id, topic[:30], e)
+            self._update_item(
+                batch_id, item,
+                status="failed",
+                error=str(e),
+                elapsed=round(time.time() - start_time, 2)
+            )
+
+    def _update_item(self, batch_id: str, item: Dict[str, Any], **changes):
+        """Update batch item state (thread-safe)"""
+        with self._lock:
+            item.update(changes)
+            batch = self._batches[batch_id]
+            batch["updated_at"] = datetime.now().isoformat()
+            if batch["status"] != "completed" and \
+                    all(i["status"] in ("completed", "partial", "failed") for i in batch["items"]):
+                batch["status"] = "completed"
+                batch["finished_at"] = time.monotonic()
+
+    def _evict_batches(self):
+        """
+        Drop finished batches older than BATCH_RETENTION, and the oldest finished ones
+        beyond MAX_BATCHES, releasing their image task contexts
+        """
+        now = time.monotonic()
+        with self._lock:
+            finished = sorted(
+                (batch["finished_at"], batch_id) for batch_id, batch in self._batches.items()
+                if batch["finished_at"] is not None
+            )
+            excess = max(0, len(self._batches) - self.MAX_BATCHES + 1)
+            evicted = [
+                self._batches.pop(batch_id)
+                for position, (finished_at, batch_id) in enumerate(finished)
+                if position < excess or now - finished_at > self.BATCH_RETENTION
+            ]
+
+        if not evicted:
+            return
+        image_service = get_image_service()
+        for batch in evicted:
+            for item in batch["items"]:
+                if item["task_id"]:
+                    image_service.cleanup_task(item["task_id"])
+        logger.info("Evicted %s finished batches", len(evicted))
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get batch state with aggregate progress
+
+        Args:
+            batch_id: Batch ID
+
+        Returns:
+            Batch state, None if not found
+        """
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+
+            items = [dict(item) for item in batch["items"]]
+            status_count = {}
+            for item in items:
+                status_count[item["status"]] = status_count.get(item["status"], 0) + 1
+
+            pages_total = sum(item["pages_total"] for item in items)
+            pages_done = sum(item["pages_done"] for item in items)
+
+            return {
+                "id": batch["id"],
+                "status": batch["status"],
+                "created_at": batch["created_at"],
+                "updated_at": batch["updated_at"],
+                "progress": {
+                    "total": len(items),
+                    "by_status": status_count,
+                    "finished": sum(status_count.get(s, 0) for s in ("completed", "partial", "failed")),
+                    "pages_total": pages_total,
+                    "pages_done": pages_done,
+                    "pages_failed": sum(item["pages_failed"] for item in items)
+                },
+                "items": items
+            }
+
+    def list_batches(self) -> List[Dict[str, Any]]:
+        """List all batches (summary only)"""
+        with self._lock:
+            batch_ids = list(self._batches.keys())
+        summaries = []
+        for batch_id in batch_ids:
+            batch = self.get_batch(batch_id)
+            if batch:
+                batch.pop("items")
+                summaries.append(batch)
+        return summaries
+
+
+# Global service instance
+_service_instance = None
+_service_lock = threading.Lock()
+
+
+def get_batch_service() -> BatchService:
+    """Get global batch service instance"""
+    global _service_instance
+    if _service_instance is None:
+        with _service_lock:
+            if _service_instance is None:
+                _service_instance = BatchService()
+    return _service_instance
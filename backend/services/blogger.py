@@ -2,13 +2,102 @@
 Google Blogger 發布服務
 """
 
+import hashlib
 import logging
+import threading
+import time
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from backend.config import Config
+from backend.services.document import parse_outline
+from backend.utils.logging_utils import LazyPayload
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
 
 logger = logging.getLogger(__name__)
 
 
+class BloggerApiError(Exception):
+    """
+    Blogger API 呼叫失敗
+
+    Args:
+        message: 錯誤訊息
+        status_code: HTTP 狀態碼（網路錯誤時為 None）
+        retry_after: 伺服器要求的等待秒數（Retry-After 標頭）
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """網路錯誤、429 與 5xx 可以重試"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+def _raise_for_response(response, forbidden_message: str, error_prefix: str, ok_codes=(200,)):
+    """將非成功的回應轉為 BloggerApiError"""
+    status = response.status_code
+    if status in ok_codes:
+        return
+    if status == 401:
+        raise BloggerApiError("Token 已過期或無效，請重新授權", status)
+    if status == 403:
+        raise BloggerApiError(forbidden_message, status)
+
+    retry_after = None
+    try:
+        retry_after = float(response.headers.get("Retry-After", ""))
+    except (TypeError, ValueError):
+        pass
+    raise BloggerApiError(f"{error_prefix} ({status}): {response.text}", status, retry_after)
+
+
+class _BlogListCache:
+    """使用者部落格清單快取（以 token 雜湊為鍵，不保存 token 本身）"""
+
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+    def get(self, access_token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(access_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                CACHE_HITS.inc(cache='blogger_blogs')
+                return entry[1]
+            self._entries.pop(key, None)
+        CACHE_MISSES.inc(cache='blogger_blogs')
+        return None
+
+    def set(self, access_token: str, value: Dict[str, Any], ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.MAX_ENTRIES:
+                # 先清掉過期的，仍然太多時移除最早到期的
+                for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[key]
+                while len(self._entries) >= self.MAX_ENTRIES:
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[self._key(access_token)] = (now + ttl, value)
+
+    def invalidate(self, access_token: str):
+        with self._lock:
+            self._entries.pop(self._key(access_token), None)
+
+
+_blog_list_cache = _BlogListCache()
+
+
 class BloggerService:
     """Google Blogger API 服務"""
 
@@ -27,29 +116,41 @@ class BloggerService:
             "Content-Type": "application/json"
         }
 
-    def get_user_blogs(self) -> Dict[str, Any]:
-        """取得使用者的所有部落格"""
+    def get_user_blogs(self, use_cache: bool = True) -> Dict[str, Any]:
+        """
+        取得使用者的所有部落格
+
+        成功的結果依 token 快取 Config.BLOGGER_BLOGS_CACHE_TTL 秒。
+
+        Args:
+            use_cache: 是否使用快取（False 時重新查詢並更新快取）
+        """
+        if use_cache:
+            cached = _blog_list_cache.get(self.access_token)
+            if cached is not None:
+                return cached
+
         url = f"{self.BLOGGER_API_BASE}/users/self/blogs"
 
-        logger.info(f"正在呼叫 Blogger API: {url}")
-        logger.info(f"Token 前 20 字元: {self.access_token[:20]}...")
+        logger.info("正在呼叫 Blogger API: %s", url)
+        logger.info("Token 前 20 字元: %s...", self.access_token[:20])
 
         try:
             response = requests.get(url, headers=self.headers, timeout=30)
-            logger.info(f"Blogger API 回應狀態碼: {response.status_code}")
-            logger.info(f"Blogger API 回應內容: {response.text[:500]}")
+            logger.info("Blogger API 回應狀態碼: %s", response.status_code)
+            logger.debug("Blogger API 回應內容: %s", LazyPayload(response.text))
         except requests.exceptions.RequestException as e:
-            logger.error(f"網路請求失敗: {e}")
-            raise Exception(f"網路請求失敗: {e}")
+            logger.error("網路請求失敗: %s", e)
+            raise BloggerApiError(f"網路請求失敗: {e}")
 
         if response.status_code == 401:
-            raise Exception("Token 已過期或無效，請重新授權")
-        elif response.status_code == 403:
-            raise Exception("權限不足，請確認已授權 Blogger API scope")
-        elif response.status_code != 200:
-            raise Exception(f"Blogger API 錯誤 ({response.status_code}): {response.text}")
+            _blog_list_cache.invalidate(self.access_token)
+        _raise_for_response(response, "權限不足，請確認已授權 Blogger API scope", "Blogger API 錯誤")
 
-        return response.json()
+        result = response.json()
+        if Config.BLOGGER_BLOGS_CACHE_TTL > 0:
+            _blog_list_cache.set(self.access_token, result, Config.BLOGGER_BLOGS_CACHE_TTL)
+        return result
 
     def create_post(
         self,
@@ -88,17 +189,14 @@ class BloggerService:
 
         try:
             response = requests.post(url, headers=self.headers, json=post_data, timeout=60)
-            logger.info(f"發布文章 API 回應狀態碼: {response.status_code}")
+            logger.info("發布文章 API 回應狀態碼: %s", response.status_code)
         except requests.exceptions.RequestException as e:
-            logger.error(f"發布文章網路請求失敗: {e}")
-            raise Exception(f"網路請求失敗: {e}")
+            logger.error("發布文章網路請求失敗: %s", e)
+            raise BloggerApiError(f"網路請求失敗: {e}")
 
-        if response.status_code == 401:
-            raise Exception("Token 已過期或無效，請重新授權")
-        elif response.status_code == 403:
-            raise Exception("權限不足，請確認已授權 Blogger API 寫入權限")
-        elif response.status_code not in [200, 201]:
-            raise Exception(f"發布文章失敗 ({response.status_code}): {response.text}")
+        _raise_for_response(
+            response, "權限不足，請確認已授權 Blogger API 寫入權限", "發布文章失敗", ok_codes=(200, 201)
+        )
 
         return response.json()
 
@@ -117,33 +215,16 @@ def generate_blog_html(outline: str, images: list, title: str = "") -> str:
     """
     html_parts = []
 
-    # 解析大綱，將每個段落配上對應的圖片
-    sections = outline.split('<page>')
-
-    for i, section in enumerate(sections):
-        section = section.strip()
-        if not section:
-            continue
-
-        # 移除類型標記 [封面]、[前言] 等，但保留內容
-        lines = section.split('\n')
-        content_lines = []
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith('[') and line.endswith(']'):
-                continue  # 跳過類型標記
-            if line.startswith('配圖建議'):
-                continue  # 跳過配圖建議
-            if line:
-                content_lines.append(line)
-
-        if not content_lines:
+    # 解析大綱（共用快取的頁面模型），將每個段落配上對應的圖片
+    for page in parse_outline(outline):
+        i = page.index
+        content = page.content
+        if not content.lines:
             continue
 
         # 第一行作為小標題
-        subtitle = content_lines[0] if content_lines else ""
-        body = '\n'.join(content_lines[1:]) if len(content_lines) > 1 else ""
+        subtitle = content.lines[0]
+        body_lines = content.lines[1:]
 
         # 組合 HTML
         section_html = f'<h2>{subtitle}</h2>\n'
@@ -152,23 +233,18 @@ def generate_blog_html(outline: str, images: list, title: str = "") -> str:
         if i < len(images) and images[i]:
             section_html += f'<p><img src="{images[i]}" alt="{subtitle}" style="max-width:100%;"/></p>\n'
 
-        # 加入內容
-        if body:
-            paragraphs = body.split('\n\n')
-            for p in paragraphs:
-                p = p.strip()
-                if p:
-                    # 處理列表
-                    if p.startswith('•') or p.startswith('-') or p.startswith('*'):
-                        items = p.split('\n')
-                        section_html += '<ul>\n'
-                        for item in items:
-                            item = item.strip().lstrip('•-* ')
-                            if item:
-                                section_html += f'  <li>{item}</li>\n'
-                        section_html += '</ul>\n'
-                    else:
-                        section_html += f'<p>{p.replace(chr(10), "<br/>")}</p>\n'
+        # 加入內容（lines 已去掉空行，正文為同一段）
+        if body_lines:
+            if body_lines[0].startswith(('•', '-', '*')):
+                # 列表
+                section_html += '<ul>\n'
+                for item in body_lines:
+                    item = item.lstrip('•-* ')
+                    if item:
+                        section_html += f'  <li>{item}</li>\n'
+                section_html += '</ul>\n'
+            else:
+                section_html += f'<p>{"<br/>".join(body_lines)}</p>\n'
 
         html_parts.append(section_html)
 
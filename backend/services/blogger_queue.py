@@ -0,0 +1,310 @@
+"""
+Blogger 發布佇列
+
+- 背景執行緒池發布文章，HTTP 請求只負責排入佇列
+- 每個部落格各自限速（兩次發文的最小間隔）
+- 429 / 5xx / 網路錯誤自動重試（指數退避，優先採用 Retry-After）
+- 可指定發布時間，到期才送出
+"""
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from backend.config import Config
+from backend.services.blogger import BloggerApiError, BloggerService
+from backend.utils.metrics import record_failure, record_retry
+from backend.utils.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# 已結束的狀態
+FINISHED_STATUSES = ("published", "failed", "cancelled")
+
+
+class PublishQueue:
+    """
+    Blogger 發布佇列
+
+    工作狀態：scheduled（等待發布時間）/ queued（等待執行）/ running / retrying（等待重試）/
+    published / failed / cancelled
+    """
+
+    MAX_RETRY_DELAY = 300  # 單次重試最長等待秒數
+    MAX_FINISHED_JOBS = 1000  # 保留的已結束工作數
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=Config.BLOGGER_PUBLISH_WORKERS,
+            thread_name_prefix="blogger-publish"
+        )
+        self._cond = threading.Condition()
+        self._heap: List[tuple] = []  # (到期時間, 序號, job_id)
+        self._seq = itertools.count()
+        self._dispatcher: Optional[threading.Thread] = None
+
+        # 對外的工作狀態
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # 不對外的資料（token、產生內容的函式）
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        # 部落格 ID -> 下次可以發文的時間
+        self._next_slot: Dict[str, float] = {}
+
+    def submit(
+        self,
+        access_token: str,
+        blog_id: str,
+        title: str,
+        render: Callable[[], str],
+        labels: Optional[list] = None,
+        is_draft: bool = False,
+        publish_at: Optional[datetime] = None,
+        trace_id: Optional[str] = None
+    ) -> str:
+        """
+        排入一篇文章
+
+        Args:
+            access_token: Google OAuth2 access token
+            blog_id: 部落格 ID
+            title: 文章標題
+            render: 產生文章 HTML 的函式（在背景執行，例如上傳圖片後轉換大綱）
+            labels: 標籤列表
+            is_draft: 是否為草稿
+            publish_at: 發布時間（None 表示立即）
+            trace_id: 追蹤 ID
+
+        Returns:
+            工作 ID
+        """
+        job_id = f"publish_{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        due = max(now, publish_at.timestamp()) if publish_at else now
+        created_at = datetime.now().isoformat()
+
+        with self._cond:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "blog_id": blog_id,
+                "title": title,
+                "is_draft": is_draft,
+                "trace_id": trace_id,
+                "status": "scheduled" if due > now else "queued",
+                "publish_at": datetime.fromtimestamp(due).isoformat(),
+                "attempts": 0,
+                "next_attempt_at": None,
+                "post_id": None,
+                "post_url": None,
+                "published_at": None,
+                "error": None,
+                "created_at": created_at,
+                "updated_at": created_at
+            }
+            self._payloads[job_id] = {
+                "access_token": access_token,
+                "render": render,
+                "labels": labels or [],
+                "content": None
+            }
+            self._schedule_locked(job_id, due)
+            self._ensure_dispatcher()
+
+        logger.info("Blogger 發布已排入佇列: job_id=%s, blog_id=%s, publish_at=%s",
+                    job_id, blog_id, self._jobs[job_id]["publish_at"])
+        return job_id
+
+    def _schedule_locked(self, job_id: str, due: float):
+        """排入到期佇列（呼叫端需持有鎖）"""
+        heapq.heappush(self._heap, (due, next(self._seq), job_id))
+        self._cond.notify()
+
+    def _ensure_dispatcher(self):
+        """第一次排入時啟動分派執行緒（呼叫端需持有鎖）"""
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_loop, name="blogger-publish-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        """等到工作到期，且該部落格的限速允許時，交給執行緒池"""
+        interval = 1.0 / Config.BLOGGER_PUBLISH_RATE if Config.BLOGGER_PUBLISH_RATE > 0 else 0.0
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                due, _, job_id = self._heap[0]
+                now = time.time()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._heap)
+
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in FINISHED_STATUSES:
+                    continue
+
+                # 每個部落格的發文間隔，還沒輪到就延後
+                slot = self._next_slot.get(job["blog_id"], 0.0)
+                if slot > now:
+                    self._schedule_locked(job_id, slot)
+                    continue
+                self._next_slot[job["blog_id"]] = now + interval
+
+                job["status"] = "queued"
+                job["updated_at"] = datetime.now().isoformat()
+                self._executor.submit(contextvars.copy_context().run, self._run_job, job_id)
+
+    def _run_job(self, job_id: str):
+        """產生內容並發布，可重試的錯誤重新排入佇列（不在執行緒中等待）"""
+        with self._cond:
+            job = self._jobs[job_id]
+            payload = self._payloads.get(job_id)
+            if payload is None or job["status"] in FINISHED_STATUSES:
+                return
+            job["status"] = "running"
+            job["attempts"] += 1
+            job["next_attempt_at"] = None
+            job["updated_at"] = datetime.now().isoformat()
+            attempt = job["attempts"]
+
+        try:
+            with start_span("publish.queue_job", trace_id=job["trace_id"],
+                            blog_id=job["blog_id"], attempt=attempt):
+                # 內容只產生一次，重試時沿用
+                if payload["content"] is None:
+                    payload["content"] = payload["render"]()
+                service = BloggerService(payload["access_token"])
+                with start_span("publish.create_post", is_draft=job["is_draft"]):
+                    result = service.create_post(
+                        blog_id=job["blog_id"],
+                        title=job["title"],
+                        content=payload["content"],
+                        labels=payload["labels"],
+                        is_draft=job["is_draft"]
+                    )
+        except Exception as e:
+            self._handle_failure(job_id, e, attempt)
+            return
+
+        self._finish(
+            job_id,
+            status="published",
+            post_id=result.get("id", ""),
+            post_url=result.get("url", ""),
+            published_at=datetime.now().isoformat(),
+            error=None
+        )
+        logger.info("[OK] Blogger 發布完成: job_id=%s, url=%s", job_id, result.get("url", ""))
+
+    def _handle_failure(self, job_id: str, error: Exception, attempt: int):
+        """可重試的錯誤排入重試，否則標記失敗"""
+        record_failure('blogger_publish', error, provider='blogger')
+        retryable = isinstance(error, BloggerApiError) and error.retryable
+        if not retryable or attempt > Config.BLOGGER_PUBLISH_RETRIES:
+            logger.error("[FAIL] Blogger 發布失敗: job_id=%s, attempts=%s: %s", job_id, attempt, error)
+            self._finish(job_id, status="failed", error=str(error))
+            return
+
+        record_retry('blogger_publish', error, provider='blogger')
+        delay = error.retry_after or 2 ** attempt + random.uniform(0, 1)
+        delay = min(delay, self.MAX_RETRY_DELAY)
+        logger.warning("Blogger 發布失敗，%.1f 秒後重試 (%s/%s): job_id=%s: %s",
+                       delay, attempt, Config.BLOGGER_PUBLISH_RETRIES, job_id, error)
+
+        with self._cond:
+            job = self._jobs[job_id]
+            if job["status"] in FINISHED_STATUSES:
+                return
+            due = time.time() + delay
+            job.update(
+                status="retrying",
+                error=str(error),
+                next_attempt_at=datetime.fromtimestamp(due).isoformat(),
+                updated_at=datetime.now().isoformat()
+            )
+            self._schedule_locked(job_id, due)
+
+    def _finish(self, job_id: str, **changes):
+        """標記工作結束並釋放 token 等資料"""
+        with self._cond:
+            job = self._jobs[job_id]
+            job.update(changes)
+            job["updated_at"] = datetime.now().isoformat()
+            self._payloads.pop(job_id, None)
+            self._prune_locked()
+
+    def _prune_locked(self):
+        """移除最舊的已結束工作（呼叫端需持有鎖）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消尚未開始的工作（scheduled / queued / retrying）
+
+        Returns:
+            是否已取消
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("scheduled", "queued", "retrying"):
+                return False
+        self._finish(job_id, status="cancelled")
+        logger.info("Blogger 發布已取消: job_id=%s", job_id)
+        return True
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取得工作狀態，不存在時返回 None"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, status: Optional[str] = None, blog_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        列出工作（新的在前）
+
+        Args:
+            status: 只列出此狀態
+            blog_id: 只列出此部落格
+
+        Returns:
+            jobs 與各狀態數量
+        """
+        with self._cond:
+            jobs = [dict(job) for job in self._jobs.values()]
+
+        by_status: Dict[str, int] = {}
+        for job in jobs:
+            by_status[job["status"]] = by_status.get(job["status"], 0) + 1
+
+        jobs = [
+            job for job in jobs
+            if (status is None or job["status"] == status) and (blog_id is None or job["blog_id"] == blog_id)
+        ]
+        jobs.sort(key=lambda job: job["created_at"], reverse=True)
+        return {"jobs": jobs, "by_status": by_status}
+
+
+# 全域服務實例
+_service_instance = None
+_service_lock = threading.Lock()
+
+
+def get_publish_queue() -> PublishQueue:
+    """取得全域 Blogger 發布佇列"""
+    global _service_instance
+    if _service_instance is None:
+        with _service_lock:
+            if _service_instance is None:
+                _service_instance = PublishQueue()
+    return _service_instance
@@ -0,0 +1,407 @@
+"""Bulk Export Service"""
+import json
+import contextvars
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from backend.services.document import escape_html
+from backend.services.history import get_history_service
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "history"
+)
+# Job output lives next to task dirs (dot dir: skipped by history scans, servable via offload)
+EXPORT_ROOT = os.path.join(HISTORY_ROOT, ".exports")
+
+EXPORT_FORMATS = ("markdown", "html")
+IMAGE_MODES = ("copy", "link", "none")  # link = hard link, falls back to copy across filesystems
+OUTPUT_MODES = ("directory", "zip")
+
+# Already-compressed files are stored as-is in the archive
+_STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif", ".zip")
+
+
+def _place_image(src: str, dest: str, mode: str):
+    """Copy or hard link one image into the site"""
+    if os.path.exists(dest):
+        return
+    if mode == "link":
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dest)
+
+
+def _export_record(record_path: str, site_dir: str, formats: List[str], image_mode: str) -> Dict[str, Any]:
+    """
+    Render one history record into the site (runs in a render thread)
+
+    Layout:
+        posts/<record_id>/index.md, index.html
+        images/<task_id>/<index>.png
+
+    Args:
+        record_path: History record JSON path
+        site_dir: Site root directory
+        formats: Formats to render
+        image_mode: copy / link / none
+
+    Returns:
+        Summary used for the site index
+    """
+    from backend.services.export import get_export_service
+
+    with open(record_path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+
+    record_id = record["id"]
+    pages = (record.get("outline") or {}).get("pages", [])
+    images = record.get("images") or {}
+    task_id = images.get("task_id")
+    generated = images.get("generated") or []
+
+    # Copy / link images first so the rendered pages only reference files that exist
+    copied = 0
+    task_dir = os.path.join(HISTORY_ROOT, task_id) if task_id else None
+    if image_mode != "none" and task_dir and os.path.isdir(task_dir):
+        image_dir = os.path.join(site_dir, "images", task_id)
+        os.makedirs(image_dir, exist_ok=True)
+        for filename in generated:
+            src = os.path.join(task_dir, filename)
+            if os.path.isfile(src):
+                _place_image(src, os.path.join(image_dir, filename), image_mode)
+                copied += 1
+    include_images = copied > 0
+
+    post_dir = os.path.join(site_dir, "posts", record_id)
+    os.makedirs(post_dir, exist_ok=True)
+    service = get_export_service()
+    title = record.get("title") or record_id
+
+    if "markdown" in formats:
+        content = service.export_to_markdown(
+            task_id, pages, include_images=include_images, image_base_url="../../images"
+        )
+        with open(os.path.join(post_dir, "index.md"), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    if "html" in formats:
+        content = service.export_to_html(
+            task_id, pages, include_images=include_images, image_base_url="../../images",
+            include_srcset=False
+        )
+        with open(os.path.join(post_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write(service.build_html_document(content, title))
+
+    return {
+        "record_id": record_id,
+        "title": title,
+        "created_at": record.get("created_at"),
+        "pages": len(pages),
+        "images": copied
+    }
+
+
+class BulkExportService:
+    """
+    Bulk Export Service Class
+
+    Exports many history records into a static site directory (optionally zipped).
+    Records render in a thread pool (rendering is mostly file copies and small string
+    work, and threads share the parsed page cache); jobs run one at a time so they
+    don't compete for the pool. Finished jobs and their files are removed after
+    JOB_RETENTION, or earlier when more than MAX_JOBS are kept.
+    """
+
+    MAX_WORKERS = 4  # Render threads
+    MAX_ERRORS = 50  # Errors kept per job
+    JOB_RETENTION = 24 * 3600  # Seconds a finished job's files stay downloadable
+    MAX_JOBS = 20  # Max jobs kept; the oldest finished ones are removed first
+
+    def __init__(self):
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-export")
+        self._pool = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="bulk-export-render")
+        self._lock = threading.Lock()
+
+        # Store job states
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def submit_export(
+        self,
+        record_ids: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        formats: Optional[List[str]] = None,
+        image_mode: str = "copy",
+        output: str = "zip"
+    ) -> str:
+        """
+        Submit a bulk export job
+
+        Args:
+            record_ids: Records to export (None = all records)
+            status: Only export records with this status (e.g. completed)
+            formats: Subset of EXPORT_FORMATS (default: both)
+            image_mode: copy / link / none
+            output: directory (site folder only) / zip (site folder + archive)
+
+        Returns:
+            Job ID
+        """
+        formats = list(formats or EXPORT_FORMATS)
+        if not set(formats) <= set(EXPORT_FORMATS):
+            raise ValueError(f"Unsupported formats: {formats}, available: {list(EXPORT_FORMATS)}")
+        if image_mode not in IMAGE_MODES:
+            raise ValueError(f"Unsupported image_mode: {image_mode}, available: {list(IMAGE_MODES)}")
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"Unsupported output: {output}, available: {list(OUTPUT_MODES)}")
+
+        history_service = get_history_service()
+        index_records = history_service.list_records(page=1, page_size=10 ** 9, status=status)["records"]
+        if record_ids is not None:
+            wanted = set(record_ids)
+            index_records = [r for r in index_records if r["id"] in wanted]
+
+        self._evict_jobs()
+
+        job_id = f"export_{uuid.uuid4().hex[:8]}"
+        now = datetime.now().isoformat()
+
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "created_at": now,
+                "updated_at": now,
+                "status": "pending",  # pending/running/archiving/completed/failed
+                "formats": formats,
+                "image_mode": image_mode,
+                "output": output,
+                "total": len(index_records),
+                "done": 0,
+                "failed": 0,
+                "images": 0,
+                "errors": [],
+                "site_dir": None,
+                "archive": None,
+                "elapsed": None,
+                "finished_at": None
+            }
+
+        logger.info("Bulk export submitted: job_id=%s, records=%s", job_id, len(index_records))
+        self._runner.submit(self._run_job, job_id, [r["id"] for r in index_records])
+        return job_id
+
+    def _run_job(self, job_id: str, record_ids: List[str]):
+        """Render all records through the render pool, then write the index and archive"""
+        start_time = time.time()
+        job = self._jobs[job_id]
+        job_dir = os.path.join(EXPORT_ROOT, job_id)
+        site_dir = os.path.join(job_dir, "site")
+
+        try:
+            os.makedirs(site_dir, exist_ok=True)
+            self._update_job(job_id, status="running", site_dir=site_dir)
+
+            history_service = get_history_service()
+            futures = {
+                self._pool.submit(
+                    contextvars.copy_context().run,
+                    _export_record,
+                    history_service._get_record_path(record_id),
+                    site_dir,
+                    job["formats"],
+                    job["image_mode"]
+                ): record_id
+                for record_id in record_ids
+            }
+
+            posts = []
+            for future in as_completed(futures):
+                record_id = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    logger.warning("Bulk export record failed: job_id=%s, record=%s: %s", job_id, record_id, e)
+                    with self._lock:
+                        job["failed"] += 1
+                        if len(job["errors"]) < self.MAX_ERRORS:
+                            job["errors"].append({"record_id": record_id, "error": str(e)})
+                        job["updated_at"] = datetime.now().isoformat()
+                    continue
+
+                posts.append(summary)
+                with self._lock:
+                    job["done"] += 1
+                    job["images"] += summary["images"]
+                    job["updated_at"] = datetime.now().isoformat()
+
+            self._write_site_index(site_dir, posts, job["formats"])
+
+            archive = None
+            if job["output"] == "zip":
+                self._update_job(job_id, status="archiving")
+                archive = self._write_archive(site_dir, os.path.join(job_dir, f"{job_id}.zip"))
+                # The site dir was only staging for the archive
+                shutil.rmtree(site_dir, ignore_errors=True)
+                self._update_job(job_id, site_dir=None)
+
+            self._update_job(
+                job_id,
+                status="completed",
+                archive=archive,
+                elapsed=round(time.time() - start_time, 2)
+            )
+            logger.info(
+                "[OK] Bulk export done: job_id=%s, done=%s, failed=%s, elapsed=%.1fs",
+                job_id, job["done"], job["failed"], time.time() - start_time
+            )
+
+        except Exception as e:
+            logger.error("[FAIL] Bulk export failed: job_id=%s: %s", job_id, e, exc_info=True)
+            with self._lock:
+                if len(job["errors"]) < self.MAX_ERRORS:
+                    job["errors"].append({"record_id": None, "error": str(e)})
+            self._update_job(job_id, status="failed", elapsed=round(time.time() - start_time, 2))
+
+    def _write_site_index(self, site_dir: str, posts: List[Dict[str, Any]], formats: List[str]):
+        """Write site index (index.html and posts.json), newest first"""
+        posts.sort(key=lambda p: p.get("created_at") or "", reverse=True)
+
+        with open(os.path.join(site_dir, "posts.json"), "w", encoding="utf-8") as f:
+            json.dump(posts, f, ensure_ascii=False, indent=2)
+
+        filename = "index.html" if "html" in formats else "index.md"
+        items = "\n".join(
+            f'<li><a href="posts/{p["record_id"]}/{filename}">{escape_html(p["title"])}</a></li>'
+            for p in posts
+        )
+        with open(os.path.join(site_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write(
+                '<!DOCTYPE html>\n<html lang="zh-TW">\n<head>\n<meta charset="UTF-8">\n'
+                f'<title>文章列表</title>\n</head>\n<body>\n<ul>\n{items}\n</ul>\n</body>\n</html>\n'
+            )
+
+    def _write_archive(self, site_dir: str, archive_path: str) -> str:
+        """Zip the site directory (images stored without recompression)"""
+        tmp_path = f"{archive_path}.part"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for dirpath, _, filenames in os.walk(site_dir):
+                for name in sorted(filenames):
+                    path = os.path.join(dirpath, name)
+                    compress_type = zipfile.ZIP_STORED if name.lower().endswith(_STORED_EXTENSIONS) else None
+                    zf.write(path, os.path.relpath(path, site_dir), compress_type=compress_type)
+        os.replace(tmp_path, archive_path)
+        return archive_path
+
+    def _update_job(self, job_id: str, **changes):
+        """Update job state (thread-safe)"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            job["updated_at"] = datetime.now().isoformat()
+            if job["status"] in ("completed", "failed") and job["finished_at"] is None:
+                job["finished_at"] = time.monotonic()
+
+    def _evict_jobs(self):
+        """
+        Remove finished jobs older than JOB_RETENTION, and the oldest finished ones
+        beyond MAX_JOBS, together with their files; also remove job dirs left by a
+        previous process once they are older than JOB_RETENTION
+        """
+        now = time.monotonic()
+        with self._lock:
+            finished = sorted(
+                (job["finished_at"], job_id) for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None
+            )
+            excess = max(0, len(self._jobs) - self.MAX_JOBS + 1)
+            evicted = [
+                job_id
+                for position, (finished_at, job_id) in enumerate(finished)
+                if position < excess or now - finished_at > self.JOB_RETENTION
+            ]
+            for job_id in evicted:
+                del self._jobs[job_id]
+            known = set(self._jobs)
+
+        for job_id in evicted:
+            shutil.rmtree(os.path.join(EXPORT_ROOT, job_id), ignore_errors=True)
+
+        try:
+            entries = os.listdir(EXPORT_ROOT)
+        except FileNotFoundError:
+            entries = []
+        for name in entries:
+            path = os.path.join(EXPORT_ROOT, name)
+            try:
+                stale = name not in known and time.time() - os.path.getmtime(path) > self.JOB_RETENTION
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+                evicted.append(name)
+
+        if evicted:
+            logger.info("Removed %s finished export jobs", len(evicted))
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get job state with progress
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Job state, None if not found
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            job["errors"] = list(job["errors"])
+
+        finished = job["done"] + job["failed"]
+        job["progress"] = {
+            "finished": finished,
+            "percent": round(finished * 100 / job["total"], 1) if job["total"] else 100.0
+        }
+        return job
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """List all jobs (without error details)"""
+        with self._lock:
+            job_ids = list(self._jobs.keys())
+        jobs = []
+        for job_id in job_ids:
+            job = self.get_job(job_id)
+            if job:
+                job.pop("errors")
+                jobs.append(job)
+        return jobs
+
+
+# Global service instance
+_service_instance = None
+_service_lock = threading.Lock()
+
+
+def get_bulk_export_service() -> BulkExportService:
+    """Get global bulk export service instance"""
+    global _service_instance
+    if _service_instance is None:
+        with _service_lock:
+            if _service_instance is None:
+                _service_instance = BulkExportService()
+    return _service_instance
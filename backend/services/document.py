@@ -0,0 +1,255 @@
+"""頁面文件模型 - Markdown / HTML / Blogger 匯出共用的大綱解析結果"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import NamedTuple, Tuple
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
+
+# 類型標記，如 [封面]、[內容]
+_TYPE_MARKER = re.compile(r'\[(\S+)\]')
+# 獨立的標記行（不屬於正文）
+_MARKER_LINE = re.compile(r'\[.*\]')
+# 配圖建議行
+_IMAGE_SUGGESTION = re.compile(r'配圖建議')
+# 標題 / 副標題行
+_TITLE = re.compile(r'(?:標題|标题)：\s*(.*)')
+_SUBTITLE = re.compile(r'(?:副標題|副标题)：\s*(.*)')
+# 列表項目（• / - / * 開頭，或 1. 編號）
+_BULLET_ITEM = re.compile(r'[•\-*]\s*(.*)')
+_NUMBERED_ITEM = re.compile(r'\d+\.\s*(.*)')
+# 強調行（副標題轉成的 *文字*）
+_EMPHASIS = re.compile(r'\*([^*].*?)\*')
+
+# 類型標記 -> 頁面類型
+PAGE_TYPES = {
+    "封面": "cover",
+    "前言": "intro",
+    "內容": "content",
+    "内容": "content",
+    "結論": "summary",
+    "总结": "summary",
+}
+
+# 小標題最大長度（超過視為一般段落）
+HEADING_MAX_CHARS = 50
+
+
+class Block(NamedTuple):
+    """HTML 區塊：kind 為 p（段落）、em（強調段落）、ul、ol"""
+    kind: str
+    items: Tuple[str, ...]
+
+
+class PageContent:
+    """
+    單頁內容的解析結果
+
+    內容行只過濾一次（lines）；匯出用的標題、正文與 HTML 區塊在第一次讀取時才由 lines 建立。
+    """
+
+    def __init__(self, page_type: str, lines: Tuple[str, ...]):
+        self.page_type = page_type  # 依類型標記判斷的頁面類型（沒有標記時為 content）
+        self.lines = lines          # 去掉空行、類型標記行與配圖建議的內容行（Blogger 以第一行作小標題）
+
+    @cached_property
+    def _split(self) -> Tuple[str, Tuple[str, ...]]:
+        """取出「標題：」，副標題轉為 *副標題*"""
+        title = ""
+        body_lines = []
+        for line in self.lines:
+            title_match = _TITLE.match(line)
+            if title_match:
+                title = title_match.group(1).strip()
+                continue
+            subtitle_match = _SUBTITLE.match(line)
+            if subtitle_match:
+                subtitle = subtitle_match.group(1).strip()
+                if subtitle:
+                    body_lines.append(f"*{subtitle}*")
+                continue
+            body_lines.append(line)
+        return title, tuple(body_lines)
+
+    @cached_property
+    def _heading_split(self) -> Tuple[str, Tuple[str, ...]]:
+        body_lines = self._split[1]
+        if body_lines:
+            first_line = body_lines[0]
+            if (not first_line.startswith(('•', '-'))
+                    and len(first_line) < HEADING_MAX_CHARS
+                    and not first_line.endswith('：')):
+                return first_line, body_lines[1:]
+        return "", body_lines
+
+    @property
+    def title(self) -> str:
+        """「標題：」的內容"""
+        return self._split[0]
+
+    @property
+    def body(self) -> str:
+        """正文（副標題轉為 *副標題*）"""
+        return '\n'.join(self._split[1])
+
+    @property
+    def heading(self) -> str:
+        """正文第一行作為小標題時的內容（否則為空字串）"""
+        return self._heading_split[0]
+
+    @property
+    def heading_body(self) -> str:
+        """取出小標題後的正文"""
+        return '\n'.join(self._heading_split[1])
+
+    @cached_property
+    def blocks(self) -> Tuple[Block, ...]:
+        """body 的 HTML 區塊"""
+        return _build_blocks(self._split[1])
+
+    @cached_property
+    def heading_blocks(self) -> Tuple[Block, ...]:
+        """heading_body 的 HTML 區塊"""
+        return _build_blocks(self._heading_split[1])
+
+
+class OutlinePage(NamedTuple):
+    """大綱中的一頁"""
+    index: int
+    content: PageContent
+
+
+class _ParseCache:
+    """解析結果快取（以文字的雜湊為鍵，LRU 淘汰）"""
+
+    MAX_ENTRIES = 1024
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, kind: str, text: str, parse):
+        key = (kind, hashlib.sha1(text.encode('utf-8')).hexdigest())
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc(cache='page_document')
+                return value
+        CACHE_MISSES.inc(cache='page_document')
+
+        value = parse(text)
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return value
+
+
+_cache = _ParseCache()
+
+
+def _build_blocks(lines: Tuple[str, ...]) -> Tuple[Block, ...]:
+    """將正文行分組為段落與列表（連續的列表項目合併為同一個列表）"""
+    blocks = []
+    list_kind = None
+    items = []
+
+    for line in lines:
+        emphasis = _EMPHASIS.fullmatch(line)
+        bullet = None if emphasis else _BULLET_ITEM.fullmatch(line)
+        numbered = None if emphasis or bullet else _NUMBERED_ITEM.fullmatch(line)
+        item = bullet or numbered
+
+        if item:
+            if list_kind is None:
+                list_kind = 'ul' if bullet else 'ol'
+            items.append(item.group(1).lstrip('•-* ').strip())
+            continue
+
+        if list_kind is not None:
+            blocks.append(Block(list_kind, tuple(items)))
+            list_kind, items = None, []
+        if emphasis:
+            blocks.append(Block('em', (emphasis.group(1),)))
+        else:
+            blocks.append(Block('p', (line,)))
+
+    if list_kind is not None:
+        blocks.append(Block(list_kind, tuple(items)))
+    return tuple(blocks)
+
+
+def _parse_content(content: str) -> PageContent:
+    page_type = "content"
+    type_match = _TYPE_MARKER.match(content.strip())
+    if type_match:
+        page_type = PAGE_TYPES.get(type_match.group(1), "content")
+
+    lines = tuple(
+        line for line in (raw_line.strip() for raw_line in content.split('\n'))
+        if line and not _MARKER_LINE.fullmatch(line) and not _IMAGE_SUGGESTION.match(line)
+    )
+    return PageContent(page_type, lines)
+
+
+def escape_html(text: str) -> str:
+    """轉義 HTML 特殊字符"""
+    return (text
+            .replace('&', '&amp;')
+            .replace('<', '&lt;')
+            .replace('>', '&gt;')
+            .replace('"', '&quot;')
+            .replace("'", '&#39;'))
+
+
+def render_blocks_html(blocks: Tuple[Block, ...]) -> str:
+    """將解析後的區塊轉為 HTML"""
+    result = []
+    for block in blocks:
+        if block.kind in ('ul', 'ol'):
+            result.append(f'<{block.kind}>')
+            result.extend(f'<li>{escape_html(item)}</li>' for item in block.items)
+            result.append(f'</{block.kind}>')
+        elif block.kind == 'em':
+            result.append(f'<p><em>{escape_html(block.items[0])}</em></p>')
+        else:
+            result.append(f'<p>{escape_html(block.items[0])}</p>')
+    return '\n'.join(result)
+
+
+def parse_content(content: str) -> PageContent:
+    """
+    解析單頁內容（結果依內容雜湊快取，相同內容只解析一次）
+
+    Args:
+        content: 頁面原始內容
+
+    Returns:
+        PageContent
+    """
+    return _cache.get_or_parse('page', content, _parse_content)
+
+
+def _parse_outline(outline: str) -> Tuple[OutlinePage, ...]:
+    return tuple(
+        OutlinePage(index, parse_content(section.strip()))
+        for index, section in enumerate(outline.split('<page>'))
+        if section.strip()
+    )
+
+
+def parse_outline(outline: str) -> Tuple[OutlinePage, ...]:
+    """
+    解析完整大綱文字（以 <page> 分頁）
+
+    index 為分頁位置（對應同位置的圖片），結果依大綱雜湊快取。
+
+    Args:
+        outline: 大綱文字
+
+    Returns:
+        OutlinePage 列表
+    """
+    return _cache.get_or_parse('outline', outline, _parse_outline)
@@ -1,8 +1,11 @@
 """匯出服務 - 支援 Markdown 和 HTML 格式"""
 import logging
 import os
-import re
 from typing import Dict, List, Any, Optional
+from PIL import Image
+from backend.config import Config
+from backend.services.document import escape_html, parse_content, render_blocks_html
+from backend.utils.renditions import list_renditions
 
 logger = logging.getLogger(__name__)
 
@@ -16,45 +19,6 @@ class ExportService:
             "history"
         )
 
-    def _parse_page_content(self, content: str) -> Dict[str, str]:
-        """
-        解析頁面內容，提取標題和正文
-
-        Args:
-            content: 頁面原始內容
-
-        Returns:
-            包含 title 和 body 的字典
-        """
-        lines = content.strip().split('\n')
-        title = ""
-        body_lines = []
-        in_body = False
-
-        for line in lines:
-            line = line.strip()
-            # 跳過類型標記
-            if re.match(r'\[.*\]', line):
-                continue
-            # 處理標題行
-            if line.startswith('標題：') or line.startswith('标题：'):
-                title = line.replace('標題：', '').replace('标题：', '').strip()
-            elif line.startswith('副標題：') or line.startswith('副标题：'):
-                # 副標題作為正文的一部分
-                subtitle = line.replace('副標題：', '').replace('副标题：', '').strip()
-                if subtitle:
-                    body_lines.append(f"*{subtitle}*")
-            elif line.startswith('配圖建議：') or line.startswith('配图建议：'):
-                # 跳過配圖建議
-                continue
-            elif line:
-                body_lines.append(line)
-
-        return {
-            "title": title,
-            "body": '\n'.join(body_lines)
-        }
-
     def export_to_markdown(
         self,
         task_id: str,
@@ -81,37 +45,30 @@ class ExportService:
             content = page.get("content", "")
             index = page.get("index", 0)
 
-            parsed = self._parse_page_content(content)
+            parsed = parse_content(content)
 
             if page_type == "cover":
                 # 封面：大標題
-                if parsed["title"]:
-                    markdown_parts.append(f"# {parsed['title']}\n")
-                if parsed["body"]:
-                    markdown_parts.append(f"{parsed['body']}\n")
+                if parsed.title:
+                    markdown_parts.append(f"# {parsed.title}\n")
+                if parsed.body:
+                    markdown_parts.append(f"{parsed.body}\n")
             elif page_type == "intro":
                 # 前言
                 markdown_parts.append("## 前言\n")
-                if parsed["body"]:
-                    markdown_parts.append(f"{parsed['body']}\n")
+                if parsed.body:
+                    markdown_parts.append(f"{parsed.body}\n")
             elif page_type == "summary":
                 # 結論
                 markdown_parts.append("## 結論\n")
-                if parsed["body"]:
-                    markdown_parts.append(f"{parsed['body']}\n")
+                if parsed.body:
+                    markdown_parts.append(f"{parsed.body}\n")
+            elif parsed.heading:
+                # 一般內容：第一行作為小標題
+                markdown_parts.append(f"## {parsed.heading}\n")
+                markdown_parts.append(f"{parsed.heading_body}\n")
             else:
-                # 一般內容
-                # 嘗試從內容中提取小標題
-                lines = parsed["body"].split('\n')
-                if lines and not lines[0].startswith('•') and not lines[0].startswith('-'):
-                    first_line = lines[0].strip()
-                    if len(first_line) < 50 and not first_line.endswith('：'):
-                        markdown_parts.append(f"## {first_line}\n")
-                        markdown_parts.append('\n'.join(lines[1:]) + '\n')
-                    else:
-                        markdown_parts.append(f"{parsed['body']}\n")
-                else:
-                    markdown_parts.append(f"{parsed['body']}\n")
+                markdown_parts.append(f"{parsed.body}\n")
 
             # 添加圖片
             if include_images:
@@ -133,7 +90,8 @@ class ExportService:
         pages: List[Dict[str, Any]],
         include_images: bool = True,
         image_base_url: str = "/api/images",
-        include_style: bool = True
+        include_style: bool = True,
+        include_srcset: bool = True
     ) -> str:
         """
         匯出為 HTML 格式
@@ -144,6 +102,7 @@ class ExportService:
             include_images: 是否包含圖片
             image_base_url: 圖片 URL 前綴
             include_style: 是否包含內建樣式
+            include_srcset: 是否依已產生的 WebP 版本輸出 srcset（圖片 URL 需指向本服務的圖片 API）
 
         Returns:
             HTML 格式的文章內容
@@ -211,37 +170,32 @@ class ExportService:
             content = page.get("content", "")
             index = page.get("index", 0)
 
-            parsed = self._parse_page_content(content)
+            parsed = parse_content(content)
 
             if page_type == "cover":
-                if parsed["title"]:
-                    html_parts.append(f'<h1>{self._escape_html(parsed["title"])}</h1>\n')
-                if parsed["body"]:
-                    html_parts.append(f'<p class="subtitle">{self._format_html_content(parsed["body"])}</p>\n')
+                if parsed.title:
+                    html_parts.append(f'<h1>{self._escape_html(parsed.title)}</h1>\n')
+                if parsed.blocks:
+                    html_parts.append(f'<div class="subtitle">{render_blocks_html(parsed.blocks)}</div>\n')
             elif page_type == "intro":
                 html_parts.append('<h2>前言</h2>\n')
-                if parsed["body"]:
-                    html_parts.append(f'<div>{self._format_html_content(parsed["body"])}</div>\n')
+                if parsed.blocks:
+                    html_parts.append(f'<div>{render_blocks_html(parsed.blocks)}</div>\n')
             elif page_type == "summary":
                 html_parts.append('<h2>結論</h2>\n')
-                if parsed["body"]:
-                    html_parts.append(f'<div>{self._format_html_content(parsed["body"])}</div>\n')
+                if parsed.blocks:
+                    html_parts.append(f'<div>{render_blocks_html(parsed.blocks)}</div>\n')
+            elif parsed.heading:
+                html_parts.append(f'<h2>{self._escape_html(parsed.heading)}</h2>\n')
+                html_parts.append(f'<div>{render_blocks_html(parsed.heading_blocks)}</div>\n')
             else:
-                lines = parsed["body"].split('\n')
-                if lines and not lines[0].startswith('•') and not lines[0].startswith('-'):
-                    first_line = lines[0].strip()
-                    if len(first_line) < 50 and not first_line.endswith('：'):
-                        html_parts.append(f'<h2>{self._escape_html(first_line)}</h2>\n')
-                        html_parts.append(f'<div>{self._format_html_content(chr(10).join(lines[1:]))}</div>\n')
-                    else:
-                        html_parts.append(f'<div>{self._format_html_content(parsed["body"])}</div>\n')
-                else:
-                    html_parts.append(f'<div>{self._format_html_content(parsed["body"])}</div>\n')
+                html_parts.append(f'<div>{render_blocks_html(parsed.blocks)}</div>\n')
 
             # 添加圖片
             if include_images:
                 image_url = f"{image_base_url}/{task_id}/{index}.png"
-                html_parts.append(f'<img src="{image_url}" alt="圖片 {index + 1}" loading="lazy">\n')
+                srcset = self._build_srcset(task_id, f"{index}.png", image_url) if include_srcset else ""
+                html_parts.append(f'<img src="{image_url}"{srcset} alt="圖片 {index + 1}" loading="lazy">\n')
 
             html_parts.append('<hr>\n')
 
@@ -253,53 +207,59 @@ class ExportService:
 
         return result
 
-    def _escape_html(self, text: str) -> str:
-        """轉義 HTML 特殊字符"""
-        return (text
-                .replace('&', '&amp;')
-                .replace('<', '&lt;')
-                .replace('>', '&gt;')
-                .replace('"', '&quot;')
-                .replace("'", '&#39;'))
-
-    def _format_html_content(self, text: str) -> str:
-        """格式化內容為 HTML"""
-        lines = text.split('\n')
-        result = []
-        in_list = False
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                if in_list:
-                    result.append('</ul>')
-                    in_list = False
-                continue
-
-            # 處理列表項
-            if line.startswith('•') or line.startswith('-') or line.startswith('*'):
-                if not in_list:
-                    result.append('<ul>')
-                    in_list = True
-                item = line.lstrip('•-* ').strip()
-                result.append(f'<li>{self._escape_html(item)}</li>')
-            # 處理編號列表
-            elif re.match(r'^\d+\.', line):
-                if not in_list:
-                    result.append('<ol>')
-                    in_list = True
-                item = re.sub(r'^\d+\.\s*', '', line).strip()
-                result.append(f'<li>{self._escape_html(item)}</li>')
-            else:
-                if in_list:
-                    result.append('</ul>' if '•' in text or '-' in text else '</ol>')
-                    in_list = False
-                result.append(f'<p>{self._escape_html(line)}</p>')
+    def build_html_document(self, html_content: str, title: str = "部落格文章") -> str:
+        """
+        包裝成完整的 HTML 文件
+
+        Args:
+            html_content: export_to_html 的輸出
+            title: 頁面標題
 
-        if in_list:
-            result.append('</ul>')
+        Returns:
+            完整的 HTML 文件
+        """
+        return f"""<!DOCTYPE html>
+<html lang="zh-TW">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{self._escape_html(title)}</title>
+</head>
+<body>
+{html_content}
+</body>
+</html>"""
+
+    def _build_srcset(self, task_id: str, filename: str, image_url: str) -> str:
+        """
+        產生 srcset / sizes 屬性
 
-        return '\n'.join(result)
+        Args:
+            task_id: 任務 ID
+            filename: 原圖檔名
+            image_url: 原圖 URL
+
+        Returns:
+            以空白開頭的屬性字串；沒有 WebP 版本（舊任務或未啟用）時返回空字串
+        """
+        task_dir = os.path.join(self.history_root_dir, task_id)
+        renditions = list_renditions(task_dir, filename, Config.IMAGE_RENDITION_WIDTHS)
+        if not renditions:
+            return ""
+
+        candidates = [f"{image_url}?w={width} {width}w" for width, _ in renditions]
+        try:
+            # 只讀取檔頭取得原圖寬度，作為最大的候選（不帶參數的 URL 會返回縮圖，需指定原圖）
+            with Image.open(os.path.join(task_dir, filename)) as img:
+                candidates.append(f"{image_url}?thumbnail=false {img.width}w")
+        except OSError:
+            pass
+
+        return f' srcset="{", ".join(candidates)}" sizes="(max-width: 800px) 100vw, 800px"'
+
+    def _escape_html(self, text: str) -> str:
+        """轉義 HTML 特殊字符"""
+        return escape_html(text)
 
 
 def get_export_service() -> ExportService:
@@ -1,6 +1,8 @@
 import os
+import glob
 import json
 import uuid
+import threading
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
@@ -15,6 +17,8 @@ class HistoryService:
         os.makedirs(self.history_dir, exist_ok=True)
 
         self.index_file = os.path.join(self.history_dir, "index.json")
+        # index.json 是读-改-写，并发任务（如批量生成）需要串行化
+        self._index_lock = threading.RLock()
         self._init_index()
 
     def _init_index(self):
@@ -63,18 +67,19 @@ class HistoryService:
         with open(record_path, "w", encoding="utf-8") as f:
             json.dump(record, f, ensure_ascii=False, indent=2)
 
-        index = self._load_index()
-        index["records"].insert(0, {
-            "id": record_id,
-            "title": topic,
-            "created_at": now,
-            "updated_at": now,
-            "status": "draft",
-            "thumbnail": None,
-            "page_count": len(outline.get("pages", [])),
-            "task_id": task_id
-        })
-        self._save_index(index)
+        with self._index_lock:
+            index = self._load_index()
+            index["records"].insert(0, {
+                "id": record_id,
+                "title": topic,
+                "created_at": now,
+                "updated_at": now,
+                "status": "draft",
+                "thumbnail": None,
+                "page_count": len(outline.get("pages", [])),
+                "task_id": task_id
+            })
+            self._save_index(index)
 
         return record_id
 
@@ -121,21 +126,22 @@ class HistoryService:
         with open(record_path, "w", encoding="utf-8") as f:
             json.dump(record, f, ensure_ascii=False, indent=2)
 
-        index = self._load_index()
-        for idx_record in index["records"]:
-            if idx_record["id"] == record_id:
-                idx_record["updated_at"] = now
-                if status:
-                    idx_record["status"] = status
-                if thumbnail:
-                    idx_record["thumbnail"] = thumbnail
-                if outline:
-                    idx_record["page_count"] = len(outline.get("pages", []))
-                if images is not None and images.get("task_id"):
-                    idx_record["task_id"] = images.get("task_id")
-                break
-
-        self._save_index(index)
+        with self._index_lock:
+            index = self._load_index()
+            for idx_record in index["records"]:
+                if idx_record["id"] == record_id:
+                    idx_record["updated_at"] = now
+                    if status:
+                        idx_record["status"] = status
+                    if thumbnail:
+                        idx_record["thumbnail"] = thumbnail
+                    if outline:
+                        idx_record["page_count"] = len(outline.get("pages", []))
+                    if images is not None and images.get("task_id"):
+                        idx_record["task_id"] = images.get("task_id")
+                    break
+
+            self._save_index(index)
         return True
 
     def delete_record(self, record_id: str) -> bool:
@@ -155,6 +161,13 @@ class HistoryService:
                 except Exception as e:
                     print(f"删除任务目录失败: {task_dir}, {e}")
 
+            # 删除打包下载时缓存的 ZIP
+            for zip_path in glob.glob(os.path.join(self.history_dir, ".cache", "zips", f"{glob.escape(task_id)}-*.zip")):
+                try:
+                    os.remove(zip_path)
+                except OSError:
+                    pass
+
         # 删除记录JSON文件
         record_path = self._get_record_path(record_id)
         try:
@@ -163,9 +176,10 @@ class HistoryService:
             return False
 
         # 更新索引
-        index = self._load_index()
-        index["records"] = [r for r in index["records"] if r["id"] != record_id]
-        self._save_index(index)
+        with self._index_lock:
+            index = self._load_index()
+            index["records"] = [r for r in index["records"] if r["id"] != record_id]
+            self._save_index(index)
 
         return True
 
@@ -342,8 +356,8 @@ class HistoryService:
             for item in os.listdir(self.history_dir):
                 item_path = os.path.join(self.history_dir, item)
 
-                # 只处理目录（任务文件夹）
-                if not os.path.isdir(item_path):
+                # 只处理目录（任务文件夹），跳过 .tmp 等隐藏目录
+                if not os.path.isdir(item_path) or item.startswith('.'):
                     continue
 
                 # 假设任务文件夹名就是 task_id
@@ -378,10 +392,14 @@ class HistoryService:
 
 
 _service_instance = None
+_service_lock = threading.Lock()
 
 
 def get_history_service() -> HistoryService:
     global _service_instance
+    # 只能有一个实例：index.json 的读-改-写靠实例上的 _index_lock 串行化
     if _service_instance is None:
-        _service_instance = HistoryService()
+        with _service_lock:
+            if _service_instance is None:
+                _service_instance = HistoryService()
     return _service_instance
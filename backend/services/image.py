@@ -3,23 +3,129 @@ import logging
 import os
 import uuid
 import time
+import math
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, Any, Generator, List, Optional, Tuple
+import contextvars
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Dict, Any, Generator, List, Optional, Tuple, Union
 from backend.config import Config
-from backend.generators.factory import ImageGeneratorFactory
-from backend.utils.image_compressor import compress_image
+from backend.generators.registry import GENERATOR_REGISTRY, config_hash
+from backend.services.outline import get_outline_service
+from backend.utils.image_compressor import compress_image, compress_image_file
+from backend.utils.config_store import CONFIG_STORE
+from backend.utils.renditions import generate_renditions
+from backend.utils.metrics import PROMPT_CHARS, observe_stage, record_failure, record_retry
+from backend.utils.prompt_compaction import PromptStats, build_outline_brief, truncate_text
+from backend.utils.streaming import StreamedImage, discard_image, write_bytes_atomic
+from backend.utils.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
 
+class ImageTaskContext:
+    """
+    Execution context of one image generation task
+
+    Holds the task's output directory, inputs and results. It is passed explicitly
+    through generation, saving and state updates, so concurrent tasks running on the
+    same ImageService never write into each other's directories or states.
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        task_dir: str,
+        pages: Optional[list] = None,
+        full_outline: str = "",
+        user_images: Optional[List[bytes]] = None,
+        user_topic: str = "",
+        image_style: str = "flat"
+    ):
+        self.task_id = task_id
+        self.task_dir = task_dir
+        self.pages = pages or []
+        self.full_outline = full_outline
+        self.user_images = user_images
+        self.user_topic = user_topic
+        self.image_style = image_style
+        self.cover_image: Optional[bytes] = None
+        self.generated: Dict[int, str] = {}
+        self.failed: Dict[int, str] = {}
+        self.prompt_stats = PromptStats()
+        self.page_prompts: Dict[int, Tuple[str, str]] = {}  # index -> (page content, distilled prompt)
+        self._brief: Optional[Tuple[Tuple[str, str], Tuple[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def compact_context(self, full_outline: str, user_topic: str) -> Tuple[str, str]:
+        """
+        Outline brief and user topic to send with each page prompt
+
+        Extracted once per task (again only if a retry passes a different outline).
+        """
+        with self._lock:
+            if self._brief is None or self._brief[0] != (full_outline, user_topic):
+                max_chars = Config.PROMPT_BRIEF_MAX_CHARS
+                self._brief = (
+                    (full_outline, user_topic),
+                    (build_outline_brief(full_outline, max_chars), truncate_text(user_topic, max_chars))
+                )
+            return self._brief[1]
+
+    def page_prompt(self, page: Dict) -> str:
+        """Distilled image prompt of a page, or its raw content (not distilled / edited since)"""
+        entry = self.page_prompts.get(page["index"])
+        return entry[1] if entry and entry[0] == page["content"] else page["content"]
+
+    def mark_generated(self, index: int, filename: str):
+        """Record a generated page (clears an earlier failure)"""
+        with self._lock:
+            self.generated[index] = filename
+            self.failed.pop(index, None)
+
+    def mark_failed(self, index: int, error: str):
+        """Record a failed page"""
+        with self._lock:
+            self.failed[index] = error
+
+    def to_state(self) -> Dict[str, Any]:
+        """Task state as a plain dict (copies, safe to read while the task runs)"""
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "generated": dict(self.generated),
+                "failed": dict(self.failed),
+                "cover_image": self.cover_image,
+                "full_outline": self.full_outline,
+                "user_images": self.user_images,
+                "user_topic": self.user_topic,
+                "image_style": self.image_style,
+                "prompt_stats": self.prompt_stats.to_dict()
+            }
+
+
 class ImageService:
-    """Image Generation Service Class"""
+    """
+    Image Generation Service Class
+
+    One instance is bound to one provider config (see provider_key). Generators come
+    from the shared registry, and task states are shared by all instances, so
+    replacing the instance after a config change keeps retries and warm clients.
+    """
 
     # Concurrency Config
     MAX_CONCURRENT = 15  # Max concurrent
     AUTO_RETRY_COUNT = 3  # Auto retry count
 
+    # Hedged request Config
+    HEDGE_MIN_SAMPLES = 5  # Latency samples needed before using the percentile
+    HEDGE_HISTORY_SIZE = 200  # Recent latencies kept for the percentile
+
+    # Task contexts (for retry), shared across instances
+    _task_states: Dict[str, ImageTaskContext] = {}
+    _task_states_lock = threading.Lock()
+
     def __init__(self, provider_name: str = None):
         """
         Initialize image generation service
@@ -29,24 +135,39 @@ class ImageService:
         """
         logger.debug("Initializing ImageService...")
 
+        # Config snapshot version this instance was built from
+        self.config_version = CONFIG_STORE.get('image_providers').version
+
         # Get provider config
         if provider_name is None:
             provider_name = Config.get_active_image_provider()
 
-        logger.info(f"Using image provider: {provider_name}")
+        logger.info("Using image provider: %s", provider_name)
         provider_config = Config.get_image_provider_config(provider_name)
 
-        # Create generator instance
+        # Get generator instance (reused while this provider's config is unchanged)
         provider_type = provider_config.get('type', provider_name)
-        logger.debug(f"Creating generator: type={provider_type}")
-        self.generator = ImageGeneratorFactory.create(provider_type, provider_config)
+        self.generator = GENERATOR_REGISTRY.get(provider_name, provider_config)
+        self.provider_key = self.build_provider_key(provider_name, provider_config)
 
         # Save config info
         self.provider_name = provider_name
         self.provider_config = provider_config
 
+        # Metric labels for this provider
+        self._metric_labels = {
+            "provider": provider_name,
+            "model": provider_config.get('model', '')
+        }
+
         # Check if short prompt mode is enabled
         self.use_short_prompt = provider_config.get('short_prompt', False)
+        # Full prompt mode: send an outline brief instead of the whole outline (opt-in,
+        # the brief drops per-page detail the model may use for consistency)
+        self.compact_prompt = provider_config.get('compact_prompt', False)
+        # Replace raw page text with visual prompts distilled by one text model call per task
+        # (opt-in: it adds a text provider call and dependency to every task)
+        self.distill_prompt = provider_config.get('distill_prompt', False)
 
         # Load prompt templates
         self.prompt_template = self._load_prompt_template()
@@ -59,13 +180,17 @@ class ImageService:
         )
         os.makedirs(self.history_root_dir, exist_ok=True)
 
-        # Current task output directory
-        self.current_task_dir = None
-
-        # Store task states (for retry)
-        self._task_states: Dict[str, Dict] = {}
+        # Hedged requests: duplicate slow calls after a latency percentile
+        self.hedge_enabled = provider_config.get('hedge_enabled', False)
+        self.hedge_percentile = float(provider_config.get('hedge_percentile', 90))
+        self.hedge_initial_delay = float(provider_config.get('hedge_initial_delay', 60))
+        self.hedge_min_delay = float(provider_config.get('hedge_min_delay', 5))
+        # Recent successful call latencies per provider (primary and hedge kept apart)
+        self._latencies: Dict[str, deque] = {}
+        self._latency_lock = threading.Lock()
+        self._hedge_generator = None
 
-        logger.info(f"ImageService initialized: provider={provider_name}, type={provider_type}")
+        logger.info("ImageService initialized: provider=%s, type=%s", provider_name, provider_type)
 
     def _load_prompt_template(self, short: bool = False) -> str:
         """Load Prompt template"""
@@ -81,155 +206,450 @@ class ImageService:
         with open(prompt_path, "r", encoding="utf-8") as f:
             return f.read()
 
-    def _save_image(self, image_data: bytes, filename: str, task_dir: str = None) -> str:
+    def _save_image(self, image_data: Union[bytes, StreamedImage], filename: str, task_dir: str) -> str:
         """
-        Save image to local, also generate thumbnail
+        Save image to local, also generate thumbnail and WebP renditions
+
+        Streamed images are renamed into the task dir; bytes are written to a temp file
+        and renamed, so readers never see a partially written image.
 
         Args:
-            image_data: Image binary data
+            image_data: Image binary data, or a StreamedImage decoded into a temp file
             filename: File name
-            task_dir: Task directory (if None use current task dir)
+            task_dir: Task directory
 
         Returns:
             Saved file path
         """
-        if task_dir is None:
-            task_dir = self.current_task_dir
-
-        if task_dir is None:
+        if not task_dir:
+            discard_image(image_data)
             raise ValueError("Task directory not set")
 
-        # Save original image
-        filepath = os.path.join(task_dir, filename)
-        with open(filepath, "wb") as f:
-            f.write(image_data)
-
-        # Generate thumbnail (~50KB)
-        thumbnail_data = compress_image(image_data, max_size_kb=50)
-        thumbnail_filename = f"thumb_{filename}"
-        thumbnail_path = os.path.join(task_dir, thumbnail_filename)
-        with open(thumbnail_path, "wb") as f:
-            f.write(thumbnail_data)
+        with start_span("image.save", filename=filename, bytes=len(image_data)):
+            # Save original image
+            filepath = os.path.join(task_dir, filename)
+            with observe_stage('disk_write', **self._metric_labels):
+                if isinstance(image_data, StreamedImage):
+                    image_data.save_to(filepath)
+                else:
+                    write_bytes_atomic(image_data, filepath)
+
+            # Generate thumbnail (~50KB) from the saved file, without reading it into memory
+            with observe_stage('thumbnail', **self._metric_labels):
+                thumbnail_data = compress_image_file(filepath, max_size_kb=50)
+            thumbnail_filename = f"thumb_{filename}"
+            thumbnail_path = os.path.join(task_dir, thumbnail_filename)
+            with observe_stage('disk_write', **self._metric_labels):
+                write_bytes_atomic(thumbnail_data, thumbnail_path)
+
+            # Generate WebP renditions (optional, the original is always kept)
+            if Config.IMAGE_RENDITION_WIDTHS:
+                try:
+                    with observe_stage('renditions', **self._metric_labels):
+                        generate_renditions(
+                            filepath, Config.IMAGE_RENDITION_WIDTHS, Config.IMAGE_RENDITION_QUALITY
+                        )
+                except Exception as e:
+                    logger.warning("Failed to generate renditions for %s: %s", filename, e)
 
         return filepath
 
     def _generate_single_image(
         self,
         page: Dict,
-        task_id: str,
+        task: ImageTaskContext,
         reference_image: Optional[bytes] = None,
         retry_count: int = 0,
         full_outline: str = "",
         user_images: Optional[List[bytes]] = None,
         user_topic: str = "",
-        image_style: str = "flat"
+        image_style: str = "flat",
+        prompt: Optional[str] = None
     ) -> Tuple[int, bool, Optional[str], Optional[str]]:
         """
         Generate single image (with auto retry)
 
         Args:
             page: Page data
-            task_id: Task ID
+            task: Task context (output directory)
             reference_image: Reference image (cover image)
             retry_count: Current retry count
             full_outline: Full outline text
             user_images: User uploaded reference images list
             user_topic: User original input
             image_style: Image style (flat, tech, minimal, photo, sketch, infographic, cinematic, brand)
+            prompt: Prompt already built (and counted in prompt stats) for the first attempt
 
         Returns:
             (index, success, filename, error_message)
         """
         index = page["index"]
         page_type = page["type"]
-        page_content = page["content"]
 
         max_retries = self.AUTO_RETRY_COUNT
 
         # Get style prompt
         style_prompt = self._get_image_style_prompt(image_style)
 
-        for attempt in range(max_retries):
-            try:
-                logger.debug(f"Generating image [{index}]: type={page_type}, style={image_style}, attempt={attempt + 1}/{max_retries}")
-
-                # Select template based on config (short prompt or full prompt)
-                if self.use_short_prompt and self.prompt_template_short:
-                    # Short prompt mode: only page type and content
-                    prompt = self.prompt_template_short.format(
-                        page_content=page_content,
-                        page_type=page_type,
-                        image_style=style_prompt
-                    )
-                    logger.debug(f"  Using short prompt mode ({len(prompt)} chars)")
-                else:
-                    # Full prompt mode: include outline and user requirements
-                    prompt = self.prompt_template.format(
-                        page_content=page_content,
-                        page_type=page_type,
-                        full_outline=full_outline,
-                        user_topic=user_topic if user_topic else "Not provided",
-                        image_style=style_prompt
-                    )
+        with start_span("image.page", trace_id=task.task_id, index=index, type=page_type) as span:
+            for attempt in range(max_retries):
+                try:
+                    logger.debug("Generating image [%s]: type=%s, style=%s, attempt=%s/%s", index, page_type, image_style, attempt + 1, max_retries)
 
-                # Call generator to generate image
-                if self.provider_config.get('type') == 'google_genai':
-                    logger.debug(f"  Using Google GenAI generator")
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        aspect_ratio=self.provider_config.get('default_aspect_ratio', '16:9'),
-                        temperature=self.provider_config.get('temperature', 1.0),
-                        model=self.provider_config.get('model', 'gemini-3-pro-image-preview'),
-                        reference_image=reference_image,
-                    )
-                elif self.provider_config.get('type') == 'image_api':
-                    logger.debug(f"  Using Image API generator")
-                    # Image API supports multiple reference images
-                    # Combine reference images: user uploaded + cover
-                    reference_images = []
-                    if user_images:
-                        reference_images.extend(user_images)
-                    if reference_image:
-                        reference_images.append(reference_image)
-
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        aspect_ratio=self.provider_config.get('default_aspect_ratio', '16:9'),
-                        temperature=self.provider_config.get('temperature', 1.0),
-                        model=self.provider_config.get('model', 'nano-banana-2'),
-                        reference_images=reference_images if reference_images else None,
-                    )
-                else:
-                    logger.debug(f"  Using OpenAI compatible generator")
-                    image_data = self.generator.generate_image(
-                        prompt=prompt,
-                        size=self.provider_config.get('default_size', '1024x1024'),
-                        model=self.provider_config.get('model'),
-                        quality=self.provider_config.get('quality', 'standard'),
-                    )
+                    if prompt is None or attempt > 0:
+                        with observe_stage('prompt_build', **self._metric_labels):
+                            prompt = self._build_prompt(page, task, full_outline, user_topic, style_prompt)
 
-                # Save image (use current task directory)
-                filename = f"{index}.png"
-                self._save_image(image_data, filename, self.current_task_dir)
-                logger.info(f"[OK] Image [{index}] generated: {filename}")
+                    # Call generator to generate image (hedged if enabled)
+                    if self.hedge_enabled:
+                        image_data = self._hedged_generate(
+                            index, prompt, reference_image, user_images, cache_scope=task.task_id
+                        )
+                    else:
+                        image_data = self._timed_generate(
+                            self.generator, self.provider_config, prompt, reference_image, user_images,
+                            cache_scope=task.task_id
+                        )
 
-                return (index, True, filename, None)
+                    # Save image into this task's directory
+                    filename = f"{index}.png"
+                    self._save_image(image_data, filename, task.task_dir)
+                    logger.info("[OK] Image [%s] generated: %s", index, filename)
 
-            except Exception as e:
-                error_msg = str(e)
-                logger.warning(f"Image [{index}] failed (attempt {attempt + 1}/{max_retries}): {error_msg[:200]}")
-
-                if attempt < max_retries - 1:
-                    # Wait and retry
-                    wait_time = 2 ** attempt
-                    logger.debug(f"  Waiting {wait_time}s before retry...")
-                    time.sleep(wait_time)
+                    span.set_attribute("attempts", attempt + 1)
+                    return (index, True, filename, None)
+
+                except Exception as e:
+                    error_msg = str(e)
+                    logger.warning("Image [%s] failed (attempt %s/%s): %s", index, attempt + 1, max_retries, error_msg[:200])
+                    record_failure('image_service', e, **self._metric_labels)
+
+                    if attempt < max_retries - 1:
+                        # Wait and retry
+                        record_retry('image_service', e, **self._metric_labels)
+                        wait_time = 2 ** attempt
+                        logger.debug("  Waiting %ss before retry...", wait_time)
+                        time.sleep(wait_time)
+                        continue
+
+                    logger.error("[FAIL] Image [%s] failed, max retries reached", index)
+                    span.set_attribute("attempts", max_retries)
+                    span.set_error(error_msg)
+                    return (index, False, None, error_msg)
+
+            span.set_error("Max retries exceeded")
+            return (index, False, None, "Max retries exceeded")
+
+    def _invoke_generator(
+        self,
+        generator,
+        provider_config: Dict,
+        prompt: str,
+        reference_image: Optional[bytes] = None,
+        user_images: Optional[List[bytes]] = None,
+        cache_scope: Optional[str] = None
+    ) -> Union[bytes, StreamedImage]:
+        """
+        Call a generator with the parameters its provider type expects
+
+        cache_scope (the task id) lets generators with file_upload enabled upload each
+        reference image once per task and refer to it by file id afterwards.
+        """
+        if provider_config.get('type') == 'google_genai':
+            logger.debug("  Using Google GenAI generator")
+            return generator.generate_image(
+                prompt=prompt,
+                aspect_ratio=provider_config.get('default_aspect_ratio', '16:9'),
+                temperature=provider_config.get('temperature', 1.0),
+                model=provider_config.get('model', 'gemini-3-pro-image-preview'),
+                reference_image=reference_image,
+                cache_scope=cache_scope,
+            )
+        elif provider_config.get('type') == 'image_api':
+            logger.debug("  Using Image API generator")
+            # Image API supports multiple reference images
+            # Combine reference images: user uploaded + cover
+            reference_images = []
+            if user_images:
+                reference_images.extend(user_images)
+            if reference_image:
+                reference_images.append(reference_image)
+
+            return generator.generate_image(
+                prompt=prompt,
+                aspect_ratio=provider_config.get('default_aspect_ratio', '16:9'),
+                temperature=provider_config.get('temperature', 1.0),
+                model=provider_config.get('model', 'nano-banana-2'),
+                reference_images=reference_images if reference_images else None,
+                cache_scope=cache_scope,
+            )
+        else:
+            logger.debug("  Using OpenAI compatible generator")
+            return generator.generate_image(
+                prompt=prompt,
+                size=provider_config.get('default_size', '1024x1024'),
+                model=provider_config.get('model'),
+                quality=provider_config.get('quality', 'standard'),
+            )
+
+    def _timed_generate(
+        self,
+        generator,
+        provider_config: Dict,
+        prompt: str,
+        reference_image: Optional[bytes] = None,
+        user_images: Optional[List[bytes]] = None,
+        cache_scope: Optional[str] = None
+    ) -> Union[bytes, StreamedImage]:
+        """Call generator and record the latency of successful calls (feeds the hedge delay)"""
+        provider = getattr(generator, 'provider_name', '')
+        model = provider_config.get('model', '')
+        start_time = time.time()
+        with start_span("image.provider_call", provider=provider, model=model), \
+                observe_stage('provider_call', provider=provider, model=model):
+            image_data = self._invoke_generator(
+                generator, provider_config, prompt, reference_image, user_images, cache_scope
+            )
+        with self._latency_lock:
+            samples = self._latencies.get(provider)
+            if samples is None:
+                samples = self._latencies[provider] = deque(maxlen=self.HEDGE_HISTORY_SIZE)
+            samples.append(time.time() - start_time)
+        return image_data
+
+    def _hedge_delay(self) -> float:
+        """Seconds to wait before issuing the duplicate request (from the primary provider's latencies)"""
+        provider = getattr(self.generator, 'provider_name', self.provider_name)
+        with self._latency_lock:
+            samples = sorted(self._latencies.get(provider, ()))
+
+        if len(samples) < self.HEDGE_MIN_SAMPLES:
+            return self.hedge_initial_delay
+
+        rank = max(0, math.ceil(self.hedge_percentile / 100 * len(samples)) - 1)
+        return max(samples[rank], self.hedge_min_delay)
+
+    def _get_hedge_target(self) -> Tuple[Any, Dict]:
+        """Generator used for the duplicate request (secondary provider if configured)"""
+        hedge_provider = self.provider_config.get('hedge_provider')
+        if not hedge_provider or hedge_provider == self.provider_name:
+            return self.generator, self.provider_config
+
+        with self._latency_lock:
+            if self._hedge_generator is None:
+                hedge_config = Config.get_image_provider_config(hedge_provider)
+                self._hedge_generator = (GENERATOR_REGISTRY.get(hedge_provider, hedge_config), hedge_config)
+                logger.info("Hedge provider ready: %s", hedge_provider)
+        return self._hedge_generator
+
+    @staticmethod
+    def build_provider_key(provider_name: str, provider_config: Dict[str, Any]) -> Tuple[str, ...]:
+        """
+        Identity of the provider config an instance is bound to
+
+        Covers the provider's own config and, when hedging to another provider, that
+        provider's config too. Changes to unrelated providers don't change the key.
+        """
+        key = (provider_name, config_hash(provider_config))
+        hedge_provider = provider_config.get('hedge_provider')
+        if provider_config.get('hedge_enabled') and hedge_provider and hedge_provider != provider_name:
+            hedge_config = Config.load_image_providers_config().get('providers', {}).get(hedge_provider, {})
+            key += (hedge_provider, config_hash(hedge_config))
+        return key
+
+    def _hedged_generate(
+        self,
+        index: int,
+        prompt: str,
+        reference_image: Optional[bytes] = None,
+        user_images: Optional[List[bytes]] = None,
+        cache_scope: Optional[str] = None
+    ) -> Union[bytes, StreamedImage]:
+        """
+        Hedged request: if the primary call is slower than the latency percentile,
+        issue a duplicate and take whichever finishes first
+
+        The loser is cancelled if it has not started yet; a call already in flight cannot
+        be interrupted, so its result is simply discarded when it returns.
+        """
+        executor = _get_hedge_executor()
+        primary = executor.submit(
+            contextvars.copy_context().run, self._timed_generate,
+            self.generator, self.provider_config, prompt, reference_image, user_images, cache_scope
+        )
+        delay = self._hedge_delay()
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_generator, hedge_config = self._get_hedge_target()
+        logger.info("Image [%s] slower than %.1fs, issuing hedged request", index, delay)
+        hedge = executor.submit(
+            contextvars.copy_context().run, self._timed_generate,
+            hedge_generator, hedge_config, prompt, reference_image, user_images, cache_scope
+        )
+        pending = {primary, hedge}
+        last_error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    image_data = future.result()
+                except Exception as e:
+                    last_error = e
                     continue
 
-                logger.error(f"[FAIL] Image [{index}] failed, max retries reached")
-                return (index, False, None, error_msg)
+                for loser in (pending | done) - {future}:
+                    loser.cancel()
+                    # Streamed results of a loser that still finishes are temp files; drop them
+                    loser.add_done_callback(_discard_future_result)
+                logger.debug("  Image [%s] won by %s request", index, 'hedge' if future is hedge else 'primary')
+                return image_data
+
+        raise last_error
+
+    def _build_prompt(
+        self,
+        page: Dict,
+        task: ImageTaskContext,
+        full_outline: str,
+        user_topic: str,
+        style_prompt: str
+    ) -> str:
+        """Build image prompt for one page (size recorded in the task's prompt stats)"""
+        page_content = task.page_prompt(page)
+        saved = len(page["content"]) - len(page_content)
+
+        # Select template based on config (short prompt or full prompt)
+        if self.use_short_prompt and self.prompt_template_short:
+            # Short prompt mode: only page type and content
+            prompt = self.prompt_template_short.format(
+                page_content=page_content,
+                page_type=page["type"],
+                image_style=style_prompt
+            )
+            logger.debug("  Using short prompt mode (%s chars)", len(prompt))
+            self._record_prompt(task, prompt, saved)
+            return prompt
+
+        # Full prompt mode: include outline (or its brief) and user requirements
+        outline_text, topic_text = full_outline, user_topic
+        if self.compact_prompt:
+            outline_text, topic_text = task.compact_context(full_outline, user_topic)
+
+        prompt = self.prompt_template.format(
+            page_content=page_content,
+            page_type=page["type"],
+            full_outline=outline_text,
+            user_topic=topic_text if topic_text else "Not provided",
+            image_style=style_prompt
+        )
+        saved += len(full_outline) - len(outline_text) + len(user_topic) - len(topic_text)
+        self._record_prompt(task, prompt, saved)
+        return prompt
+
+    def _record_prompt(self, task: ImageTaskContext, prompt: str, saved: int):
+        """Record the size of a prompt about to be sent"""
+        task.prompt_stats.record(len(prompt), len(prompt) + saved)
+        PROMPT_CHARS.inc(len(prompt), kind='sent', provider=self.provider_name)
+        if saved > 0:
+            PROMPT_CHARS.inc(saved, kind='saved', provider=self.provider_name)
+
+    def _distill_page_prompts(self, task: ImageTaskContext):
+        """
+        Distill visual prompts for all pages of a task with one text model call
+
+        Cached by outline hash in OutlineService. On failure the raw page text is used.
+        """
+        if not self.distill_prompt or not task.pages:
+            return
+        try:
+            prompts = get_outline_service().generate_image_prompts(
+                task.pages, task.full_outline, task.user_topic
+            )
+        except Exception as e:
+            logger.warning("Image prompt distillation failed, using page text: %s", str(e)[:200])
+            return
+        task.page_prompts = {
+            page["index"]: (page["content"], prompts[page["index"]])
+            for page in task.pages if page["index"] in prompts
+        }
+        logger.debug("Distilled image prompts: %s/%s pages", len(task.page_prompts), len(task.pages))
+
+    def _generate_batch_images(
+        self,
+        pages: List[Dict],
+        task: ImageTaskContext,
+        reference_image: Optional[bytes] = None,
+        full_outline: str = "",
+        user_images: Optional[List[bytes]] = None,
+        user_topic: str = "",
+        image_style: str = "flat"
+    ) -> Generator[Tuple[str, Any], None, None]:
+        """
+        Generate pages through the generator's batch path, split results back per page
+
+        The batch call runs in a worker thread; while the provider's batch job is polled,
+        its status is yielded as ("progress", data) so the SSE stream keeps moving. Each
+        page then yields ("result", (index, success, filename, error_message)).
+
+        Pages missing from the batch output (or when the whole batch fails) fall back to
+        the single-image path with its usual retries, cover reference and user images.
+        """
+        style_prompt = self._get_image_style_prompt(image_style)
+        with observe_stage('prompt_build', **self._metric_labels):
+            batch_requests = [
+                {
+                    "custom_id": str(page["index"]),
+                    "prompt": self._build_prompt(page, task, full_outline, user_topic, style_prompt),
+                    "size": self.provider_config.get('default_size', '1024x1024'),
+                    "model": self.provider_config.get('model'),
+                    "quality": self.provider_config.get('quality', 'standard'),
+                }
+                for page in pages
+            ]
 
-        return (index, False, None, "Max retries exceeded")
+        def call_batch():
+            with start_span("image.provider_batch_call", pages=len(batch_requests), **self._metric_labels), \
+                    observe_stage('provider_call', **self._metric_labels):
+                return self.generator.generate_images_batch(batch_requests, progress_callback=updates.put)
+
+        updates: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-batch") as executor:
+            future = executor.submit(contextvars.copy_context().run, call_batch)
+            while not future.done() or not updates.empty():
+                try:
+                    update = updates.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                yield ("progress", update)
+
+        try:
+            outputs = future.result()
+        except Exception as e:
+            logger.warning("Batch generation failed, falling back to single requests: %s", str(e)[:200])
+            outputs = {}
+
+        prompts = {request["custom_id"]: request["prompt"] for request in batch_requests}
+        for page in pages:
+            index = page["index"]
+            output = outputs.get(str(index))
+
+            if isinstance(output, (bytes, StreamedImage)):
+                filename = f"{index}.png"
+                self._save_image(output, filename, task.task_dir)
+                logger.info("[OK] Image [%s] generated (batch): %s", index, filename)
+                yield ("result", (index, True, filename, None))
+                continue
+
+            if output is not None:
+                logger.warning("Image [%s] failed in batch: %s", index, str(output)[:200])
+            # Reuse the batch prompt so the page is counted once in the prompt stats
+            yield ("result", self._generate_single_image(
+                page, task, reference_image, 0, full_outline, user_images, user_topic, image_style,
+                prompt=prompts[str(index)]
+            ))
 
     def _get_image_style_prompt(self, style: str) -> str:
         """根據圖片風格返回對應的提示詞"""
@@ -272,12 +692,30 @@ class ImageService:
         if task_id is None:
             task_id = f"task_{uuid.uuid4().hex[:8]}"
 
-        logger.info(f"Starting image generation task: task_id={task_id}, pages={len(pages)}")
-
-        # Create task directory
-        self.current_task_dir = os.path.join(self.history_root_dir, task_id)
-        os.makedirs(self.current_task_dir, exist_ok=True)
-        logger.debug(f"Task directory: {self.current_task_dir}")
+        with start_span(
+            "image.generate_images", trace_id=task_id,
+            pages=len(pages), image_style=image_style, **self._metric_labels
+        ) as span:
+            for event in self._generate_images(
+                pages, task_id, full_outline, user_images, user_topic, image_style
+            ):
+                if event["event"] == "finish":
+                    span.set_attribute("completed", event["data"]["completed"])
+                    span.set_attribute("failed", event["data"]["failed"])
+                    span.set_attribute("prompt_chars_saved", event["data"]["prompt_stats"]["saved_chars"])
+                yield event
+
+    def _generate_images(
+        self,
+        pages: list,
+        task_id: str,
+        full_outline: str = "",
+        user_images: Optional[List[bytes]] = None,
+        user_topic: str = "",
+        image_style: str = "flat"
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Image generation events for one task (see generate_images)"""
+        logger.info("Starting image generation task: task_id=%s, pages=%s", task_id, len(pages))
 
         total = len(pages)
         generated_images = []
@@ -287,19 +725,26 @@ class ImageService:
         # Compress user uploaded reference images to <200KB (reduce memory and transfer overhead)
         compressed_user_images = None
         if user_images:
-            compressed_user_images = [compress_image(img, max_size_kb=200) for img in user_images]
-
-        # Initialize task state
-        self._task_states[task_id] = {
-            "pages": pages,
-            "generated": {},
-            "failed": {},
-            "cover_image": None,
-            "full_outline": full_outline,
-            "user_images": compressed_user_images,
-            "user_topic": user_topic,
-            "image_style": image_style
-        }
+            with observe_stage('reference_compress', **self._metric_labels):
+                compressed_user_images = [compress_image(img, max_size_kb=200) for img in user_images]
+
+        # Create task context (output directory + state for retries)
+        task = ImageTaskContext(
+            task_id,
+            os.path.join(self.history_root_dir, task_id),
+            pages=pages,
+            full_outline=full_outline,
+            user_images=compressed_user_images,
+            user_topic=user_topic,
+            image_style=image_style
+        )
+        os.makedirs(task.task_dir, exist_ok=True)
+        logger.debug("Task directory: %s", task.task_dir)
+        with self._task_states_lock:
+            self._task_states[task_id] = task
+
+        # One text call for all page prompts (before the cover, which every page follows)
+        self._distill_page_prompts(task)
 
         # ==================== Phase 1: Generate Cover ====================
         cover_page = None
@@ -332,23 +777,24 @@ class ImageService:
 
             # Generate cover (use user uploaded images as reference)
             index, success, filename, error = self._generate_single_image(
-                cover_page, task_id, reference_image=None, full_outline=full_outline,
+                cover_page, task, reference_image=None, full_outline=full_outline,
                 user_images=compressed_user_images, user_topic=user_topic,
                 image_style=image_style
             )
 
             if success:
                 generated_images.append(filename)
-                self._task_states[task_id]["generated"][index] = filename
+                task.mark_generated(index, filename)
 
                 # Read cover image as reference, compress to <200KB
-                cover_path = os.path.join(self.current_task_dir, filename)
+                cover_path = os.path.join(task.task_dir, filename)
                 with open(cover_path, "rb") as f:
                     cover_image_data = f.read()
 
                 # Compress cover image (reduce memory and transfer overhead)
-                cover_image_data = compress_image(cover_image_data, max_size_kb=200)
-                self._task_states[task_id]["cover_image"] = cover_image_data
+                with observe_stage('reference_compress', **self._metric_labels):
+                    cover_image_data = compress_image(cover_image_data, max_size_kb=200)
+                task.cover_image = cover_image_data
 
                 yield {
                     "event": "complete",
@@ -361,7 +807,7 @@ class ImageService:
                 }
             else:
                 failed_pages.append(cover_page)
-                self._task_states[task_id]["failed"][index] = error
+                task.mark_failed(index, error)
 
                 yield {
                     "event": "error",
@@ -379,7 +825,82 @@ class ImageService:
             # Check if high concurrency mode is enabled
             high_concurrency = self.provider_config.get('high_concurrency', False)
 
-            if high_concurrency:
+            if self.generator.supports_batch():
+                # Batch mode: provider generates all pages in as few requests as possible
+                yield {
+                    "event": "progress",
+                    "data": {
+                        "status": "batch_start",
+                        "message": f"Starting batch generation of {len(other_pages)} pages...",
+                        "current": len(generated_images),
+                        "total": total,
+                        "phase": "content"
+                    }
+                }
+
+                for page in other_pages:
+                    yield {
+                        "event": "progress",
+                        "data": {
+                            "index": page["index"],
+                            "status": "generating",
+                            "current": len(generated_images) + 1,
+                            "total": total,
+                            "phase": "content"
+                        }
+                    }
+
+                for kind, value in self._generate_batch_images(
+                    other_pages, task, cover_image_data, full_outline,
+                    compressed_user_images, user_topic, image_style
+                ):
+                    if kind == "progress":
+                        # Provider batch job status while it is being polled
+                        yield {
+                            "event": "progress",
+                            "data": {
+                                "status": "batch_polling",
+                                "message": (
+                                    f"Batch job {value.get('status')}: "
+                                    f"{value.get('completed', 0)}/{value.get('total', len(other_pages))} done"
+                                ),
+                                "batch": value,
+                                "current": len(generated_images),
+                                "total": total,
+                                "phase": "content"
+                            }
+                        }
+                        continue
+
+                    index, success, filename, error = value
+                    if success:
+                        generated_images.append(filename)
+                        task.mark_generated(index, filename)
+
+                        yield {
+                            "event": "complete",
+                            "data": {
+                                "index": index,
+                                "status": "done",
+                                "image_url": f"/api/images/{task_id}/{filename}",
+                                "phase": "content"
+                            }
+                        }
+                    else:
+                        failed_pages.append(next(p for p in other_pages if p["index"] == index))
+                        task.mark_failed(index, error)
+
+                        yield {
+                            "event": "error",
+                            "data": {
+                                "index": index,
+                                "status": "error",
+                                "message": error,
+                                "retryable": True,
+                                "phase": "content"
+                            }
+                        }
+            elif high_concurrency:
                 # High concurrency mode: parallel generation
                 yield {
                     "event": "progress",
@@ -397,9 +918,10 @@ class ImageService:
                     # Submit all tasks
                     future_to_page = {
                         executor.submit(
+                            contextvars.copy_context().run,
                             self._generate_single_image,
                             page,
-                            task_id,
+                            task,
                             cover_image_data,  # 使用封面作为参考
                             0,  # retry_count
                             full_outline,  # 传入完整大纲
@@ -431,7 +953,7 @@ class ImageService:
 
                             if success:
                                 generated_images.append(filename)
-                                self._task_states[task_id]["generated"][index] = filename
+                                task.mark_generated(index, filename)
 
                                 yield {
                                     "event": "complete",
@@ -444,7 +966,7 @@ class ImageService:
                                 }
                             else:
                                 failed_pages.append(page)
-                                self._task_states[task_id]["failed"][index] = error
+                                task.mark_failed(index, error)
 
                                 yield {
                                     "event": "error",
@@ -460,7 +982,7 @@ class ImageService:
                         except Exception as e:
                             failed_pages.append(page)
                             error_msg = str(e)
-                            self._task_states[task_id]["failed"][page["index"]] = error_msg
+                            task.mark_failed(page["index"], error_msg)
 
                             yield {
                                 "event": "error",
@@ -501,7 +1023,7 @@ class ImageService:
                     # Generate single image
                     index, success, filename, error = self._generate_single_image(
                         page,
-                        task_id,
+                        task,
                         cover_image_data,
                         0,
                         full_outline,
@@ -512,7 +1034,7 @@ class ImageService:
 
                     if success:
                         generated_images.append(filename)
-                        self._task_states[task_id]["generated"][index] = filename
+                        task.mark_generated(index, filename)
 
                         yield {
                             "event": "complete",
@@ -525,7 +1047,7 @@ class ImageService:
                         }
                     else:
                         failed_pages.append(page)
-                        self._task_states[task_id]["failed"][index] = error
+                        task.mark_failed(index, error)
 
                         yield {
                             "event": "error",
@@ -539,6 +1061,12 @@ class ImageService:
                         }
 
         # ==================== Finish ====================
+        prompt_stats = task.prompt_stats.to_dict()
+        logger.info(
+            "Prompt size: task_id=%s, prompts=%s, sent=%s chars, saved=%s chars (%.0f%%)",
+            task_id, prompt_stats["prompts"], prompt_stats["sent_chars"],
+            prompt_stats["saved_chars"], prompt_stats["saved_ratio"] * 100
+        )
         yield {
             "event": "finish",
             "data": {
@@ -548,7 +1076,8 @@ class ImageService:
                 "total": total,
                 "completed": len(generated_images),
                 "failed": len(failed_pages),
-                "failed_indices": [p["index"] for p in failed_pages]
+                "failed_indices": [p["index"] for p in failed_pages],
+                "prompt_stats": prompt_stats
             }
         }
 
@@ -559,7 +1088,8 @@ class ImageService:
         use_reference: bool = True,
         full_outline: str = "",
         user_topic: str = "",
-        image_style: str = ""
+        image_style: str = "",
+        user_images: Optional[List[bytes]] = None
     ) -> Dict[str, Any]:
         """
         Retry generating single image
@@ -571,29 +1101,23 @@ class ImageService:
             full_outline: Full outline text (from frontend)
             user_topic: User original input (from frontend)
             image_style: Image style (from frontend or task state)
+            user_images: User reference images (compressed), used when the task state has none
 
         Returns:
             Generation result
         """
-        self.current_task_dir = os.path.join(self.history_root_dir, task_id)
-        os.makedirs(self.current_task_dir, exist_ok=True)
-
-        reference_image = None
-        user_images = None
-
-        # First try to get context from task state
-        if task_id in self._task_states:
-            task_state = self._task_states[task_id]
-            if use_reference:
-                reference_image = task_state.get("cover_image")
-            # If no context passed, use task state
-            if not full_outline:
-                full_outline = task_state.get("full_outline", "")
-            if not user_topic:
-                user_topic = task_state.get("user_topic", "")
-            if not image_style:
-                image_style = task_state.get("image_style", "flat")
-            user_images = task_state.get("user_images")
+        task = self._get_task_context(task_id)
+
+        reference_image = task.cover_image if use_reference else None
+        user_images = task.user_images or user_images
+
+        # If no context passed, use task state
+        if not full_outline:
+            full_outline = task.full_outline
+        if not user_topic:
+            user_topic = task.user_topic
+        if not image_style:
+            image_style = task.image_style
 
         # Default image style if not set
         if not image_style:
@@ -601,16 +1125,17 @@ class ImageService:
 
         # If no cover in task state, try to load from file system
         if use_reference and reference_image is None:
-            cover_path = os.path.join(self.current_task_dir, "0.png")
+            cover_path = os.path.join(task.task_dir, "0.png")
             if os.path.exists(cover_path):
                 with open(cover_path, "rb") as f:
                     cover_data = f.read()
                 # Compress cover to 200KB
-                reference_image = compress_image(cover_data, max_size_kb=200)
+                with observe_stage('reference_compress', **self._metric_labels):
+                    reference_image = compress_image(cover_data, max_size_kb=200)
 
         index, success, filename, error = self._generate_single_image(
             page,
-            task_id,
+            task,
             reference_image,
             0,
             full_outline,
@@ -620,10 +1145,7 @@ class ImageService:
         )
 
         if success:
-            if task_id in self._task_states:
-                self._task_states[task_id]["generated"][index] = filename
-                if index in self._task_states[task_id]["failed"]:
-                    del self._task_states[task_id]["failed"][index]
+            task.mark_generated(index, filename)
 
             return {
                 "success": True,
@@ -654,19 +1176,7 @@ class ImageService:
             Progress events
         """
         # Get reference image and other context from task state
-        reference_image = None
-        full_outline = ""
-        user_images = None
-        user_topic = ""
-        image_style = "flat"
-
-        if task_id in self._task_states:
-            task_state = self._task_states[task_id]
-            reference_image = task_state.get("cover_image")
-            full_outline = task_state.get("full_outline", "")
-            user_images = task_state.get("user_images")
-            user_topic = task_state.get("user_topic", "")
-            image_style = task_state.get("image_style", "flat")
+        task = self._get_task_context(task_id)
 
         total = len(pages)
         success_count = 0
@@ -683,15 +1193,16 @@ class ImageService:
         with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT) as executor:
             future_to_page = {
                 executor.submit(
+                    contextvars.copy_context().run,
                     self._generate_single_image,
                     page,
-                    task_id,
-                    reference_image,
+                    task,
+                    task.cover_image,
                     0,  # retry_count
-                    full_outline,
-                    user_images,
-                    user_topic,
-                    image_style
+                    task.full_outline,
+                    task.user_images,
+                    task.user_topic,
+                    task.image_style
                 ): page
                 for page in pages
             }
@@ -703,10 +1214,7 @@ class ImageService:
 
                     if success:
                         success_count += 1
-                        if task_id in self._task_states:
-                            self._task_states[task_id]["generated"][index] = filename
-                            if index in self._task_states[task_id]["failed"]:
-                                del self._task_states[task_id]["failed"][index]
+                        task.mark_generated(index, filename)
 
                         yield {
                             "event": "complete",
@@ -756,7 +1264,8 @@ class ImageService:
         page: Dict,
         use_reference: bool = True,
         full_outline: str = "",
-        user_topic: str = ""
+        user_topic: str = "",
+        user_images: Optional[List[bytes]] = None
     ) -> Dict[str, Any]:
         """
         Regenerate image (user triggered, can regenerate even successful ones)
@@ -767,6 +1276,7 @@ class ImageService:
             use_reference: Whether to use cover as reference
             full_outline: Full outline text
             user_topic: User original input
+            user_images: User reference images (compressed), used when the task state has none
 
         Returns:
             Generation result
@@ -774,7 +1284,8 @@ class ImageService:
         return self.retry_single_image(
             task_id, page, use_reference,
             full_outline=full_outline,
-            user_topic=user_topic
+            user_topic=user_topic,
+            user_images=user_images
         )
 
     def get_image_path(self, task_id: str, filename: str) -> str:
@@ -791,27 +1302,102 @@ class ImageService:
         task_dir = os.path.join(self.history_root_dir, task_id)
         return os.path.join(task_dir, filename)
 
+    def _get_task_context(self, task_id: str) -> ImageTaskContext:
+        """
+        Context of an existing task (for retries)
+
+        Falls back to a fresh, unregistered context when the task state is gone
+        (e.g. after a restart); results are then only written to disk.
+        """
+        with self._task_states_lock:
+            task = self._task_states.get(task_id)
+        if task is None:
+            task = ImageTaskContext(task_id, os.path.join(self.history_root_dir, task_id))
+        os.makedirs(task.task_dir, exist_ok=True)
+        return task
+
     def get_task_state(self, task_id: str) -> Optional[Dict]:
         """Get task state"""
-        return self._task_states.get(task_id)
+        with self._task_states_lock:
+            task = self._task_states.get(task_id)
+        return task.to_state() if task else None
 
     def cleanup_task(self, task_id: str):
-        """Cleanup task state (free memory)"""
-        if task_id in self._task_states:
-            del self._task_states[task_id]
+        """Cleanup task state (free memory) and files uploaded to providers for it"""
+        with self._task_states_lock:
+            self._task_states.pop(task_id, None)
+
+        generators = [self.generator]
+        if self._hedge_generator is not None:
+            generators.append(self._hedge_generator[0])
+        for generator in generators:
+            try:
+                generator.release_files(task_id)
+            except Exception as e:
+                logger.debug("Failed to release provider files of task %s: %s", task_id, e)
+
+
+# Pool running hedged calls, shared by all instances so replacing the service doesn't leak threads
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Shared pool for hedged calls, created on first use (primary + duplicate per concurrent image)"""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=ImageService.MAX_CONCURRENT * 2,
+                    thread_name_prefix="hedge"
+                )
+    return _hedge_executor
+
+
+def _discard_future_result(future):
+    """Done callback: remove the temp file of an unused hedged result"""
+    if not future.cancelled() and future.exception() is None:
+        discard_image(future.result())
 
 
 # Global service instance
 _service_instance = None
+_service_lock = threading.Lock()
 
 def get_image_service() -> ImageService:
-    """Get global image generation service instance"""
+    """
+    Get global image generation service instance (thread-safe)
+
+    When the image config is republished, the instance is replaced only if the
+    active provider (or its hedge provider) changed; requests already running keep
+    the instance they started with.
+    """
     global _service_instance
-    if _service_instance is None:
+    snapshot = CONFIG_STORE.get('image_providers')
+    service = _service_instance
+    if service is not None and service.config_version == snapshot.version:
+        return service
+
+    with _service_lock:
+        snapshot = CONFIG_STORE.get('image_providers')
+        service = _service_instance
+        if service is not None and service.config_version == snapshot.version:
+            return service
+
+        if service is not None:
+            provider_name = Config.get_active_image_provider()
+            provider_config = Config.get_image_provider_config(provider_name)
+            if ImageService.build_provider_key(provider_name, provider_config) == service.provider_key:
+                service.config_version = snapshot.version
+                return service
+
+        GENERATOR_REGISTRY.prune(snapshot.get('providers', {}).keys())
         _service_instance = ImageService()
-    return _service_instance
+        return _service_instance
 
 def reset_image_service():
-    """Reset global service instance (call after config update)"""
+    """Reset global service instance (not needed after config updates, see get_image_service)"""
     global _service_instance
-    _service_instance = None
+    with _service_lock:
+        _service_instance = None
@@ -0,0 +1,408 @@
+"""
+圖床上傳服務
+
+- 並行上傳（有上限的執行緒池），每個圖床各自限速（token bucket）
+- 失敗自動重試（指數退避）
+- 內容雜湊 -> 公開 URL 的持久快取：內容沒變的圖片不會重新上傳（每批上傳寫回一次，LRU 淘汰）
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from backend.config import Config
+from backend.utils.image_serving import FILE_INFO_CACHE
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES, record_failure, record_retry
+
+logger = logging.getLogger(__name__)
+
+# 持久快取檔案（history 下的隱藏目錄，不會被任務掃描當成任務）
+UPLOAD_CACHE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "history",
+    ".cache",
+    "upload_urls.json"
+)
+
+# 上傳單一檔案的函式：參數為檔案路徑，返回公開 URL
+# （或含 url 及其他欄位的 dict，其他欄位會一併快取），失敗時拋出例外
+UploadFunc = Callable[[str], Union[str, Dict[str, Any]]]
+
+
+def file_digest(path: str) -> str:
+    """圖片內容雜湊（與圖片 ETag 共用快取，檔案沒變時不重新計算）"""
+    return FILE_INFO_CACHE.get(path, os.stat(path)).etag
+
+
+class HostRateLimiter:
+    """
+    單一圖床的限速器（token bucket）
+
+    Args:
+        rate: 每秒請求數
+        burst: 允許的瞬間請求數
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個請求額度（不足時等待）"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class UploadUrlCache:
+    """
+    內容雜湊 -> 公開 URL 的持久快取
+
+    鍵為「圖床:雜湊」，同一張圖片上傳到不同圖床各自記錄。
+    set 只更新記憶體，由 flush 一次寫回檔案；超過 MAX_ENTRIES 時淘汰最久沒用到的記錄。
+    """
+
+    MAX_ENTRIES = 5000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: "Optional[OrderedDict[str, Dict]]" = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> "OrderedDict[str, Dict]":
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = OrderedDict(json.load(f))
+            except FileNotFoundError:
+                self._entries = OrderedDict()
+            except Exception as e:
+                logger.warning("讀取上傳快取失敗，將重新建立: %s", e)
+                self._entries = OrderedDict()
+        return self._entries
+
+    def get(self, host: str, digest: str) -> Optional[Dict]:
+        """取得快取的上傳結果（含 url），沒有時返回 None"""
+        key = f"{host}:{digest}"
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry:
+                entries.move_to_end(key)
+        if entry:
+            CACHE_HITS.inc(cache='upload_url')
+        else:
+            CACHE_MISSES.inc(cache='upload_url')
+        return entry
+
+    def set(self, host: str, digest: str, url: str, **extra):
+        """記錄上傳結果（呼叫 flush 後才寫回檔案）"""
+        key = f"{host}:{digest}"
+        with self._lock:
+            entries = self._load()
+            entries[key] = {
+                "url": url,
+                "uploaded_at": datetime.now().isoformat(),
+                **extra
+            }
+            entries.move_to_end(key)
+            while len(entries) > self.MAX_ENTRIES:
+                entries.popitem(last=False)
+            self._dirty = True
+
+    def discard(self, host: str, digest: str):
+        """移除失效的快取（例如圖床上的圖片已被刪除）"""
+        with self._lock:
+            if self._load().pop(f"{host}:{digest}", None) is not None:
+                self._dirty = True
+        self.flush()
+
+    def flush(self):
+        """將尚未寫入的變更寫回檔案（寫入暫存檔後改名）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.part"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning("寫入上傳快取失敗，下次上傳後重試: %s", e)
+
+
+UPLOAD_URL_CACHE = UploadUrlCache(UPLOAD_CACHE_FILE)
+
+
+class ConcurrentUploader:
+    """
+    並行上傳到單一圖床
+
+    Args:
+        host: 圖床名稱（快取鍵與限速設定使用）
+        max_workers: 最大並行數
+        rate: 每秒請求數
+        retries: 失敗重試次數
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_workers: int = 4,
+        rate: float = 2.0,
+        retries: int = 3
+    ):
+        self.host = host
+        self.max_workers = max_workers
+        self.retries = retries
+        self.limiter = HostRateLimiter(rate, burst=max_workers)
+
+    def _upload_with_retry(self, path: str, upload_func: UploadFunc) -> Dict[str, Any]:
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                result = upload_func(path)
+                return result if isinstance(result, dict) else {"url": result}
+            except Exception as e:
+                record_failure('upload', e, provider=self.host)
+                if attempt >= self.retries:
+                    raise
+                record_retry('upload', e, provider=self.host)
+                wait_time = 2 ** attempt + random.uniform(0, 0.5)
+                logger.warning("上傳到 %s 失敗，%.1f 秒後重試 (%s/%s): %s", self.host, wait_time, attempt + 1, self.retries, e)
+                time.sleep(wait_time)
+
+    def _upload_and_cache(self, path: str, digest: str, upload_func: UploadFunc) -> Dict[str, Any]:
+        """上傳並記錄到快取（呼叫端中途離開時，已完成的上傳也會保留）"""
+        result = self._upload_with_retry(path, upload_func)
+        extra = {k: v for k, v in result.items() if k != "url"}
+        UPLOAD_URL_CACHE.set(self.host, digest, result["url"], **extra)
+        return dict(result, cached=False)
+
+    def upload_file(self, path: str, upload_func: UploadFunc) -> Dict[str, Any]:
+        """
+        上傳單一檔案（已上傳過的相同內容直接返回快取的結果）
+
+        Args:
+            path: 檔案路徑
+            upload_func: 上傳單一檔案的函式
+
+        Returns:
+            上傳結果（含 url、cached）；失敗時拋出例外
+        """
+        digest = file_digest(path)
+        cached = UPLOAD_URL_CACHE.get(self.host, digest)
+        if cached:
+            return dict(cached, cached=True)
+        try:
+            return self._upload_and_cache(path, digest, upload_func)
+        finally:
+            UPLOAD_URL_CACHE.flush()
+
+    def upload_one(self, path: str, upload_func: UploadFunc) -> str:
+        """上傳單一檔案並返回公開 URL；失敗時拋出例外"""
+        return self.upload_file(path, upload_func)["url"]
+
+    def iter_upload(
+        self,
+        paths: List[Optional[str]],
+        upload_func: UploadFunc
+    ) -> Iterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+        """
+        並行上傳多個檔案，依完成順序產生結果
+
+        內容相同的檔案只上傳一次；已在快取中的先產生（cached=True），不會上傳。
+        快取檔案在整批結束時寫回一次。中途停止迭代時，尚未開始的上傳會取消，
+        進行中的上傳完成後仍會寫入快取，下次以同樣的列表呼叫即可從中斷處繼續。
+
+        Args:
+            paths: 檔案路徑列表（None 表示略過，不產生結果）
+            upload_func: 上傳單一檔案的函式
+
+        Yields:
+            (位置, 上傳結果 dict（含 url、cached）或例外)
+        """
+        pending: Dict[str, List[int]] = {}  # 雜湊 -> 位置
+        first_path: Dict[str, str] = {}
+
+        for position, path in enumerate(paths):
+            if not path:
+                continue
+            try:
+                digest = file_digest(path)
+            except OSError as e:
+                yield position, e
+                continue
+
+            cached = UPLOAD_URL_CACHE.get(self.host, digest)
+            if cached:
+                yield position, dict(cached, cached=True)
+                continue
+            pending.setdefault(digest, []).append(position)
+            first_path.setdefault(digest, path)
+
+        if not pending:
+            return
+
+        logger.info("上傳 %s 張圖片到 %s", len(pending), self.host)
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending)))
+        futures = {}
+        try:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, self._upload_and_cache, first_path[digest], digest, upload_func
+                ): digest
+                for digest in pending
+            }
+            for future in as_completed(futures):
+                digest = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error("上傳到 %s 失敗: %s: %s", self.host, first_path[digest], e)
+                    result = e
+                for position in pending[digest]:
+                    yield position, result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            UPLOAD_URL_CACHE.flush()
+            for future in futures:
+                if not future.done():
+                    future.add_done_callback(lambda _: UPLOAD_URL_CACHE.flush())
+
+    def upload_many(self, paths: List[Optional[str]], upload_func: UploadFunc) -> List[str]:
+        """
+        並行上傳多個檔案
+
+        Args:
+            paths: 檔案路徑列表（None 表示略過）
+            upload_func: 上傳單一檔案的函式
+
+        Returns:
+            與 paths 順序相同的 URL 列表，失敗或略過的位置為空字串
+        """
+        urls = [''] * len(paths)
+        for position, result in self.iter_upload(paths, upload_func):
+            if not isinstance(result, Exception):
+                urls[position] = result["url"]
+        return urls
+
+
+class StreamingMultipartBody:
+    """
+    從磁碟串流讀取的 multipart/form-data 請求內容
+
+    requests 會依 len() 設定 Content-Length 並分塊呼叫 read()，
+    不必先把整個檔案讀進記憶體或轉成 base64。
+
+    Args:
+        fields: 一般欄位
+        file_field: 檔案欄位名稱
+        path: 檔案路徑
+        content_type: 檔案類型
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fields: Dict[str, str], file_field: str, path: str,
+                 content_type: str = "application/octet-stream"):
+        self.boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            )
+        filename = os.path.basename(path).replace('"', '')
+        parts.append(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        self._head = "".join(parts).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._file = open(path, "rb")
+        self._length = len(self._head) + os.fstat(self._file.fileno()).st_size + len(self._tail)
+        self._stage = 0  # 0 = head, 1 = file, 2 = tail, 3 = done
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        while size > 0 and self._stage < 3:
+            if self._stage == 0:
+                chunk, self._head = self._head[:size], self._head[size:]
+                if not self._head:
+                    self._stage = 1
+            elif self._stage == 1:
+                chunk = self._file.read(min(size, self.CHUNK_SIZE))
+                if not chunk:
+                    self._file.close()
+                    self._stage = 2
+                    continue
+            else:
+                chunk, self._tail = self._tail[:size], self._tail[size:]
+                if not self._tail:
+                    self._stage = 3
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        self._file.close()
+
+
+# 圖床 -> (建立時的設定, 上傳器)
+_uploaders: Dict[str, Tuple[Tuple[int, float, int], ConcurrentUploader]] = {}
+_uploaders_lock = threading.Lock()
+
+
+def get_uploader(host: str) -> ConcurrentUploader:
+    """
+    取得圖床的共用上傳器（同一圖床共用限速器）
+
+    上傳函式由每次呼叫傳入，共用上傳器本身不保存，並行的請求互不影響。
+    IMAGE_HOST_MAX_WORKERS、IMAGE_HOST_RATE_LIMITS 或 IMAGE_HOST_RETRIES 變更後，
+    下次取得時以新設定重建；進行中的上傳繼續使用舊的上傳器。
+    """
+    settings = (
+        Config.IMAGE_HOST_MAX_WORKERS,
+        Config.IMAGE_HOST_RATE_LIMITS.get(host, 2.0),
+        Config.IMAGE_HOST_RETRIES
+    )
+    with _uploaders_lock:
+        entry = _uploaders.get(host)
+        if entry is not None and entry[0] == settings:
+            return entry[1]
+
+        max_workers, rate, retries = settings
+        uploader = ConcurrentUploader(host, max_workers=max_workers, rate=rate, retries=retries)
+        _uploaders[host] = (settings, uploader)
+        if entry is not None:
+            logger.info("圖床 %s 的上傳設定已變更，重建上傳器", host)
+        return uploader
@@ -2,40 +2,74 @@ import logging
 import os
 import re
 import base64
-import yaml
-from pathlib import Path
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional
+from backend.config import Config
+from backend.utils.config_store import CONFIG_STORE
 from backend.utils.text_client import get_text_chat_client
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES, observe_stage
+from backend.utils.tracing import start_span
 
 logger = logging.getLogger(__name__)
 
 
+class _ImagePromptCache:
+    """大綱雜湊 -> 各頁圖片提示詞（LRU 淘汰，跨服務實例共用）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Dict[int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[int, str]]:
+        with self._lock:
+            prompts = self._entries.get(key)
+            if prompts is not None:
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc(cache='image_prompts')
+                return prompts
+        CACHE_MISSES.inc(cache='image_prompts')
+        return None
+
+    def set(self, key: str, prompts: Dict[int, str]):
+        with self._lock:
+            self._entries[key] = prompts
+            self._entries.move_to_end(key)
+            while len(self._entries) > Config.IMAGE_PROMPT_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+
+_image_prompt_cache = _ImagePromptCache()
+
+
+def outline_hash(full_outline: str, pages: List[Dict[str, Any]], user_topic: str = "") -> str:
+    """大綱、使用者需求與各頁內容的雜湊（使用者修改任何一頁都會得到新的雜湊）"""
+    payload = json.dumps(
+        [full_outline, user_topic, [[page["index"], page["content"]] for page in pages]],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
 class OutlineService:
     def __init__(self):
         logger.debug("初始化 OutlineService...")
         self.text_config = self._load_text_config()
         self.client = self._get_client()
         self.prompt_template = self._load_prompt_template()
-        logger.info(f"OutlineService 初始化完成，使用服務商: {self.text_config.get('active_provider')}")
+        self.image_prompt_template = self._load_prompt_template("image_prompt_distill.txt")
+        logger.info("OutlineService 初始化完成，使用服務商: %s", self.text_config.get('active_provider'))
 
     def _load_text_config(self) -> dict:
-        """載入文字生成配置"""
-        config_path = Path(__file__).parent.parent.parent / 'text_providers.yaml'
-        logger.debug(f"載入文字配置: {config_path}")
+        """載入文字生成配置（配置存儲中的快照，不重新解析 YAML）"""
+        snapshot = CONFIG_STORE.get('text_providers')
+        self.config_version = snapshot.version
 
-        if config_path.exists():
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = yaml.safe_load(f) or {}
-                logger.debug(f"文字配置載入成功: active={config.get('active_provider')}")
-                return config
-            except yaml.YAMLError as e:
-                logger.error(f"文字配置 YAML 解析失敗: {e}")
-                raise ValueError(
-                    f"文字配置檔案格式錯誤: text_providers.yaml\n"
-                    f"YAML 解析錯誤: {e}\n"
-                    "解決方案：檢查 YAML 縮排和語法"
-                )
+        if snapshot.exists:
+            logger.debug("文字配置載入成功: active=%s (v%s)", snapshot.get('active_provider'), snapshot.version)
+            return snapshot.data
 
         logger.warning("text_providers.yaml 不存在，使用預設配置")
         # 預設配置
@@ -81,7 +115,7 @@ class OutlineService:
 
         if active_provider not in providers:
             available = ', '.join(providers.keys())
-            logger.error(f"文字服務商 [{active_provider}] 不存在，可用: {available}")
+            logger.error("文字服務商 [%s] 不存在，可用: %s", active_provider, available)
             raise ValueError(
                 f"未找到文字生成服務商配置: {active_provider}\n"
                 f"可用的服務商: {available}\n"
@@ -92,20 +126,20 @@ class OutlineService:
 
         api_key = provider_config.get('api_key', '')
         if not self._is_valid_api_key(api_key):
-            logger.error(f"文字服務商 [{active_provider}] 未配置有效的 API Key")
+            logger.error("文字服務商 [%s] 未配置有效的 API Key", active_provider)
             raise ValueError(
                 f"文字服務商 {active_provider} 未配置有效的 API Key\n"
                 "解決方案：在系統設定頁面編輯該服務商，填寫 API Key"
             )
 
-        logger.info(f"使用文字服務商: {active_provider} (type={provider_config.get('type')})")
+        logger.info("使用文字服務商: %s (type=%s)", active_provider, provider_config.get('type'))
         return get_text_chat_client(provider_config)
 
-    def _load_prompt_template(self) -> str:
+    def _load_prompt_template(self, filename: str = "outline_prompt.txt") -> str:
         prompt_path = os.path.join(
             os.path.dirname(os.path.dirname(__file__)),
             "prompts",
-            "outline_prompt.txt"
+            filename
         )
         with open(prompt_path, "r", encoding="utf-8") as f:
             return f.read()
@@ -147,6 +181,83 @@ class OutlineService:
 
         return pages
 
+    def _parse_image_prompts(self, text: str, indices: List[int]) -> Dict[int, str]:
+        """解析模型回傳的 JSON 陣列（容許前後多餘文字或 ``` 區塊）"""
+        start, end = text.find('['), text.rfind(']')
+        if start < 0 or end <= start:
+            raise ValueError("回傳內容中找不到 JSON 陣列")
+        items = json.loads(text[start:end + 1])
+
+        wanted = set(indices)
+        prompts = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("index"))
+            except (TypeError, ValueError):
+                continue
+            prompt = str(item.get("prompt") or "").strip()
+            if index in wanted and prompt:
+                prompts[index] = prompt
+        return prompts
+
+    def generate_image_prompts(
+        self,
+        pages: List[Dict[str, Any]],
+        full_outline: str,
+        user_topic: str = ""
+    ) -> Dict[int, str]:
+        """
+        一次文字模型呼叫，為所有頁面產生精簡的圖片提示詞（依大綱雜湊快取）
+
+        Args:
+            pages: 頁面列表（index / type / content）
+            full_outline: 完整大綱
+            user_topic: 使用者原始需求
+
+        Returns:
+            頁面 index -> 圖片提示詞（模型漏掉的頁面不會出現，呼叫端應改用頁面原文）
+
+        Raises:
+            Exception: 呼叫失敗或回傳內容無法解析
+        """
+        key = outline_hash(full_outline, pages, user_topic)
+        cached = _image_prompt_cache.get(key)
+        if cached is not None:
+            return cached
+
+        pages_text = "\n\n".join(
+            f"[index={page['index']}] ({page['type']})\n{page['content']}" for page in pages
+        )
+        prompt = self.image_prompt_template.format(
+            user_topic=user_topic or "未提供",
+            full_outline=full_outline,
+            pages=pages_text
+        )
+
+        active_provider = self.text_config.get('active_provider', 'google_gemini')
+        provider_config = self.text_config.get('providers', {}).get(active_provider, {})
+        model = provider_config.get('model', 'gemini-2.0-flash-exp')
+
+        with start_span("outline.image_prompts", provider=active_provider, model=model, pages=len(pages)) as span, \
+                observe_stage('prompt_distill', provider=active_provider, model=model):
+            text = self.client.generate_text(
+                prompt=prompt,
+                model=model,
+                temperature=provider_config.get('temperature', 1.0),
+                max_output_tokens=provider_config.get('max_output_tokens', 8000)
+            )
+            prompts = self._parse_image_prompts(text, [page["index"] for page in pages])
+            span.set_attribute("prompt_chars", len(prompt))
+            span.set_attribute("prompts", len(prompts))
+
+        if not prompts:
+            raise ValueError("回傳內容中沒有任何頁面的提示詞")
+        logger.info("圖片提示詞產生完成: %s/%s 頁", len(prompts), len(pages))
+        _image_prompt_cache.set(key, prompts)
+        return prompts
+
     def _get_text_style_prompt(self, style: str) -> str:
         """根據文字風格返回對應的提示詞"""
         style_prompts = {
@@ -178,7 +289,7 @@ class OutlineService:
         text_style: str = 'professional'
     ) -> Dict[str, Any]:
         try:
-            logger.info(f"開始生成大綱: topic={topic[:50]}..., images={len(images) if images else 0}, style={text_style}")
+            logger.info("開始生成大綱: topic=%s..., images=%s, style=%s", topic[:50], len(images) if images else 0, text_style)
             prompt = self.prompt_template.format(topic=topic)
 
             # 加入文字風格提示
@@ -187,7 +298,7 @@ class OutlineService:
 
             if images and len(images) > 0:
                 prompt += f"\n\n注意：使用者提供了 {len(images)} 張參考圖片，請在生成大綱時考慮這些圖片的內容和風格。這些圖片可能是產品圖、個人照片或場景圖，請根據圖片內容來最佳化大綱，使生成的內容與圖片相關聯。"
-                logger.debug(f"新增了 {len(images)} 張參考圖片到提示詞")
+                logger.debug("新增了 %s 張參考圖片到提示詞", len(images))
 
             # 從配置中取得模型參數
             active_provider = self.text_config.get('active_provider', 'google_gemini')
@@ -198,18 +309,24 @@ class OutlineService:
             temperature = provider_config.get('temperature', 1.0)
             max_output_tokens = provider_config.get('max_output_tokens', 8000)
 
-            logger.info(f"呼叫文字生成 API: model={model}, temperature={temperature}")
-            outline_text = self.client.generate_text(
-                prompt=prompt,
-                model=model,
-                temperature=temperature,
-                max_output_tokens=max_output_tokens,
-                images=images
-            )
+            logger.info("呼叫文字生成 API: model=%s, temperature=%s", model, temperature)
+            with start_span("outline.provider_call", provider=active_provider, model=model) as span, \
+                    observe_stage('provider_call', provider=active_provider, model=model):
+                outline_text = self.client.generate_text(
+                    prompt=prompt,
+                    model=model,
+                    temperature=temperature,
+                    max_output_tokens=max_output_tokens,
+                    images=images
+                )
+                span.set_attribute("prompt_chars", len(prompt))
+                span.set_attribute("output_chars", len(outline_text))
 
-            logger.debug(f"API 回傳文字長度: {len(outline_text)} 字元")
-            pages = self._parse_outline(outline_text)
-            logger.info(f"大綱解析完成，共 {len(pages)} 頁")
+            logger.debug("API 回傳文字長度: %s 字元", len(outline_text))
+            with start_span("outline.parse") as span:
+                pages = self._parse_outline(outline_text)
+                span.set_attribute("pages", len(pages))
+            logger.info("大綱解析完成，共 %s 頁", len(pages))
 
             return {
                 "success": True,
@@ -220,7 +337,7 @@ class OutlineService:
 
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"大綱生成失敗: {error_msg}")
+            logger.error("大綱生成失敗: %s", error_msg)
 
             # 根據錯誤類型提供更詳細的錯誤訊息
             if "api_key" in error_msg.lower() or "unauthorized" in error_msg.lower() or "401" in error_msg:
@@ -277,9 +394,21 @@ class OutlineService:
             }
 
 
+_service_instance = None
+_service_lock = threading.Lock()
+
+
 def get_outline_service() -> OutlineService:
     """
     取得大綱生成服務實例
-    每次呼叫都建立新實例以確保配置是最新的
+    文字配置發布新版本時重新建立，否則共用同一個實例
     """
-    return OutlineService()
+    global _service_instance
+    version = CONFIG_STORE.get('text_providers').version
+    service = _service_instance
+    if service is not None and service.config_version == version:
+        return service
+    with _service_lock:
+        if _service_instance is None or _service_instance.config_version != version:
+            _service_instance = OutlineService()
+        return _service_instance
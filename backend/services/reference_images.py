@@ -0,0 +1,202 @@
+"""
+Reference Image Store
+
+User reference images are uploaded once and then referred to by a content-hash handle,
+so repeated outline / generate / retry requests no longer carry base64 images:
+- uploads are streamed to disk in chunks and rejected once they exceed the size limit
+- only the compressed (<200KB) variant the providers receive is kept, on disk under
+  history/.cache/references and in a small in-memory LRU
+- the handle is the SHA-256 of the uploaded bytes, so a client can check whether an
+  image is already stored before uploading it again
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional
+from PIL import Image
+from backend.config import Config
+from backend.utils.image_compressor import compress_image
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
+from backend.utils.streaming import CHUNK_SIZE, write_bytes_atomic
+
+logger = logging.getLogger(__name__)
+
+# Stored variants (hidden dir under history, not scanned as a task)
+REFERENCE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "history",
+    ".cache",
+    "references"
+)
+
+# Size of the stored variant, same as the compression applied before provider calls
+COMPRESSED_MAX_KB = 200
+
+HANDLE_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ReferenceImageNotFound(LookupError):
+    """Unknown or expired reference image handle"""
+
+
+class ReferenceImageTooLarge(ValueError):
+    """Upload exceeds REFERENCE_IMAGE_MAX_BYTES"""
+
+
+class ReferenceImageStore:
+    """Content-addressed store of compressed reference images"""
+
+    PRUNE_INTERVAL = 3600  # Seconds between scans for expired images
+
+    def __init__(self, root: str):
+        self.root = root
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def _path(self, handle: str) -> str:
+        if not isinstance(handle, str) or not HANDLE_PATTERN.match(handle):
+            raise ReferenceImageNotFound(f"Invalid reference image handle: {handle!r}")
+        return os.path.join(self.root, handle)
+
+    def _remember(self, handle: str, data: bytes):
+        with self._lock:
+            self._memory[handle] = data
+            self._memory.move_to_end(handle)
+            while len(self._memory) > Config.REFERENCE_IMAGE_CACHE_SIZE:
+                self._memory.popitem(last=False)
+
+    def exists(self, handle: str) -> bool:
+        """Whether the handle refers to a stored image"""
+        try:
+            return os.path.exists(self._path(handle))
+        except ReferenceImageNotFound:
+            return False
+
+    def save(self, stream: BinaryIO, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Store an uploaded image
+
+        Args:
+            stream: Readable binary stream (e.g. an uploaded file)
+            max_bytes: Upload size limit (None uses REFERENCE_IMAGE_MAX_BYTES)
+
+        Returns:
+            handle, size (uploaded bytes), stored_size (compressed bytes), existing
+
+        Raises:
+            ReferenceImageTooLarge: Over the size limit
+            ValueError: Empty or not an image
+        """
+        max_bytes = Config.REFERENCE_IMAGE_MAX_BYTES if max_bytes is None else max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._prune_expired()
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ReferenceImageTooLarge(f"Reference image too large: over {max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+            if size == 0:
+                raise ValueError("Reference image is empty")
+
+            handle = digest.hexdigest()
+            path = self._path(handle)
+            if os.path.exists(path):
+                # Same content uploaded before: keep the stored variant, refresh its age
+                os.utime(path)
+                return {"handle": handle, "size": size, "stored_size": os.path.getsize(path), "existing": True}
+
+            with open(tmp_path, "rb") as f:
+                data = f.read()
+            try:
+                with Image.open(io.BytesIO(data)) as img:
+                    img.verify()
+            except Exception:
+                raise ValueError("Reference image is not a valid image file")
+
+            compressed = compress_image(data, max_size_kb=COMPRESSED_MAX_KB)
+            write_bytes_atomic(compressed, path)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+        self._remember(handle, compressed)
+        logger.info("Stored reference image %s: %s -> %s bytes", handle[:12], size, len(compressed))
+        return {"handle": handle, "size": size, "stored_size": len(compressed), "existing": False}
+
+    def get(self, handle: str) -> bytes:
+        """
+        Compressed image of a handle
+
+        Raises:
+            ReferenceImageNotFound: Unknown or expired handle
+        """
+        path = self._path(handle)
+        with self._lock:
+            data = self._memory.get(handle)
+            if data is not None:
+                self._memory.move_to_end(handle)
+        if data is not None:
+            CACHE_HITS.inc(cache='reference_image')
+        else:
+            CACHE_MISSES.inc(cache='reference_image')
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                raise ReferenceImageNotFound(f"Reference image not found or expired: {handle}")
+            self._remember(handle, data)
+
+        # Images in use don't expire
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def resolve(self, handles: List[str]) -> List[bytes]:
+        """Compressed images of several handles, in order (raises ReferenceImageNotFound)"""
+        return [self.get(handle) for handle in handles or []]
+
+    def _prune_expired(self):
+        """Remove stored images unused for REFERENCE_IMAGE_TTL seconds (at most once per PRUNE_INTERVAL)"""
+        now = time.time()
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + self.PRUNE_INTERVAL
+
+        cutoff = now - Config.REFERENCE_IMAGE_TTL
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    with self._lock:
+                        self._memory.pop(entry.name, None)
+            except FileNotFoundError:
+                continue
+
+
+REFERENCE_STORE = ReferenceImageStore(REFERENCE_DIR)
@@ -0,0 +1,224 @@
+"""
+配置存储
+
+所有 YAML 配置（服务商配置、上传配置）统一在这里读取：
+- 每个文件只解析一次，之后按 mtime / 大小 / inode 检测变化（最多每 CHECK_INTERVAL 秒 stat 一次）
+- 每次解析产生一个不可变的快照（带递增版本号），整体替换发布，读者永远不会看到一半的配置
+- 进行中的任务持有自己拿到的快照，配置更新不影响它们；新任务拿到新快照
+- 重新解析失败时保留上一份有效快照（首次解析失败才抛出异常）
+- 写入先写临时文件再改名，然后立即发布新快照
+"""
+import copy
+import itertools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+import yaml
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+# 配置文件所在目录（项目根目录）
+CONFIG_DIR = Path(__file__).parent.parent.parent
+
+# 两次 stat 检查之间的最短间隔（秒）
+CHECK_INTERVAL = 1.0
+
+
+def freeze(value: Any) -> Any:
+    """转为只读结构（dict -> MappingProxyType，list -> tuple）"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """只读结构转回可修改的 dict / list（深拷贝）"""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return copy.deepcopy(value)
+
+
+class ConfigSnapshot(NamedTuple):
+    """某个配置文件在某一时刻的不可变快照"""
+    name: str
+    version: int                 # 全局递增，版本号变化即表示内容重新发布
+    data: Mapping[str, Any]      # 只读内容（文件不存在时为默认值）
+    exists: bool                 # 配置文件是否存在
+    loaded_at: float             # 发布时间（time.time()）
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可修改的副本（用于修改后写回）"""
+        return thaw(self.data)
+
+
+class _Entry:
+    """单个配置文件的状态"""
+
+    def __init__(self, name: str, path: Path, default: Dict[str, Any]):
+        self.name = name
+        self.path = path
+        self.default = default
+        self.snapshot: Optional[ConfigSnapshot] = None
+        self.file_key: Optional[Tuple[int, int, int]] = None
+        self.next_check = 0.0
+
+
+class ConfigStore:
+    """版本化的 YAML 配置存储"""
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+
+    def register(self, name: str, filename: str, default: Optional[Dict[str, Any]] = None):
+        """
+        注册配置文件
+
+        Args:
+            name: 配置名称
+            filename: 项目根目录下的文件名
+            default: 文件不存在时使用的内容
+        """
+        with self._lock:
+            self._entries[name] = _Entry(name, CONFIG_DIR / filename, default or {})
+
+    def path(self, name: str) -> Path:
+        """配置文件路径"""
+        return self._entries[name].path
+
+    def get(self, name: str) -> ConfigSnapshot:
+        """
+        取得最新快照（文件有变化时重新解析并发布）
+
+        Args:
+            name: 配置名称
+
+        Returns:
+            ConfigSnapshot
+
+        Raises:
+            ValueError: 首次解析失败（YAML 格式错误）
+        """
+        entry = self._entries[name]
+        snapshot = entry.snapshot
+        if snapshot is not None and time.monotonic() < entry.next_check:
+            CACHE_HITS.inc(cache=f'{name}_config')
+            return snapshot
+
+        with self._lock:
+            if entry.snapshot is not None and time.monotonic() < entry.next_check:
+                CACHE_HITS.inc(cache=f'{name}_config')
+                return entry.snapshot
+            entry.next_check = time.monotonic() + CHECK_INTERVAL
+            file_key = self._file_key(entry.path)
+            if entry.snapshot is not None and file_key == entry.file_key:
+                CACHE_HITS.inc(cache=f'{name}_config')
+                return entry.snapshot
+            CACHE_MISSES.inc(cache=f'{name}_config')
+            return self._load_locked(entry, file_key)
+
+    def reload(self, name: Optional[str] = None):
+        """
+        强制重新解析（name 为 None 时全部重新解析）
+
+        重新解析失败时保留原快照。
+        """
+        with self._lock:
+            entries = [self._entries[name]] if name else list(self._entries.values())
+            for entry in entries:
+                entry.next_check = time.monotonic() + CHECK_INTERVAL
+                try:
+                    self._load_locked(entry, self._file_key(entry.path))
+                except ValueError:
+                    if entry.snapshot is None:
+                        raise
+
+    def write(self, name: str, data: Dict[str, Any]) -> ConfigSnapshot:
+        """
+        写入配置文件（原子改名）并立即发布新快照
+
+        Args:
+            name: 配置名称
+            data: 新内容
+
+        Returns:
+            新快照
+        """
+        entry = self._entries[name]
+        with self._lock:
+            tmp_path = f"{entry.path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+            os.replace(tmp_path, entry.path)
+            entry.next_check = time.monotonic() + CHECK_INTERVAL
+            return self._load_locked(entry, self._file_key(entry.path))
+
+    @staticmethod
+    def _file_key(path: Path) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _load_locked(self, entry: _Entry, file_key) -> ConfigSnapshot:
+        """解析并发布快照（调用方需持有锁）"""
+        if file_key is None:
+            data, exists = entry.default, False
+        else:
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    data = yaml.safe_load(f) or entry.default
+                exists = True
+            except yaml.YAMLError as e:
+                if entry.snapshot is not None:
+                    logger.error("配置文件 %s 格式错误，继续使用版本 %s: %s",
+                                 entry.path.name, entry.snapshot.version, e)
+                    # 文件没再变化前不重复解析
+                    entry.file_key = file_key
+                    return entry.snapshot
+                raise ValueError(
+                    f"配置文件格式错误: {entry.path.name}\n"
+                    f"YAML 解析错误: {e}\n"
+                    "解决方案：\n"
+                    "1. 检查 YAML 缩进是否正确（使用空格，不要用 Tab）\n"
+                    "2. 检查引号是否配对\n"
+                    "3. 使用在线 YAML 验证器检查格式"
+                )
+
+        snapshot = ConfigSnapshot(
+            name=entry.name,
+            version=next(self._versions),
+            data=freeze(data),
+            exists=exists,
+            loaded_at=time.time()
+        )
+        entry.snapshot = snapshot
+        entry.file_key = file_key
+        logger.debug("配置已发布: %s v%s (exists=%s)", entry.name, snapshot.version, exists)
+        return snapshot
+
+
+CONFIG_STORE = ConfigStore()
+CONFIG_STORE.register('image_providers', 'image_providers.yaml', {
+    'active_provider': 'google_genai',
+    'providers': {}
+})
+CONFIG_STORE.register('text_providers', 'text_providers.yaml', {
+    'active_provider': 'google_gemini',
+    'providers': {}
+})
+CONFIG_STORE.register('upload', 'upload_config.yaml', {})
@@ -0,0 +1,227 @@
+"""
+文件传输工具
+
+- 传输交给前端 Web 服务器：Flask 只负责授权与解析路径，返回 X-Accel-Redirect（nginx）
+  或 X-Sendfile（Apache mod_xsendfile / lighttpd）头，由 Web 服务器直接从磁盘发送
+- 前端 dist/ 静态资源：优先返回预压缩的 .br / .gz，带哈希的资源返回长期缓存头
+
+nginx 设定示例（Config.STATIC_OFFLOAD = 'x-accel'，路径前缀见 Config.STATIC_OFFLOAD_LOCATIONS）：
+
+    location /_internal/history/ {
+        internal;
+        alias /path/to/ai-blog-generator/history/;
+    }
+    location /_internal/dist/ {
+        internal;
+        alias /path/to/ai-blog-generator/frontend/dist/;
+        gzip_static on;      # nginx 自行选择 .gz（brotli 模块则用 brotli_static on）
+    }
+"""
+import gzip
+import logging
+import mimetypes
+import os
+import re
+from typing import Optional
+from urllib.parse import quote
+from flask import Response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from backend.config import Config
+from backend.utils.image_serving import sniff_mimetype
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 预压缩的文件类型
+PRECOMPRESS_EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json', '.txt', '.map', '.ico')
+# 小于此大小的文件不压缩
+PRECOMPRESS_MIN_BYTES = 1024
+
+# Vite 产出的带哈希文件名（如 assets/index-BASSv48K.js），内容变化时文件名也会变
+_HASHED_ASSET = re.compile(r'^assets/.*-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+# 预压缩文件后缀 -> Content-Encoding（按优先顺序）
+_ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+# 传输交给 Web 服务器时使用的头
+_OFFLOAD_HEADERS = ('X-Accel-Redirect', 'X-Sendfile')
+
+
+def offload_enabled() -> bool:
+    """是否把文件传输交给 Web 服务器"""
+    return bool(Config.STATIC_OFFLOAD)
+
+
+def offload_file(
+    path: str,
+    root_dir: str,
+    location: str,
+    mimetype: str,
+    download_name: Optional[str] = None,
+    content_encoding: Optional[str] = None
+) -> Response:
+    """
+    返回交给 Web 服务器发送文件的空响应
+
+    Args:
+        path: 文件绝对路径（必须已用 safe_join 解析并确认存在）
+        root_dir: path 所在的根目录（对应 nginx internal location）
+        location: Config.STATIC_OFFLOAD_LOCATIONS 中的键
+        mimetype: Content-Type
+        download_name: 以附件下载时的文件名
+        content_encoding: path 为预压缩文件时的编码（只用于 X-Sendfile）
+
+    Returns:
+        带 X-Accel-Redirect / X-Sendfile 头的响应（304 时不带，避免 Web 服务器仍发送文件）
+    """
+    mode = Config.STATIC_OFFLOAD
+    response = Response(mimetype=mimetype)
+
+    if mode == 'x-accel':
+        relative = os.path.relpath(path, root_dir).replace(os.sep, '/')
+        prefix = Config.STATIC_OFFLOAD_LOCATIONS[location].rstrip('/')
+        response.headers['X-Accel-Redirect'] = f"{prefix}/{quote(relative)}"
+    elif mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+        if content_encoding:
+            response.content_encoding = content_encoding
+    else:
+        raise ValueError(f"不支持的 STATIC_OFFLOAD 模式: {mode}（可用：x-accel、x-sendfile）")
+
+    if download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+
+    st = os.stat(path)
+    response.last_modified = st.st_mtime
+    return response
+
+
+def finalize_offload(response: Response) -> Response:
+    """条件请求命中（304）时移除传输头，否则 Web 服务器仍会发送整个文件"""
+    if response.status_code == 304:
+        for header in _OFFLOAD_HEADERS:
+            response.headers.pop(header, None)
+    return response
+
+
+def file_mimetype(path: str) -> str:
+    """依文件头识别类型（缩略图是扩展名为 .png 的 JPEG），无法识别时按扩展名"""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    guessed = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return sniff_mimetype(head, default=guessed)
+
+
+# ==================== 前端静态资源 ====================
+
+def _accepted_encodings() -> set:
+    accept = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip().lower() for part in accept.split(',') if part.strip()}
+
+
+def send_static_asset(static_folder: str, filename: str) -> Response:
+    """
+    输出前端 dist/ 中的文件
+
+    - 客户端接受时优先返回预压缩的 .br / .gz（Vary: Accept-Encoding）
+    - assets/ 下带哈希的文件名返回 immutable 长期缓存，其余（index.html 等）返回 no-cache
+    - 启用 STATIC_OFFLOAD 时交给 Web 服务器发送
+
+    Args:
+        static_folder: dist 目录
+        filename: 相对路径
+
+    Returns:
+        响应；文件不存在时抛出 NotFound
+    """
+    path = safe_join(static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if mimetype.startswith('text/') or mimetype in ('application/javascript', 'application/json'):
+        mimetype = f"{mimetype}; charset=utf-8"
+
+    send_path, encoding = path, None
+    accepted = _accepted_encodings()
+    for suffix, name in _ENCODINGS:
+        if name in accepted and os.path.isfile(path + suffix):
+            send_path, encoding = path + suffix, name
+            break
+
+    if offload_enabled():
+        if Config.STATIC_OFFLOAD == 'x-accel':
+            # nginx 的 gzip_static / brotli_static 会自行选择预压缩文件
+            send_path, encoding = path, None
+        response = offload_file(send_path, static_folder, 'frontend', mimetype, content_encoding=encoding)
+        response.make_conditional(request)
+        response = finalize_offload(response)
+    else:
+        response = send_file(send_path, mimetype=mimetype, conditional=True, etag=True)
+        if encoding:
+            response.content_encoding = encoding
+
+    response.vary.add('Accept-Encoding')
+    if _HASHED_ASSET.match(relative):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def precompress_static(static_folder: str) -> int:
+    """
+    为 dist/ 中的文本资源产生 .gz（已安装 brotli 时另产生 .br）
+
+    已存在且不比原文件旧的压缩文件会跳过，所以可以在每次启动时执行。
+
+    Args:
+        static_folder: dist 目录
+
+    Returns:
+        新产生的压缩文件数
+    """
+    created = 0
+    for dirpath, _, filenames in os.walk(static_folder):
+        for name in filenames:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            if st.st_size < PRECOMPRESS_MIN_BYTES:
+                continue
+
+            data = None
+            targets = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                targets.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+
+            for suffix, compress in targets:
+                target = path + suffix
+                try:
+                    if os.stat(target).st_mtime_ns >= st.st_mtime_ns:
+                        continue
+                except FileNotFoundError:
+                    pass
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                tmp_path = f"{target}.part"
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, target)
+                created += 1
+
+    return created
@@ -7,6 +7,7 @@ from google.genai import types
 
 # 导入统一的错误解析函数
 from ..generators.google_genai import parse_genai_error
+from .metrics import record_failure, record_retry
 
 
 def retry_on_429(max_retries=3, base_delay=2):
@@ -21,6 +22,7 @@ def retry_on_429(max_retries=3, base_delay=2):
                 except Exception as e:
                     last_error = e
                     error_str = str(e).lower()
+                    record_failure('text_client', e, model=kwargs.get('model', ''))
 
                     # 不可重试的错误类型
                     non_retryable = [
@@ -43,6 +45,7 @@ def retry_on_429(max_retries=3, base_delay=2):
 
                     # 可重试的错误
                     if attempt < max_retries - 1:
+                        record_retry('text_client', e, model=kwargs.get('model', ''))
                         if "429" in error_str or "resource_exhausted" in error_str:
                             wait_time = (base_delay ** attempt) + random.uniform(0, 1)
                             print(f"[重试] 遇到资源限制，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
@@ -1,8 +1,12 @@
 """圖片壓縮工具"""
 import io
+import logging
+import os
 from PIL import Image
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 
 def compress_image(
     image_data: bytes,
@@ -33,62 +37,108 @@ def compress_image(
     try:
         # 開啟圖片
         img = Image.open(io.BytesIO(image_data))
+        return _compress_opened(img, len(image_data), max_size_bytes, quality_start, quality_min, max_dimension)
 
-        # 轉換為 RGB（處理 RGBA 等格式）
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-        elif img.mode != 'RGB':
-            img = img.convert('RGB')
-
-        # 如果圖片尺寸過大，先縮小
-        width, height = img.size
-        if width > max_dimension or height > max_dimension:
-            ratio = min(max_dimension / width, max_dimension / height)
-            new_width = int(width * ratio)
-            new_height = int(height * ratio)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    except Exception as e:
+        logger.warning("壓縮圖片失敗，返回原圖: %s", e)
+        return image_data
 
-        # 逐步降低品質直到滿足大小要求
-        quality = quality_start
-        compressed_data = None
 
-        while quality >= quality_min:
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            compressed_data = output.getvalue()
+def compress_image_file(
+    path: str,
+    max_size_kb: int = 200,
+    quality_start: int = 85,
+    quality_min: int = 20,
+    max_dimension: int = 2048
+) -> bytes:
+    """
+    從檔案壓縮圖片到指定大小以內（不把原始檔案整個讀進記憶體）
 
-            if len(compressed_data) <= max_size_bytes:
-                break
+    JPEG 以 draft 模式直接在解碼時縮小，其餘格式開啟後先縮到 max_dimension 以內。
 
-            quality -= 5
+    Args:
+        path: 圖片檔案路徑
+        其餘參數同 compress_image
 
-        # 如果還是太大，進一步縮小尺寸
-        if len(compressed_data) > max_size_bytes:
-            width, height = img.size
-            while len(compressed_data) > max_size_bytes and max(width, height) > 512:
-                width = int(width * 0.9)
-                height = int(height * 0.9)
-                img_resized = img.resize((width, height), Image.Resampling.LANCZOS)
+    Returns:
+        壓縮後的圖片資料（原圖已小於目標大小時為原始檔案內容）
+    """
+    max_size_bytes = max_size_kb * 1024
+    original_size = os.path.getsize(path)
+
+    # 如果原圖已經小於目標大小，直接返回
+    if original_size <= max_size_bytes:
+        with open(path, 'rb') as f:
+            return f.read()
 
-                output = io.BytesIO()
-                img_resized.save(output, format='JPEG', quality=quality_min, optimize=True)
-                compressed_data = output.getvalue()
+    try:
+        with Image.open(path) as img:
+            img.draft('RGB', (max_dimension, max_dimension))
+            return _compress_opened(img, original_size, max_size_bytes, quality_start, quality_min, max_dimension)
 
-        original_size_kb = len(image_data) / 1024
-        compressed_size_kb = len(compressed_data) / 1024
-        compression_ratio = (1 - compressed_size_kb / original_size_kb) * 100
+    except Exception as e:
+        logger.warning("壓縮圖片失敗，返回原圖: %s: %s", os.path.basename(path), e)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def _compress_opened(
+    img: Image.Image,
+    original_size: int,
+    max_size_bytes: int,
+    quality_start: int,
+    quality_min: int,
+    max_dimension: int
+) -> bytes:
+    """把已開啟的圖片壓縮成 max_size_bytes 以內的 JPEG"""
+    # 轉換為 RGB（處理 RGBA 等格式）
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # 如果圖片尺寸過大，先縮小
+    width, height = img.size
+    if width > max_dimension or height > max_dimension:
+        ratio = min(max_dimension / width, max_dimension / height)
+        new_width = int(width * ratio)
+        new_height = int(height * ratio)
+        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    # 逐步降低品質直到滿足大小要求
+    quality = quality_start
+    compressed_data = None
+
+    while quality >= quality_min:
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+        compressed_data = output.getvalue()
+
+        if len(compressed_data) <= max_size_bytes:
+            break
+
+        quality -= 5
+
+    # 如果還是太大，進一步縮小尺寸
+    if len(compressed_data) > max_size_bytes:
+        width, height = img.size
+        while len(compressed_data) > max_size_bytes and max(width, height) > 512:
+            width = int(width * 0.9)
+            height = int(height * 0.9)
+            img_resized = img.resize((width, height), Image.Resampling.LANCZOS)
 
-        print(f"[Compress] {original_size_kb:.1f}KB -> {compressed_size_kb:.1f}KB ({compression_ratio:.1f}%)")
+            output = io.BytesIO()
+            img_resized.save(output, format='JPEG', quality=quality_min, optimize=True)
+            compressed_data = output.getvalue()
 
-        return compressed_data
+    logger.debug("壓縮圖片: %.1fKB -> %.1fKB (%.1f%%)", original_size / 1024, len(compressed_data) / 1024,
+                 (1 - len(compressed_data) / original_size) * 100)
 
-    except Exception as e:
-        print(f"[Compress] Failed, return original: {e}")
-        return image_data
+    return compressed_data
 
 
 def compress_images(images: list[bytes], max_size_kb: int = 200) -> list[bytes]:
@@ -0,0 +1,137 @@
+"""
+图片输出工具
+
+- 内容哈希 ETag（按 路径 + mtime + 大小 记忆，文件不变时不重复计算）
+- 依文件头识别图片类型（PNG / JPEG / WebP / GIF）
+- 热点缩略图内存快取（按总字节数 LRU 淘汰）
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+from backend.utils.metrics import CACHE_HITS, CACHE_MISSES
+
+# 计算哈希时每次读取的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def sniff_mimetype(head: bytes, default: str = 'application/octet-stream') -> str:
+    """
+    依文件头识别图片类型
+
+    Args:
+        head: 文件开头的若干字节（至少 12 字节）
+        default: 无法识别时的类型
+
+    Returns:
+        MIME 类型
+    """
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return default
+
+
+def _file_key(path: str, st) -> Tuple[str, int, int]:
+    """快取键：文件被覆盖（重新生成）时 mtime/大小会变，旧条目自然失效"""
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+class ImageFileInfo(NamedTuple):
+    etag: str
+    mimetype: str
+
+
+class ImageFileInfoCache:
+    """文件 ETag / 类型快取"""
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, int, int], ImageFileInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, st) -> ImageFileInfo:
+        """取得文件的 ETag 与类型（未快取时读取文件计算）"""
+        key = _file_key(path, st)
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc(cache='image_etag')
+                return info
+        CACHE_MISSES.inc(cache='image_etag')
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            head = f.read(HASH_CHUNK_SIZE)
+            mimetype = sniff_mimetype(head)
+            while head:
+                digest.update(head)
+                head = f.read(HASH_CHUNK_SIZE)
+        info = ImageFileInfo(digest.hexdigest()[:32], mimetype)
+
+        with self._lock:
+            self._entries[key] = info
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return info
+
+
+class CachedImage(NamedTuple):
+    data: bytes
+    etag: str
+    mimetype: str
+
+
+class HotThumbnailCache:
+    """热点缩略图内存快取"""
+
+    MAX_BYTES = 32 * 1024 * 1024  # 快取总大小上限
+    MAX_ITEM_BYTES = 512 * 1024  # 单张超过此大小不快取
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, int, int], CachedImage]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str, st) -> Optional[CachedImage]:
+        """取得缩略图（未快取时返回 None）"""
+        key = _file_key(path, st)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc(cache='hot_thumbnail')
+                return image
+        CACHE_MISSES.inc(cache='hot_thumbnail')
+        return None
+
+    def load(self, path: str, st) -> Optional[CachedImage]:
+        """读取缩略图并放入快取（文件过大时返回 None）"""
+        if st.st_size > self.MAX_ITEM_BYTES:
+            return None
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        image = CachedImage(data, hashlib.sha256(data).hexdigest()[:32], sniff_mimetype(data[:16]))
+
+        key = _file_key(path, st)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = image
+                self._total_bytes += len(data)
+                while self._total_bytes > self.MAX_BYTES:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._total_bytes -= len(evicted.data)
+        return image
+
+
+# 全局快取
+FILE_INFO_CACHE = ImageFileInfoCache()
+THUMBNAIL_CACHE = HotThumbnailCache()
@@ -0,0 +1,228 @@
+"""
+日志工具
+
+- 异步日志管线：业务线程只把记录放进队列，由后台线程格式化并输出
+- 惰性摘要：LazyPayload 只在记录真正输出时才把大对象转成简短摘要
+- 敏感信息遮盖：API Key、Bearer token、access_token 等在输出前替换
+- 按模块采样：高频模块的 DEBUG/INFO 日志只保留一部分（WARNING 以上全部保留）
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+# 摘要时单个字符串的最大长度（base64 图片等长字符串只保留长度信息）
+MAX_STRING_CHARS = 200
+# 摘要时容器最多展开的元素数
+MAX_ITEMS = 10
+# 摘要最大深度
+MAX_DEPTH = 4
+
+# 视为敏感的字段名（小写比对）
+SENSITIVE_KEYS = {
+    'api_key', 'apikey', 'key', 'access_token', 'refresh_token', 'token',
+    'authorization', 'password', 'secret', 'client_secret'
+}
+
+# 输出前需遮盖的文本模式
+_REDACT_PATTERNS = [
+    (re.compile(r'(Bearer\s+)[A-Za-z0-9._\-]+', re.IGNORECASE), r'\1***'),
+    (re.compile(r'\bsk-[A-Za-z0-9_\-]{8,}'), 'sk-***'),
+    (re.compile(r'\bAIza[0-9A-Za-z_\-]{20,}'), 'AIza***'),
+    (re.compile(r'(["\']?(?:api_key|apikey|access_token|refresh_token|key|password|secret)["\']?\s*[:=]\s*["\']?)'
+                r'[^"\'\s,&}]{6,}', re.IGNORECASE), r'\1***'),
+]
+
+
+def summarize_payload(value: Any, depth: int = 0) -> Any:
+    """
+    生成大对象的简短摘要（不会先把整个对象转成字符串）
+
+    长字符串与 bytes 只保留长度和开头片段，容器只展开前 MAX_ITEMS 个元素，
+    敏感字段的值替换为 ***。
+
+    Args:
+        value: 任意对象（通常是 API 响应的 dict）
+        depth: 目前深度（递归用）
+
+    Returns:
+        可安全输出的摘要对象
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return f"<bytes len={len(value)}>"
+
+    if isinstance(value, str):
+        if len(value) > MAX_STRING_CHARS:
+            return f"{value[:40]}...<str len={len(value)}>"
+        return value
+
+    if depth >= MAX_DEPTH:
+        return f"<{type(value).__name__}>"
+
+    if isinstance(value, dict):
+        summary = {}
+        for i, (k, v) in enumerate(value.items()):
+            if i >= MAX_ITEMS:
+                summary['...'] = f"<{len(value) - MAX_ITEMS} more keys>"
+                break
+            if isinstance(k, str) and k.lower() in SENSITIVE_KEYS:
+                summary[k] = '***'
+            else:
+                summary[k] = summarize_payload(v, depth + 1)
+        return summary
+
+    if isinstance(value, (list, tuple)):
+        items = [summarize_payload(v, depth + 1) for v in value[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            items.append(f"<{len(value) - MAX_ITEMS} more items>")
+        return items
+
+    return value
+
+
+class LazyPayload:
+    """
+    惰性摘要：作为 %-style 日志参数传入，只有记录输出时才计算摘要
+
+    用法：
+        logger.debug("Chat API 响应: %s", LazyPayload(result))
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return str(summarize_payload(self.value))
+
+    __repr__ = __str__
+
+
+def redact(text: str) -> str:
+    """遮盖文本中的 API Key / token"""
+    for pattern, replacement in _REDACT_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RedactingFormatter(logging.Formatter):
+    """格式化后遮盖敏感信息（在后台线程中执行）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按模块采样 DEBUG/INFO 日志
+
+    Args:
+        rates: 模块名前缀 -> 保留比例（0~1），如 {'backend.generators': 0.1}
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        # 最长前缀优先匹配
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    进程内队列 handler
+
+    标准 QueueHandler.prepare 会在业务线程中格式化消息；
+    这里保留原始 msg/args，把格式化留给后台线程。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        """放入队列；队列已满时 WARNING 以上阻塞等待，其余直接丢弃"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_async_logging(
+    handlers: List[logging.Handler],
+    level: str = 'INFO',
+    module_levels: Optional[Dict[str, str]] = None,
+    sampling: Optional[Dict[str, float]] = None,
+    context_filters: Optional[List[logging.Filter]] = None,
+    queue_size: int = 10000
+) -> logging.Logger:
+    """
+    设置异步日志管线
+
+    Args:
+        handlers: 实际输出的 handler（在后台线程中执行）
+        level: 根 logger 级别
+        module_levels: 模块级别覆盖，如 {'werkzeug': 'INFO'}
+        sampling: 按模块采样比例（见 SamplingFilter）
+        context_filters: 需要在业务线程中执行的过滤器（如读取 contextvars 的 trace_id）
+        queue_size: 队列容量，满时丢弃 DEBUG/INFO 记录而不阻塞业务线程
+
+    Returns:
+        根 logger
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.handlers.clear()
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = _InProcessQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sampling))
+    for context_filter in context_filters or []:
+        queue_handler.addFilter(context_filter)
+    root_logger.addHandler(queue_handler)
+
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    return root_logger
+
+
+def stop_async_logging():
+    """停止后台线程并输出队列中剩余的记录"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_async_logging)
+
+
+def create_console_handler(fmt: str, datefmt: str = '%H:%M:%S') -> logging.Handler:
+    """创建输出到 stdout 并遮盖敏感信息的 handler"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(RedactingFormatter(fmt, datefmt=datefmt))
+    return handler
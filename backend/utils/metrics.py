@@ -0,0 +1,266 @@
+"""
+指标采集工具
+
+进程内的轻量指标（直方图 + 计数器），以 Prometheus 文本格式输出，
+不依赖 prometheus_client。
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 覆盖毫秒级（写盘）到分钟级（图片生成）的耗时
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+def _escape_label_value(value: str) -> str:
+    """转义标签值（反斜杠、双引号、换行）"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = '') -> str:
+    """格式化标签为 {a="1",b="2"}"""
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    """格式化数值（整数不带小数点）"""
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """按声明顺序取标签值，缺失的标签为空字符串"""
+        return tuple(str(labels.get(name, '') or '') for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """计数加 amount"""
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """取得目前值"""
+        with self._lock:
+            return self._values.get(self._label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    metric_type = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], Dict] = {}
+
+    def observe(self, value: float, **labels):
+        """记录一次观测值"""
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """计时上下文，退出时记录耗时（秒），异常时也记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, list(series['counts']), series['sum'], series['count'])
+                for key, series in self._series.items()
+            )
+
+        inf_label = 'le="+Inf"'
+        lines = []
+        for key, counts, total_sum, total_count in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, inf_label)} {total_count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total_sum)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {total_count}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """注册指标（同名重复注册返回已存在的实例）"""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式（version 0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.metric_type}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 全局注册表
+REGISTRY = MetricsRegistry()
+
+# 各阶段耗时：prompt_build / prompt_distill / provider_call / decode / disk_write / thumbnail / reference_compress / sse_emit
+STAGE_DURATION = REGISTRY.histogram(
+    'blog_stage_duration_seconds',
+    'Duration of each generation stage in seconds',
+    ['stage', 'provider', 'model']
+)
+
+RETRIES = REGISTRY.counter(
+    'blog_retries_total',
+    'Number of retried calls',
+    ['component', 'provider', 'model']
+)
+
+RATE_LIMITED = REGISTRY.counter(
+    'blog_rate_limited_total',
+    'Number of 429 / rate limit responses',
+    ['component', 'provider', 'model']
+)
+
+CACHE_HITS = REGISTRY.counter(
+    'blog_cache_hits_total',
+    'Number of cache hits',
+    ['cache']
+)
+
+CACHE_MISSES = REGISTRY.counter(
+    'blog_cache_misses_total',
+    'Number of cache misses',
+    ['cache']
+)
+
+# 图片提示词字符数：kind=sent（实际发送）/ saved（压缩节省）
+PROMPT_CHARS = REGISTRY.counter(
+    'blog_image_prompt_chars_total',
+    'Characters of image prompts sent and saved by prompt compaction',
+    ['kind', 'provider']
+)
+
+
+def observe_stage(stage: str, provider: Optional[str] = '', model: Optional[str] = ''):
+    """
+    阶段计时上下文
+
+    用法：
+        with observe_stage('disk_write', provider='openai', model='dall-e-3'):
+            ...
+    """
+    return STAGE_DURATION.time(stage=stage, provider=provider, model=model)
+
+
+# 限流错误信息中的关键字（"rate" 单独出现不算，例如 "generate"）
+RATE_LIMIT_MARKERS = ("429", "rate limit", "rate_limit", "resource_exhausted", "too many requests")
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """判断异常是否为 429 / 限流错误"""
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    error_str = str(error).lower()
+    return any(marker in error_str for marker in RATE_LIMIT_MARKERS)
+
+
+def record_failure(component: str, error: Exception, provider: Optional[str] = '', model: Optional[str] = ''):
+    """
+    记录一次失败的调用（限流错误计入 RATE_LIMITED）
+
+    每次捕获到失败都要调用，不论之后是否重试：最后一次尝试的 429 也要计数。
+    """
+    if is_rate_limit_error(error):
+        RATE_LIMITED.inc(component=component, provider=provider, model=model)
+
+
+def record_retry(component: str, error: Exception, provider: Optional[str] = '', model: Optional[str] = ''):
+    """记录一次重试（限流计数见 record_failure）"""
+    RETRIES.inc(component=component, provider=provider, model=model)
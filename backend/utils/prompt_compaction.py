@@ -0,0 +1,113 @@
+"""
+提示词压缩
+
+全文提示词模式下，每一页的图片提示词原本都附带整份大纲，N 页的文章就把大纲发送 N 次。
+这里每个任务只从大纲中提取一次精简的文章简介（标题、副标题、各段落主题），
+每页只发送自己的内容加上这份简介，并统计每个任务节省的提示词大小。
+"""
+import re
+import threading
+from typing import Dict, List, Union
+
+# 段落类型标记，例如 [封面]、[內容]
+PAGE_TYPE_PATTERN = re.compile(r'^\[([^\]]+)\]\s*')
+
+# 封面中保留的标题行
+TITLE_PREFIXES = ('標題', '标题', '副標題', '副标题', 'Title', 'Subtitle')
+
+# 配图建议只与所在页面有关，不放进简介
+IMAGE_HINT_PREFIXES = ('配圖建議', '配图建议', 'Image suggestion')
+
+# 每个段落主题的最大长度
+HEADING_MAX_CHARS = 60
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """截断过长的文本（末尾加省略号）"""
+    if not text or max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return text[:max_chars - 1].rstrip() + '…'
+
+
+def split_outline_pages(full_outline: str) -> List[str]:
+    """按 <page> 分割大纲（兼容旧的 --- 分隔符）"""
+    if re.search(r'<page>', full_outline, flags=re.IGNORECASE):
+        return re.split(r'<page>', full_outline, flags=re.IGNORECASE)
+    return full_outline.split('---')
+
+
+def build_outline_brief(full_outline: str, max_chars: int = 600) -> str:
+    """
+    从大纲提取精简的文章简介
+
+    封面保留标题 / 副标题行，其他段落只保留类型和第一行（段落主题），
+    跳过配图建议。简介不会比原大纲长。
+
+    Args:
+        full_outline: 完整大纲文本
+        max_chars: 简介最大长度
+
+    Returns:
+        文章简介
+    """
+    if not full_outline:
+        return full_outline
+
+    entries = []
+    for raw_page in split_outline_pages(full_outline):
+        lines = [line.strip() for line in raw_page.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+
+        page_type = ''
+        match = PAGE_TYPE_PATTERN.match(lines[0])
+        if match:
+            page_type = match.group(1)
+            rest = lines[0][match.end():].strip()
+            lines = ([rest] if rest else []) + lines[1:]
+
+        lines = [line for line in lines if not line.startswith(IMAGE_HINT_PREFIXES)]
+        if not lines:
+            continue
+
+        titles = [line for line in lines if line.startswith(TITLE_PREFIXES)]
+        summary = titles or [lines[0]]
+        prefix = f"[{page_type}] " if page_type else ""
+        entries.append(prefix + " / ".join(truncate_text(line, HEADING_MAX_CHARS) for line in summary))
+
+    brief = truncate_text("\n".join(entries), max_chars)
+    return brief if brief and len(brief) < len(full_outline) else full_outline
+
+
+class PromptStats:
+    """单个任务的提示词大小统计（线程安全）"""
+
+    def __init__(self):
+        self.prompts = 0
+        self.sent_chars = 0
+        self.full_chars = 0
+        self._lock = threading.Lock()
+
+    def record(self, sent_chars: int, full_chars: int):
+        """
+        记录一次发送的提示词
+
+        Args:
+            sent_chars: 实际发送的字符数
+            full_chars: 不压缩时的字符数
+        """
+        with self._lock:
+            self.prompts += 1
+            self.sent_chars += sent_chars
+            self.full_chars += full_chars
+
+    def to_dict(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            saved = self.full_chars - self.sent_chars
+            return {
+                "prompts": self.prompts,
+                "sent_chars": self.sent_chars,
+                "full_chars": self.full_chars,
+                "saved_chars": saved,
+                "saved_ratio": round(saved / self.full_chars, 3) if self.full_chars else 0.0
+            }
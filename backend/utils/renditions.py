@@ -0,0 +1,120 @@
+"""
+多尺寸 WebP 图片工具
+
+生成图片后，在任务目录中原图旁边产生数个宽度的 WebP 版本（原图保留）：
+    0.png -> 0_w480.webp, 0_w960.webp, 0_w1600.webp
+
+- 图片接口用 ?w= 选择最接近的版本（见 select_rendition）
+- HTML 导出依已存在的版本输出 srcset（见 list_renditions）
+"""
+import io
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+from PIL import Image
+from backend.utils.streaming import write_bytes_atomic
+
+logger = logging.getLogger(__name__)
+
+RENDITION_FORMAT = "webp"
+
+
+def rendition_filename(filename: str, width: int) -> str:
+    """原图文件名 -> 指定宽度的 WebP 文件名（0.png -> 0_w480.webp）"""
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_w{width}.{RENDITION_FORMAT}"
+
+
+def generate_renditions(
+    source_path: str,
+    widths: Sequence[int],
+    quality: int = 80
+) -> List[int]:
+    """
+    产生多尺寸 WebP 版本
+
+    只产生比原图窄的版本；原图重新生成后变窄时，多出来的旧版本会被删除。
+
+    Args:
+        source_path: 原图路径
+        widths: 目标宽度列表（像素）
+        quality: WebP 品质（1-100）
+
+    Returns:
+        实际产生的宽度列表（由小到大）
+    """
+    task_dir, filename = os.path.split(source_path)
+
+    with Image.open(source_path) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if img.mode in ("LA", "PA", "P") else "RGB")
+        source_width, source_height = img.size
+
+        produced = []
+        for width in sorted(set(widths)):
+            path = os.path.join(task_dir, rendition_filename(filename, width))
+            if width >= source_width:
+                _remove_quietly(path)
+                continue
+
+            height = max(1, round(source_height * width / source_width))
+            resized = img.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            buffer = io.BytesIO()
+            resized.save(buffer, format=RENDITION_FORMAT, quality=quality, method=4)
+            write_bytes_atomic(buffer.getvalue(), path)
+            produced.append(width)
+
+    return produced
+
+
+def list_renditions(task_dir: str, filename: str, widths: Sequence[int]) -> List[Tuple[int, str]]:
+    """
+    列出已存在的版本
+
+    Args:
+        task_dir: 任务目录
+        filename: 原图文件名
+        widths: 设定中的宽度列表
+
+    Returns:
+        [(宽度, 文件名), ...]（由小到大）
+    """
+    available = []
+    for width in sorted(set(widths)):
+        name = rendition_filename(filename, width)
+        if os.path.isfile(os.path.join(task_dir, name)):
+            available.append((width, name))
+    return available
+
+
+def select_rendition(task_dir: str, filename: str, requested_width: int,
+                     widths: Sequence[int]) -> Optional[Tuple[str, os.stat_result]]:
+    """
+    选择不小于请求宽度的最小版本
+
+    Args:
+        task_dir: 任务目录
+        filename: 原图文件名
+        requested_width: 请求的宽度（通常为显示宽度 × 像素比）
+        widths: 设定中的宽度列表
+
+    Returns:
+        (文件路径, os.stat 结果)；没有合适版本（请求比所有版本都宽，或尚未产生）时返回 None
+    """
+    for width in sorted(set(widths)):
+        if width < requested_width:
+            continue
+        path = os.path.join(task_dir, rendition_filename(filename, width))
+        try:
+            return path, os.stat(path)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,343 @@
+"""
+图片响应流式解码工具
+
+图片 API 的响应通常是数 MB 的 JSON（b64_json 或 data URI）。
+这里逐块读取响应（requests stream=True），遇到图片 base64 内容时直接分块解码写入临时文件，
+其余 JSON 文本保留下来（图片内容替换为占位符），不再把整个响应体、解析后的 dict
+和解码后的图片同时放在内存中。
+
+临时文件放在 history/.tmp 下，与任务目录同一文件系统，保存时用 os.replace 原子改名。
+"""
+import base64
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 临时文件目录（与 history 任务目录在同一文件系统）
+STREAM_TMP_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "history",
+    ".tmp"
+)
+
+# 每次读取的块大小
+CHUNK_SIZE = 64 * 1024
+
+# 图片内容在保留文本中的占位符
+PLACEHOLDER = "streamed:{}"
+
+# 图片 base64 内容的起点："b64_json": "（可带 data URI 前缀）或任意 data:image/...;base64,
+_START_PATTERN = re.compile(
+    rb'"b64_json"\s*:\s*"(?:data:[^,"]{0,100},)?|data:image/[A-Za-z0-9.+\-]{1,30};base64,'
+)
+# 标记跨块时保留的尾部长度（大于最长标记）
+_TAIL_KEEP = 160
+
+_BASE64_CHARS = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=")
+_NON_BASE64 = re.compile(rb'[^A-Za-z0-9+/=]')
+_JSON_SKIPPED_ESCAPES = frozenset(b"nrt")
+
+
+class StreamedImage:
+    """已解码到临时文件的图片"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read(self) -> bytes:
+        """读取图片内容"""
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def save_to(self, dest_path: str):
+        """移动到目标路径（同一文件系统时为原子改名）"""
+        try:
+            os.replace(self.path, dest_path)
+        except OSError:
+            shutil.move(self.path, dest_path)
+
+    def discard(self):
+        """删除临时文件"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def image_bytes(image: Any) -> bytes:
+    """取得图片内容（bytes 或 StreamedImage）"""
+    return image.read() if isinstance(image, StreamedImage) else image
+
+
+def discard_image(image: Any):
+    """丢弃不再需要的图片结果（只有 StreamedImage 需要清理）"""
+    if isinstance(image, StreamedImage):
+        image.discard()
+
+
+def _new_temp_file():
+    """在临时目录中建立文件"""
+    os.makedirs(STREAM_TMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="img_", suffix=".part", dir=STREAM_TMP_DIR)
+    return os.fdopen(fd, "wb"), path
+
+
+class _Base64FileWriter:
+    """分块 base64 解码写入文件（只解码 4 字节对齐的部分，余下留到下一块）"""
+
+    def __init__(self):
+        self.file, self.path = _new_temp_file()
+        self._pending = bytearray()
+        self.size = 0
+
+    def write(self, data: bytes):
+        self._pending += data
+        aligned = len(self._pending) - len(self._pending) % 4
+        if aligned:
+            decoded = base64.b64decode(bytes(self._pending[:aligned]))
+            self.file.write(decoded)
+            self.size += len(decoded)
+            del self._pending[:aligned]
+
+    def finish(self) -> StreamedImage:
+        if self._pending:
+            padded = bytes(self._pending) + b"=" * (-len(self._pending) % 4)
+            decoded = base64.b64decode(padded)
+            self.file.write(decoded)
+            self.size += len(decoded)
+        self.file.close()
+        return StreamedImage(self.path, self.size)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ImagePayloadScanner:
+    """
+    逐块扫描图片 API 响应
+
+    feed() 依序送入响应块；close() 返回 (图片列表, 去掉图片内容后的响应文本)。
+    图片按在响应中出现的顺序排列，文本中对应位置为 PLACEHOLDER。
+    """
+
+    def __init__(self):
+        self._text = bytearray()
+        self._buffer = b""
+        self._writer: Optional[_Base64FileWriter] = None
+        self.images: List[StreamedImage] = []
+
+    def feed(self, chunk: bytes, final: bool = False):
+        self._buffer += chunk
+        while self._buffer:
+            if self._writer is None:
+                if not self._scan_text(final):
+                    break
+            elif not self._scan_base64():
+                break
+
+    def _scan_text(self, final: bool) -> bool:
+        """文本模式：寻找图片内容起点；返回是否切换到 base64 模式"""
+        match = _START_PATTERN.search(self._buffer)
+        if match is None:
+            # 保留尾部，避免标记被切成两半
+            keep = 0 if final else min(len(self._buffer), _TAIL_KEEP)
+            self._text += self._buffer[:len(self._buffer) - keep]
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            return False
+
+        if not final and len(self._buffer) - match.start() < _TAIL_KEEP:
+            # 标记靠近块尾（可能还有 data URI 前缀未到），等下一块再判断
+            self._text += self._buffer[:match.start()]
+            self._buffer = self._buffer[match.start():]
+            return False
+
+        self._text += self._buffer[:match.end()]
+        self._buffer = self._buffer[match.end():]
+        self._writer = _Base64FileWriter()
+        return True
+
+    def _scan_base64(self) -> bool:
+        """base64 模式：解码到结束符为止；返回是否回到文本模式"""
+        buffer = self._buffer
+        parts = []
+        pos = 0
+        end = None
+
+        while True:
+            match = _NON_BASE64.search(buffer, pos)
+            if match is None:
+                parts.append(buffer[pos:])
+                pos = len(buffer)
+                break
+
+            i = match.start()
+            parts.append(buffer[pos:i])
+            pos = i
+            if buffer[i] != 0x5C:  # 非反斜杠：图片内容结束
+                end = i
+                break
+
+            # JSON 转义
+            if i + 1 >= len(buffer):
+                break
+            escaped = buffer[i + 1]
+            if escaped == 0x2F:  # \/
+                parts.append(b"/")
+                pos = i + 2
+            elif escaped in _JSON_SKIPPED_ESCAPES:  # \n \r \t（base64 换行）
+                pos = i + 2
+            elif escaped == 0x75:  # \uXXXX
+                if i + 6 > len(buffer):
+                    break
+                char = chr(int(buffer[i + 2:i + 6], 16)).encode("latin-1", "ignore")
+                if not char or char[0] not in _BASE64_CHARS:
+                    end = i
+                    break
+                parts.append(char)
+                pos = i + 6
+            else:
+                end = i
+                break
+
+        self._writer.write(b"".join(parts))
+        if end is None:
+            self._buffer = buffer[pos:]
+            return False
+
+        self.images.append(self._writer.finish())
+        self._writer = None
+        self._text += PLACEHOLDER.format(len(self.images) - 1).encode()
+        self._buffer = buffer[end:]
+        return True
+
+    def close(self) -> Tuple[List[StreamedImage], bytes]:
+        """结束扫描；响应在图片内容中途结束时丢弃该图片"""
+        self.feed(b"", final=True)
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+            logger.warning("图片响应在 base64 内容中途结束，已丢弃不完整的图片")
+        self._text += self._buffer
+        self._buffer = b""
+        return self.images, bytes(self._text)
+
+    def abort(self):
+        """出错时清理所有临时文件"""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+        for image in self.images:
+            image.discard()
+        self.images = []
+
+
+def scan_image_chunks(chunks: Iterable[bytes]) -> Tuple[List[StreamedImage], bytes]:
+    """
+    扫描响应块
+
+    Args:
+        chunks: 响应内容块
+
+    Returns:
+        (图片列表, 去掉图片内容后的响应文本)
+    """
+    scanner = ImagePayloadScanner()
+    try:
+        for chunk in chunks:
+            if chunk:
+                scanner.feed(chunk)
+        return scanner.close()
+    except BaseException:
+        scanner.abort()
+        raise
+
+
+def read_image_response(response) -> Tuple[List[StreamedImage], Any]:
+    """
+    读取 stream=True 的图片 API 响应
+
+    Args:
+        response: requests 响应对象（stream=True）
+
+    Returns:
+        (图片列表, 解析后的 JSON；图片内容已替换为 PLACEHOLDER)
+    """
+    try:
+        images, text = scan_image_chunks(response.iter_content(CHUNK_SIZE))
+    finally:
+        response.close()
+
+    try:
+        result = json.loads(text) if text.strip() else {}
+    except ValueError:
+        for image in images:
+            image.discard()
+        raise ValueError(f"响应不是有效的 JSON: {text[:300].decode('utf-8', 'replace')}")
+
+    return images, result
+
+
+def download_to_file(response, max_bytes: Optional[int] = None) -> StreamedImage:
+    """
+    将 stream=True 的下载响应分块写入临时文件
+
+    Args:
+        response: requests 响应对象（stream=True，状态码已检查）
+        max_bytes: 大小上限（None 表示不限制），超过时中止下载并抛出 ValueError
+
+    Returns:
+        StreamedImage
+    """
+    if max_bytes is not None:
+        try:
+            declared = int(response.headers.get("Content-Length", ""))
+        except (TypeError, ValueError):
+            declared = None
+        if declared is not None and declared > max_bytes:
+            response.close()
+            raise ValueError(f"文件过大: {declared} 字节（上限 {max_bytes} 字节）")
+
+    file, path = _new_temp_file()
+    size = 0
+    try:
+        with file:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if chunk:
+                    size += len(chunk)
+                    # Content-Length 可能缺失或不实，按实际读取量检查
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f"文件过大: 超过上限 {max_bytes} 字节")
+                    file.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+    finally:
+        response.close()
+
+    return StreamedImage(path, size)
+
+
+def write_bytes_atomic(data: bytes, dest_path: str):
+    """先写入同目录临时文件再改名，避免读到写了一半的图片"""
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex[:8]}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, dest_path)
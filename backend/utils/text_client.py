@@ -6,6 +6,8 @@ import requests
 from functools import wraps
 from typing import List, Optional, Union
 from .image_compressor import compress_image
+from .metrics import record_failure, record_retry
+from .logging_utils import summarize_payload
 
 
 def retry_on_429(max_retries=3, base_delay=2):
@@ -18,8 +20,10 @@ def retry_on_429(max_retries=3, base_delay=2):
                     return func(*args, **kwargs)
                 except Exception as e:
                     error_str = str(e)
+                    record_failure('text_client', e, model=kwargs.get('model', ''))
                     if "429" in error_str or "rate" in error_str.lower():
                         if attempt < max_retries - 1:
+                            record_retry('text_client', e, model=kwargs.get('model', ''))
                             wait_time = (base_delay ** attempt) + random.uniform(0, 1)
                             print(f"[重试] 遇到限流，{wait_time:.1f}秒后重试 (尝试 {attempt + 2}/{max_retries})")
                             time.sleep(wait_time)
@@ -240,7 +244,7 @@ class TextChatClient:
         else:
             raise Exception(
                 f"Text API 响应格式异常：未找到生成的文本。\n"
-                f"响应数据: {str(result)[:500]}\n"
+                f"响应数据: {str(summarize_payload(result))[:500]}\n"
                 "可能原因：\n"
                 "1. API返回格式与OpenAI标准不一致\n"
                 "2. 请求被拒绝或过滤\n"
@@ -0,0 +1,238 @@
+"""
+轻量追踪工具
+
+以任务为单位（trace_id，通常就是 task_id）记录嵌套 span：
+名称、起止时间、耗时、属性与错误。span 保存在内存中供 /api/tasks/<id>/trace 查看，
+并可追加写入本地 JSONL 文件（Config.TRACE_EXPORT_FILE）。
+
+跨线程池传递上下文时，用 contextvars.copy_context().run 包装提交的函数。
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 目前线程/上下文中的 span
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """单个 span"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        """设置属性"""
+        self.attributes[key] = value
+
+    def set_error(self, error: Union[Exception, str]):
+        """标记为失败"""
+        self.status = "error"
+        self.error = str(error)[:500]
+
+    def finish(self):
+        """结束 span，记录耗时"""
+        self.duration_ms = round((time.perf_counter() - self._start_perf) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """追踪器：保存最近的 trace，并可导出为 JSONL"""
+
+    MAX_TRACES = 500  # 内存中保留的 trace 数
+    MAX_SPANS_PER_TRACE = 5000  # 单个 trace 最多保留的 span 数
+
+    def __init__(self, export_file: Optional[str] = None):
+        self.export_file = export_file
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+
+    def record(self, span: Span):
+        """保存已结束的 span"""
+        data = span.to_dict()
+
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = []
+                self._traces[span.trace_id] = spans
+                while len(self._traces) > self.MAX_TRACES:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(span.trace_id)
+            if len(spans) < self.MAX_SPANS_PER_TRACE:
+                spans.append(data)
+
+        if self.export_file:
+            self._export(data)
+
+    def _export(self, data: Dict[str, Any]):
+        """追加写入 JSONL 文件"""
+        try:
+            with self._export_lock:
+                export_dir = os.path.dirname(self.export_file)
+                if export_dir:
+                    os.makedirs(export_dir, exist_ok=True)
+                with open(self.export_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False, default=str) + "\n")
+        except Exception as e:
+            logger.warning("写入 trace 文件失败: %s", e)
+
+    def get_spans(self, trace_id: str) -> List[Dict[str, Any]]:
+        """取得 trace 的所有 span（内存中没有时从 JSONL 文件读取）"""
+        with self._lock:
+            spans = list(self._traces.get(trace_id, []))
+        if spans or not self.export_file or not os.path.exists(self.export_file):
+            return spans
+
+        with open(self.export_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if trace_id not in line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    continue
+                if data.get("trace_id") == trace_id:
+                    spans.append(data)
+        return spans
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """取得全局追踪器"""
+    return _tracer
+
+
+def configure_tracing(export_file: Optional[str] = None):
+    """设置 JSONL 导出文件（None 表示只保存在内存）"""
+    _tracer.export_file = export_file
+
+
+def current_span() -> Optional[Span]:
+    """取得目前上下文中的 span"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """取得目前上下文中的 trace_id"""
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def new_trace_id() -> str:
+    """产生新的 trace_id"""
+    return f"trace_{uuid.uuid4().hex[:12]}"
+
+
+@contextmanager
+def start_span(name: str, trace_id: Optional[str] = None, **attributes):
+    """
+    开始一个 span（上下文管理器）
+
+    Args:
+        name: span 名称，如 "image.generate"
+        trace_id: 指定 trace_id；不指定时沿用目前上下文的 trace，都没有则新建
+        **attributes: span 属性
+
+    用法：
+        with start_span("export.markdown", trace_id=task_id, pages=10) as span:
+            span.set_attribute("bytes", len(result))
+    """
+    parent = _current_span.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else new_trace_id()
+    parent_id = parent.span_id if parent and parent.trace_id == trace_id else None
+
+    span = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            span.set_error(e)
+        raise
+    finally:
+        span.finish()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 生成器在不同上下文中被关闭时无法还原，直接清空
+            _current_span.set(parent)
+        _tracer.record(span)
+
+
+def build_span_tree(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """将扁平 span 列表组织成树（按开始时间排序）"""
+    nodes = {span["span_id"]: dict(span, children=[]) for span in spans}
+    roots = []
+    for node in sorted(nodes.values(), key=lambda s: s["start_time"]):
+        parent = nodes.get(node["parent_id"]) if node["parent_id"] else None
+        if parent is not None:
+            parent["children"].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+def summarize_spans(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按 span 名称汇总耗时"""
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for span in spans:
+        stats = by_name.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+        duration = span.get("duration_ms") or 0.0
+        stats["count"] += 1
+        stats["total_ms"] = round(stats["total_ms"] + duration, 3)
+        stats["max_ms"] = max(stats["max_ms"], duration)
+        if span.get("status") == "error":
+            stats["errors"] += 1
+
+    if spans:
+        start = min(s["start_time"] for s in spans)
+        end = max(s["start_time"] + (s.get("duration_ms") or 0) / 1000 for s in spans)
+        wall_ms = round((end - start) * 1000, 3)
+    else:
+        wall_ms = 0.0
+
+    return {"span_count": len(spans), "wall_ms": wall_ms, "by_name": by_name}
+
+
+class TraceContextFilter(logging.Filter):
+    """为日志记录加上 trace_id（无 trace 时为 '-'）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
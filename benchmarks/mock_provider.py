@@ -0,0 +1,487 @@
+"""
+Mock image provider
+
+A local HTTP server speaking the provider APIs the image generators call, so
+ImageService can be exercised offline:
+- OpenAI-compatible: POST /v1/images/generations (honours n), POST /v1/chat/completions
+  (image returned as a Markdown data URI), POST/DELETE /v1/files, and the offline batch
+  API (POST /v1/batches, GET /v1/batches/<id>, GET /v1/files/<id>/content)
+- Gemini: POST /v1beta/models/<model>:generateContent (inline image part) and the
+  resumable Files API upload (POST /upload/v1beta/files, DELETE /v1beta/files/<id>)
+
+Each generation request sleeps for a latency drawn from a configurable distribution
+and can fail with an injected 500 or 429 (with Retry-After). Batch jobs draw the same
+latency and failure per request: the job completes once its slowest request would
+have, and failed requests appear as error lines in the output file. Responses carry a noise
+PNG of roughly --payload-kb, so decoding and saving cost what real images do.
+
+    python benchmarks/mock_provider.py --port 8765 --latency lognormal:2,0.5 --error-rate 0.02
+
+Latency specs (seconds): const:S, uniform:LO,HI, normal:MEAN,STD, lognormal:MEDIAN,SIGMA,
+exp:MEAN. GET /_stats returns request counts per route and status and the reference images
+received (inline / file); POST /_reset clears them. Reference images in an images API "image"
+array must be data URIs or URLs, and chat "file" parts must name an uploaded file (400 otherwise).
+"""
+import argparse
+import base64
+import io
+import itertools
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from PIL import Image
+
+GEMINI_GENERATE = re.compile(r'^/v1beta/models/([^/:]+):generateContent$')
+GEMINI_FILE = re.compile(r'^/v1beta/files/([\w-]+)$')
+OPENAI_FILE = re.compile(r'^/v1/files/([\w-]+)$')
+OPENAI_FILE_CONTENT = re.compile(r'^/v1/files/([\w-]+)/content$')
+OPENAI_BATCH = re.compile(r'^/v1/batches/([\w-]+)$')
+JSONL_LINE = re.compile(rb'^\{.*"custom_id".*\}\r?$', re.MULTILINE)
+
+
+class LatencyModel:
+    """Latency distribution parsed from a spec such as "lognormal:2,0.5" (seconds)"""
+
+    KINDS = {"const": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+
+    def __init__(self, spec: str, rng: random.Random):
+        self.spec = spec
+        self.rng = rng
+        kind, _, args = spec.partition(":")
+        if not args:
+            kind, args = "const", kind
+        try:
+            self.params = [float(x) for x in args.split(",")]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        if self.KINDS.get(kind) != len(self.params) or any(p < 0 for p in self.params):
+            raise ValueError(f"Invalid latency spec: {spec!r} (expected one of {', '.join(self.KINDS)})")
+        self.kind = kind
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "const":
+            return p[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return self.rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        return self.rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+
+
+def noise_png(payload_kb: int, rng: random.Random) -> bytes:
+    """PNG of random pixels, roughly payload_kb large (noise doesn't compress)"""
+    side = max(8, int(math.sqrt(payload_kb * 1024 / 3)))
+    image = Image.frombytes("RGB", (side, side), rng.randbytes(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class MockProviderServer:
+    """
+    Threaded mock provider
+
+    Args:
+        host / port: Bind address (port 0 picks a free port)
+        latency: Latency spec applied to generation requests
+        error_rate: Share of generation requests answered with 500
+        rate_limit_rate: Share of generation requests answered with 429
+        payload_kb: Approximate size of the returned PNG
+        seed: Seed for latencies, injected failures and the payload
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "const:0",
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 payload_kb: int = 200, seed=None):
+        if error_rate + rate_limit_rate > 1:
+            raise ValueError("error_rate + rate_limit_rate must not exceed 1")
+        self.rng = random.Random(seed)
+        self.latency = LatencyModel(latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.payload_kb = payload_kb
+        self.image_b64 = base64.b64encode(noise_png(payload_kb, self.rng)).decode("ascii")
+
+        self._stats = Counter()
+        self._references = Counter()
+        self._files = {}
+        self._batches = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockProviderServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        """Request counts: {"<route> <status>": count}, files currently stored, reference images by kind"""
+        with self._lock:
+            counts = dict(sorted(self._stats.items()))
+            files = len(self._files)
+            references = dict(self._references)
+        return {"requests": counts, "total": sum(counts.values()), "stored_files": files,
+                "references": references}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+            self._references.clear()
+
+    def record(self, route: str, status: int):
+        with self._lock:
+            self._stats[f"{route} {status}"] += 1
+
+    def record_references(self, **counts: int):
+        """Count reference images sent with generation requests ("inline" data or "file" ids)"""
+        with self._lock:
+            self._references.update({kind: n for kind, n in counts.items() if n})
+
+    def draw(self):
+        """(latency, status of an injected failure (500 / 429) or 0 to succeed)"""
+        with self._lock:
+            roll = self.rng.random()
+            delay = self.latency.sample()
+        if roll < self.error_rate:
+            return delay, 500
+        if roll < self.error_rate + self.rate_limit_rate:
+            return delay, 429
+        return delay, 0
+
+    def draw_failure(self) -> int:
+        """Sleep for a sampled latency; status of an injected failure, or 0 to succeed"""
+        delay, status = self.draw()
+        time.sleep(delay)
+        return status
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def store_file(self, data: bytes, mime_type: str, content: bytes = None) -> str:
+        file_id = f"file-{self.next_id()}"
+        with self._lock:
+            self._files[file_id] = (len(data), mime_type, content)
+        return file_id
+
+    def has_file(self, file_id) -> bool:
+        with self._lock:
+            return file_id in self._files
+
+    def file_content(self, file_id: str):
+        with self._lock:
+            entry = self._files.get(file_id)
+        return entry[2] if entry else None
+
+    def create_batch(self, input_file_id: str, endpoint: str):
+        """Create a batch job from a stored JSONL file (None if the file is unknown)"""
+        content = self.file_content(input_file_id)
+        if content is None:
+            return None
+        now = time.monotonic()
+        requests = []
+        for line in JSONL_LINE.findall(content):
+            delay, status = self.draw()
+            requests.append({"custom_id": json.loads(line)["custom_id"], "done_at": now + delay, "status": status})
+        batch = {
+            "id": f"batch-{self.next_id()}",
+            "object": "batch",
+            "endpoint": endpoint,
+            "input_file_id": input_file_id,
+            "completion_window": "24h",
+            "created_at": int(time.time()),
+            "requests": requests,
+            "output_file_id": None,
+        }
+        with self._lock:
+            self._batches[batch["id"]] = batch
+        return self.batch_state(batch["id"])
+
+    def batch_state(self, batch_id: str):
+        """Public view of a batch job; writes the output file once every request is done"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is None:
+            return None
+        now = time.monotonic()
+        requests = batch["requests"]
+        done = [r for r in requests if r["done_at"] <= now]
+        if len(done) == len(requests) and batch["output_file_id"] is None:
+            output = b"".join(self._batch_output_line(batch_id, r) for r in requests)
+            batch["output_file_id"] = self.store_file(output, "application/jsonl", output)
+        state = {key: value for key, value in batch.items() if key != "requests"}
+        state["status"] = "completed" if batch["output_file_id"] else "in_progress"
+        state["request_counts"] = {
+            "total": len(requests),
+            "completed": sum(1 for r in done if not r["status"]),
+            "failed": sum(1 for r in done if r["status"]),
+        }
+        return state
+
+    def _batch_output_line(self, batch_id: str, request: dict) -> bytes:
+        if request["status"]:
+            response = {"status_code": request["status"], "request_id": batch_id,
+                        "body": {"error": {"message": "Injected failure (mock)"}}}
+        else:
+            response = {"status_code": 200, "request_id": batch_id,
+                        "body": {"created": int(time.time()), "data": [{"b64_json": self.image_b64}]}}
+        entry = {"id": f"{batch_id}-{request['custom_id']}", "custom_id": request["custom_id"],
+                 "response": response, "error": None}
+        return json.dumps(entry).encode("utf-8") + b"\n"
+
+    def delete_file(self, file_id: str) -> bool:
+        with self._lock:
+            return self._files.pop(file_id, None) is not None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping a request (e.g. a discarded hedged call) are not errors
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def mock(self) -> MockProviderServer:
+        return self.server.mock
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, route: str, status: int, payload: dict, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.mock.record(route, status)
+
+    def _send_failure(self, route: str, status: int, gemini: bool):
+        headers = {"Retry-After": "1"} if status == 429 else None
+        if gemini:
+            error = {"code": status, "message": "Resource has been exhausted (mock)", "status": "RESOURCE_EXHAUSTED"} \
+                if status == 429 else {"code": status, "message": "Internal error (mock)", "status": "INTERNAL"}
+        else:
+            error = {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"} \
+                if status == 429 else {"message": "Internal server error (mock)", "type": "server_error"}
+        self._send(route, status, {"error": error}, headers)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/_stats":
+            return self._send("stats", 200, self.mock.stats())
+        match = OPENAI_BATCH.match(path)
+        if match:
+            state = self.mock.batch_state(match.group(1))
+            if state is None:
+                return self._send("batches.get", 404, {"error": {"message": f"No such batch: {match.group(1)}"}})
+            return self._send("batches.get", 200, state)
+        match = OPENAI_FILE_CONTENT.match(path)
+        if match:
+            content = self.mock.file_content(match.group(1))
+            if content is None:
+                return self._send("files.content", 404, {"error": {"message": f"No such file: {match.group(1)}"}})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/jsonl")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return self.mock.record("files.content", 200)
+        self._send("unknown", 404, {"error": {"message": f"Not found: {self.path}"}})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == "/_reset":
+            self._body()
+            self.mock.reset_stats()
+            return self._send("reset", 200, {"ok": True})
+        if path == "/v1/images/generations":
+            return self._images(self._body())
+        if path == "/v1/chat/completions":
+            return self._chat(self._body())
+        if path == "/v1/files":
+            return self._openai_upload(self._body())
+        if path == "/v1/batches":
+            payload = json.loads(self._body() or b"{}")
+            state = self.mock.create_batch(payload.get("input_file_id"), payload.get("endpoint"))
+            if state is None:
+                return self._send("batches.create", 400, {"error": {"message": "Unknown input_file_id"}})
+            return self._send("batches.create", 200, state)
+        if path == "/upload/v1beta/files":
+            return self._gemini_upload(self._body())
+        match = GEMINI_GENERATE.match(path)
+        if match:
+            return self._gemini_generate(self._body())
+        self._body()
+        self._send("unknown", 404, {"error": {"message": f"Not found: {path}"}})
+
+    def do_DELETE(self):
+        path = urlsplit(self.path).path
+        match = OPENAI_FILE.match(path) or GEMINI_FILE.match(path)
+        if match and self.mock.delete_file(match.group(1)):
+            return self._send("files.delete", 200, {"id": match.group(1), "deleted": True})
+        self._send("files.delete", 404, {"error": {"message": f"No such file: {path}"}})
+
+    def _images(self, body: bytes):
+        route = "images"
+        payload = json.loads(body or b"{}")
+        # Like the images API, reference images must be image data (data URI / URL), not file objects
+        references = payload.get("image") or []
+        if any(not isinstance(image, str) for image in references):
+            return self._send(route, 400, {"error": {
+                "message": "Invalid 'image': expected data URIs or URLs", "type": "invalid_request_error"
+            }})
+        self.mock.record_references(inline=len(references))
+        status = self.mock.draw_failure()
+        if status:
+            return self._send_failure(route, status, gemini=False)
+        n = max(1, int(payload.get("n", 1)))
+        data = [{"b64_json": self.mock.image_b64} for _ in range(n)]
+        self._send(route, 200, {"created": int(time.time()), "data": data})
+
+    def _chat(self, body: bytes):
+        route = "chat"
+        payload = json.loads(body or b"{}")
+        inline, files = 0, 0
+        for message in payload.get("messages", []):
+            parts = message.get("content")
+            for part in parts if isinstance(parts, list) else []:
+                if part.get("type") == "image_url":
+                    inline += 1
+                elif part.get("type") == "file":
+                    file_id = part.get("file", {}).get("file_id")
+                    if not self.mock.has_file(file_id):
+                        return self._send(route, 400, {"error": {
+                            "message": f"No such file: {file_id}", "type": "invalid_request_error"
+                        }})
+                    files += 1
+        self.mock.record_references(inline=inline, file=files)
+        status = self.mock.draw_failure()
+        if status:
+            return self._send_failure(route, status, gemini=False)
+        content = f"![image](data:image/png;base64,{self.mock.image_b64})"
+        self._send(route, 200, {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}]
+        })
+
+    def _gemini_generate(self, body: bytes):
+        route = "gemini.generateContent"
+        status = self.mock.draw_failure()
+        if status:
+            return self._send_failure(route, status, gemini=True)
+        self._send(route, 200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [
+                    {"inlineData": {"mimeType": "image/png", "data": self.mock.image_b64}}
+                ]},
+                "finishReason": "STOP"
+            }],
+            "usageMetadata": {"promptTokenCount": len(body) // 4, "candidatesTokenCount": 1290}
+        })
+
+    def _openai_upload(self, body: bytes):
+        if "multipart/form-data" not in self.headers.get("Content-Type", ""):
+            return self._send("files.upload", 400, {"error": {"message": "Expected multipart/form-data"}})
+        purpose = "batch" if re.search(rb'name="purpose"\r\n\r\nbatch\r\n', body) else "vision"
+        match = re.search(rb'Content-Type: (image/[\w.+-]+)', body)
+        mime_type = match.group(1).decode() if match else "application/octet-stream"
+        # Batch input files are kept so /v1/batches can read their requests
+        file_id = self.mock.store_file(body, mime_type, body if purpose == "batch" else None)
+        self._send("files.upload", 200, {
+            "id": file_id, "object": "file", "bytes": len(body),
+            "created_at": int(time.time()), "purpose": purpose
+        })
+
+    def _gemini_upload(self, body: bytes):
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        if "start" in command:
+            # Resumable protocol: hand out the URL the bytes are sent to
+            upload_id = self.mock.next_id()
+            mime_type = self.headers.get("X-Goog-Upload-Header-Content-Type", "application/octet-stream")
+            return self._send("gemini.files.start", 200, {}, {
+                "X-Goog-Upload-Status": "active",
+                "X-Goog-Upload-URL": f"{self.mock.base_url}/upload/v1beta/files?upload_id={upload_id}&mime={mime_type}",
+            })
+        query = dict(part.split("=", 1) for part in urlsplit(self.path).query.split("&") if "=" in part)
+        mime_type = query.get("mime", "application/octet-stream")
+        file_id = self.mock.store_file(body, mime_type)
+        self._send("gemini.files.upload", 200, {"file": {
+            "name": f"files/{file_id}",
+            "uri": f"{self.mock.base_url}/v1beta/files/{file_id}",
+            "mimeType": mime_type,
+            "sizeBytes": str(len(body)),
+            "state": "ACTIVE"
+        }}, {"X-Goog-Upload-Status": "final"})
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run a local mock image provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="const:0", help="latency spec in seconds (default const:0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests failing with 429")
+    parser.add_argument("--payload-kb", type=int, default=200, help="approximate PNG size (default 200)")
+    parser.add_argument("--seed", type=int, help="seed for latencies and injected failures")
+    args = parser.parse_args(argv)
+
+    server = MockProviderServer(
+        args.host, args.port, args.latency, args.error_rate, args.rate_limit_rate, args.payload_kb, args.seed
+    )
+    print(f"mock provider listening on {server.base_url} "
+          f"(latency {args.latency}, errors {args.error_rate:.0%}, 429s {args.rate_limit_rate:.0%})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
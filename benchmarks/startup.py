@@ -0,0 +1,158 @@
+"""
+Startup benchmark
+
+Measures, in fresh interpreter processes:
+- import_s: `import backend.app`
+- create_app_s: `create_app()` (route registration, config validation)
+- first_request_s: first GET /api/health through the test client
+- ready_s: the three above combined (time until the worker can answer)
+
+and which heavy optional modules got imported along the way.
+
+Prints one JSON object (medians over --runs) so results can be stored and compared
+in CI:
+
+    python benchmarks/startup.py --runs 7 --output startup.json
+    python benchmarks/startup.py --baseline startup.json --max-regression 0.25
+
+With --baseline, exits 1 when any median exceeds baseline * (1 + max-regression).
+--importtime prints the slowest imports (python -X importtime) to stderr.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+METRICS = ("import_s", "create_app_s", "first_request_s", "ready_s")
+
+# Modules that should only load when the matching provider / feature is used
+HEAVY_MODULES = ("google.genai", "multiprocessing.pool", "concurrent.futures.process")
+
+_CHILD = r"""
+import json, logging, sys, time
+t0 = time.perf_counter()
+import backend.app
+t1 = time.perf_counter()
+app = backend.app.create_app()
+t2 = time.perf_counter()
+response = app.test_client().get('/api/health')
+t3 = time.perf_counter()
+logging.shutdown()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "create_app_s": t2 - t1,
+    "first_request_s": t3 - t2,
+    "ready_s": t3 - t0,
+    "status": response.status_code,
+    "loaded": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def _child_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    env["LOG_LEVEL"] = "WARNING"
+    # Measure the lazy path only, even if the caller's environment opts into warm-up
+    env["STARTUP_WARMUP"] = "0"
+    return env
+
+
+def run_once() -> dict:
+    """Run one cold start in a fresh interpreter"""
+    code = f"HEAVY = {HEAVY_MODULES!r}\n" + _CHILD
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT, env=_child_env(), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_importtime(limit: int = 15):
+    """Print the slowest imports by cumulative time"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.app; backend.app.create_app()"],
+        cwd=PROJECT_ROOT, env=_child_env(), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if cumulative_us.strip().isdigit():
+            rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    print("slowest imports (cumulative ms):", file=sys.stderr)
+    for cumulative_us, name in rows[:limit]:
+        print(f"  {cumulative_us / 1000:8.1f}  {name}", file=sys.stderr)
+
+
+def summarize(runs: list) -> dict:
+    """Median / min / max per metric"""
+    summary = {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "runs": len(runs),
+        "status": sorted({run["status"] for run in runs}),
+        "heavy_modules_loaded": sorted({m for run in runs for m in run["loaded"]}),
+    }
+    for metric in METRICS:
+        values = [run[metric] for run in runs]
+        summary[metric] = {
+            "median": round(statistics.median(values), 4),
+            "min": round(min(values), 4),
+            "max": round(max(values), 4),
+        }
+    return summary
+
+
+def compare(summary: dict, baseline: dict, max_regression: float) -> list:
+    """Metrics whose median regressed beyond the allowed ratio"""
+    regressions = []
+    for metric in METRICS:
+        if metric not in baseline:
+            continue
+        current, previous = summary[metric]["median"], baseline[metric]["median"]
+        if previous > 0 and current > previous * (1 + max_regression):
+            regressions.append(f"{metric}: {previous:.4f}s -> {current:.4f}s (+{current / previous - 1:.0%})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure backend cold-start time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to run (default 5)")
+    parser.add_argument("--output", help="also write the JSON summary to this file")
+    parser.add_argument("--baseline", help="JSON summary from a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed median slowdown vs baseline as a ratio (default 0.25)")
+    parser.add_argument("--importtime", action="store_true", help="print the slowest imports to stderr")
+    args = parser.parse_args(argv)
+
+    # One untimed run so bytecode caches exist, like a deployed worker
+    run_once()
+    summary = summarize([run_once() for _ in range(max(1, args.runs))])
+
+    output = json.dumps(summary, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    if args.importtime:
+        print_importtime()
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(summary, baseline, args.max_regression)
+        if regressions:
+            print("startup regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Image generation throughput benchmark
+
+Runs ImageService.generate_images end to end against the local mock provider
+(benchmarks/mock_provider.py) for each concurrency setting and reports, per setting:
+- pages_per_s: generated pages / wall time
+- latency_s: p50 / p95 / p99 / max page latency (from a page's "generating" event to its
+  result, including provider retries)
+- completed / failed pages and the requests the mock provider received
+- peak_rss_mb: peak resident memory of the worker process
+
+Each setting runs in a fresh interpreter so peak RSS isn't carried over between
+settings; the mock provider runs in this process. Prints one JSON object:
+
+    python benchmarks/throughput.py --concurrency 1,4,15 --pages 8 --tasks 2
+    python benchmarks/throughput.py --provider google_genai --latency lognormal:1.5,0.4 \\
+        --rate-limit-rate 0.05 --output throughput.json
+    python benchmarks/throughput.py --baseline throughput.json --max-regression 0.2
+
+Concurrency 1 uses sequential mode; higher values turn on high_concurrency with
+ImageService.MAX_CONCURRENT set to the value. Prompt distillation is off (there is no
+text provider) and images are written to a temporary directory, not history/.
+With --baseline, exits 1 when pages/s drops or p95 latency grows beyond the allowed
+ratio for any concurrency present in both runs.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+import yaml
+from mock_provider import MockProviderServer
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Provider configs pointed at the mock server
+PROVIDERS = {
+    "image_api": {"type": "image_api", "endpoint_type": "/v1/images/generations"},
+    "image_api_chat": {"type": "image_api", "endpoint_type": "/v1/chat/completions"},
+    "openai_compatible": {"type": "openai_compatible", "endpoint_type": "/v1/images/generations"},
+    "openai_compatible_batch": {
+        "type": "openai_compatible", "endpoint_type": "/v1/images/generations",
+        "batch_mode": "jsonl", "batch_poll_interval": 0.2,
+    },
+    "google_genai": {"type": "google_genai"},
+}
+
+PERCENTILES = (50, 95, 99)
+
+PAGE_TEXT = (
+    "這一段介紹主題的重點與背景，說明讀者為什麼需要關心，並舉出一個日常生活中的例子。"
+    "接著整理三個實用的建議，每個建議都附上簡短的理由與注意事項，最後用一句話收尾。"
+)
+
+
+def percentile(samples: list, p: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def build_pages(count: int) -> list:
+    pages = [{"index": 0, "type": "cover", "content": "標題：基準測試文章\n副標題：模擬的部落格配圖"}]
+    for index in range(1, count):
+        pages.append({"index": index, "type": "content", "content": f"第 {index} 段\n{PAGE_TEXT}"})
+    return pages
+
+
+def reference_images(count: int) -> list:
+    """Small distinct PNGs used as user reference images"""
+    import io
+    from PIL import Image
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        Image.new("RGB", (256, 256), (40 * i % 256, 120, 200)).save(buffer, "PNG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def run_worker(spec: dict) -> dict:
+    """Child process: generate spec["tasks"] tasks concurrently and time every page"""
+    import resource
+    import threading
+    import time
+
+    from backend.config import Config
+    from backend.utils import streaming
+    from backend.utils.config_store import CONFIG_STORE
+
+    workdir = spec["workdir"]
+    CONFIG_STORE.register("image_providers", os.path.join(workdir, "image_providers.yaml"))
+    streaming.STREAM_TMP_DIR = os.path.join(workdir, ".tmp")
+    Config.IMAGE_RENDITION_WIDTHS = spec["renditions"]
+
+    from backend.services.image import ImageService
+
+    service = ImageService()
+    service.history_root_dir = os.path.join(workdir, "history")
+    service.MAX_CONCURRENT = spec["concurrency"]
+
+    pages = build_pages(spec["pages"])
+    outline = "\n<page>\n".join(page["content"] for page in pages)
+    user_images = reference_images(spec["reference_images"]) or None
+    latencies, failed = [], []
+    lock = threading.Lock()
+
+    def run_task(task_number: int):
+        task_id = f"bench_{task_number}"
+        started = {}
+        for event in service.generate_images(
+            pages, task_id=task_id, full_outline=outline, user_images=user_images,
+            user_topic="基準測試", image_style="flat"
+        ):
+            data, now = event["data"], time.perf_counter()
+            if event["event"] == "progress" and data.get("status") == "generating":
+                started[data["index"]] = now
+            elif event["event"] in ("complete", "error") and data.get("index") in started:
+                with lock:
+                    if event["event"] == "complete":
+                        latencies.append(now - started.pop(data["index"]))
+                    else:
+                        failed.append(data["index"])
+        service.cleanup_task(task_id)
+
+    threads = [threading.Thread(target=run_task, args=(i,)) for i in range(spec["tasks"])]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+    result = {
+        "concurrency": spec["concurrency"],
+        "wall_s": round(wall, 3),
+        "completed": len(latencies),
+        "failed": len(failed),
+        "pages_per_s": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_s": {},
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+    if latencies:
+        result["latency_s"] = {f"p{p}": round(percentile(latencies, p), 3) for p in PERCENTILES}
+        result["latency_s"]["max"] = round(max(latencies), 3)
+    return result
+
+
+def run_setting(args, server: MockProviderServer, concurrency: int) -> dict:
+    """Run one concurrency setting in a fresh interpreter"""
+    workdir = tempfile.mkdtemp(prefix="throughput_")
+    try:
+        provider = {
+            **PROVIDERS[args.provider],
+            "api_key": "mock-benchmark-key",
+            "base_url": server.base_url,
+            "model": "mock-image-model",
+            "high_concurrency": concurrency > 1,
+            "distill_prompt": False,
+            "file_upload": args.file_upload,
+            "file_reference": args.file_upload,
+        }
+        with open(os.path.join(workdir, "image_providers.yaml"), "w", encoding="utf-8") as f:
+            yaml.safe_dump({"active_provider": "mock", "providers": {"mock": provider}}, f)
+
+        spec = {
+            "workdir": workdir,
+            "concurrency": concurrency,
+            "pages": args.pages,
+            "tasks": args.tasks,
+            "reference_images": args.reference_images,
+            "renditions": [int(width) for width in args.renditions.split(",") if width.strip()],
+        }
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+        env["LOG_LEVEL"] = "WARNING"
+
+        server.reset_stats()
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", json.dumps(spec)],
+            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr[-4000:])
+            raise RuntimeError(f"worker failed at concurrency {concurrency} (exit {result.returncode})")
+        summary = json.loads(result.stdout.strip().splitlines()[-1])
+        summary["provider_requests"] = server.stats()["requests"]
+        return summary
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(summary: dict, baseline: dict, max_regression: float) -> list:
+    """Settings whose pages/s or p95 latency regressed beyond the allowed ratio"""
+    previous_results = {r["concurrency"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for current in summary["results"]:
+        previous = previous_results.get(current["concurrency"])
+        if previous is None:
+            continue
+        label = f"concurrency {current['concurrency']}"
+        if previous["pages_per_s"] > 0 and current["pages_per_s"] < previous["pages_per_s"] * (1 - max_regression):
+            regressions.append(f"{label} pages/s: {previous['pages_per_s']} -> {current['pages_per_s']}")
+        p95, previous_p95 = current["latency_s"].get("p95"), previous["latency_s"].get("p95")
+        if p95 and previous_p95 and p95 > previous_p95 * (1 + max_regression):
+            regressions.append(f"{label} p95: {previous_p95}s -> {p95}s")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure image generation throughput against a mock provider")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="image_api")
+    parser.add_argument("--concurrency", default="1,4,15",
+                        help="comma-separated concurrency settings (default 1,4,15)")
+    parser.add_argument("--pages", type=int, default=8, help="pages per task, including the cover (default 8)")
+    parser.add_argument("--tasks", type=int, default=1, help="tasks generated at the same time (default 1)")
+    parser.add_argument("--reference-images", type=int, default=0, help="user reference images per task")
+    parser.add_argument("--file-upload", action="store_true",
+                        help="enable provider file upload and file references (file_upload, file_reference)")
+    parser.add_argument("--renditions", default="",
+                        help="comma-separated WebP rendition widths generated after saving (default none)")
+    parser.add_argument("--latency", default="lognormal:0.5,0.3", help="mock latency spec (default lognormal:0.5,0.3)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of mock requests failing with 429")
+    parser.add_argument("--payload-kb", type=int, default=500, help="approximate size of mock images (default 500)")
+    parser.add_argument("--seed", type=int, default=1, help="mock provider seed (default 1)")
+    parser.add_argument("--output", help="also write the JSON summary to this file")
+    parser.add_argument("--baseline", help="JSON summary from a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed pages/s drop or p95 growth vs baseline as a ratio (default 0.2)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    settings = [int(value) for value in args.concurrency.split(",") if value.strip()]
+    summary = {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "provider": args.provider,
+        "pages": args.pages,
+        "tasks": args.tasks,
+        "reference_images": args.reference_images,
+        "file_upload": args.file_upload,
+        "renditions": args.renditions,
+        "mock": {
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "payload_kb": args.payload_kb,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+    with MockProviderServer(
+        latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        payload_kb=args.payload_kb, seed=args.seed
+    ) as server:
+        for concurrency in settings:
+            summary["results"].append(run_setting(args, server, concurrency))
+
+    output = json.dumps(summary, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(summary, baseline, args.max_regression)
+        if regressions:
+            print("throughput regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
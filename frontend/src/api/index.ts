@@ -30,39 +30,76 @@ export interface FinishEvent {
   images: string[]
 }
 
+// ==================== 参考图片 ====================
+
+// 已上传参考图片的 handle（同一个 File 对象只上传一次）
+const referenceHandles = new WeakMap<File, string>()
+
+// 计算文件的 SHA-256（十六进制），非安全上下文无法使用时返回 null
+async function sha256Hex(file: File): Promise<string | null> {
+  if (!globalThis.crypto?.subtle) {
+    return null
+  }
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer())
+  return Array.from(new Uint8Array(digest))
+    .map(b => b.toString(16).padStart(2, '0'))
+    .join('')
+}
+
+// 上传参考图片，返回 handle 列表（与 files 顺序相同）
+// 服务器上已有相同内容的图片不会重新上传
+export async function uploadReferenceImages(files: File[]): Promise<string[]> {
+  const handles: (string | undefined)[] = files.map(file => referenceHandles.get(file))
+  const missing: number[] = []
+
+  await Promise.all(files.map(async (file, i) => {
+    if (handles[i]) return
+    const hash = await sha256Hex(file)
+    if (hash) {
+      try {
+        await axios.get(`${API_BASE_URL}/references/${hash}`)
+        handles[i] = hash
+        referenceHandles.set(file, hash)
+        return
+      } catch {
+        // 不存在，需要上传
+      }
+    }
+    missing.push(i)
+  }))
+
+  if (missing.length > 0) {
+    const formData = new FormData()
+    missing.forEach(i => formData.append('images', files[i]))
+    const response = await axios.post<{ success: boolean; references: { handle: string }[] }>(
+      `${API_BASE_URL}/references`,
+      formData,
+      { headers: { 'Content-Type': 'multipart/form-data' } }
+    )
+    response.data.references.forEach((ref, j) => {
+      handles[missing[j]] = ref.handle
+      referenceHandles.set(files[missing[j]], ref.handle)
+    })
+  }
+
+  return handles as string[]
+}
+
 // 生成大纲（支持图片上传和文字風格）
 export async function generateOutline(
   topic: string,
   images?: File[],
   textStyle?: string
 ): Promise<OutlineResponse & { has_images?: boolean }> {
-  // 如果有图片，使用 FormData
-  if (images && images.length > 0) {
-    const formData = new FormData()
-    formData.append('topic', topic)
-    if (textStyle) {
-      formData.append('text_style', textStyle)
-    }
-    images.forEach((file) => {
-      formData.append('images', file)
-    })
-
-    const response = await axios.post<OutlineResponse & { has_images?: boolean }>(
-      `${API_BASE_URL}/outline`,
-      formData,
-      {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
-      }
-    )
-    return response.data
-  }
+  // 有图片时先上传参考图片，请求中只传 handle
+  const referenceImages = images && images.length > 0
+    ? await uploadReferenceImages(images)
+    : undefined
 
-  // 无图片，使用 JSON
-  const response = await axios.post<OutlineResponse>(`${API_BASE_URL}/outline`, {
+  const response = await axios.post<OutlineResponse & { has_images?: boolean }>(`${API_BASE_URL}/outline`, {
     topic,
-    text_style: textStyle || 'professional'
+    text_style: textStyle || 'professional',
+    reference_images: referenceImages
   })
   return response.data
 }
@@ -306,20 +343,10 @@ export async function generateImagesPost(
   imageStyle?: string
 ) {
   try {
-    // 将用户图片转换为 base64
-    let userImagesBase64: string[] = []
-    if (userImages && userImages.length > 0) {
-      userImagesBase64 = await Promise.all(
-        userImages.map(file => {
-          return new Promise<string>((resolve, reject) => {
-            const reader = new FileReader()
-            reader.onload = () => resolve(reader.result as string)
-            reader.onerror = reject
-            reader.readAsDataURL(file)
-          })
-        })
-      )
-    }
+    // 参考图片只上传一次，请求中只传 handle
+    const referenceImages = userImages && userImages.length > 0
+      ? await uploadReferenceImages(userImages)
+      : []
 
     const response = await fetch(`${API_BASE_URL}/generate`, {
       method: 'POST',
@@ -330,7 +357,7 @@ export async function generateImagesPost(
         pages,
         task_id: taskId,
         full_outline: fullOutline,
-        user_images: userImagesBase64.length > 0 ? userImagesBase64 : undefined,
+        reference_images: referenceImages.length > 0 ? referenceImages : undefined,
         user_topic: userTopic || '',
         image_style: imageStyle || 'flat'
       })
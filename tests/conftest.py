@@ -1,14 +1,22 @@
 """
 pytest 配置和共享 fixtures
 """
+import hashlib
+import json
 import os
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pytest
 import tempfile
 import shutil
+import yaml
 
 # 添加项目根目录到 Python 路径
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# benchmarks/mock_provider.py 供需要服务商的测试使用
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
 
 
 @pytest.fixture
@@ -26,6 +34,159 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture
+def mock_provider():
+    """本地模拟图片服务商（无延迟、无故障注入，可在测试中修改 error_rate 等属性）"""
+    from mock_provider import MockProviderServer
+    with MockProviderServer(payload_kb=8, seed=1) as server:
+        yield server
+
+
+@pytest.fixture
+def stream_tmp_dir(tmp_path, monkeypatch):
+    """流式解码的临时文件目录（不写入 history/.tmp）"""
+    from backend.utils import streaming
+    path = tmp_path / '.tmp'
+    monkeypatch.setattr(streaming, 'STREAM_TMP_DIR', str(path))
+    return path
+
+
+class _ImageHostHandler(BaseHTTPRequestHandler):
+    """圖床模擬：接受任意 POST，記錄請求內容，返回 urusai.cc / ImgBB 兩種格式都能解析的 JSON"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        with server.lock:
+            server.uploads.append({'path': self.path, 'headers': dict(self.headers), 'body': body})
+            failing = server.fail_next > 0
+            if failing:
+                server.fail_next -= 1
+
+        if failing:
+            payload, status = {'success': False, 'error': {'message': 'stub failure'}}, 500
+        else:
+            url = f"https://img.stub/{hashlib.sha1(body).hexdigest()[:12]}.png"
+            payload, status = {
+                'status': 'success',
+                'success': True,
+                'data': {
+                    'url_direct': url,
+                    'url': url,
+                    'display_url': url,
+                    'delete_url': f"{url}/delete",
+                    'thumb': {'url': f"{url}/thumb"},
+                },
+            }, 200
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def image_host_stub(tmp_path, monkeypatch):
+    """
+    本地圖床模擬伺服器
+
+    上傳快取寫入臨時檔案，共用上傳器清空；server.uploads 為收到的請求，
+    server.fail_next 設為 N 時接下來 N 個請求返回 500。
+    """
+    from backend.services import image_hosting
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHostHandler)
+    server.uploads = []
+    server.fail_next = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/upload"
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(image_hosting, 'UPLOAD_URL_CACHE', image_hosting.UploadUrlCache(str(tmp_path / 'upload_urls.json')))
+    monkeypatch.setattr(image_hosting, '_uploaders', {})
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def history_images(tmp_path, monkeypatch):
+    """
+    临时 history 目录，含 task_1 的原图 0.png 与缩略图 thumb_0.png
+
+    返回任务目录路径；图片路由从这里读取。
+    """
+    from PIL import Image
+    from backend.routes import image_routes
+
+    history_root = tmp_path / 'history'
+    task_dir = history_root / 'task_1'
+    task_dir.mkdir(parents=True)
+    Image.new('RGB', (640, 360), (200, 80, 40)).save(task_dir / '0.png', 'PNG')
+    Image.new('RGB', (64, 36), (200, 80, 40)).save(task_dir / 'thumb_0.png', 'PNG')
+    monkeypatch.setattr(image_routes, '_history_root', lambda: str(history_root))
+    return task_dir
+
+
+@pytest.fixture
+def temp_history_service(tmp_path):
+    """写入临时 history 目录的 HistoryService（不碰项目的 history/）"""
+    from backend.services.history import HistoryService
+
+    class TempHistoryService(HistoryService):
+        def __init__(self, history_dir):
+            self.history_dir = str(history_dir)
+            self.index_file = os.path.join(self.history_dir, "index.json")
+            self._index_lock = threading.RLock()
+            self._init_index()
+
+    history_dir = tmp_path / 'history'
+    history_dir.mkdir(exist_ok=True)
+    return TempHistoryService(history_dir)
+
+
+@pytest.fixture
+def make_image_service(mock_provider, tmp_path, monkeypatch, stream_tmp_dir):
+    """
+    以指向模拟服务商的配置创建 ImageService
+
+    配置写入临时 image_providers.yaml（测试结束后恢复原配置），图片写入临时目录，不生成 WebP。
+    """
+    from backend.config import Config
+    from backend.services.image import ImageService
+    from backend.utils.config_store import CONFIG_STORE
+
+    monkeypatch.setattr(Config, 'IMAGE_RENDITION_WIDTHS', [])
+    monkeypatch.setitem(CONFIG_STORE._entries, 'image_providers', CONFIG_STORE._entries['image_providers'])
+
+    def factory(**provider_config):
+        config = {
+            'type': 'image_api',
+            'api_key': 'mock-test-key',
+            'base_url': mock_provider.base_url,
+            'model': 'mock-image-model',
+            **provider_config,
+        }
+        path = tmp_path / 'image_providers.yaml'
+        path.write_text(
+            yaml.safe_dump({'active_provider': 'mock', 'providers': {'mock': config}}),
+            encoding='utf-8'
+        )
+        CONFIG_STORE.register('image_providers', str(path))
+        service = ImageService()
+        service.history_root_dir = str(tmp_path / 'history')
+        return service
+
+    return factory
+
+
 @pytest.fixture
 def temp_history_dir():
     """创建临时历史目录"""
@@ -0,0 +1,130 @@
+"""
+批量生成测试：参数校验与已完成批次的回收
+"""
+import time
+import pytest
+from backend.services import batch as batch_module
+from backend.services.batch import BatchService
+
+
+class FakeImageService:
+    def __init__(self):
+        self.cleaned = []
+
+    def cleanup_task(self, task_id):
+        self.cleaned.append(task_id)
+
+
+@pytest.fixture
+def fake_image_service(monkeypatch):
+    service = FakeImageService()
+    monkeypatch.setattr(batch_module, 'get_image_service', lambda: service)
+    return service
+
+
+def _add_batch(service, batch_id, finished_at, task_id):
+    service._batches[batch_id] = {
+        "id": batch_id,
+        "created_at": "",
+        "updated_at": "",
+        "status": "running" if finished_at is None else "completed",
+        "finished_at": finished_at,
+        "items": [{"task_id": task_id, "status": "completed"}],
+    }
+
+
+@pytest.mark.parametrize('body', [
+    {"items": [{"topic": 5}]},
+    {"items": [5]},
+    {"items": "一个主题"},
+    {"items": []},
+])
+def test_submit_batch_rejects_invalid_items(client, body):
+    response = client.post('/api/batch', json=body)
+    assert response.status_code == 400
+    data = response.get_json()
+    assert data["success"] is False
+    assert data["error"]
+
+
+def test_expired_batches_are_evicted_and_tasks_released(fake_image_service):
+    service = BatchService()
+    now = time.monotonic()
+    _add_batch(service, "old", now - service.BATCH_RETENTION - 1, "task_old")
+    _add_batch(service, "recent", now, "task_recent")
+    _add_batch(service, "running", None, "task_running")
+
+    service._evict_batches()
+
+    assert set(service._batches) == {"recent", "running"}
+    assert fake_image_service.cleaned == ["task_old"]
+
+
+def test_batch_cap_evicts_oldest_finished_first(fake_image_service, monkeypatch):
+    monkeypatch.setattr(BatchService, 'MAX_BATCHES', 3)
+    service = BatchService()
+    now = time.monotonic()
+    _add_batch(service, "running", None, "task_running")
+    _add_batch(service, "first", now - 20, "task_first")
+    _add_batch(service, "second", now - 10, "task_second")
+
+    service._evict_batches()
+
+    # Room for one new batch: the oldest finished batch goes, running batches stay
+    assert set(service._batches) == {"running", "second"}
+    assert fake_image_service.cleaned == ["task_first"]
+
+
+def test_finished_batch_keeps_task_context_until_evicted(fake_image_service):
+    service = BatchService()
+    _add_batch(service, "b", None, "task_b")
+    item = service._batches["b"]["items"][0]
+    item["status"] = "running"
+
+    service._update_item("b", item, status="partial")
+
+    assert service._batches["b"]["status"] == "completed"
+    assert service._batches["b"]["finished_at"] is not None
+    assert fake_image_service.cleaned == []
+
+
+class FakeOutlineService:
+    """按主题返回固定页数的大纲（“失败”主题返回错误）"""
+
+    def generate_outline(self, topic, images, text_style):
+        if topic == "失败":
+            return {"success": False, "error": "文本服务商不可用"}
+        pages = [{"index": 0, "type": "cover", "content": f"标题：{topic}"}]
+        pages += [{"index": i, "type": "content", "content": f"{topic} 第 {i} 段"} for i in (1, 2)]
+        return {"success": True, "outline": "\n<page>\n".join(p["content"] for p in pages), "pages": pages}
+
+
+def test_batch_runs_end_to_end_against_mock_provider(make_image_service, temp_history_service, monkeypatch):
+    image_service = make_image_service()
+    monkeypatch.setattr(batch_module, 'get_image_service', lambda: image_service)
+    monkeypatch.setattr(batch_module, 'get_outline_service', lambda: FakeOutlineService())
+    monkeypatch.setattr(batch_module, 'get_history_service', lambda: temp_history_service)
+    service = BatchService()
+
+    batch_id = service.submit_batch([{"topic": "咖啡"}, {"topic": "茶"}, {"topic": "失败"}])
+    deadline = time.time() + 20
+    while service.get_batch(batch_id)["status"] != "completed":
+        assert time.time() < deadline, "batch did not finish"
+        time.sleep(0.05)
+
+    batch = service.get_batch(batch_id)
+    assert batch["progress"]["by_status"] == {"completed": 2, "failed": 1}
+    assert batch["progress"]["finished"] == 3
+    assert (batch["progress"]["pages_total"], batch["progress"]["pages_done"]) == (6, 6)
+    assert batch["items"][2]["error"] == "文本服务商不可用"
+
+    records = {}
+    for item in batch["items"][:2]:
+        record = temp_history_service.get_record(item["record_id"])
+        records[record["title"]] = record
+        assert record["status"] == "completed"
+        assert record["images"] == {"task_id": item["task_id"], "generated": ["0.png", "1.png", "2.png"]}
+    assert set(records) == {"咖啡", "茶"}
+    assert len(temp_history_service.list_records()["records"]) == 2
+    for item in batch["items"][:2]:
+        image_service.cleanup_task(item["task_id"])
@@ -0,0 +1,146 @@
+"""
+Blogger 測試：發布佇列（重試、限速、排程、取消）與部落格清單快取
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from backend.config import Config
+from backend.services import blogger as blogger_module
+from backend.services import blogger_queue as queue_module
+from backend.services.blogger import BloggerApiError, BloggerService
+from backend.services.blogger_queue import PublishQueue
+
+
+class FakeBloggerService:
+    """記錄發文，依 failures 依序拋出錯誤"""
+
+    posts = []
+    failures = []
+    lock = threading.Lock()
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+
+    def create_post(self, blog_id, title, content, labels, is_draft):
+        with self.lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.posts.append({"blog_id": blog_id, "title": title, "content": content, "at": time.monotonic()})
+            return {"id": f"post-{len(self.posts)}", "url": f"https://blog.example/{len(self.posts)}"}
+
+
+@pytest.fixture
+def publish_queue(monkeypatch):
+    FakeBloggerService.posts = []
+    FakeBloggerService.failures = []
+    monkeypatch.setattr(queue_module, 'BloggerService', FakeBloggerService)
+    monkeypatch.setattr(Config, 'BLOGGER_PUBLISH_RATE', 20.0)
+    return PublishQueue()
+
+
+def _wait_for(queue, job_id, statuses=("published", "failed", "cancelled"), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} stuck in {queue.get_job(job_id)['status']}")
+
+
+def test_retryable_error_is_retried_and_content_rendered_once(publish_queue):
+    FakeBloggerService.failures = [BloggerApiError("rate limited", 429, retry_after=0.05)]
+    renders = []
+
+    job_id = publish_queue.submit("token", "blog-1", "標題", lambda: renders.append(1) or "<p>內文</p>")
+    job = _wait_for(publish_queue, job_id)
+
+    assert job["status"] == "published"
+    assert job["attempts"] == 2
+    assert job["post_url"] == "https://blog.example/1"
+    assert renders == [1]
+
+
+def test_non_retryable_error_fails_immediately(publish_queue):
+    FakeBloggerService.failures = [BloggerApiError("Token 已過期或無效，請重新授權", 401)]
+
+    job = _wait_for(publish_queue, publish_queue.submit("token", "blog-1", "標題", lambda: ""))
+
+    assert job["status"] == "failed"
+    assert job["attempts"] == 1
+    assert "Token" in job["error"]
+
+
+def test_posts_to_the_same_blog_are_spaced(publish_queue):
+    job_ids = [publish_queue.submit("token", "blog-1", f"文章 {i}", lambda: "") for i in range(3)]
+    job_ids.append(publish_queue.submit("token", "blog-2", "其他部落格", lambda: ""))
+    for job_id in job_ids:
+        _wait_for(publish_queue, job_id)
+
+    same_blog = sorted(post["at"] for post in FakeBloggerService.posts if post["blog_id"] == "blog-1")
+    gaps = [b - a for a, b in zip(same_blog, same_blog[1:])]
+    assert len(same_blog) == 3
+    assert min(gaps) >= 1 / Config.BLOGGER_PUBLISH_RATE * 0.8
+
+
+def test_scheduled_job_waits_and_can_be_cancelled(publish_queue):
+    publish_at = datetime.now() + timedelta(hours=1)
+    job_id = publish_queue.submit("token", "blog-1", "排程", lambda: "", publish_at=publish_at)
+
+    assert publish_queue.get_job(job_id)["status"] == "scheduled"
+    assert publish_queue.cancel(job_id) is True
+    assert publish_queue.get_job(job_id)["status"] == "cancelled"
+    assert publish_queue.cancel(job_id) is False
+    assert publish_queue.list_jobs(status="cancelled")["by_status"] == {"cancelled": 1}
+    assert FakeBloggerService.posts == []
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.headers = {}
+        self.text = str(self.payload)
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def blogs_api(monkeypatch):
+    """取代 Blogger API 的 GET，依 responses 依序回應"""
+    calls = []
+    responses = []
+
+    def fake_get(url, headers=None, timeout=None):
+        calls.append(headers["Authorization"])
+        return responses.pop(0) if responses else FakeResponse(200, {"items": [{"id": "blog-1"}]})
+
+    monkeypatch.setattr(blogger_module.requests, 'get', fake_get)
+    monkeypatch.setattr(blogger_module, '_blog_list_cache', blogger_module._BlogListCache())
+    return calls, responses
+
+
+def test_blog_list_is_cached_per_token(blogs_api):
+    calls, _ = blogs_api
+
+    first = BloggerService("token-a").get_user_blogs()
+    assert BloggerService("token-a").get_user_blogs() == first
+    BloggerService("token-b").get_user_blogs()
+    BloggerService("token-a").get_user_blogs(use_cache=False)
+
+    assert calls == ["Bearer token-a", "Bearer token-b", "Bearer token-a"]
+
+
+def test_expired_token_invalidates_cached_blog_list(blogs_api, monkeypatch):
+    calls, responses = blogs_api
+    BloggerService("token-a").get_user_blogs()
+    responses.append(FakeResponse(401))
+
+    with pytest.raises(BloggerApiError) as error:
+        BloggerService("token-a").get_user_blogs(use_cache=False)
+    assert error.value.status_code == 401 and not error.value.retryable
+
+    BloggerService("token-a").get_user_blogs()
+    assert len(calls) == 3
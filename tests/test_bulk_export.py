@@ -0,0 +1,97 @@
+"""
+批次匯出測試：靜態網站輸出、ZIP、匯出任務的回收
+"""
+import os
+import time
+import zipfile
+import pytest
+from backend.services import bulk_export as bulk_export_module
+from backend.services.bulk_export import BulkExportService
+
+PAGES = [
+    {"index": 0, "type": "cover", "content": "[封面]\n標題：咖啡入門\n副標題：從選豆到沖煮"},
+    {"index": 1, "type": "content", "content": "[內容]\n沖煮步驟\n1. 磨豆\n2. 注水"},
+]
+
+
+@pytest.fixture
+def export_service(history_images, temp_history_service, monkeypatch):
+    history_root = history_images.parent
+    history = temp_history_service
+    for title in ("第一篇", "第二篇"):
+        record_id = history.create_record(title, {"pages": PAGES}, task_id="task_1")
+        history.update_record(record_id, images={"task_id": "task_1", "generated": ["0.png"]}, status="completed")
+
+    monkeypatch.setattr(bulk_export_module, 'get_history_service', lambda: history)
+    monkeypatch.setattr(bulk_export_module, 'HISTORY_ROOT', str(history_root))
+    monkeypatch.setattr(bulk_export_module, 'EXPORT_ROOT', str(history_root / ".exports"))
+    return BulkExportService()
+
+
+def _wait(service, job_id):
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = service.get_job(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"export job {job_id} did not finish")
+
+
+def test_directory_export_renders_every_record(export_service):
+    job = _wait(export_service, export_service.submit_export(output="directory", image_mode="link"))
+
+    assert job["status"] == "completed"
+    assert (job["done"], job["failed"], job["images"]) == (2, 0, 2)
+    site_dir = job["site_dir"]
+    posts = os.listdir(os.path.join(site_dir, "posts"))
+    assert len(posts) == 2
+    html = open(os.path.join(site_dir, "posts", posts[0], "index.html"), encoding="utf-8").read()
+    assert '<img src="../../images/task_1/0.png"' in html
+    assert os.path.isfile(os.path.join(site_dir, "images", "task_1", "0.png"))
+
+
+def test_zip_export_keeps_only_the_archive(export_service):
+    job = _wait(export_service, export_service.submit_export(formats=["markdown"], image_mode="none"))
+
+    assert job["site_dir"] is None
+    assert os.listdir(os.path.dirname(job["archive"])) == [os.path.basename(job["archive"])]
+    with zipfile.ZipFile(job["archive"]) as zf:
+        names = zf.namelist()
+    assert "index.html" in names and "posts.json" in names
+    assert sum(name.endswith("index.md") for name in names) == 2
+
+
+def test_finished_jobs_and_files_are_removed(export_service, monkeypatch):
+    monkeypatch.setattr(BulkExportService, 'MAX_JOBS', 2)
+    first = _wait(export_service, export_service.submit_export(image_mode="none"))
+    second = _wait(export_service, export_service.submit_export(image_mode="none"))
+
+    # Room for one new job: the oldest finished one goes, with its files
+    third = export_service.submit_export(image_mode="none")
+    _wait(export_service, third)
+
+    assert export_service.get_job(first["id"]) is None
+    assert not os.path.exists(os.path.dirname(first["archive"]))
+    assert export_service.get_job(second["id"]) is not None
+
+    export_service._jobs[second["id"]]["finished_at"] -= BulkExportService.JOB_RETENTION + 1
+    export_service._evict_jobs()
+    assert export_service.get_job(second["id"]) is None
+
+
+def test_stale_job_dirs_from_previous_runs_are_removed(export_service):
+    stale = os.path.join(bulk_export_module.EXPORT_ROOT, "export_old")
+    os.makedirs(stale)
+    old = time.time() - BulkExportService.JOB_RETENTION - 10
+    os.utime(stale, (old, old))
+
+    export_service._evict_jobs()
+
+    assert not os.path.exists(stale)
+
+
+def test_invalid_options_are_rejected(client):
+    response = client.post('/api/export/bulk', json={"formats": ["pdf"]})
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -0,0 +1,85 @@
+"""
+配置存储测试：版本号、快照不可变、格式错误时保留旧快照
+"""
+import os
+import pytest
+from backend.utils import config_store
+from backend.utils.config_store import ConfigStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """独立的配置存储（不碰项目根目录的配置文件），每次 get 都检查文件"""
+    monkeypatch.setattr(config_store, 'CHECK_INTERVAL', 0)
+    store = ConfigStore()
+    store.register('demo', str(tmp_path / 'demo.yaml'), {'active_provider': 'default'})
+    return store
+
+
+def _write(path, text, bump_ns=0):
+    path.write_text(text, encoding='utf-8')
+    if bump_ns:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump_ns))
+
+
+def test_missing_file_uses_default(store):
+    snapshot = store.get('demo')
+    assert snapshot.exists is False
+    assert snapshot.get('active_provider') == 'default'
+
+
+def test_unchanged_file_keeps_version(store):
+    _write(store.path('demo'), 'active_provider: a\n')
+    first = store.get('demo')
+    assert store.get('demo') is first
+
+
+def test_file_change_publishes_new_version(store):
+    path = store.path('demo')
+    _write(path, 'active_provider: a\n')
+    first = store.get('demo')
+
+    _write(path, 'active_provider: bb\n', bump_ns=1_000_000)
+    second = store.get('demo')
+
+    assert second.version > first.version
+    assert (first.get('active_provider'), second.get('active_provider')) == ('a', 'bb')
+
+
+def test_write_publishes_immediately(store):
+    before = store.get('demo')
+    written = store.write('demo', {'providers': {'x': {'api_key': 'k'}}})
+
+    assert written.version > before.version
+    assert written.exists is True
+    assert store.get('demo') is written
+    assert not [p for p in store.path('demo').parent.iterdir() if p.name.endswith('.part')]
+
+
+def test_snapshot_is_read_only_and_to_dict_is_a_copy(store):
+    snapshot = store.write('demo', {'providers': {'x': {'models': ['m1']}}})
+
+    with pytest.raises(TypeError):
+        snapshot.data['providers']['y'] = {}
+    assert snapshot.data['providers']['x']['models'] == ('m1',)
+
+    copy = snapshot.to_dict()
+    copy['providers']['x']['models'].append('m2')
+    assert snapshot.data['providers']['x']['models'] == ('m1',)
+
+
+def test_parse_error_keeps_previous_snapshot(store):
+    path = store.path('demo')
+    good = store.write('demo', {'active_provider': 'a'})
+
+    _write(path, 'active_provider: [unclosed\n', bump_ns=1_000_000)
+    assert store.get('demo') is good
+    store.reload('demo')
+    assert store.get('demo') is good
+
+
+def test_first_parse_error_raises(store):
+    _write(store.path('demo'), 'active_provider: [unclosed\n')
+    with pytest.raises(ValueError):
+        store.get('demo')
@@ -0,0 +1,114 @@
+"""
+頁面文件模型測試：內容解析、解析快取、Blogger HTML 小標題規則
+"""
+import pytest
+from backend.services import document
+from backend.services.blogger import generate_blog_html
+from backend.services.document import Block, parse_content, parse_outline
+from backend.utils.metrics import CACHE_HITS
+
+COVER = "[封面]\n標題：咖啡入門\n副標題：從選豆到沖煮\n配圖建議：一杯手沖咖啡"
+
+
+def test_cover_title_subtitle_and_markers():
+    parsed = parse_content(COVER)
+
+    assert parsed.page_type == "cover"
+    assert parsed.title == "咖啡入門"
+    assert parsed.body == "*從選豆到沖煮*"
+    assert parsed.blocks == (Block('em', ("從選豆到沖煮",)),)
+
+
+def test_consecutive_list_items_are_grouped():
+    parsed = parse_content("[內容]\n沖煮步驟\n1. 磨豆\n2. 注水\n小提醒\n• 水溫 92 度\n- 悶蒸 30 秒")
+
+    assert parsed.heading == "沖煮步驟"
+    assert parsed.heading_blocks == (
+        Block('ol', ("磨豆", "注水")),
+        Block('p', ("小提醒",)),
+        Block('ul', ("水溫 92 度", "悶蒸 30 秒")),
+    )
+
+
+@pytest.mark.parametrize('first_line', [
+    "以下是三個重點：",
+    "這一段文字非常長" * 8,
+    "- 清單開頭",
+])
+def test_export_heading_rules(first_line):
+    assert parse_content(f"[內容]\n{first_line}\n第二行").heading == ""
+
+
+def test_parse_results_are_cached(monkeypatch):
+    calls = []
+    original = document._parse_content
+    monkeypatch.setattr(document, '_cache', document._ParseCache())
+    monkeypatch.setattr(document, '_parse_content', lambda text: calls.append(text) or original(text))
+    hits = CACHE_HITS.get(cache='page_document')
+
+    first = parse_content("[內容]\n快取測試")
+    second = parse_content("[內容]\n快取測試")
+
+    assert first is second
+    assert calls == ["[內容]\n快取測試"]
+    assert CACHE_HITS.get(cache='page_document') == hits + 1
+
+
+def test_cache_evicts_least_recently_used(monkeypatch):
+    cache = document._ParseCache()
+    monkeypatch.setattr(cache, 'MAX_ENTRIES', 2)
+    cache.get_or_parse('page', 'a', str.upper)
+    cache.get_or_parse('page', 'b', str.upper)
+    cache.get_or_parse('page', 'a', str.upper)
+    cache.get_or_parse('page', 'c', str.upper)
+
+    assert len(cache._entries) == 2
+    assert cache.get_or_parse('page', 'b', lambda text: 'reparsed') == 'reparsed'
+
+
+def test_outline_index_matches_page_position():
+    pages = parse_outline(f"{COVER}\n<page>\n\n<page>\n[內容]\n第三頁")
+    assert [page.index for page in pages] == [0, 2]
+
+
+@pytest.mark.parametrize('first_line', [
+    "以下是三個重點：",
+    "這一段文字非常長" * 8,
+    "• 清單開頭",
+])
+def test_blogger_first_line_is_always_the_heading(first_line):
+    html = generate_blog_html(f"[內容]\n{first_line}\n第二行", ["https://img.example/1.png"], title="文章標題")
+
+    assert html.startswith(f"<h2>{first_line}</h2>")
+    assert f'alt="{first_line}"' in html
+    assert "文章標題" not in html
+
+
+def test_blogger_html_matches_original_rendering():
+    outline = f"{COVER}\n<page>\n[內容]\n<b>粗體</b>\n第一行\n\n第二行\n<page>\n[內容]\n清單\n• 一\n- 二\n配圖建議：無"
+
+    html = generate_blog_html(outline, [None, "https://img.example/1.png"])
+
+    assert html == (
+        "<h2>標題：咖啡入門</h2>\n<p>副標題：從選豆到沖煮</p>\n"
+        "\n"
+        "<h2><b>粗體</b></h2>\n"
+        '<p><img src="https://img.example/1.png" alt="<b>粗體</b>" style="max-width:100%;"/></p>\n'
+        "<p>第一行<br/>第二行</p>\n"
+        "\n"
+        "<h2>清單</h2>\n<ul>\n  <li>一</li>\n  <li>二</li>\n</ul>\n"
+    )
+
+
+def test_block_views_are_built_on_first_use(monkeypatch):
+    calls = []
+    original = document._build_blocks
+    monkeypatch.setattr(document, '_build_blocks', lambda lines: calls.append(lines) or original(lines))
+
+    parsed = document._parse_content("[內容]\n小標題\n• 一")
+    assert parsed.lines == ("小標題", "• 一")
+    assert calls == []
+
+    assert parsed.heading_blocks == (Block('ul', ("一",)),)
+    assert parsed.heading_blocks == (Block('ul', ("一",)),)
+    assert calls == [("• 一",)]
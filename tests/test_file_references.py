@@ -0,0 +1,107 @@
+"""
+参考图文件引用测试：images 端点一律内联，chat 端点在服务商支持文件引用时每个任务只上传一次
+"""
+import io
+import pytest
+from PIL import Image
+from backend.generators.file_cache import ProviderFileCache
+
+
+def _png_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (128, 128), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+USER_IMAGES = [_png_bytes((200, 40, 40)), _png_bytes((40, 200, 40))]
+
+
+def _pages(count=3):
+    pages = [{"index": 0, "type": "cover", "content": "标题：参考图"}]
+    pages += [{"index": i, "type": "content", "content": f"第 {i} 段"} for i in range(1, count)]
+    return pages
+
+
+def _run(service, task_id="task_refs"):
+    events = list(service.generate_images(_pages(), task_id=task_id, user_images=USER_IMAGES))
+    assert events[-1]["data"]["completed"] == 3
+    return events
+
+
+@pytest.mark.parametrize('provider_config', [
+    {},
+    {'file_upload': True},
+    {'file_upload': True, 'file_reference': True},
+], ids=['default', 'file_upload', 'file_reference'])
+def test_images_api_always_sends_inline_data(make_image_service, mock_provider, provider_config):
+    service = make_image_service(endpoint_type='/v1/images/generations', **provider_config)
+
+    _run(service)
+
+    stats = mock_provider.stats()
+    assert service.generator.file_cache is None
+    assert "file" not in stats["references"]
+    assert stats["references"]["inline"] > 0
+    assert not [route for route in stats["requests"] if route.startswith("files.")]
+    assert stats["requests"]["images 200"] == 3
+
+
+def test_chat_api_needs_file_reference_to_use_file_ids(make_image_service, mock_provider):
+    service = make_image_service(endpoint_type='/v1/chat/completions', file_upload=True)
+
+    _run(service)
+
+    stats = mock_provider.stats()
+    assert service.generator.file_cache is None
+    assert "file" not in stats["references"]
+    assert "files.upload 200" not in stats["requests"]
+
+
+def test_chat_api_uploads_each_reference_once_per_task(make_image_service, mock_provider):
+    service = make_image_service(
+        endpoint_type='/v1/chat/completions', file_upload=True, file_reference=True, high_concurrency=True
+    )
+
+    _run(service)
+
+    stats = mock_provider.stats()
+    assert stats["requests"]["chat 200"] == 3
+    # 两张用户参考图 + 封面，每张只上传一次；封面带 2 张参考图，两个内容页各带 3 张
+    assert stats["requests"]["files.upload 200"] == 3
+    assert stats["references"]["file"] == 2 + 2 * 3
+    assert "inline" not in stats["references"]
+
+    service.cleanup_task("task_refs")
+    assert mock_provider.stats()["stored_files"] == 0
+
+
+def test_file_cache_entry_is_written_before_upload_lock_is_released():
+    cache = ProviderFileCache(ttl=60)
+
+    class CheckedUploads(dict):
+        def pop(self, key, default=None):
+            # 移除上传锁时条目必须已可读取，否则之后到达的请求会重新上传
+            assert key in cache._entries
+            return super().pop(key, default)
+
+    cache._uploading = CheckedUploads()
+    uploads = []
+
+    ref = cache.get_or_upload("task", USER_IMAGES[0], lambda data: uploads.append(data) or "file-1")
+
+    assert ref == "file-1"
+    assert cache.get_or_upload("task", USER_IMAGES[0], lambda data: "file-2") == "file-1"
+    assert len(uploads) == 1 and not cache._uploading
+
+
+def test_file_cache_failed_upload_releases_lock():
+    cache = ProviderFileCache(ttl=60)
+
+    def fail(data):
+        raise ConnectionError("upload failed")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_upload("task", USER_IMAGES[0], fail)
+
+    assert not cache._uploading
+    assert cache.get_or_upload("task", USER_IMAGES[0], lambda data: "file-1") == "file-1"
@@ -0,0 +1,83 @@
+"""
+文件传输测试：X-Accel-Redirect / X-Sendfile、前端资源预压缩与缓存头
+"""
+import gzip
+import pytest
+from flask import Flask
+from backend.config import Config
+from backend.utils.file_serving import precompress_static, send_static_asset
+
+SCRIPT = b"console.log('hello');\n" * 200
+
+
+@pytest.fixture
+def dist_dir(tmp_path):
+    dist = tmp_path / 'dist'
+    (dist / 'assets').mkdir(parents=True)
+    (dist / 'assets' / 'index-BASSv48K.js').write_bytes(SCRIPT)
+    (dist / 'index.html').write_bytes(b'<!DOCTYPE html><title>app</title>')
+    return dist
+
+
+@pytest.fixture
+def request_context():
+    app = Flask(__name__)
+
+    def context(path='/', headers=None):
+        return app.test_request_context(path, headers=headers or {})
+    return context
+
+
+def test_precompress_creates_gzip_once(dist_dir):
+    assert precompress_static(str(dist_dir)) >= 1
+    assert gzip.decompress((dist_dir / 'assets' / 'index-BASSv48K.js.gz').read_bytes()) == SCRIPT
+    # Files under the minimum size are skipped
+    assert not (dist_dir / 'index.html.gz').exists()
+    # Up-to-date outputs are skipped on the next start
+    assert precompress_static(str(dist_dir)) == 0
+
+
+def test_hashed_asset_is_served_precompressed_and_immutable(dist_dir, request_context):
+    precompress_static(str(dist_dir))
+
+    with request_context(headers={'Accept-Encoding': 'gzip, deflate'}):
+        response = send_static_asset(str(dist_dir), 'assets/index-BASSv48K.js')
+        response.direct_passthrough = False
+        body = response.get_data()
+
+    assert response.content_encoding == 'gzip'
+    assert gzip.decompress(body) == SCRIPT
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert 'immutable' in response.headers['Cache-Control']
+
+
+def test_index_is_not_cached_and_not_encoded_without_accept(dist_dir, request_context):
+    with request_context():
+        response = send_static_asset(str(dist_dir), 'index.html')
+
+    assert response.content_encoding is None
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+def test_image_is_offloaded_to_nginx(client, history_images, monkeypatch):
+    monkeypatch.setattr(Config, 'STATIC_OFFLOAD', 'x-accel')
+
+    response = client.get('/api/images/task_1/0.png')
+
+    assert response.headers['X-Accel-Redirect'] == '/_internal/history/task_1/thumb_0.png'
+    assert response.data == b''
+
+    revalidated = client.get(
+        '/api/images/task_1/0.png', headers={'If-Modified-Since': response.headers['Last-Modified']}
+    )
+    assert revalidated.status_code == 304
+    assert 'X-Accel-Redirect' not in revalidated.headers
+
+
+def test_image_is_offloaded_with_x_sendfile(client, history_images, monkeypatch):
+    monkeypatch.setattr(Config, 'STATIC_OFFLOAD', 'x-sendfile')
+
+    response = client.get('/api/images/task_1/0.png?thumbnail=false')
+
+    assert response.headers['X-Sendfile'] == str(history_images / '0.png')
+    assert response.mimetype == 'image/png'
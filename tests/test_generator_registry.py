@@ -0,0 +1,83 @@
+"""
+生成器注册表测试：按配置复用实例、创建时不持有锁、并发创建只保留一个实例
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend.generators import registry as registry_module
+from backend.generators.registry import GeneratorRegistry
+
+
+class FakeGenerator:
+    def __init__(self, config):
+        self.config = config
+
+
+class SlowFactory:
+    """创建 'slow' 类型时等待 release，用来检查创建期间注册表是否被锁住"""
+
+    created = []
+    started = threading.Event()
+    release = threading.Event()
+
+    @classmethod
+    def create(cls, provider_type, config):
+        if provider_type == 'slow':
+            cls.started.set()
+            assert cls.release.wait(5)
+        generator = FakeGenerator(config)
+        cls.created.append(generator)
+        return generator
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    SlowFactory.created = []
+    SlowFactory.started = threading.Event()
+    SlowFactory.release = threading.Event()
+    monkeypatch.setattr(registry_module, 'ImageGeneratorFactory', SlowFactory)
+    return GeneratorRegistry()
+
+
+def test_same_config_reuses_instance_and_change_rebuilds(registry):
+    first = registry.get('p', {'type': 'fast', 'model': 'a'})
+    assert registry.get('p', {'model': 'a', 'type': 'fast'}) is first
+    assert first.provider_name == 'p'
+
+    second = registry.get('p', {'type': 'fast', 'model': 'b'})
+    assert second is not first
+    assert registry.get('p', {'type': 'fast', 'model': 'b'}) is second
+
+
+def test_slow_creation_does_not_block_other_providers(registry):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        slow = pool.submit(registry.get, 'slow_provider', {'type': 'slow'})
+        assert SlowFactory.started.wait(5)
+
+        # 慢的服务商还在创建，其他服务商照常取得实例
+        fast = registry.get('fast_provider', {'type': 'fast'})
+        assert registry.get('fast_provider', {'type': 'fast'}) is fast
+
+        SlowFactory.release.set()
+        assert slow.result(5).provider_name == 'slow_provider'
+
+
+def test_concurrent_creation_keeps_one_instance(registry):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(registry.get, 'slow_provider', {'type': 'slow'}) for _ in range(4)]
+        assert SlowFactory.started.wait(5)
+        SlowFactory.release.set()
+        results = [future.result(5) for future in futures]
+
+    assert all(result is results[0] for result in results)
+    assert registry.get('slow_provider', {'type': 'slow'}) is results[0]
+
+
+def test_prune_removes_unlisted_providers(registry):
+    kept = registry.get('keep', {'type': 'fast'})
+    removed = registry.get('drop', {'type': 'fast'})
+
+    registry.prune(['keep'])
+
+    assert registry.get('keep', {'type': 'fast'}) is kept
+    assert registry.get('drop', {'type': 'fast'}) is not removed
@@ -0,0 +1,61 @@
+"""
+对冲请求测试：共享线程池、按服务商统计延迟
+"""
+import threading
+import time
+import pytest
+from backend.services import image as image_module
+
+
+class StubGenerator:
+    def __init__(self, provider_name, delay=0.0, result=b"image"):
+        self.provider_name = provider_name
+        self.delay = delay
+        self.result = result
+
+    def generate_image(self, **kwargs):
+        time.sleep(self.delay)
+        return self.result
+
+    def release_files(self, scope):
+        pass
+
+
+@pytest.fixture
+def hedged_service(make_image_service):
+    def factory(primary, hedge):
+        service = make_image_service(hedge_enabled=True, hedge_initial_delay=0.05, hedge_min_delay=0)
+        service.generator = primary
+        service._hedge_generator = (hedge, service.provider_config)
+        service.provider_config = {**service.provider_config, 'hedge_provider': hedge.provider_name}
+        return service
+    return factory
+
+
+def test_latencies_are_kept_per_provider(hedged_service):
+    primary, hedge = StubGenerator("primary"), StubGenerator("backup")
+    service = hedged_service(primary, hedge)
+
+    for _ in range(service.HEDGE_MIN_SAMPLES):
+        service._timed_generate(primary, service.provider_config, "prompt")
+    service._latencies["backup"] = image_module.deque([10.0] * 20)
+
+    assert len(service._latencies["primary"]) == service.HEDGE_MIN_SAMPLES
+    # Slow hedge samples don't inflate the primary's hedge delay
+    assert service._hedge_delay() < 1.0
+
+
+def test_hedged_calls_share_one_pool_across_instances(hedged_service):
+    services = [
+        hedged_service(StubGenerator("primary", delay=0.5, result=b"slow"), StubGenerator("backup", result=b"fast"))
+        for _ in range(3)
+    ]
+
+    results = [service._hedged_generate(1, "prompt") for service in services]
+
+    assert results == [b"fast"] * 3
+    assert image_module._get_hedge_executor() is image_module._get_hedge_executor()
+    assert not hasattr(services[0], '_hedge_executor')
+    hedge_threads = [t for t in threading.enumerate() if t.name.startswith("hedge")]
+    assert len(hedge_threads) <= image_module.ImageService.MAX_CONCURRENT * 2
+    assert services[0]._latencies.keys() >= {"backup"}
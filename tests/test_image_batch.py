@@ -0,0 +1,80 @@
+"""
+ImageService 批量生成路径测试：轮询进度事件、失败页面回退到单张生成
+"""
+import pytest
+
+
+@pytest.fixture
+def pages(sample_pages):
+    return sample_pages
+
+
+def _run(service, pages, task_id):
+    events = list(service.generate_images(pages, task_id=task_id, full_outline="大纲"))
+    service.cleanup_task(task_id)
+    return events
+
+
+def test_batch_job_progress_is_streamed(make_image_service, mock_provider, pages):
+    mock_provider.latency.params = [0.2]
+    service = make_image_service(type='openai_compatible', batch_mode='jsonl', batch_poll_interval=0.05)
+
+    events = _run(service, pages, "task_batch_progress")
+
+    polling = [e for e in events if e["event"] == "progress" and e["data"].get("status") == "batch_polling"]
+    assert polling
+    assert polling[0]["data"]["batch"]["total"] == len(pages) - 1
+    finish = events[-1]["data"]
+    assert finish["completed"] == len(pages) and finish["failed"] == 0
+    requests = mock_provider.stats()["requests"]
+    assert requests["batches.create 200"] == 1
+    # Only the cover goes through the images endpoint
+    assert requests["images 200"] == 1
+
+
+def test_batch_failure_falls_back_with_cover_and_user_images(make_image_service, pages, monkeypatch):
+    service = make_image_service(type='openai_compatible', batch_mode='jsonl')
+
+    def failing_batch(batch_requests, progress_callback=None, **kwargs):
+        raise RuntimeError("batch API down")
+
+    monkeypatch.setattr(service.generator, 'generate_images_batch', failing_batch)
+    calls = []
+    single = service._generate_single_image
+
+    def recording_single(page, task, reference_image=None, retry_count=0, full_outline="",
+                         user_images=None, *args, **kwargs):
+        calls.append((page["index"], reference_image, user_images))
+        return single(page, task, reference_image, retry_count, full_outline, user_images, *args, **kwargs)
+
+    monkeypatch.setattr(service, '_generate_single_image', recording_single)
+
+    events = list(service.generate_images(
+        pages, task_id="task_batch_fallback", full_outline="大纲", user_images=[b"not-an-image"]
+    ))
+    service.cleanup_task("task_batch_fallback")
+
+    assert events[-1]["data"]["completed"] == len(pages)
+    fallbacks = [call for call in calls if call[0] != 0]
+    assert len(fallbacks) == len(pages) - 1
+    assert all(reference is not None for _, reference, _ in fallbacks)
+    assert all(user_images for _, _, user_images in fallbacks)
+
+
+def test_fallback_pages_are_counted_once_in_prompt_stats(make_image_service, pages, monkeypatch):
+    service = make_image_service(type='openai_compatible', batch_mode='jsonl')
+    sent = []
+
+    def failing_batch(batch_requests, progress_callback=None, **kwargs):
+        sent.extend(request["prompt"] for request in batch_requests)
+        raise RuntimeError("batch API down")
+
+    monkeypatch.setattr(service.generator, 'generate_images_batch', failing_batch)
+
+    events = list(service.generate_images(pages, task_id="task_batch_stats", full_outline="大纲"))
+
+    assert events[-1]["data"]["completed"] == len(pages)
+    assert len(sent) == len(pages) - 1
+    # Cover once, each content page once: the fallback reuses the batch prompt
+    assert service.get_task_state("task_batch_stats")["prompt_stats"]["prompts"] == len(pages)
+    service.cleanup_task("task_batch_stats")
@@ -0,0 +1,163 @@
+"""
+圖床上傳測試：限速器、上傳 URL 快取、共用上傳器、Blogger 圖片上傳
+"""
+import time
+import pytest
+from backend.config import Config
+from backend.routes import blogger_routes
+from backend.services import image_hosting
+from backend.services.image_hosting import ConcurrentUploader, HostRateLimiter, UploadUrlCache, get_uploader
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(image_hosting.time, 'sleep', lambda seconds: None)
+
+
+@pytest.fixture
+def urusai_stub(image_host_stub, history_images, monkeypatch):
+    monkeypatch.setattr(blogger_routes, 'URUSAI_API_URL', image_host_stub.url)
+    monkeypatch.setattr(blogger_routes, 'HISTORY_ROOT', str(history_images.parent))
+    return image_host_stub
+
+
+def test_rate_limiter_allows_burst_then_spaces_requests():
+    limiter = HostRateLimiter(rate=20, burst=2)
+    start = time.monotonic()
+    for _ in range(2):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.05
+
+    for _ in range(3):
+        limiter.acquire()
+    # Three more requests at 20/s need about 0.15s
+    assert time.monotonic() - start >= 0.12
+
+
+def test_upload_url_cache_persists_and_discards(tmp_path):
+    path = str(tmp_path / 'cache' / 'upload_urls.json')
+    cache = UploadUrlCache(path)
+    cache.set('imgbb.com', 'abc', 'https://img/1.png', delete_url='https://img/1/delete')
+    assert UploadUrlCache(path).get('imgbb.com', 'abc') is None
+    cache.flush()
+
+    reloaded = UploadUrlCache(path)
+    assert reloaded.get('imgbb.com', 'abc')['delete_url'] == 'https://img/1/delete'
+    assert reloaded.get('urusai.cc', 'abc') is None
+
+    reloaded.discard('imgbb.com', 'abc')
+    assert UploadUrlCache(path).get('imgbb.com', 'abc') is None
+
+
+def test_upload_url_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    path = str(tmp_path / 'upload_urls.json')
+    cache = UploadUrlCache(path)
+    monkeypatch.setattr(cache, 'MAX_ENTRIES', 2)
+    cache.set('imgbb.com', 'a', 'https://img/a.png')
+    cache.set('imgbb.com', 'b', 'https://img/b.png')
+    cache.get('imgbb.com', 'a')
+    cache.set('imgbb.com', 'c', 'https://img/c.png')
+    cache.flush()
+
+    reloaded = UploadUrlCache(path)
+    assert reloaded.get('imgbb.com', 'b') is None
+    assert reloaded.get('imgbb.com', 'a') and reloaded.get('imgbb.com', 'c')
+
+
+def test_uploader_dedups_content_and_reuses_cached_urls(image_host_stub, history_images, monkeypatch):
+    calls = []
+
+    def upload(path):
+        calls.append(path)
+        return f"https://img/{len(calls)}.png"
+
+    uploader = ConcurrentUploader('test-host', max_workers=4, rate=100)
+    original, duplicate = str(history_images / '0.png'), str(history_images / 'copy.png')
+    (history_images / 'copy.png').write_bytes((history_images / '0.png').read_bytes())
+    thumbnail = str(history_images / 'thumb_0.png')
+
+    flushes = []
+    flush = image_hosting.UPLOAD_URL_CACHE.flush
+    monkeypatch.setattr(image_hosting.UPLOAD_URL_CACHE, 'flush', lambda: flushes.append(1) or flush())
+
+    urls = uploader.upload_many([original, None, duplicate, thumbnail], upload)
+    assert len(calls) == 2
+    assert urls[0] == urls[2] and urls[1] == '' and urls[3]
+    # The cache file is written once for the whole batch
+    assert len(flushes) == 1
+
+    results = dict(uploader.iter_upload([original, thumbnail], upload))
+    assert len(calls) == 2
+    assert all(result['cached'] for result in results.values())
+
+
+def test_uploader_retries_then_reports_failure(image_host_stub, history_images, no_backoff):
+    attempts = []
+
+    def upload(path):
+        attempts.append(path)
+        raise ConnectionError("host down")
+
+    uploader = ConcurrentUploader('test-host', rate=100, retries=2)
+    results = dict(uploader.iter_upload([str(history_images / '0.png'), str(history_images / 'missing.png')], upload))
+
+    assert len(attempts) == 3
+    assert isinstance(results[0], ConnectionError)
+    assert isinstance(results[1], OSError)
+
+
+def test_shared_uploader_is_rebuilt_when_settings_change(image_host_stub, monkeypatch):
+    first = get_uploader('urusai.cc')
+    assert get_uploader('urusai.cc') is first
+    assert first.limiter.rate == Config.IMAGE_HOST_RATE_LIMITS['urusai.cc']
+
+    monkeypatch.setattr(Config, 'IMAGE_HOST_RATE_LIMITS', {'urusai.cc': 9.0})
+    rebuilt = get_uploader('urusai.cc')
+    assert rebuilt is not first and rebuilt.limiter.rate == 9.0
+
+    monkeypatch.setattr(Config, 'IMAGE_HOST_RETRIES', Config.IMAGE_HOST_RETRIES + 1)
+    monkeypatch.setattr(Config, 'IMAGE_HOST_MAX_WORKERS', 1)
+    latest = get_uploader('urusai.cc')
+    assert latest is not rebuilt
+    assert (latest.max_workers, latest.retries) == (1, Config.IMAGE_HOST_RETRIES)
+
+
+def test_shared_uploader_uses_the_upload_function_of_each_call(image_host_stub, history_images):
+    original = str(history_images / '0.png')
+    thumbnail = str(history_images / 'thumb_0.png')
+
+    first = get_uploader('urusai.cc').upload_one(original, lambda path: 'https://img/first.png')
+    second = get_uploader('urusai.cc').upload_one(thumbnail, lambda path: 'https://img/second.png')
+
+    assert (first, second) == ('https://img/first.png', 'https://img/second.png')
+    assert not hasattr(get_uploader('urusai.cc'), 'upload_func')
+
+
+def test_blogger_images_are_uploaded_once_per_content(urusai_stub):
+    images = [
+        '/api/images/task_1/0.png?thumbnail=false',
+        'https://example.com/external.png',
+        '/api/images/task_1/0.png',
+        '/api/images/task_1/missing.png',
+        '',
+    ]
+
+    urls = blogger_routes.convert_images_to_public_urls(images)
+
+    assert len(urusai_stub.uploads) == 1
+    assert urls[0].startswith('https://img.stub/') and urls[2] == urls[0]
+    assert urls[1] == 'https://example.com/external.png'
+    assert urls[3:] == ['', '']
+
+    # Unchanged content comes from the URL cache
+    assert blogger_routes.convert_images_to_public_urls(images[:1]) == urls[:1]
+    assert len(urusai_stub.uploads) == 1
+
+
+def test_blogger_upload_retries_stub_failures(urusai_stub, no_backoff):
+    urusai_stub.fail_next = 2
+
+    url = blogger_routes.upload_image_to_urusai(blogger_routes.HISTORY_ROOT + '/task_1/0.png')
+
+    assert url.startswith('https://img.stub/')
+    assert len(urusai_stub.uploads) == 3
@@ -0,0 +1,60 @@
+"""
+图片输出测试：ETag / 条件请求 / Range / 版本化 URL 缓存头
+"""
+from backend.utils.image_serving import sniff_mimetype
+
+
+def test_thumbnail_is_served_by_default(client, history_images):
+    response = client.get('/api/images/task_1/0.png')
+
+    assert response.status_code == 200
+    assert response.data == (history_images / 'thumb_0.png').read_bytes()
+    assert response.mimetype == 'image/png'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+
+def test_original_is_served_without_thumbnail(client, history_images):
+    response = client.get('/api/images/task_1/0.png?thumbnail=false')
+    assert response.data == (history_images / '0.png').read_bytes()
+
+
+def test_etag_revalidation_returns_304(client, history_images):
+    first = client.get('/api/images/task_1/0.png?thumbnail=false')
+    etag = first.headers['ETag']
+
+    second = client.get('/api/images/task_1/0.png?thumbnail=false', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.data == b''
+
+
+def test_etag_changes_when_image_is_regenerated(client, history_images):
+    etag = client.get('/api/images/task_1/0.png?thumbnail=false').headers['ETag']
+    (history_images / '0.png').write_bytes((history_images / 'thumb_0.png').read_bytes() + b'\0')
+
+    assert client.get('/api/images/task_1/0.png?thumbnail=false').headers['ETag'] != etag
+
+
+def test_range_request_returns_partial_content(client, history_images):
+    for query in ('', '?thumbnail=false'):
+        response = client.get(f'/api/images/task_1/0.png{query}', headers={'Range': 'bytes=0-7'})
+        assert response.status_code == 206
+        assert response.data == b'\x89PNG\r\n\x1a\n'
+
+
+def test_versioned_url_is_immutable(client, history_images):
+    response = client.get('/api/images/task_1/0.png?v=abc')
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+
+
+def test_missing_image_returns_404(client, history_images):
+    response = client.get('/api/images/task_1/9.png')
+    assert response.status_code == 404
+    assert response.get_json()["success"] is False
+
+
+def test_sniff_mimetype():
+    assert sniff_mimetype(b'\xff\xd8\xff\xe0' + b'\0' * 8) == 'image/jpeg'
+    assert sniff_mimetype(b'RIFF\0\0\0\0WEBPVP8 ') == 'image/webp'
+    assert sniff_mimetype(b'not an image') == 'application/octet-stream'
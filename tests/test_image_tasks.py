@@ -0,0 +1,53 @@
+"""
+ImageService 任务上下文测试：同一实例上并发的任务互不写入对方的目录和状态
+"""
+import os
+import threading
+
+
+def _pages(count, label):
+    pages = [{"index": 0, "type": "cover", "content": f"标题：{label}"}]
+    pages += [{"index": i, "type": "content", "content": f"{label} 第 {i} 段"} for i in range(1, count)]
+    return pages
+
+
+def test_concurrent_tasks_keep_their_own_directories(make_image_service, mock_provider):
+    mock_provider.latency.params = [0.05]
+    service = make_image_service(high_concurrency=True)
+    sizes = {"task_small": 2, "task_large": 6}
+    events = {}
+
+    def run(task_id):
+        events[task_id] = list(service.generate_images(_pages(sizes[task_id], task_id), task_id=task_id))
+
+    threads = [threading.Thread(target=run, args=(task_id,)) for task_id in sizes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for task_id, count in sizes.items():
+        expected = {f"{i}.png" for i in range(count)}
+        task_dir = os.path.join(service.history_root_dir, task_id)
+        assert {name for name in os.listdir(task_dir) if not name.startswith("thumb_")} == expected
+
+        urls = [e["data"]["image_url"] for e in events[task_id] if e["event"] == "complete"]
+        assert len(urls) == count
+        assert all(url.startswith(f"/api/images/{task_id}/") for url in urls)
+
+        state = service.get_task_state(task_id)
+        assert set(state["generated"]) == set(range(count))
+        assert state["pages"][0]["content"] == f"标题：{task_id}"
+        service.cleanup_task(task_id)
+
+
+def test_task_state_is_a_copy(make_image_service):
+    service = make_image_service()
+    list(service.generate_images(_pages(2, "copy"), task_id="task_copy"))
+
+    state = service.get_task_state("task_copy")
+    state["generated"].clear()
+
+    assert set(service.get_task_state("task_copy")["generated"]) == {0, 1}
+    service.cleanup_task("task_copy")
+    assert service.get_task_state("task_copy") is None
@@ -0,0 +1,98 @@
+"""
+ImgBB 上傳測試：串流 multipart 內容、批量上傳（JSON / SSE）
+"""
+import json
+import pytest
+import yaml
+from backend.routes import upload_routes
+from backend.services.image_hosting import StreamingMultipartBody
+from backend.utils.config_store import CONFIG_STORE
+
+API_KEY = 'imgbb-test-key-123456'
+
+
+@pytest.fixture
+def imgbb_stub(image_host_stub, history_images, tmp_path, monkeypatch):
+    """ImgBB 指向模擬伺服器，上傳配置寫入臨時檔案（測試結束後恢復原配置）"""
+    config_path = tmp_path / 'upload_config.yaml'
+    config_path.write_text(yaml.safe_dump({'imgbb': {'api_key': API_KEY}}), encoding='utf-8')
+    monkeypatch.setitem(CONFIG_STORE._entries, 'upload', CONFIG_STORE._entries['upload'])
+    CONFIG_STORE.register('upload', str(config_path))
+    monkeypatch.setattr(upload_routes, 'IMGBB_API_URL', image_host_stub.url)
+    monkeypatch.setattr(upload_routes, 'HISTORY_ROOT', str(history_images.parent))
+    return image_host_stub
+
+
+def _expected_body(body, content):
+    return (
+        f'--{body.boundary}\r\nContent-Disposition: form-data; name="key"\r\n\r\n{API_KEY}\r\n'
+        f'--{body.boundary}\r\nContent-Disposition: form-data; name="image"; filename="0.png"\r\n'
+        f'Content-Type: image/png\r\n\r\n'
+    ).encode() + content + f'\r\n--{body.boundary}--\r\n'.encode()
+
+
+@pytest.mark.parametrize('size', [1, 7, 100, 65536, -1])
+def test_multipart_body_streams_in_any_read_size(history_images, size):
+    path = history_images / '0.png'
+    body = StreamingMultipartBody({'key': API_KEY}, 'image', str(path), 'image/png')
+
+    chunks = []
+    while True:
+        chunk = body.read(size)
+        if not chunk:
+            break
+        assert size < 0 or len(chunk) <= size
+        chunks.append(chunk)
+    body.close()
+
+    data = b''.join(chunks)
+    assert data == _expected_body(body, path.read_bytes())
+    assert len(body) == len(data)
+    assert body.content_type == f'multipart/form-data; boundary={body.boundary}'
+
+
+def test_batch_upload_returns_results_in_request_order(client, imgbb_stub, history_images):
+    images = [
+        {'task_id': 'task_1', 'filename': '0.png', 'index': 0},
+        {'task_id': 'task_1', 'filename': 'missing.png', 'index': 1},
+        {'task_id': 'task_1', 'filename': '0.png', 'index': 2},
+    ]
+
+    data = client.post('/api/upload/batch', json={'images': images}).get_json()
+
+    assert [r['index'] for r in data['results']] == [0, 1, 2]
+    assert [r['success'] for r in data['results']] == [True, False, True]
+    assert data['results'][0]['url'] == data['results'][2]['url']
+    assert (data['uploaded'], data['failed']) == (2, 1)
+
+    # Identical content is uploaded once, streamed from disk with a Content-Length
+    assert len(imgbb_stub.uploads) == 1
+    upload = imgbb_stub.uploads[0]
+    assert int(upload['headers']['Content-Length']) == len(upload['body'])
+    assert API_KEY.encode() in upload['body']
+    assert (history_images / '0.png').read_bytes() in upload['body']
+
+
+def test_batch_upload_streams_sse_events_and_uses_cache(client, imgbb_stub):
+    images = [{'task_id': 'task_1', 'filename': '0.png', 'index': 0}]
+    client.post('/api/upload/batch', json={'images': images})
+
+    response = client.post('/api/upload/batch', json={'images': images, 'stream': True})
+
+    assert response.mimetype == 'text/event-stream'
+    events = [block.split('\n', 1) for block in response.get_data(as_text=True).strip().split('\n\n')]
+    names = [name for name, _ in events]
+    assert names == ['event: image', 'event: complete']
+    complete = json.loads(events[-1][1][len('data: '):])
+    assert complete['cached'] == 1
+    assert len(imgbb_stub.uploads) == 1
+
+
+def test_batch_upload_requires_api_key(client, imgbb_stub, tmp_path):
+    (tmp_path / 'upload_config.yaml').write_text(yaml.safe_dump({'imgbb': {'api_key': ''}}), encoding='utf-8')
+    CONFIG_STORE.reload('upload')
+
+    response = client.post('/api/upload/batch', json={'images': [{'task_id': 'task_1', 'filename': '0.png'}]})
+
+    assert response.status_code == 400
+    assert imgbb_stub.uploads == []
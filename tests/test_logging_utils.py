@@ -0,0 +1,61 @@
+"""
+日志工具测试：惰性摘要、敏感信息遮盖、按模块采样
+"""
+import logging
+import pytest
+from backend.utils.logging_utils import LazyPayload, SamplingFilter, redact, summarize_payload
+
+
+def _record(name, level):
+    return logging.LogRecord(name, level, __file__, 1, "msg", None, None)
+
+
+def test_summarize_payload_shortens_images_and_hides_secrets():
+    payload = {
+        "data": [{"b64_json": "A" * 5000}],
+        "api_key": "sk-secret-value",
+        "raw": b"\x89PNG" * 100,
+    }
+
+    summary = summarize_payload(payload)
+
+    assert summary["data"][0]["b64_json"].endswith("<str len=5000>")
+    assert summary["api_key"] == "***"
+    assert summary["raw"] == "<bytes len=400>"
+
+
+def test_lazy_payload_is_only_summarized_when_emitted(monkeypatch):
+    calls = []
+
+    def counting_summary(value, depth=0):
+        calls.append(value)
+        return value
+
+    monkeypatch.setattr('backend.utils.logging_utils.summarize_payload', counting_summary)
+    logger = logging.getLogger('tests.lazy_payload')
+    logger.setLevel(logging.INFO)
+
+    logger.debug("payload: %s", LazyPayload({"a": 1}))
+    assert calls == []
+
+    assert str(LazyPayload({"a": 1})) == "{'a': 1}"
+    assert calls == [{"a": 1}]
+
+
+@pytest.mark.parametrize('text, secret', [
+    ("Authorization: Bearer abc.def-123", "abc.def-123"),
+    ("using key sk-abcdefghijklmnop", "sk-abcdefghijklmnop"),
+    ("url?key=AIzaSyA1234567890abcdefghij&x=1", "AIzaSyA1234567890abcdefghij"),
+    ('{"access_token": "ya29.tokenvalue"}', "ya29.tokenvalue"),
+])
+def test_redact_masks_secrets(text, secret):
+    assert secret not in redact(text)
+
+
+def test_sampling_filter_matches_longest_prefix_and_keeps_warnings():
+    sampling = SamplingFilter({'backend': 1.0, 'backend.generators': 0.0})
+
+    assert sampling.filter(_record('backend.generators.image_api', logging.INFO)) is False
+    assert sampling.filter(_record('backend.generators.image_api', logging.WARNING)) is True
+    assert sampling.filter(_record('backend.services.image', logging.DEBUG)) is True
+    assert sampling.filter(_record('backend_other', logging.INFO)) is True
@@ -0,0 +1,92 @@
+"""
+指标测试：Prometheus 文本格式输出
+"""
+import pytest
+from backend.utils.metrics import RATE_LIMITED, RETRIES, MetricsRegistry, is_rate_limit_error
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = registry.histogram('stage_seconds', 'Stage duration', ['stage'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='decode')
+    histogram.observe(0.5, stage='decode')
+    histogram.observe(3, stage='decode')
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ['# HELP stage_seconds Stage duration', '# TYPE stage_seconds histogram']
+    assert 'stage_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="decode",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="decode"} 3.55' in lines
+    assert 'stage_seconds_count{stage="decode"} 3' in lines
+
+
+def test_counter_escapes_labels_and_fills_missing_ones(registry):
+    counter = registry.counter('retries_total', 'Retries', ['component', 'provider'])
+    counter.inc(component='image', provider='a"b\\c\nd')
+    counter.inc(2, component='text')
+
+    output = registry.render()
+
+    assert 'retries_total{component="image",provider="a\\"b\\\\c\\nd"} 1' in output
+    assert 'retries_total{component="text",provider=""} 2' in output
+    assert counter.get(component='text') == 2
+    assert output.endswith('\n')
+
+
+def test_duplicate_registration_returns_existing_metric(registry):
+    first = registry.counter('hits_total', 'Hits', ['cache'])
+    second = registry.counter('hits_total', 'Hits', ['cache'])
+    assert first is second
+    assert registry.render().count('# TYPE hits_total counter') == 1
+
+
+def test_metrics_route_serves_prometheus_text(client):
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE blog_stage_duration_seconds histogram' in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('message, expected', [
+    ("429 Too Many Requests", True),
+    ("RESOURCE_EXHAUSTED: quota", True),
+    ("Rate limit exceeded", True),
+    ("500 Internal Server Error", False),
+    ("Image generation failed", False),
+])
+def test_is_rate_limit_error(message, expected):
+    assert is_rate_limit_error(Exception(message)) is expected
+
+
+def test_is_rate_limit_error_uses_status_code():
+    error = Exception("quota")
+    error.status_code = 429
+    assert is_rate_limit_error(error) is True
+
+
+def test_rate_limit_on_last_attempt_is_counted(monkeypatch):
+    from backend.generators import image_api
+
+    monkeypatch.setattr(image_api.time, 'sleep', lambda seconds: None)
+    calls = []
+
+    @image_api.retry_on_error(max_retries=2, base_delay=0)
+    def always_rate_limited(model=None):
+        calls.append(model)
+        raise Exception("429 Too Many Requests")
+
+    labels = {'component': 'generator', 'provider': '', 'model': 'metrics-test'}
+    rate_limited, retries = RATE_LIMITED.get(**labels), RETRIES.get(**labels)
+    with pytest.raises(Exception):
+        always_rate_limited(model='metrics-test')
+
+    # Both attempts hit 429, only the first was retried
+    assert len(calls) == 2
+    assert RATE_LIMITED.get(**labels) - rate_limited == 2
+    assert RETRIES.get(**labels) - retries == 1
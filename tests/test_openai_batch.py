@@ -0,0 +1,107 @@
+"""
+OpenAI 兼容生成器的批量生成测试（使用 benchmarks/mock_provider.py 的 /v1/batches 模拟接口）
+"""
+import pytest
+from backend.generators.base import ImageGeneratorBase
+from backend.generators.openai_compatible import OpenAICompatibleGenerator
+from backend.utils.streaming import StreamedImage, image_bytes
+
+
+def _generator(mock_provider, **config):
+    return OpenAICompatibleGenerator({
+        'api_key': 'mock-test-key',
+        'base_url': mock_provider.base_url,
+        'model': 'mock-image-model',
+        'batch_mode': 'jsonl',
+        'batch_poll_interval': 0.05,
+        **config,
+    })
+
+
+def _requests(count):
+    return [{"custom_id": str(i), "prompt": f"第 {i} 页"} for i in range(1, count + 1)]
+
+
+def test_jsonl_batch_returns_every_image_streamed(mock_provider, stream_tmp_dir):
+    generator = _generator(mock_provider)
+    progress = []
+
+    results = generator.generate_images_batch(_requests(5), progress_callback=progress.append)
+
+    assert sorted(results) == ["1", "2", "3", "4", "5"]
+    assert all(isinstance(image, StreamedImage) for image in results.values())
+    assert image_bytes(results["3"]).startswith(b'\x89PNG')
+    assert progress and progress[-1]["status"] == "completed"
+    assert progress[-1]["completed"] == 5
+    requests = mock_provider.stats()["requests"]
+    assert requests["files.upload 200"] == 1
+    assert requests["batches.create 200"] == 1
+    assert requests["files.content 200"] == 1
+    assert "images 200" not in requests
+    for image in results.values():
+        image.discard()
+
+
+def test_jsonl_batch_reports_failed_items(mock_provider, stream_tmp_dir):
+    mock_provider.error_rate = 1.0
+    generator = _generator(mock_provider)
+
+    results = generator.generate_images_batch(_requests(3))
+
+    assert all(isinstance(error, Exception) for error in results.values())
+    # Image data of failed lines never reaches a temp file
+    assert not stream_tmp_dir.exists() or not any(stream_tmp_dir.iterdir())
+
+
+def test_polling_reports_progress_before_completion(mock_provider, stream_tmp_dir):
+    mock_provider.latency.params = [0.3]
+    generator = _generator(mock_provider)
+    progress = []
+
+    results = generator.generate_images_batch(_requests(2), progress_callback=progress.append)
+
+    statuses = [update["status"] for update in progress]
+    assert statuses[0] == "in_progress"
+    assert statuses[-1] == "completed"
+    for image in results.values():
+        image.discard()
+
+
+@pytest.mark.parametrize('batch_mode', ['none', 'unknown'])
+def test_other_batch_modes_fall_back_to_single_requests(mock_provider, stream_tmp_dir, batch_mode):
+    generator = _generator(mock_provider, batch_mode=batch_mode)
+    assert generator.batch_mode == 'none'
+    assert not generator.supports_batch()
+
+    results = generator.generate_images_batch(_requests(2))
+
+    assert len(results) == 2
+    assert mock_provider.stats()["requests"] == {"images 200": 2}
+    for image in results.values():
+        image.discard()
+
+
+class EchoGenerator(ImageGeneratorBase):
+    """逐张生成，prompt 为 fail 时失败"""
+
+    def generate_image(self, prompt, **kwargs):
+        if prompt == "fail":
+            raise ValueError("failed")
+        return f"{prompt}:{kwargs.get('size')}".encode()
+
+    def validate_config(self):
+        return True
+
+
+def test_base_batch_falls_back_to_generate_image():
+    generator = EchoGenerator({})
+    progress = []
+
+    results = generator.generate_images_batch(
+        [{"custom_id": 1, "prompt": "a", "size": "1x1"}, {"custom_id": 2, "prompt": "fail"}],
+        progress_callback=progress.append
+    )
+
+    assert results["1"] == b"a:1x1"
+    assert isinstance(results["2"], ValueError)
+    assert progress[-1] == {"status": "completed", "completed": 1, "failed": 1, "total": 2}
@@ -0,0 +1,62 @@
+"""
+提示词压缩测试：大纲简介、截断，以及 compact_prompt 默认关闭
+"""
+import pytest
+from backend.services.image import ImageTaskContext
+from backend.utils.prompt_compaction import build_outline_brief, truncate_text
+
+OUTLINE = (
+    "[封面]\n標題：在家煮咖啡\n副標題：從選豆到手沖\n配圖建議：咖啡杯與咖啡豆\n"
+    "<page>\n[內容] 如何挑選咖啡豆\n產地、烘焙度與新鮮度都會影響風味，購買時注意烘焙日期。\n配圖建議：各種咖啡豆\n"
+    "<page>\n[內容] 手沖的基本步驟\n先溫杯，再以 92 度的熱水分段注水，控制總時間約兩分半。\n"
+)
+
+
+@pytest.mark.parametrize('text, max_chars, expected', [
+    ("短文字", 10, "短文字"),
+    ("一二三四五六", 4, "一二三…"),
+    ("", 3, ""),
+    ("不限制", 0, "不限制"),
+])
+def test_truncate_text(text, max_chars, expected):
+    assert truncate_text(text, max_chars) == expected
+
+
+def test_outline_brief_keeps_titles_and_headings_only():
+    brief = build_outline_brief(OUTLINE)
+
+    assert brief.splitlines() == [
+        "[封面] 標題：在家煮咖啡 / 副標題：從選豆到手沖",
+        "[內容] 如何挑選咖啡豆",
+        "[內容] 手沖的基本步驟",
+    ]
+    assert "配圖建議" not in brief
+
+
+def test_outline_brief_is_never_longer_than_outline():
+    assert build_outline_brief("[封面] 短") == "[封面] 短"
+    assert len(build_outline_brief(OUTLINE, max_chars=20)) <= 20
+
+
+def _prompt(service):
+    page = {"index": 1, "type": "content", "content": "如何挑選咖啡豆"}
+    task = ImageTaskContext("task_prompt", "", pages=[page], full_outline=OUTLINE)
+    return service._build_prompt(page, task, OUTLINE, "咖啡入門", "flat"), task
+
+
+def test_full_outline_is_sent_by_default(make_image_service):
+    service = make_image_service()
+    prompt, task = _prompt(service)
+
+    assert service.compact_prompt is False
+    assert "先溫杯" in prompt
+    assert task.prompt_stats.to_dict()["saved_chars"] == 0
+
+
+def test_compact_prompt_sends_outline_brief(make_image_service):
+    service = make_image_service(compact_prompt=True)
+    prompt, task = _prompt(service)
+
+    assert "[內容] 手沖的基本步驟" in prompt
+    assert "先溫杯" not in prompt
+    assert task.prompt_stats.to_dict()["saved_chars"] > 0
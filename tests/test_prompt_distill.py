@@ -0,0 +1,71 @@
+"""
+提示词提炼测试：distill_prompt 默认关闭，开启后用提炼结果，失败时回退到页面原文
+"""
+import pytest
+from backend.services import image as image_module
+from backend.services.image import ImageTaskContext
+from backend.services.outline import OutlineService
+
+PAGES = [
+    {"index": 0, "type": "cover", "content": "標題：在家煮咖啡"},
+    {"index": 1, "type": "content", "content": "產地、烘焙度與新鮮度都會影響風味"},
+]
+
+
+class FakeOutlineService:
+    def __init__(self, prompts=None, error=None):
+        self.prompts = prompts or {}
+        self.error = error
+        self.calls = 0
+
+    def generate_image_prompts(self, pages, full_outline, user_topic=""):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.prompts
+
+
+@pytest.fixture
+def outline_service(monkeypatch):
+    def install(**kwargs):
+        service = FakeOutlineService(**kwargs)
+        monkeypatch.setattr(image_module, 'get_outline_service', lambda: service)
+        return service
+    return install
+
+
+def _distill(service):
+    task = ImageTaskContext("task_distill", "", pages=PAGES, full_outline="大綱")
+    service._distill_page_prompts(task)
+    return task
+
+
+def test_distillation_is_off_by_default(make_image_service, outline_service):
+    outline = outline_service(prompts={1: "咖啡豆特寫"})
+    task = _distill(make_image_service())
+
+    assert outline.calls == 0
+    assert task.page_prompt(PAGES[1]) == PAGES[1]["content"]
+
+
+def test_distilled_prompts_replace_page_text(make_image_service, outline_service):
+    outline_service(prompts={1: "咖啡豆特寫"})
+    task = _distill(make_image_service(distill_prompt=True))
+
+    assert task.page_prompt(PAGES[1]) == "咖啡豆特寫"
+    # 模型漏掉的頁面、或之後被編輯過的頁面都改用原文
+    assert task.page_prompt(PAGES[0]) == PAGES[0]["content"]
+    assert task.page_prompt(dict(PAGES[1], content="已編輯")) == "已編輯"
+
+
+def test_distillation_failure_falls_back_to_page_text(make_image_service, outline_service):
+    outline_service(error=RuntimeError("text provider down"))
+    task = _distill(make_image_service(distill_prompt=True))
+
+    assert task.page_prompts == {}
+    assert task.page_prompt(PAGES[1]) == PAGES[1]["content"]
+
+
+def test_parse_image_prompts_tolerates_surrounding_text():
+    text = '結果如下：\n```json\n[{"index": 1, "prompt": " 咖啡豆 "}, {"index": 9, "prompt": "x"}, {"index": "bad"}]\n```'
+    assert OutlineService._parse_image_prompts(None, text, [0, 1]) == {1: "咖啡豆"}
@@ -0,0 +1,107 @@
+"""
+参考图片测试：上传一次后以内容哈希引用、大小上限、过期清理
+"""
+import hashlib
+import io
+import os
+import time
+import pytest
+from PIL import Image
+from backend.config import Config
+from backend.routes import image_routes, outline_routes
+from backend.services.reference_images import (
+    ReferenceImageNotFound, ReferenceImageStore, ReferenceImageTooLarge
+)
+
+
+def _png_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 60).convert('RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """写入临时目录的参考图片存储（不写入 history/.cache）"""
+    store = ReferenceImageStore(str(tmp_path / 'references'))
+    monkeypatch.setattr(image_routes, 'REFERENCE_STORE', store)
+    monkeypatch.setattr(outline_routes, 'REFERENCE_STORE', store)
+    return store
+
+
+def _upload(client, *contents):
+    files = [(io.BytesIO(content), f'{i}.png') for i, content in enumerate(contents)]
+    return client.post('/api/references', data={'images': files}, content_type='multipart/form-data')
+
+
+def test_upload_returns_content_hash_and_stores_compressed_variant(client, store):
+    content = _png_bytes()
+    data = _upload(client, content).get_json()
+
+    reference = data['references'][0]
+    assert reference['handle'] == hashlib.sha256(content).hexdigest()
+    assert reference['existing'] is False
+    assert reference['stored_size'] <= 200 * 1024 < reference['size']
+    assert len(store.get(reference['handle'])) == reference['stored_size']
+    assert not [name for name in os.listdir(store.root) if name.endswith('.part')]
+
+    again = _upload(client, content).get_json()['references'][0]
+    assert again['existing'] is True
+    assert client.get(f"/api/references/{reference['handle']}").status_code == 200
+    assert client.get(f"/api/references/{'0' * 64}").status_code == 404
+
+
+def test_upload_over_limit_is_rejected(client, store, monkeypatch):
+    monkeypatch.setattr(Config, 'REFERENCE_IMAGE_MAX_BYTES', 1000)
+
+    response = _upload(client, _png_bytes())
+
+    assert response.status_code == 413
+    assert os.listdir(store.root) == []
+
+
+def test_upload_rejects_non_image(client, store):
+    response = _upload(client, b'not an image at all')
+    assert response.status_code == 400
+    assert os.listdir(store.root) == []
+
+
+def test_unknown_handle_in_generate_returns_missing_reference(client, store):
+    response = client.post('/api/generate', json={
+        'pages': [{'index': 0, 'type': 'cover', 'content': '标题'}],
+        'task_id': 'task_ref',
+        'reference_images': ['f' * 64],
+    })
+
+    assert response.status_code == 404
+    assert response.get_json()['missing_reference'] is True
+
+
+def test_get_is_served_from_disk_when_not_in_memory(store, monkeypatch):
+    monkeypatch.setattr(Config, 'REFERENCE_IMAGE_CACHE_SIZE', 1)
+    first = store.save(io.BytesIO(_png_bytes(size=(64, 64))))['handle']
+    store.save(io.BytesIO(_png_bytes(size=(65, 64))))
+
+    assert first not in store._memory
+    assert store.get(first) == open(os.path.join(store.root, first), 'rb').read()
+    with pytest.raises(ReferenceImageNotFound):
+        store.get('../../etc/passwd')
+
+
+def test_unused_images_expire(store, monkeypatch):
+    handle = store.save(io.BytesIO(_png_bytes(size=(64, 64))))['handle']
+    old = time.time() - Config.REFERENCE_IMAGE_TTL - 10
+    os.utime(os.path.join(store.root, handle), (old, old))
+
+    store._next_prune = 0.0
+    store.save(io.BytesIO(_png_bytes(size=(65, 64))))
+
+    assert not store.exists(handle)
+    with pytest.raises(ReferenceImageNotFound):
+        store.get(handle)
+
+
+def test_save_checks_size_while_streaming(store):
+    with pytest.raises(ReferenceImageTooLarge):
+        store.save(io.BytesIO(b'x' * 5000), max_bytes=4096)
+    assert os.listdir(store.root) == []
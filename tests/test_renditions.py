@@ -0,0 +1,49 @@
+"""
+多尺寸 WebP 测试：产生版本、?w= 选择、HTML 导出 srcset
+"""
+import pytest
+from backend.config import Config
+from backend.services.export import ExportService
+from backend.utils.renditions import generate_renditions
+
+WIDTHS = [160, 320, 1600]
+
+
+@pytest.fixture
+def renditions(history_images, monkeypatch):
+    monkeypatch.setattr(Config, 'IMAGE_RENDITION_WIDTHS', WIDTHS)
+    return generate_renditions(str(history_images / '0.png'), WIDTHS)
+
+
+def test_only_widths_narrower_than_the_original_are_produced(renditions, history_images):
+    assert renditions == [160, 320]
+    assert (history_images / '0_w320.webp').exists()
+    assert not (history_images / '0_w1600.webp').exists()
+
+
+def test_width_query_serves_smallest_sufficient_rendition(client, renditions, history_images):
+    response = client.get('/api/images/task_1/0.png?w=200')
+    assert response.mimetype == 'image/webp'
+    assert response.data == (history_images / '0_w320.webp').read_bytes()
+
+    # Wider than every rendition: the original
+    response = client.get('/api/images/task_1/0.png?w=1000')
+    assert response.data == (history_images / '0.png').read_bytes()
+
+
+def test_srcset_widest_candidate_is_the_original(renditions, history_images):
+    service = ExportService()
+    service.history_root_dir = str(history_images.parent)
+
+    srcset = service._build_srcset('task_1', '0.png', '/api/images/task_1/0.png')
+
+    assert '/api/images/task_1/0.png?w=160 160w' in srcset
+    assert '/api/images/task_1/0.png?thumbnail=false 640w' in srcset
+
+
+def test_renditions_are_off_by_default(history_images):
+    service = ExportService()
+    service.history_root_dir = str(history_images.parent)
+
+    assert Config.IMAGE_RENDITION_WIDTHS == []
+    assert service._build_srcset('task_1', '0.png', '/api/images/task_1/0.png') == ""
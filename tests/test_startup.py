@@ -0,0 +1,36 @@
+"""
+启动测试：预热默认关闭，设置 STARTUP_WARMUP 后才在后台预热
+"""
+import os
+import subprocess
+import sys
+import pytest
+from backend import app as app_module
+from backend.config import Config
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, False), ('', False), ('0', False), ('1', True), ('true', True), ('YES', True),
+])
+def test_startup_warmup_is_opt_in(value, expected):
+    env = {k: v for k, v in os.environ.items() if k != 'STARTUP_WARMUP'}
+    if value is not None:
+        env['STARTUP_WARMUP'] = value
+    result = subprocess.run(
+        [sys.executable, '-c', 'from backend.config import Config; print(Config.STARTUP_WARMUP)'],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == str(expected)
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def test_create_app_warms_up_only_when_enabled(monkeypatch, enabled):
+    calls = []
+    monkeypatch.setattr(Config, 'STARTUP_WARMUP', enabled)
+    monkeypatch.setattr(app_module, '_warm_up_in_background', calls.append)
+
+    app_module.create_app()
+
+    assert len(calls) == int(enabled)
@@ -0,0 +1,109 @@
+"""
+流式解码测试：ImagePayloadScanner 在任意分块边界下的解码结果
+"""
+import base64
+import io
+import json
+import os
+import pytest
+from PIL import Image
+from backend.utils.image_compressor import compress_image_file
+from backend.utils.streaming import PLACEHOLDER, scan_image_chunks
+
+IMAGE = bytes(range(256)) * 3 + b"tail"
+ENCODED = base64.b64encode(IMAGE).decode()
+
+
+def _split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _json_escaped(encoded: str) -> str:
+    """模拟服务商的 JSON 转义：\\/ 与每 76 字符一个 \\n"""
+    lines = [encoded[i:i + 76] for i in range(0, len(encoded), 76)]
+    return "\\n".join(lines).replace("/", "\\/")
+
+
+PAYLOADS = {
+    "b64_json": '{"created": 1, "data": [{"b64_json": "%s", "revised_prompt": "a cat"}]}' % ENCODED,
+    "escaped": '{"data": [{"b64_json": "%s"}]}' % _json_escaped(ENCODED),
+    "data_uri": '{"choices": [{"message": {"content": "![img](data:image/png;base64,%s) done"}}]}' % ENCODED,
+    "unicode_escape": '{"data": [{"b64_json": "%s"}]}' % ENCODED.replace("+", "\\u002b"),
+}
+
+
+@pytest.mark.parametrize('name', sorted(PAYLOADS))
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 64, 159, 160, 161, 100000])
+def test_images_decode_across_chunk_boundaries(stream_tmp_dir, name, chunk_size):
+    payload = PAYLOADS[name].encode()
+
+    images, text = scan_image_chunks(_split(payload, chunk_size))
+
+    assert len(images) == 1
+    assert images[0].read() == IMAGE
+    assert len(images[0]) == len(IMAGE)
+    assert PLACEHOLDER.format(0) in text.decode()
+    json.loads(text)
+    images[0].discard()
+
+
+def test_multiple_images_keep_their_order(stream_tmp_dir):
+    second = b"second image"
+    payload = json.dumps({"data": [
+        {"b64_json": ENCODED},
+        {"b64_json": base64.b64encode(second).decode()},
+    ]}).encode()
+
+    images, text = scan_image_chunks(_split(payload, 13))
+
+    assert [image.read() for image in images] == [IMAGE, second]
+    result = json.loads(text)
+    assert [item["b64_json"] for item in result["data"]] == [PLACEHOLDER.format(0), PLACEHOLDER.format(1)]
+    for image in images:
+        image.discard()
+
+
+def test_truncated_image_is_discarded(stream_tmp_dir):
+    payload = PAYLOADS["b64_json"].encode()[:200]
+
+    images, _ = scan_image_chunks(_split(payload, 50))
+
+    assert images == []
+    assert not any(stream_tmp_dir.iterdir())
+
+
+def test_text_without_images_is_unchanged(stream_tmp_dir):
+    payload = json.dumps({"error": {"message": "rate limited", "code": 429}}).encode()
+
+    images, text = scan_image_chunks(_split(payload, 4))
+
+    assert images == []
+    assert text == payload
+
+
+def test_thumbnail_is_built_from_file(tmp_path):
+    path = tmp_path / "page.png"
+    noise = Image.frombytes("RGB", (1200, 800), os.urandom(1200 * 800 * 3))
+    noise.save(path, "PNG")
+
+    thumbnail = compress_image_file(str(path), max_size_kb=50)
+
+    assert len(thumbnail) <= 50 * 1024
+    assert Image.open(io.BytesIO(thumbnail)).format == "JPEG"
+
+
+def test_small_file_is_returned_as_is(tmp_path):
+    path = tmp_path / "small.png"
+    Image.new("RGB", (16, 16), (10, 20, 30)).save(path, "PNG")
+
+    assert compress_image_file(str(path), max_size_kb=50) == path.read_bytes()
+
+
+def test_unreadable_file_is_returned_as_is_and_logged(tmp_path, caplog):
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'not an image' * 10000)
+
+    with caplog.at_level('WARNING', logger='backend.utils.image_compressor'):
+        assert compress_image_file(str(path), max_size_kb=50) == path.read_bytes()
+
+    assert 'broken.png' in caplog.text
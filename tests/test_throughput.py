@@ -0,0 +1,82 @@
+"""
+基准工具测试：模拟服务商的延迟与错误注入、吞吐量基准的百分位与回归比较
+"""
+import json
+import random
+import pytest
+import requests
+from mock_provider import LatencyModel, MockProviderServer
+from throughput import compare, main, percentile
+
+
+@pytest.mark.parametrize('spec, low, high', [
+    ('0.25', 0.25, 0.25),
+    ('const:0.5', 0.5, 0.5),
+    ('uniform:0.1,0.2', 0.1, 0.2),
+    ('normal:0.1,5', 0.0, float('inf')),
+    ('lognormal:1,0.5', 0.0, float('inf')),
+    ('exp:0.3', 0.0, float('inf')),
+])
+def test_latency_samples_stay_in_range(spec, low, high):
+    model = LatencyModel(spec, random.Random(1))
+    assert all(low <= model.sample() <= high for _ in range(200))
+
+
+@pytest.mark.parametrize('spec', ['uniform:1', 'gamma:1,2', 'const:-1', 'const:fast'])
+def test_invalid_latency_spec_is_rejected(spec):
+    with pytest.raises(ValueError):
+        LatencyModel(spec, random.Random(1))
+
+
+def test_injected_failures_are_counted_per_route():
+    with MockProviderServer(error_rate=0.5, rate_limit_rate=0.5, payload_kb=4, seed=3) as server:
+        statuses = [
+            requests.post(f"{server.base_url}/v1/images/generations", json={"prompt": "x"}, timeout=5)
+            for _ in range(20)
+        ]
+
+    assert {response.status_code for response in statuses} == {500, 429}
+    assert all(r.headers.get("Retry-After") == "1" for r in statuses if r.status_code == 429)
+    counts = server.stats()["requests"]
+    assert counts.get("images 500", 0) + counts.get("images 429", 0) == 20
+
+
+def test_images_endpoint_returns_n_images():
+    with MockProviderServer(payload_kb=4, seed=1) as server:
+        data = requests.post(
+            f"{server.base_url}/v1/images/generations", json={"prompt": "x", "n": 3}, timeout=5
+        ).json()["data"]
+    assert len(data) == 3 and all(item["b64_json"] for item in data)
+
+
+def test_percentile_is_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert (percentile(samples, 50), percentile(samples, 95), percentile(samples, 99)) == (50.0, 95.0, 99.0)
+    assert percentile([3.0], 99) == 3.0
+
+
+def _result(concurrency, pages_per_s, p95):
+    return {"concurrency": concurrency, "pages_per_s": pages_per_s, "latency_s": {"p95": p95}}
+
+
+def test_compare_reports_only_regressions_beyond_threshold():
+    baseline = {"results": [_result(1, 10.0, 1.0), _result(4, 40.0, 1.0)]}
+    summary = {"results": [_result(1, 9.0, 1.1), _result(4, 30.0, 1.5), _result(15, 1.0, 9.0)]}
+
+    regressions = compare(summary, baseline, max_regression=0.2)
+
+    assert regressions == ["concurrency 4 pages/s: 40.0 -> 30.0", "concurrency 4 p95: 1.0s -> 1.5s"]
+
+
+def test_benchmark_runs_end_to_end(tmp_path):
+    output = tmp_path / 'throughput.json'
+    exit_code = main([
+        '--concurrency', '1,2', '--pages', '3', '--latency', 'const:0', '--payload-kb', '8',
+        '--output', str(output),
+    ])
+
+    summary = json.loads(output.read_text(encoding='utf-8'))
+    assert exit_code == 0
+    assert [r["concurrency"] for r in summary["results"]] == [1, 2]
+    assert all(r["completed"] == 3 and r["failed"] == 0 for r in summary["results"])
+    assert summary["results"][0]["provider_requests"] == {"images 200": 3}
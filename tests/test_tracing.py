@@ -0,0 +1,54 @@
+"""
+追踪测试：span 嵌套、跨线程传递、JSONL 导出
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from backend.utils import tracing
+from backend.utils.tracing import Tracer, build_span_tree, start_span, summarize_spans
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    tracer = Tracer(export_file=str(tmp_path / "traces" / "spans.jsonl"))
+    monkeypatch.setattr(tracing, '_tracer', tracer)
+    return tracer
+
+
+def test_spans_nest_and_propagate_to_pool_threads(tracer):
+    with start_span("image.generate", trace_id="task_1"):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, _child_span, index)
+                for index in range(2)
+            ]
+            for future in futures:
+                future.result()
+
+    tree = build_span_tree(tracer.get_spans("task_1"))
+    assert [root["name"] for root in tree] == ["image.generate"]
+    assert sorted(child["attributes"]["index"] for child in tree[0]["children"]) == [0, 1]
+
+
+def _child_span(index):
+    with start_span("image.page", index=index):
+        pass
+
+
+def test_failed_span_records_error_and_summary(tracer):
+    with pytest.raises(ValueError):
+        with start_span("export.html", trace_id="task_2"):
+            raise ValueError("boom")
+
+    summary = summarize_spans(tracer.get_spans("task_2"))
+    assert summary["span_count"] == 1
+    assert summary["by_name"]["export.html"]["errors"] == 1
+
+
+def test_spans_are_read_back_from_export_file(tracer):
+    with start_span("publish.blogger", trace_id="task_3"):
+        pass
+
+    reloaded = Tracer(export_file=tracer.export_file)
+    spans = reloaded.get_spans("task_3")
+    assert [span["name"] for span in spans] == ["publish.blogger"]
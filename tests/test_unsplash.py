@@ -0,0 +1,147 @@
+"""
+Unsplash 測試：搜尋快取與串流下載（大小上限、縮圖）
+"""
+import io
+import pytest
+import yaml
+from PIL import Image
+from backend.config import Config
+from backend.routes import unsplash_routes
+from backend.utils.config_store import CONFIG_STORE
+
+API_KEY = 'unsplash-test-key'
+
+
+def _png_bytes(size=(320, 200)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (90, 160, 220)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, content=b'', headers=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.content = content
+        self.headers = headers or {}
+        self.closed = False
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), 7):
+            yield self.content[i:i + 7]
+
+    def close(self):
+        self.closed = True
+
+
+class ImmediateExecutor:
+    """背景工作改為同步執行，測試可直接檢查結果"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def unsplash_api(tmp_path, monkeypatch, stream_tmp_dir):
+    """Unsplash API 改為假回應，上傳配置與歷史目錄寫入臨時路徑"""
+    config_path = tmp_path / 'upload_config.yaml'
+    config_path.write_text(yaml.safe_dump({'unsplash': {'api_key': API_KEY}}), encoding='utf-8')
+    monkeypatch.setitem(CONFIG_STORE._entries, 'upload', CONFIG_STORE._entries['upload'])
+    CONFIG_STORE.register('upload', str(config_path))
+    monkeypatch.setattr(unsplash_routes, 'HISTORY_ROOT', str(tmp_path / 'history'))
+    monkeypatch.setattr(unsplash_routes, '_search_cache', unsplash_routes._SearchCache())
+    monkeypatch.setattr(unsplash_routes, '_background', ImmediateExecutor())
+    monkeypatch.setattr(Config, 'IMAGE_RENDITION_WIDTHS', [])
+
+    calls = []
+    responses = {}
+
+    def fake_get(url, params=None, headers=None, timeout=None, stream=False):
+        calls.append((url, params))
+        return responses.get(url) or FakeResponse(200, {'total': 0, 'results': []})
+
+    monkeypatch.setattr(unsplash_routes.requests, 'get', fake_get)
+    return calls, responses
+
+
+def _search_result():
+    return {'total': 1, 'results': [{
+        'id': 'p1',
+        'urls': {key: f'https://images.example/{key}' for key in ('thumb', 'small', 'regular', 'full')},
+        'alt_description': '貓',
+        'user': {'name': '攝影師', 'links': {'html': 'https://unsplash.com/@someone'}},
+    }]}
+
+
+def test_repeat_search_is_served_from_cache(client, unsplash_api):
+    calls, responses = unsplash_api
+    responses['https://api.unsplash.com/search/photos'] = FakeResponse(200, _search_result())
+
+    first = client.post('/api/unsplash/search', json={'query': 'Cat  Cafe'}).get_json()
+    second = client.post('/api/unsplash/search', json={'query': 'cat cafe'}).get_json()
+    client.post('/api/unsplash/search', json={'query': 'cat cafe', 'orientation': 'portrait'})
+
+    assert first['cached'] is False and second['cached'] is True
+    assert second['photos'] == first['photos'] and second['total'] == 1
+    assert len(calls) == 2
+
+
+def test_failed_search_is_not_cached(client, unsplash_api):
+    calls, responses = unsplash_api
+    responses['https://api.unsplash.com/search/photos'] = FakeResponse(500)
+
+    for _ in range(2):
+        response = client.post('/api/unsplash/search', json={'query': 'cat'})
+        assert response.status_code == 500
+    assert len(calls) == 2
+
+
+def test_search_cache_expires(unsplash_api, monkeypatch):
+    monkeypatch.setattr(Config, 'UNSPLASH_SEARCH_CACHE_TTL', -1)
+    cache = unsplash_routes._SearchCache()
+    cache.set(('cat', 'landscape', 8), {'photos': []})
+    assert cache.get(('cat', 'landscape', 8)) is None
+
+
+def test_download_streams_photo_and_builds_thumbnail(client, unsplash_api, tmp_path):
+    calls, responses = unsplash_api
+    content = _png_bytes()
+    responses['https://images.example/regular'] = FakeResponse(200, content=content)
+
+    data = client.post('/api/unsplash/download', json={
+        'photo_url': 'https://images.example/regular', 'task_id': 'task_1', 'index': 0, 'photo_id': 'p1',
+    }).get_json()
+
+    task_dir = tmp_path / 'history' / 'task_1'
+    assert data == {'success': True, 'image_url': '/api/images/task_1/0.png'}
+    assert (task_dir / '0.png').read_bytes() == content
+    assert (task_dir / 'thumb_0.png').exists()
+    assert ('https://api.unsplash.com/photos/p1/download', None) in calls
+
+
+@pytest.mark.parametrize('headers', [{'Content-Length': '999999'}, {}])
+def test_download_over_size_limit_is_rejected(client, unsplash_api, tmp_path, stream_tmp_dir, monkeypatch, headers):
+    _, responses = unsplash_api
+    monkeypatch.setattr(Config, 'UNSPLASH_DOWNLOAD_MAX_BYTES', 100)
+    response_stub = FakeResponse(200, content=_png_bytes(), headers=headers)
+    responses['https://images.example/full'] = response_stub
+
+    response = client.post('/api/unsplash/download', json={
+        'photo_url': 'https://images.example/full', 'task_id': 'task_1', 'index': 0,
+    })
+
+    # Content-Length 過大時直接拒絕，缺少時按實際讀取量中止；都不留下暫存檔
+    assert response.status_code == 413
+    assert response_stub.closed
+    assert not (tmp_path / 'history' / 'task_1' / '0.png').exists()
+    assert not stream_tmp_dir.exists() or not any(stream_tmp_dir.iterdir())
+
+
+def test_download_rejects_path_outside_history(client, unsplash_api):
+    response = client.post('/api/unsplash/download', json={
+        'photo_url': 'https://images.example/regular', 'task_id': '../outside', 'index': 0,
+    })
+    assert response.status_code == 400